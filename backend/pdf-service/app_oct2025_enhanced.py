@@ -2,9 +2,11 @@
 NEXA AI Document Analyzer - Multi-Spec Support
 Enhanced version with multiple spec file support and persistent storage
 """
+# First, so every import below is timed (GET /debug/startup)
+from startup_profiler import startup_profiler
+startup_profiler.install_import_hook()
+
 import os
-import io
-import pickle
 import json
 from datetime import datetime
 from contextlib import asynccontextmanager
@@ -12,21 +14,31 @@ from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query, Fo
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from sentence_transformers import SentenceTransformer, util
-from pypdf import PdfReader
 import nltk
-import re
 import torch
 import pandas as pd
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from pydantic import BaseModel, Field, validator
-import pytesseract
 from PIL import Image
 import logging
 import time
+import asyncio
 from multiprocessing import Pool, cpu_count
 from functools import lru_cache  # Week 1: Added for caching spec lookups
 from middleware import ValidationMiddleware, ErrorHandlingMiddleware, RateLimitMiddleware
+from modules.spec_index import SpecSnapshot
+from modules.spec_dedup import dedup_report
+from modules.spec_store import get_spec_store
+from modules.model_registry import get_embedding_model, model_registry
+from pdf_extraction import iter_pages, get_extraction_stats, shutdown_pool as shutdown_extraction_pool
+from pdf_ocr import get_ocr_stats
+from modules.upload_spool import SpooledUpload, UploadTooLarge, spool_upload
+from modules.cpu_executor import get_cpu_executor
+from modules.embedding_batcher import get_embedding_batcher
+from modules.plugin_registry import PluginRegistry
+from modules.audit_pipeline import clean_audit_garble, extract_text_from_pdf, analyze_audit_pdf, analyzer_config_hash
+from modules.audit_result_cache import get_audit_result_cache, result_key
+from modules.rate_limiter import create_rate_limiter
 import hashlib
 
 # Configure logging
@@ -46,7 +58,7 @@ except ImportError as e:
 # Pricing integration for cost impact analysis
 try:
     from modules.pricing_endpoints import pricing_router, init_pricing_analyzer
-    from modules.pricing_integration import enhance_infraction_with_pricing, PricingAnalyzer
+    from modules.pricing_integration import PricingAnalyzer
     PRICING_ENABLED = True
     logger.info("💰 Pricing integration enabled")
 except ImportError as e:
@@ -54,49 +66,21 @@ except ImportError as e:
     logger.warning(f"Pricing integration not available: {e}")
     pricing_router = None
 
-# Job Package Training integration
-try:
-    from modules.job_package_training_api import add_training_endpoints
-    TRAINING_ENABLED = True
-    logger.info("📚 Job package training enabled - NEXA can learn to fill packages!")
-except ImportError as e:
-    TRAINING_ENABLED = False
-    logger.warning(f"Job package training not available: {e}")
-    add_training_endpoints = None
-
-# Enhanced Spec Analyzer with Fine-Tuned NER
-try:
-    from modules.enhanced_spec_analyzer import integrate_with_app as add_enhanced_analyzer
-    ENHANCED_ANALYZER_ENABLED = True
-    logger.info("🎯 Enhanced analyzer with poles/underground NER enabled!")
-except ImportError as e:
-    ENHANCED_ANALYZER_ENABLED = False
-    logger.warning(f"Enhanced analyzer not available: {e}")
-    add_enhanced_analyzer = None
-
-# Spec Learning System
-try:
-    from modules.spec_learning_endpoints import integrate_spec_learning
-    SPEC_LEARNING_ENABLED = True
-    logger.info("📚 Spec learning system enabled - Upload PG&E PDFs!")
-except ImportError as e:
-    SPEC_LEARNING_ENABLED = False
-    logger.warning(f"Spec learning not available: {e}")
-    integrate_spec_learning = None
-
 # === CPU PERFORMANCE OPTIMIZATION ===
 num_cores = int(os.environ.get('RENDER_CORES', len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else cpu_count()))
 optimal_threads = max(1, num_cores // 2)
 
-torch.set_num_threads(optimal_threads)
-torch.set_num_interop_threads(1)
+with startup_profiler.span('torch.set_num_threads'):
+    torch.set_num_threads(optimal_threads)
+    torch.set_num_interop_threads(1)
 
 os.environ.setdefault('OMP_NUM_THREADS', str(optimal_threads))
 os.environ.setdefault('MKL_NUM_THREADS', str(optimal_threads))
 os.environ.setdefault('PYTORCH_ENABLE_MPS_FALLBACK', '1')
 
 # Download NLTK data
-nltk.download('punkt', quiet=True)
+with startup_profiler.span('nltk.download'):
+    nltk.download('punkt', quiet=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -106,15 +90,28 @@ async def lifespan(app: FastAPI):
     
     # Initialize default specs for testing
     try:
-        spec_lib = load_spec_library()
-        if spec_lib['metadata']['total_chunks'] == 0:
+        with startup_profiler.span('lifespan.spec_library'):
+            spec_snapshot = get_spec_snapshot()
+        if len(spec_snapshot) == 0:
             logger.info("Initializing default spec library...")
             # The load_spec_library function already handles initialization
         else:
-            logger.info(f"Spec library loaded: {spec_lib['metadata']['total_chunks']} chunks")
+            logger.info(f"Spec library loaded: {len(spec_snapshot)} chunks (v{spec_snapshot.version})")
     except Exception as e:
         logger.error(f"Failed to initialize spec library: {e}")
     
+    # Load the shared embedding model without holding up the port bind
+    # (its load time is reported by /debug/startup from the registry)
+    model_registry.preload(device=device, background=True)
+    
+    # Load PLUGIN_WARMUP plugins without holding up the port bind; the rest load on first request
+    plugin_registry.start_warmup()
+    
+    # Compact small spec segments in the background
+    with startup_profiler.span('lifespan.spec_maintenance'):
+        spec_store.index.start_background_maintenance()
+        spec_store.start_watching()
+    
     # Pre-load vision model if enabled
     if VISION_ENABLED:
         try:
@@ -125,8 +122,9 @@ async def lifespan(app: FastAPI):
                 logger.info("Roboflow API key found, will download utility-pole-detection-birhf model")
             
             # Pre-initialize detector to download model
-            from modules.pole_vision_detector import PoleVisionDetector
-            detector = PoleVisionDetector()
+            with startup_profiler.span('lifespan.vision_model'):
+                from modules.pole_vision_detector import PoleVisionDetector
+                detector = PoleVisionDetector()
             logger.info("Vision model pre-loaded successfully")
             
             # Test model status
@@ -143,17 +141,18 @@ async def lifespan(app: FastAPI):
     if os.path.exists(ner_model_path):
         try:
             # Load fine-tuned NER with F1=0.87
-            from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
-            ner_model = AutoModelForTokenClassification.from_pretrained(ner_model_path)
-            ner_tokenizer = AutoTokenizer.from_pretrained(ner_model_path)
-            
-            # Create NER pipeline for easy inference
-            ner_pipeline = pipeline(
-                "token-classification",
-                model=ner_model,
-                tokenizer=ner_tokenizer,
-                aggregation_strategy="simple"
-            )
+            with startup_profiler.span('lifespan.ner_model'):
+                from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
+                ner_model = AutoModelForTokenClassification.from_pretrained(ner_model_path)
+                ner_tokenizer = AutoTokenizer.from_pretrained(ner_model_path)
+
+                # Create NER pipeline for easy inference
+                ner_pipeline = pipeline(
+                    "token-classification",
+                    model=ner_model,
+                    tokenizer=ner_tokenizer,
+                    aggregation_strategy="simple"
+                )
             
             logger.info("✅ Fine-tuned NER model loaded (F1=0.87) from /data/fine_tuned_ner_deep")
             NER_AVAILABLE = True
@@ -169,15 +168,25 @@ async def lifespan(app: FastAPI):
     # Initialize pricing if enabled
     if PRICING_ENABLED:
         try:
-            init_pricing_analyzer(app)
+            with startup_profiler.span('lifespan.pricing_analyzer'):
+                init_pricing_analyzer(app)
             logger.info("💰 Pricing analyzer initialized")
         except Exception as e:
             logger.warning(f"Pricing analyzer initialization failed: {e}")
-    
+
+    startup_profiler.mark_ready()
+    logger.info(f"⏱️ Startup took {startup_profiler.ready_seconds}s, RSS {startup_profiler.ready_rss_mb}MB (GET /debug/startup)")
+
     yield  # Server is running
     
     # Shutdown code
     logger.info("Shutting down NEXA Field Management System...")
+    await plugin_registry.stop_warmup()
+    spec_store.stop_watching()
+    spec_store.index.stop_background_maintenance()
+    shutdown_extraction_pool()
+    await embedding_batcher.stop()
+    cpu_executor.shutdown()
 
 app = FastAPI(
     title="NEXA Universal Standards Platform",
@@ -186,7 +195,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 # Add middleware - ORDER MATTERS! CORS must be last
-app.add_middleware(RateLimitMiddleware, calls=200, period=60)  # Week 1: Increased for 30 users
+rate_limiter = create_rate_limiter(calls=200, period=60)  # Week 1: Increased for 30 users
+app.add_middleware(RateLimitMiddleware, calls=200, period=60, limiter=rate_limiter)
 app.add_middleware(ErrorHandlingMiddleware)
 app.add_middleware(ValidationMiddleware)
 
@@ -203,7 +213,8 @@ app.add_middleware(
 # Model setup
 device = 'cpu'
 logger.info(f"🔧 Using device: {device}")
-model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+# Shared with every analyzer module through the registry; loaded on first use
+model = get_embedding_model(device=device, consumer='app')
 
 # Persistence paths - ALWAYS use /data on Render
 DATA_PATH = '/data'
@@ -213,12 +224,23 @@ SPEC_METADATA_PATH = os.path.join(DATA_PATH, 'spec_metadata.json')
 # Create data directory if it doesn't exist
 os.makedirs(DATA_PATH, exist_ok=True)
 
+# Process-resident spec library shared with every analyzer module - reloads only when the on-disk version changes
+with startup_profiler.span('spec_store'):
+    spec_store = get_spec_store(DATA_PATH)
+
+# Bounded pool for parsing/OCR/encoding so the event loop stays responsive (503 + Retry-After when saturated)
+cpu_executor = get_cpu_executor()
+
+# Concurrent single-text encodes (go-back analyses) are coalesced into one batched encode on cpu_executor
+embedding_batcher = get_embedding_batcher()
+
 logger.info(f"💾 Data storage path: {DATA_PATH}")
 
 # Initialize pricing analyzer if available
 pricing_analyzer = None
 if PRICING_ENABLED:
-    pricing_analyzer = init_pricing_analyzer(model, DATA_PATH)
+    with startup_profiler.span('pricing_analyzer'):
+        pricing_analyzer = init_pricing_analyzer(model, DATA_PATH)
     logger.info("💰 Pricing analyzer initialized")
 
 # Include vision router if available
@@ -231,188 +253,62 @@ if PRICING_ENABLED and pricing_router:
     app.include_router(pricing_router, prefix="/pricing", tags=["Pricing"])
     logger.info("💰 Pricing endpoints registered at /pricing/*")
 
-# Include training endpoints if available
-if TRAINING_ENABLED and add_training_endpoints:
-    add_training_endpoints(app)
-    logger.info("📚 Training endpoints registered - /train-job-package, /train-as-built, /batch-train-packages")
-
-# Include enhanced analyzer if available
-if ENHANCED_ANALYZER_ENABLED and add_enhanced_analyzer:
-    add_enhanced_analyzer(app)
-    logger.info("🎯 Enhanced analyzer endpoints registered - /analyze-go-back, /batch-analyze-go-backs")
-
-# Include spec learning system if available
-if SPEC_LEARNING_ENABLED and integrate_spec_learning:
-    integrate_spec_learning(app)
-    logger.info("📚 Spec learning endpoints registered - /spec-learning/learn-spec, /spec-learning/search-specs")
-
-# Mega Bundle Analysis System
-try:
-    from modules.mega_bundle_endpoints import integrate_mega_bundle_endpoints
-    MEGA_BUNDLE_ENABLED = True
-    logger.info("📦 Mega bundle analysis enabled - Process 3500+ jobs!")
-except ImportError as e:
-    MEGA_BUNDLE_ENABLED = False
-    logger.warning(f"Mega bundle analysis not available: {e}")
-    integrate_mega_bundle_endpoints = None
-
-if MEGA_BUNDLE_ENABLED and integrate_mega_bundle_endpoints:
-    integrate_mega_bundle_endpoints(app)
-    logger.info("✅ Mega bundle endpoints registered - /mega-bundle/upload, /mega-bundle/status")
-
-# Spec-Based Hour Estimation System
-try:
-    from modules.spec_based_hour_estimator import integrate_spec_hour_estimation
-    HOUR_ESTIMATION_ENABLED = True
-    logger.info("⏰ Spec-based hour estimation enabled - More accurate profitability!")
-except ImportError as e:
-    HOUR_ESTIMATION_ENABLED = False
-    logger.warning(f"Hour estimation not available: {e}")
-    integrate_spec_hour_estimation = None
-
-if HOUR_ESTIMATION_ENABLED and integrate_spec_hour_estimation:
-    integrate_spec_hour_estimation(app)
-    logger.info("✅ Hour estimation endpoints registered - /hour-estimation/estimate")
-
-# Model Fine-Tuning System
-try:
-    from modules.model_fine_tuner import integrate_fine_tuning_endpoints
-    FINE_TUNING_ENABLED = True
-    logger.info("🎯 Model fine-tuning enabled - Improve NER/YOLO/embeddings!")
-except ImportError as e:
-    FINE_TUNING_ENABLED = False
-    logger.warning(f"Fine-tuning not available: {e}")
-    integrate_fine_tuning_endpoints = None
-
-if FINE_TUNING_ENABLED and integrate_fine_tuning_endpoints:
-    integrate_fine_tuning_endpoints(app)
-    logger.info("✅ Fine-tuning endpoints registered - /fine-tune/start, /fine-tune/progress")
-
-# Conduit NER Fine-Tuning System
-try:
-    from modules.conduit_ner_fine_tuner import integrate_conduit_ner_endpoints
-    CONDUIT_NER_ENABLED = True
-    logger.info("🚇 Conduit NER fine-tuning enabled - Improve underground analysis!")
-except ImportError as e:
-    CONDUIT_NER_ENABLED = False
-    logger.warning(f"Conduit NER fine-tuning not available: {e}")
-    integrate_conduit_ner_endpoints = None
-
-if CONDUIT_NER_ENABLED and integrate_conduit_ner_endpoints:
-    integrate_conduit_ner_endpoints(app)
-    logger.info("✅ Conduit NER endpoints registered - /fine-tune-conduits/start")
-
-# Enhanced Conduit Analyzer
-try:
-    from modules.conduit_enhanced_analyzer import integrate_enhanced_analyzer
-    CONDUIT_ANALYZER_ENABLED = True
-    logger.info("🔍 Enhanced conduit analyzer enabled - >90% go-back confidence!")
-except ImportError as e:
-    CONDUIT_ANALYZER_ENABLED = False
-    logger.warning(f"Enhanced conduit analyzer not available: {e}")
-    integrate_enhanced_analyzer = None
-
-if CONDUIT_ANALYZER_ENABLED and integrate_enhanced_analyzer:
-    integrate_enhanced_analyzer(app)
-    logger.info("✅ Conduit analyzer endpoints registered - /conduit-analysis/*")
-
-# Overhead Lines NER Fine-Tuning System
-try:
-    from modules.overhead_ner_fine_tuner import integrate_overhead_ner_endpoints
-    OVERHEAD_NER_ENABLED = True
-    logger.info("⚡ Overhead NER fine-tuning enabled - Improve conductor/insulator analysis!")
-except ImportError as e:
-    OVERHEAD_NER_ENABLED = False
-    logger.warning(f"Overhead NER fine-tuning not available: {e}")
-    integrate_overhead_ner_endpoints = None
-
-if OVERHEAD_NER_ENABLED and integrate_overhead_ner_endpoints:
-    integrate_overhead_ner_endpoints(app)
-    logger.info("✅ Overhead NER endpoints registered - /fine-tune-overhead/*")
-
-# Enhanced Overhead Analyzer
-try:
-    from modules.overhead_enhanced_analyzer import integrate_overhead_analyzer
-    OVERHEAD_ANALYZER_ENABLED = True
-    logger.info("📡 Enhanced overhead analyzer enabled - >85% go-back confidence!")
-except ImportError as e:
-    OVERHEAD_ANALYZER_ENABLED = False
-    logger.warning(f"Enhanced overhead analyzer not available: {e}")
-    integrate_overhead_analyzer = None
-
-if OVERHEAD_ANALYZER_ENABLED and integrate_overhead_analyzer:
-    integrate_overhead_analyzer(app)
-    logger.info("✅ Overhead analyzer endpoints registered - /overhead-analysis/*")
-
-# Clearance-Enhanced NER Fine-Tuning System  
-try:
-    from modules.clearance_enhanced_fine_tuner import integrate_clearance_fine_tuning_endpoints
-    CLEARANCE_FINETUNE_ENABLED = True
-    logger.info("🚂 Clearance NER fine-tuning enabled - Target F1 >0.9!")
-except ImportError as e:
-    CLEARANCE_FINETUNE_ENABLED = False
-    logger.warning(f"Clearance fine-tuning not available: {e}")
-    integrate_clearance_fine_tuning_endpoints = None
-
-if CLEARANCE_FINETUNE_ENABLED and integrate_clearance_fine_tuning_endpoints:
-    integrate_clearance_fine_tuning_endpoints(app)
-    logger.info("✅ Clearance fine-tuning endpoints registered - /fine-tune-clearances/*")
-
-# Clearance Analyzer
-try:
-    from modules.clearance_analyzer import integrate_clearance_analyzer
-    CLEARANCE_ANALYZER_ENABLED = True
-    logger.info("📏 Clearance analyzer enabled - Railroad/ground clearance analysis!")
-except ImportError as e:
-    CLEARANCE_ANALYZER_ENABLED = False
-    logger.warning(f"Clearance analyzer not available: {e}")
-    integrate_clearance_analyzer = None
-
-if CLEARANCE_ANALYZER_ENABLED and integrate_clearance_analyzer:
-    integrate_clearance_analyzer(app)
-    logger.info("✅ Clearance analyzer endpoints registered - /clearance-analysis/*")
-
-# Universal Standards Engine
-try:
-    from modules.universal_standards import integrate_universal_endpoints
-    UNIVERSAL_STANDARDS_ENABLED = True
-    logger.info("🌍 Universal Standards Engine enabled - Multi-utility support!")
-except ImportError as e:
-    UNIVERSAL_STANDARDS_ENABLED = False
-    logger.warning(f"Universal Standards Engine not available: {e}")
-    integrate_universal_endpoints = None
-
-if UNIVERSAL_STANDARDS_ENABLED and integrate_universal_endpoints:
-    integrate_universal_endpoints(app)
-    logger.info("✅ Universal Standards endpoints registered - /api/utilities/*")
-
-# Authentication System - Import and integrate
-try:
-    from modules.auth_system import integrate_auth, get_current_user
-    AUTH_ENABLED = True
-    # Note: integrate_auth will add the /auth prefix internally
-    integrate_auth(app)
-    logger.info("Authentication system loaded")
-except Exception as e:
-    AUTH_ENABLED = False
-    logger.warning(f"Authentication system not available: {e}")
-    import traceback
-    traceback.print_exc()
-    get_current_user = None
-
-# Roboflow Dataset Integration
-try:
-    from modules.roboflow_dataset_integrator import integrate_roboflow_datasets
-    ROBOFLOW_ENABLED = True
-    logger.info("🖼️ Roboflow integration enabled - Fix crossarm detection!")
-except ImportError as e:
-    ROBOFLOW_ENABLED = False
-    logger.warning(f"Roboflow integration not available: {e}")
-    integrate_roboflow_datasets = None
-
-if ROBOFLOW_ENABLED and integrate_roboflow_datasets:
-    integrate_roboflow_datasets(app)
-    logger.info("✅ Roboflow endpoints registered - /roboflow/download-datasets, /roboflow/merge-and-train")
+# Optional feature routers - routes are declared now, each plugin is imported and
+# integrated on its first request (or by PLUGIN_WARMUP); ENABLED_PLUGINS is the allow-list
+plugin_registry = PluginRegistry(app)
+plugin_registry.declare('training', 'modules.job_package_training_api', 'add_training_endpoints',
+                        ['/train-job-package', '/train-as-built', '/batch-train-packages',
+                         '/training-status', '/test-fill-package'],
+                        "Job package / as-built training")
+plugin_registry.declare('enhanced_analyzer', 'modules.enhanced_spec_analyzer', 'integrate_with_app',
+                        ['/analyze-go-back', '/batch-analyze-go-backs', '/analyzer-stats'],
+                        "Go-back analyzer with poles/underground NER")
+plugin_registry.declare('spec_learning', 'modules.spec_learning_endpoints', 'integrate_spec_learning',
+                        ['/spec-learning'], "Spec learning system")
+plugin_registry.declare('mega_bundle', 'modules.mega_bundle_endpoints', 'integrate_mega_bundle_endpoints',
+                        ['/mega-bundle'], "Mega bundle analysis")
+plugin_registry.declare('hour_estimation', 'modules.spec_based_hour_estimator', 'integrate_spec_hour_estimation',
+                        ['/hour-estimation'], "Spec-based hour estimation")
+plugin_registry.declare('fine_tuning', 'modules.model_fine_tuner', 'integrate_fine_tuning_endpoints',
+                        ['/fine-tune'], "NER/YOLO/embedding fine-tuning")
+plugin_registry.declare('conduit_ner', 'modules.conduit_ner_fine_tuner', 'integrate_conduit_ner_endpoints',
+                        ['/fine-tune-conduits'], "Conduit NER fine-tuning")
+plugin_registry.declare('conduit_analyzer', 'modules.conduit_enhanced_analyzer', 'integrate_enhanced_analyzer',
+                        ['/conduit-analysis'], "Enhanced conduit go-back analyzer")
+plugin_registry.declare('overhead_ner', 'modules.overhead_ner_fine_tuner', 'integrate_overhead_ner_endpoints',
+                        ['/fine-tune-overhead'], "Overhead lines NER fine-tuning")
+plugin_registry.declare('overhead_analyzer', 'modules.overhead_enhanced_analyzer', 'integrate_overhead_analyzer',
+                        ['/overhead-analysis'], "Enhanced overhead go-back analyzer")
+plugin_registry.declare('clearance_ner', 'modules.clearance_enhanced_fine_tuner',
+                        'integrate_clearance_fine_tuning_endpoints',
+                        ['/fine-tune-clearances'], "Clearance NER fine-tuning")
+plugin_registry.declare('clearance_analyzer', 'modules.clearance_analyzer', 'integrate_clearance_analyzer',
+                        ['/clearance-analysis'], "Railroad/ground clearance analyzer")
+plugin_registry.declare('universal_standards', 'modules.universal_standards', 'integrate_universal_endpoints',
+                        ['/api/utilities'], "Universal Standards Engine (multi-utility)")
+plugin_registry.declare('auth', 'modules.auth_system', 'integrate_auth',
+                        ['/auth'], "Authentication")
+plugin_registry.declare('roboflow', 'modules.roboflow_dataset_integrator', 'integrate_roboflow_datasets',
+                        ['/roboflow'], "Roboflow dataset integration")
+logger.info(f"🔌 {len(plugin_registry.plugins)} plugins declared, loaded on first use")
+
+def preload_for_fork():
+    """
+    Load the embedding model, the spec library's ANN indexes and the
+    PLUGIN_WARMUP plugins in this process. Called by serve_preload.py in the
+    master before it forks workers, which then share all of it copy-on-write
+    instead of each loading its own. Nothing here runs inference (OpenMP
+    thread pools do not survive a fork).
+    """
+    with startup_profiler.span('preload.embedding_model'):
+        model_registry.preload(device=device)
+    with startup_profiler.span('preload.spec_library'):
+        snapshot = spec_store.snapshot()
+        if len(snapshot) and snapshot.ann is not None:
+            for segment in snapshot.segments:
+                snapshot.ann.get(segment)
+    with startup_profiler.span('preload.plugins'):
+        plugin_registry.preload()
 
 # === MODELS ===
 class SpecFile(BaseModel):
@@ -450,68 +346,8 @@ def get_file_hash(content: bytes) -> str:
     return hashlib.sha256(content).hexdigest()[:16]
 
 def load_spec_library() -> Dict[str, Any]:
-    """Load existing spec library with metadata"""
-    # Default structure with all required fields
-    library = {
-        'chunks': [],
-        'embeddings': [],
-        'metadata': {
-            'files': [],
-            'total_chunks': 0,
-            'last_updated': None
-        }
-    }
-    
-    # Load embeddings if they exist
-    if os.path.exists(EMBEDDINGS_PATH):
-        try:
-            with open(EMBEDDINGS_PATH, 'rb') as f:
-                data = pickle.load(f)
-                # Handle different formats
-                if isinstance(data, tuple) and len(data) == 2:
-                    chunks, embeddings = data
-                    library['chunks'] = chunks if isinstance(chunks, list) else []
-                    library['embeddings'] = embeddings if hasattr(embeddings, '__len__') else []
-                elif isinstance(data, dict):
-                    # Merge with default structure to ensure all keys exist
-                    if 'chunks' in data:
-                        library['chunks'] = data['chunks']
-                    if 'embeddings' in data:
-                        library['embeddings'] = data['embeddings']
-                    if 'metadata' in data and isinstance(data['metadata'], dict):
-                        # Ensure metadata has all required fields
-                        library['metadata'].update(data['metadata'])
-                        if 'files' not in library['metadata']:
-                            library['metadata']['files'] = []
-                else:
-                    logger.warning(f"Unknown embeddings format: {type(data)}")
-        except Exception as e:
-            logger.warning(f"Could not load embeddings: {e}")
-    
-    # Load metadata if it exists
-    if os.path.exists(SPEC_METADATA_PATH):
-        try:
-            with open(SPEC_METADATA_PATH, 'r') as f:
-                metadata = json.load(f)
-                # Ensure metadata has all required fields
-                if isinstance(metadata, dict):
-                    if 'files' not in metadata:
-                        metadata['files'] = []
-                    # Convert float timestamps to ISO strings for backward compatibility
-                    for file_info in metadata.get('files', []):
-                        if isinstance(file_info.get('upload_time'), (int, float)):
-                            file_info['upload_time'] = datetime.fromtimestamp(file_info['upload_time']).isoformat()
-                    if isinstance(metadata.get('last_updated'), (int, float)):
-                        metadata['last_updated'] = datetime.fromtimestamp(metadata['last_updated']).isoformat()
-                    library['metadata'].update(metadata)
-        except Exception as e:
-            logger.warning(f"Could not load metadata: {e}")
-    
-    # Ensure metadata always has required fields
-    if 'files' not in library['metadata']:
-        library['metadata']['files'] = []
-    if 'total_chunks' not in library['metadata']:
-        library['metadata']['total_chunks'] = len(library.get('chunks', []))
+    """Load existing spec library with metadata (mutable copy of the resident index)"""
+    library = spec_store.snapshot().to_library()
     
     # Initialize with default spec only if explicitly allowed (for non-production testing)
     allow_defaults = os.getenv('ALLOW_TEST_DEFAULTS', 'false').lower() == 'true'
@@ -541,36 +377,26 @@ def load_spec_library() -> Dict[str, Any]:
     
     return library
 
+def get_spec_snapshot() -> SpecSnapshot:
+    """Read-only view of the current spec library (no copy, no disk I/O unless the version changed)"""
+    snapshot = spec_store.snapshot()
+    if len(snapshot) == 0 and os.getenv('ALLOW_TEST_DEFAULTS', 'false').lower() == 'true':
+        load_spec_library()
+        snapshot = spec_store.snapshot()
+    return snapshot
+
 def save_spec_library(library: Dict[str, Any]):
-    """Save spec library with metadata"""
-    # Create directory if needed
-    os.makedirs(DATA_PATH, exist_ok=True)
-    
-    # Ensure embeddings are in list format for saving
-    embeddings = library['embeddings']
-    if hasattr(embeddings, 'tolist'):
-        embeddings = embeddings.tolist()
-    
-    # Save embeddings
-    with open(EMBEDDINGS_PATH, 'wb') as f:
-        pickle.dump((library['chunks'], embeddings), f)
-    
-    # Update metadata
-    library['metadata']['total_chunks'] = len(library['chunks'])
-    library['metadata']['last_updated'] = datetime.utcnow().isoformat()
-    
-    # Save metadata
-    with open(SPEC_METADATA_PATH, 'w') as f:
-        json.dump(library['metadata'], f, indent=2)
+    """Save spec library with metadata and publish it as a new library version"""
+    spec_store.publish(library)
 
-def extract_text_chunks(pdf_content: bytes, filename: str, chunk_size: int = 400) -> List[str]:
+def extract_text_chunks(pdf_content: Union[bytes, str], filename: str, chunk_size: int = 400) -> List[str]:
     """Extract and chunk text from PDF with OCR cleaning - Week 1: Optimized chunk size"""
     try:
-        pdf_reader = PdfReader(io.BytesIO(pdf_content))
         chunks = []
         
-        for page_num, page in enumerate(pdf_reader.pages):
-            text = page.extract_text()
+        for page in iter_pages(pdf_content):
+            page_num = page.page_number - 1
+            text = page.text
             if text:
                 # Clean the text
                 cleaned_text = clean_audit_garble(text)
@@ -603,66 +429,6 @@ def extract_text_chunks(pdf_content: bytes, filename: str, chunk_size: int = 400
         logger.error(f"Error extracting text from {filename}: {e}")
         return []
 
-def clean_audit_garble(text: str) -> str:
-    """Enhanced cleaning for audit text garble"""
-    original_length = len(text)
-    
-    # Fix common OCR issues
-    text = re.sub(r'andentercallsnotlistedatendofeachsection\.\)No', '', text)
-    text = re.sub(r'(\w)\s+(\w)', r'\1\2', text)  # Fix split words
-    text = re.sub(r'\s+', ' ', text)  # Normalize spaces
-    text = re.sub(r'\)\.?No', '', text)  # Remove common audit endings
-    
-    # More aggressive cleaning
-    text = re.sub(r'QCInspectionandentercalls', 'QC Inspection and enter calls', text)
-    text = re.sub(r'notlistedatendofeachsection', 'not listed at end of each section', text)
-    
-    if original_length != len(text):
-        logger.info(f"🧹 Cleaned audit text: reduced from {original_length} to {len(text)} chars")
-    
-    return text.strip()
-
-def extract_text_from_pdf(pdf_content: bytes, use_ocr: bool = False) -> str:
-    """Extract text from PDF with optional OCR support"""
-    try:
-        pdf = PdfReader(io.BytesIO(pdf_content))
-        text = ""
-        ocr_pages = 0
-        
-        for i, page in enumerate(pdf.pages):
-            page_text = page.extract_text() or ""
-            
-            # Clean the extracted text
-            page_text = clean_audit_garble(page_text)
-            
-            # Use OCR if text extraction is poor
-            if use_ocr and len(page_text.strip()) < 100:
-                try:
-                    # Convert PDF page to image for OCR
-                    # Note: This requires pdf2image which needs poppler
-                    from pdf2image import convert_from_bytes
-                    images = convert_from_bytes(pdf_content, first_page=i+1, last_page=i+1)
-                    if images:
-                        ocr_text = pytesseract.image_to_string(images[0])
-                        if len(ocr_text) > len(page_text):
-                            page_text = ocr_text
-                            ocr_pages += 1
-                            logger.info(f"OCR extracted text from page {i+1}")
-                except Exception as e:
-                    logger.debug(f"OCR failed for page {i+1}: {e}")
-            
-            text += page_text + "\n"
-        
-        # Final cleanup
-        text = clean_audit_garble(text)
-        
-        if ocr_pages > 0:
-            logger.info(f"OCR was used on {ocr_pages} pages")
-        
-        return text
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to extract text: {str(e)}")
-
 def chunk_text(text: str, chunk_size: int = 1100) -> List[str]:
     """Split text into chunks for embedding"""
     sentences = nltk.sent_tokenize(text)
@@ -682,10 +448,10 @@ def chunk_text(text: str, chunk_size: int = 1100) -> List[str]:
     
     return chunks
 
-def process_spec_file(file_content: bytes, filename: str, use_ocr: bool = False) -> Dict[str, Any]:
-    """Process a single spec file and return chunks and metadata"""
+def process_spec_file(upload: SpooledUpload, filename: str, use_ocr: bool = False) -> Dict[str, Any]:
+    """Process a single spooled spec file and return chunks and metadata"""
     # Extract text
-    spec_text = extract_text_from_pdf(file_content, use_ocr=use_ocr)
+    spec_text = extract_text_from_pdf(upload.source, use_ocr=use_ocr, pdf_hash=upload.sha256)
     if not spec_text:
         raise ValueError(f"No text extracted from {filename}")
     
@@ -708,13 +474,12 @@ def process_spec_file(file_content: bytes, filename: str, use_ocr: bool = False)
     )
     
     # Create metadata
-    file_hash = get_file_hash(file_content)
     metadata = SpecFile(
         filename=filename,
         upload_time=datetime.utcnow().isoformat(),
         chunk_count=len(chunks),
-        file_hash=file_hash,
-        file_size=len(file_content)
+        file_hash=upload.file_hash,
+        file_size=upload.size
     )
     
     return {
@@ -736,6 +501,9 @@ async def root():
             "/health",
             "/status",
             "/spec-library",
+            "/spec-library/dedup",
+            "/plugins",
+            "/debug/startup",
             "/upload-specs",
             "/manage-specs",
             "/analyze-audit",
@@ -778,13 +546,8 @@ async def status():
         features = {
             "vision": VISION_ENABLED,
             "pricing": PRICING_ENABLED,
-            "training": TRAINING_ENABLED,
-            "enhanced_analyzer": ENHANCED_ANALYZER_ENABLED,
-            "spec_learning": SPEC_LEARNING_ENABLED,
-            "mega_bundle": MEGA_BUNDLE_ENABLED,
-            "hour_estimation": HOUR_ESTIMATION_ENABLED,
-            "fine_tuning": FINE_TUNING_ENABLED,
-            "conduit_ner": CONDUIT_NER_ENABLED
+            # Enabled plugins load on first use - GET /plugins shows which are loaded
+            **{name: plugin_registry.is_enabled(name) for name in plugin_registry.plugins}
         }
         
         # System info
@@ -800,7 +563,15 @@ async def status():
             "timestamp": datetime.now().isoformat(),
             "version": "oct2025_enhanced",
             "cpu_cores": num_cores,
-            "torch_threads": optimal_threads
+            "torch_threads": optimal_threads,
+            "spec_index": spec_store.get_stats(),
+            "embedding_models": model_registry.get_stats(),
+            "pdf_extraction": get_extraction_stats(),
+            "ocr": get_ocr_stats(),
+            "cpu_executor": cpu_executor.get_stats(),
+            "plugins_loaded": plugin_registry.get_stats()["loaded"],
+            "embedding_batcher": embedding_batcher.get_stats(),
+            "rate_limiter": rate_limiter.get_stats()
         }
     except Exception as e:
         logger.error(f"Error in /status endpoint: {e}")
@@ -814,16 +585,15 @@ async def status():
 async def get_spec_library():
     """Get current spec library status"""
     try:
-        library = load_spec_library()
+        snapshot = get_spec_snapshot()
         
         # Ensure all required fields exist
-        metadata = library.get('metadata', {})
+        metadata = snapshot.metadata
         files = metadata.get('files', [])
-        chunks = library.get('chunks', [])
         
         return SpecLibrary(
             total_files=len(files),
-            total_chunks=len(chunks),
+            total_chunks=len(snapshot),
             files=files,
             last_updated=metadata.get('last_updated'),
             storage_path=DATA_PATH
@@ -839,9 +609,37 @@ async def get_spec_library():
             storage_path=DATA_PATH
         )
 
+@app.get("/spec-library/dedup")
+async def get_spec_dedup_report():
+    """How much near-duplicate chunk collapsing shrank the spec library"""
+    snapshot = get_spec_snapshot()
+    return {
+        **dedup_report(snapshot),
+        "dedup": spec_store.index.dedup.get_stats()
+    }
+
+@app.get("/plugins")
+async def get_plugins():
+    """Optional feature plugins: allow-list, load state and import/integrate timings"""
+    return plugin_registry.get_stats()
+
+@app.get("/debug/startup")
+async def get_startup_profile(top: int = Query(25, ge=1, le=500)):
+    """Where boot time went: slowest imports, initializer spans with RSS, model and plugin loads"""
+    plugins = plugin_registry.get_stats()
+    return {
+        **startup_profiler.report(top=top),
+        "embedding_models": model_registry.get_stats()["models"],
+        "plugins_loaded": [
+            {key: plugin[key] for key in ("name", "trigger", "import_seconds", "integrate_seconds", "load_seconds")}
+            for plugin in plugins["plugins"] if plugin["state"] == 'loaded'
+        ]
+    }
+
 @app.post("/learn-spec/")
 async def learn_single_spec(file: UploadFile = File(...)):
     """Upload and learn a single spec PDF (convenience endpoint)"""
+    upload = None
     try:
         mode = "append"
         
@@ -849,29 +647,29 @@ async def learn_single_spec(file: UploadFile = File(...)):
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Read file content
-        content = await file.read()
-        file_size = len(content)
-        
-        if file_size > 1100 * 1024 * 1024:  # 1100MB limit
+        # Stream the upload to a spooled file, hashing as it arrives
+        try:
+            upload = await spool_upload(file, max_bytes=1100 * 1024 * 1024)  # 1100MB limit
+        except UploadTooLarge:
             raise HTTPException(status_code=400, detail="File too large (max 1100MB)")
+        file_size = upload.size
         
         # Process the single file
         start_time = time.time()
-        library = load_spec_library()
-        
-        if mode == 'replace':
-            library = {'chunks': [], 'embeddings': [], 'metadata': {'files': [], 'last_updated': None}}
         
         # Get file hash for deduplication
-        file_hash = get_file_hash(content)
-        existing_hashes = {f.get('file_hash') for f in library.get('metadata', {}).get('files', [])}
+        file_hash = upload.file_hash
+        if mode == 'replace':
+            existing_hashes = set()
+        else:
+            existing_files = get_spec_snapshot().metadata.get('files', [])
+            existing_hashes = {f.get('file_hash') for f in existing_files}
         
         if file_hash in existing_hashes:
             raise HTTPException(status_code=400, detail=f"File already uploaded: {file.filename}")
         
-        # Extract and process chunks
-        chunks = extract_text_chunks(content, file.filename)
+        # Extract and process chunks (off the event loop)
+        chunks = await cpu_executor.run(extract_text_chunks, upload.source, file.filename)
         
         if not chunks:
             raise HTTPException(status_code=400, detail="No text could be extracted from PDF")
@@ -879,42 +677,22 @@ async def learn_single_spec(file: UploadFile = File(...)):
         # Generate embeddings
         logger.info(f"Generating embeddings for {len(chunks)} chunks...")
         embed_start = time.time()
-        new_embeddings = model.encode(chunks, normalize_embeddings=True, show_progress_bar=False)
+        new_embeddings = await cpu_executor.run(model.encode, chunks, normalize_embeddings=True, show_progress_bar=False)
         logger.info(f"⏱️ Embeddings generation: {time.time() - embed_start:.2f}s")
         
-        # Add to library - handle both list and numpy array formats
-        library['chunks'].extend(chunks)
-        
-        # Convert embeddings to list if they're numpy arrays
-        if hasattr(library['embeddings'], 'tolist'):
-            library['embeddings'] = library['embeddings'].tolist()
-        if not isinstance(library['embeddings'], list):
-            library['embeddings'] = []
-            
-        # Add new embeddings
-        if hasattr(new_embeddings, 'tolist'):
-            library['embeddings'].extend(new_embeddings.tolist())
-        else:
-            library['embeddings'].extend(new_embeddings)
-        
-        # Update metadata - ensure it exists and has correct structure
-        if 'metadata' not in library or library['metadata'] is None:
-            library['metadata'] = {'files': [], 'last_updated': None}
-        
-        if 'files' not in library['metadata']:
-            library['metadata']['files'] = []
-        
-        library['metadata']['files'].append({
+        file_info = {
             'filename': file.filename,
             'file_hash': file_hash,
             'chunk_count': len(chunks),
             'file_size': file_size,
             'upload_time': datetime.utcnow().isoformat()
-        })
-        library['metadata']['last_updated'] = datetime.utcnow().isoformat()
+        }
         
-        # Save library
-        save_spec_library(library)
+        # Save library - one new segment, existing segments are untouched
+        if mode == 'replace':
+            await cpu_executor.run(spec_store.append_segments, [(chunks, new_embeddings, file_info)], replace=True)
+        else:
+            await cpu_executor.run(spec_store.append_segment, chunks, new_embeddings, file_info)
         
         processing_time = time.time() - start_time
         logger.info(f"✅ Spec learned successfully: {file.filename} ({len(chunks)} chunks in {processing_time:.2f}s)")
@@ -931,6 +709,9 @@ async def learn_single_spec(file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"Error in /learn-spec/: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        if upload:
+            upload.close()
 
 @app.post("/upload-specs", response_model=MultiSpecUploadResponse)
 async def upload_multiple_specs(
@@ -955,17 +736,14 @@ async def upload_multiple_specs(
                 detail=f"File {file.filename} is not a PDF"
             )
     
-    # Load existing library or create new
+    # Existing files for deduplication - replace mode starts empty
     if mode == 'append':
-        library = load_spec_library()
+        existing_hashes = {f.get('file_hash') for f in get_spec_snapshot().metadata.get('files', [])}
     else:
-        library = {
-            'chunks': [],
-            'embeddings': [],
-            'metadata': {'files': [], 'total_chunks': 0}
-        }
+        existing_hashes = set()
     
-    # Process each file
+    # Process each file - each one becomes a segment
+    segments = []
     processed_files = 0
     new_chunks_added = 0
     errors = []
@@ -974,39 +752,34 @@ async def upload_multiple_specs(
         try:
             logger.info(f"Processing spec file: {file.filename}")
             
-            # Read file content
-            content = await file.read()
-            if len(content) > 100 * 1024 * 1024:  # 100MB per file limit
+            # Stream the upload to a spooled file, hashing as it arrives
+            try:
+                upload = await spool_upload(file, max_bytes=100 * 1024 * 1024)  # 100MB per file limit
+            except UploadTooLarge:
                 errors.append(f"{file.filename}: File too large (max 100MB)")
                 continue
             
-            # Check if file already exists (by hash)
-            file_hash = get_file_hash(content)
-            existing_hashes = [f.file_hash for f in library['metadata'].get('files', [])]
-            
-            if file_hash in existing_hashes:
-                logger.info(f"Skipping {file.filename} - already in library")
-                continue
-            
-            # Process the file
-            result = process_spec_file(content, file.filename, use_ocr=True)
-            
-            # Add to library
-            library['chunks'].extend(result['chunks'])
-            
-            # Handle embeddings (numpy array or list)
-            if len(library['embeddings']) == 0:
-                library['embeddings'] = result['embeddings']
-            else:
-                import numpy as np
-                library['embeddings'] = np.vstack([library['embeddings'], result['embeddings']])
+            with upload:
+                # Check if file already exists (by hash)
+                file_hash = upload.file_hash
+                
+                if file_hash in existing_hashes:
+                    logger.info(f"Skipping {file.filename} - already in library")
+                    continue
+                
+                # Process the file
+                result = await cpu_executor.run(process_spec_file, upload, file.filename, use_ocr=True)
             
-            # Add metadata
-            library['metadata']['files'].append(result['metadata'].dict())
+            # Queue as a segment
+            segments.append((result['chunks'], result['embeddings'], result['metadata'].dict()))
+            existing_hashes.add(file_hash)
             
             processed_files += 1
             new_chunks_added += len(result['chunks'])
             
+        except HTTPException:
+            # Busy (503) - let the client retry the batch
+            raise
         except Exception as e:
             logger.error(f"Error processing {file.filename}: {e}")
             errors.append(f"{file.filename}: {str(e)}")
@@ -1017,8 +790,12 @@ async def upload_multiple_specs(
             detail=f"No files processed successfully. Errors: {'; '.join(errors)}"
         )
     
-    # Save updated library
-    save_spec_library(library)
+    # Save updated library - one commit for the whole batch
+    if segments or mode == 'replace':
+        snapshot = await cpu_executor.run(spec_store.append_segments, segments, replace=(mode == 'replace'))
+    else:
+        snapshot = get_spec_snapshot()
+    library_files = snapshot.metadata.get('files', [])
     
     # Prepare response
     message = f"Successfully processed {processed_files}/{len(files)} files"
@@ -1028,13 +805,13 @@ async def upload_multiple_specs(
     return MultiSpecUploadResponse(
         message=message,
         files_processed=processed_files,
-        total_chunks=len(library['chunks']),
+        total_chunks=len(snapshot),
         new_chunks_added=new_chunks_added,
         library_status=SpecLibrary(
-            total_files=len(library['metadata']['files']),
-            total_chunks=len(library['chunks']),
-            files=library['metadata']['files'],
-            last_updated=library['metadata'].get('last_updated'),
+            total_files=len(library_files),
+            total_chunks=len(snapshot),
+            files=library_files,
+            last_updated=snapshot.metadata.get('last_updated'),
             storage_path=DATA_PATH
         )
     )
@@ -1049,8 +826,6 @@ async def manage_spec_library(request: SpecManagementRequest):
     - remove: Remove specific file by hash
     - list: List all files (same as GET /spec-library)
     """
-    library = load_spec_library()
-    
     if request.operation == 'clear':
         # Clear everything
         library = {
@@ -1065,9 +840,11 @@ async def manage_spec_library(request: SpecManagementRequest):
         if not request.file_hash:
             raise HTTPException(status_code=400, detail="File hash required for remove operation")
         
+        snapshot = get_spec_snapshot()
+        
         # Find file to remove
         file_to_remove = None
-        for f in library['metadata'].get('files', []):
+        for f in snapshot.metadata.get('files', []):
             if f['file_hash'] == request.file_hash:
                 file_to_remove = f
                 break
@@ -1075,25 +852,21 @@ async def manage_spec_library(request: SpecManagementRequest):
         if not file_to_remove:
             raise HTTPException(status_code=404, detail="File not found in library")
         
-        # This is complex - would need to track which chunks belong to which file
-        # For now, just remove from metadata
-        library['metadata']['files'] = [
-            f for f in library['metadata']['files'] 
-            if f['file_hash'] != request.file_hash
-        ]
-        
-        save_spec_library(library)
+        # Tombstone the file - its chunks drop out of search immediately
+        snapshot = spec_store.tombstone(request.file_hash)
         return {
-            "message": f"Removed {file_to_remove['filename']} from metadata",
-            "note": "Chunks remain in library (full rebuild required for complete removal)"
+            "message": f"Removed {file_to_remove['filename']} from library",
+            "note": "Chunks are excluded from search now and reclaimed at the next compaction",
+            "total_chunks": len(snapshot)
         }
     
     elif request.operation == 'list':
+        snapshot = get_spec_snapshot()
         return SpecLibrary(
-            total_files=len(library['metadata'].get('files', [])),
-            total_chunks=len(library['chunks']),
-            files=library['metadata'].get('files', []),
-            last_updated=library['metadata'].get('last_updated'),
+            total_files=len(snapshot.metadata.get('files', [])),
+            total_chunks=len(snapshot),
+            files=snapshot.metadata.get('files', []),
+            last_updated=snapshot.metadata.get('last_updated'),
             storage_path=DATA_PATH
         )
 
@@ -1102,223 +875,50 @@ async def analyze_audit(
     file: UploadFile = File(..., description="Audit PDF to analyze")
 ):
     """Analyze audit against spec library"""
-    # Check spec library
-    library = load_spec_library()
-    if len(library['chunks']) == 0:
+    # Check spec library - one snapshot for the whole request
+    library = get_spec_snapshot()
+    if len(library) == 0:
         raise HTTPException(
             status_code=400,
             detail="No spec files in library. Please upload spec files first."
         )
     
-    # Process audit file
-    content = await file.read()
-    if len(content) > 100 * 1024 * 1024:
+    # Process audit file - streamed to a spooled file, never read whole
+    try:
+        upload = await spool_upload(file, max_bytes=100 * 1024 * 1024)
+    except UploadTooLarge:
         raise HTTPException(status_code=413, detail="File too large (max 100MB)")
     
-    # Extract text
-    logger.info(f"Analyzing audit: {file.filename}")
-    audit_text = extract_text_from_pdf(content, use_ocr=True)
-    
-    # Debug: Log sample of extracted text
-    logger.info(f"📄 Extracted text sample (first 500 chars): {audit_text[:500]}")
-    logger.info(f"📄 Text length: {len(audit_text)} characters")
-    
-    # Extract infractions using multiple detection methods
-    infractions = []
-    
-    # Method 1: Look for structured INFRACTION patterns (e.g., "INFRACTION #1:", "INFRACTION #2:")
-    logger.info("🔍 Method 1: Looking for structured INFRACTION patterns...")
-    infraction_pattern = r'INFRACTION\s*#?\d+[:\.]?\s*(.*?)(?=INFRACTION\s*#?\d+|SUMMARY|$)'
-    matches = re.finditer(infraction_pattern, audit_text, re.IGNORECASE | re.DOTALL)
-    
-    method1_count = 0
-    for match in matches:
-        infraction_text = match.group(0).strip()
-        if len(infraction_text) > 20:  # Filter out very short matches
-            infractions.append(infraction_text)
-            method1_count += 1
-    
-    logger.info(f"✓ Method 1 found {method1_count} structured infractions")
-    
-    # Method 1.5: Look for QC Audit format with "Non-Conforming Items"
-    if not infractions:
-        logger.info("🔍 Method 1.5: Looking for QC Audit non-conforming items pattern...")
-        # Look for "Total Number of Non-Conforming Items X"
-        nc_pattern = r'Total\s+Number\s+of\s+Non[-\s]?Conforming\s+Items\s+(\d+)'
-        nc_match = re.search(nc_pattern, audit_text, re.IGNORECASE)
-        
-        if nc_match:
-            nc_count = int(nc_match.group(1))
-            logger.info(f"✓ Found QC Audit with {nc_count} non-conforming items reported")
-            
-            # Look for checklist items marked "No" or with issues
-            lines = audit_text.split('\n')
-            for i, line in enumerate(lines):
-                line_lower = line.lower()
-                # Look for questions/items with "No" answers or issues
-                if any(indicator in line_lower for indicator in ['check "no"', 'check no', 'list the items', 'list the issues', 'missing']):
-                    # Capture the context around this item
-                    start = max(0, i-3)
-                    end = min(len(lines), i+7)
-                    block = '\n'.join(lines[start:end]).strip()
-                    if block and len(block) > 30 and block not in infractions:
-                        infractions.append(block)
-            
-            logger.info(f"✓ Method 1.5 found {len(infractions)} non-conforming items from checklist")
-    
-    # Method 2: If no structured infractions found, look for keywords
-    if not infractions:
-        logger.info("🔍 Method 2: Looking for keyword-based infractions...")
-        keywords = [
-            "go-back", "go back", "goback", 
-            "infraction", "violation", "deficiency",
-            "non-compliant", "non compliant", "noncompliant",
-            "non-conforming", "non conforming", "nonconforming",
-            "correction required", "correction needed",
-            "does not meet", "fails to meet",
-            "not in compliance", "out of compliance",
-            "check no", "check \"no\"", "marked no",
-            "incomplete", "failed", "missing"
-        ]
-        
-        lines = audit_text.split('\n')
-        current_block = []
-        
-        keyword_matches = []
-        for i, line in enumerate(lines):
-            line_lower = line.lower()
-            matched_keywords = [kw for kw in keywords if kw in line_lower]
-            if matched_keywords:
-                keyword_matches.append((i, matched_keywords, line[:100]))
-                # Capture context (previous and next lines)
-                start = max(0, i-2)
-                end = min(len(lines), i+5)
-                block = '\n'.join(lines[start:end]).strip()
-                if block and block not in infractions:
-                    infractions.append(block)
-        
-        logger.info(f"✓ Method 2 found {len(infractions)} keyword-based infractions from {len(keyword_matches)} keyword matches")
-        if keyword_matches and len(keyword_matches) <= 5:
-            for line_num, kws, line_text in keyword_matches:
-                logger.info(f"  Line {line_num}: keywords={kws}, text='{line_text}...'")
-    
-    if not infractions:
-        logger.warning(f"❌ No infractions detected in {file.filename}")
-        logger.warning(f"📄 Check if the PDF contains keywords like: go-back, infraction, violation, deficiency, non-compliant")
-        return {
-            "message": "No infractions found in this audit",
-            "infractions": [],
-            "audit_file": file.filename,
-            "text_length": len(audit_text),
-            "text_sample": audit_text[:500] + "..." if len(audit_text) > 500 else audit_text,
-            "note": "The analyzer looked for keywords like 'go-back', 'infraction', 'violation', 'deficiency', etc. but found none. Please verify the PDF contains these terms or check the text_sample to see what was extracted."
-        }
-    
-    # Analyze infractions against spec library
-    logger.info(f"Found {len(infractions)} infractions, analyzing against {len(library['chunks'])} spec chunks")
-    
-    results = []
-    for i, infraction in enumerate(infractions[:50], 1):  # Limit to 50
-        logger.info(f"Analyzing infraction {i}/{min(len(infractions), 50)}")
-        
-        # Get embedding
-        inf_embedding = model.encode([infraction], normalize_embeddings=True)
-        
-        # Calculate similarities
-        cos_scores = util.cos_sim(inf_embedding, library['embeddings'])[0]
-        
-        # Get top matches
-        top_k = 5  # Increased from 3 to 5 for better coverage
-        top_indices = cos_scores.argsort(descending=True)[:top_k]
-        
-        matches = []
-        for idx in top_indices:
-            score = cos_scores[idx].item()
-            if score > 0.4:  # Lowered threshold from 0.5 to 0.4
-                chunk = library['chunks'][idx]
-                # Extract source file from chunk
-                source_match = re.search(r'\[Source: (.*?)\]', chunk)
-                source = source_match.group(1) if source_match else "Unknown"
-                
-                # Clean the chunk text (remove source tag)
-                clean_chunk = re.sub(r'\[Source:.*?\]\s*', '', chunk).strip()
-                
-                matches.append({
-                    "source_spec": source,
-                    "relevance_score": round(score * 100, 1),
-                    "spec_text": clean_chunk[:300] + "..." if len(clean_chunk) > 300 else clean_chunk
-                })
-        
-        # Determine status based on match quality
-        if not matches:
-            status = "VALID"
-            confidence = "LOW"
-        elif matches[0]['relevance_score'] > 70:
-            status = "POTENTIALLY REPEALABLE"
-            confidence = "HIGH"
-        elif matches[0]['relevance_score'] > 55:
-            status = "POTENTIALLY REPEALABLE"
-            confidence = "MEDIUM"
-        else:
-            status = "VALID"
-            confidence = "MEDIUM"
-        
-        results.append({
-            "infraction_id": i,
-            "infraction_text": infraction[:500] + "..." if len(infraction) > 500 else infraction,
-            "spec_matches": matches,
-            "status": status,
-            "confidence": confidence,
-            "match_count": len(matches)
-        })
-    
-    logger.info(f"Analysis complete: {len(results)} infractions analyzed")
-    
-    # Enhance with pricing if available
-    if PRICING_ENABLED and pricing_analyzer:
-        for result in results:
-            if result['status'] == 'POTENTIALLY REPEALABLE':
-                try:
-                    result = enhance_infraction_with_pricing(result, pricing_analyzer)
-                except Exception as e:
-                    logger.warning(f"Failed to add pricing for infraction {result['infraction_id']}: {e}")
-        logger.info("💰 Pricing enhancement complete")
-    
-    # Transform to frontend-compatible format (for backwards compatibility)
-    infractions_frontend = []
-    for r in results:
-        # Map to old frontend format
-        is_repealable = "REPEALABLE" in r['status']
-        confidence_value = 0.8 if r['confidence'] == "HIGH" else (0.6 if r['confidence'] == "MEDIUM" else 0.4)
-        
-        spec_refs = [m['source_spec'] for m in r['spec_matches'][:3]]
-        reason = r['spec_matches'][0]['spec_text'][:150] + "..." if r['spec_matches'] else "No matching specifications found"
-        
-        infractions_frontend.append({
-            "code": f"Item {r['infraction_id']}",
-            "description": r['infraction_text'][:200] + "..." if len(r['infraction_text']) > 200 else r['infraction_text'],
-            "is_repealable": is_repealable,
-            "confidence": confidence_value,
-            "reason": reason,
-            "spec_references": spec_refs,
-            "match_count": r['match_count'],
-            "status": r['status']
-        })
+    active_pricing = pricing_analyzer if PRICING_ENABLED else None
+    result_cache = get_audit_result_cache()
+    with upload:
+        # Identical re-submission against the same library, pricing and analyzer
+        cache_key = None
+        if result_cache is not None:
+            cache_key = result_key(
+                upload.sha256,
+                library.version,
+                active_pricing.get_version() if active_pricing else 'none',
+                analyzer_config_hash(model, library)
+            )
+            cached = await asyncio.to_thread(result_cache.get, cache_key, file.filename)
+            if cached is not None:
+                return cached
+        
+        result = await cpu_executor.run(
+            analyze_audit_pdf,
+            upload.source,
+            file.filename,
+            library,
+            model,
+            pdf_hash=upload.sha256,
+            pricing_analyzer=active_pricing,
+            batch_size=min(32, max(8, optimal_threads * 4))
+        )
     
-    return {
-        "audit_file": file.filename,
-        "total_spec_files": len(library['metadata'].get('files', [])),
-        "total_spec_chunks": len(library['chunks']),
-        "infractions_found": len(infractions),
-        "infractions_analyzed": len(results),
-        "infractions": infractions_frontend,  # Frontend-compatible format
-        "analysis_results": results,  # Keep new format too
-        "summary": {
-            "potentially_repealable": sum(1 for r in results if "REPEALABLE" in r['status']),
-            "valid": sum(1 for r in results if r['status'] == "VALID"),
-            "high_confidence": sum(1 for r in results if r['confidence'] == "HIGH")
-        }
-    }
+    if cache_key is not None:
+        await asyncio.to_thread(result_cache.set, cache_key, result)
+    return result
 
 # ============================================
 # WEEK 2 ASYNC ENDPOINTS - Celery Integration
@@ -1326,7 +926,7 @@ async def analyze_audit(
 
 try:
     from celery.result import AsyncResult
-    from celery_worker import app as celery_app, analyze_audit_async as celery_analyze
+    from celery_worker import app as celery_app, analyze_audit_async as celery_analyze, stage_audit_file
     import uuid
     CELERY_AVAILABLE = True
 except ImportError:
@@ -1349,14 +949,17 @@ async def analyze_audit_async_endpoint(
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(400, "Only PDF files are allowed")
         
-        # Read content
-        content = await file.read()
-        
-        if len(content) > 100 * 1024 * 1024:  # 100MB limit
+        # Stream to disk and stage by hash - only the reference goes through the broker
+        try:
+            upload = await spool_upload(file, max_bytes=100 * 1024 * 1024)  # 100MB limit
+        except UploadTooLarge:
             raise HTTPException(413, "File too large (max 100MB)")
         
+        with upload:
+            audit_ref = stage_audit_file(upload)
+        
         # Queue async task
-        task = celery_analyze.delay(content, file.filename)
+        task = celery_analyze.delay(audit_ref)
         
         logger.info(f"Queued async audit analysis: {task.id}")
         
@@ -1532,10 +1135,11 @@ async def batch_analyze_audits(
             continue
         
         try:
-            content = await file.read()
+            with await spool_upload(file) as upload:
+                audit_ref = stage_audit_file(upload)
             
             # Queue task
-            task = celery_analyze.delay(content, file.filename)
+            task = celery_analyze.delay(audit_ref)
             
             jobs.append({
                 "filename": file.filename,
@@ -1561,8 +1165,12 @@ async def batch_analyze_audits(
 @app.get("/cache-stats")
 async def get_cache_stats():
     """
-    Get Redis cache statistics and performance metrics
+    Get Redis and embedding cache statistics and performance metrics
     """
+    embedding_cache = model_registry.cache
+    embedding_stats = embedding_cache.get_stats() if embedding_cache else {"status": "disabled"}
+    result_cache = get_audit_result_cache()
+    audit_result_stats = result_cache.get_stats() if result_cache else {"status": "disabled"}
     try:
         # Check if Redis is available
         import redis
@@ -1572,7 +1180,9 @@ async def get_cache_stats():
         if not redis_url:
             return {
                 "status": "disabled",
-                "message": "Redis not configured"
+                "message": "Redis not configured",
+                "embedding_cache": embedding_stats,
+                "audit_results": audit_result_stats
             }
         
         # Connect to Redis
@@ -1605,19 +1215,25 @@ async def get_cache_stats():
                 "hit_rate": f"{(info.get('keyspace_hits', 0) / max(1, info.get('keyspace_hits', 0) + info.get('keyspace_misses', 0))) * 100:.2f}%",
                 "evicted_keys": info.get('evicted_keys', 0)
             },
-            "uptime": info.get('uptime_in_seconds', 0)
+            "uptime": info.get('uptime_in_seconds', 0),
+            "embedding_cache": embedding_stats,
+            "audit_results": audit_result_stats
         }
         
     except ImportError:
         return {
             "status": "disabled",
-            "message": "Redis client not installed"
+            "message": "Redis client not installed",
+            "embedding_cache": embedding_stats,
+            "audit_results": audit_result_stats
         }
     except Exception as e:
         logger.error(f"Cache stats error: {e}")
         return {
             "status": "error",
-            "error": str(e)
+            "error": str(e),
+            "embedding_cache": embedding_stats,
+            "audit_results": audit_result_stats
         }
 
 # Startup event has been moved to the lifespan handler above
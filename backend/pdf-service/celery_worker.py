@@ -1,10 +1,20 @@
 """
 Celery Worker for Async Audit Processing
 Handles background PDF analysis without blocking the API
+
+The API stages each audit under AUDIT_JOB_DIR by content hash and queues
+only that reference; the worker (which must see the same directory) runs
+the same pipeline as /analyze-audit with models loaded once per process.
+
+Run with: celery -A celery_worker worker --loglevel=info
 """
 from celery import Celery
+from celery.signals import worker_process_init
 import os
+import time
 import logging
+import threading
+from typing import Dict, Any, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +22,9 @@ logger = logging.getLogger(__name__)
 
 # Get Redis URL from environment
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+DATA_PATH = os.getenv('DATA_PATH', '/data')
+AUDIT_JOB_DIR = os.getenv('AUDIT_JOB_DIR', os.path.join(DATA_PATH, 'audit_jobs'))
+AUDIT_JOB_RETENTION_HOURS = float(os.getenv('AUDIT_JOB_RETENTION_HOURS', 24))
 
 # Create Celery app
 app = Celery('nexa_worker', broker=REDIS_URL, backend=REDIS_URL)
@@ -26,61 +39,176 @@ app.conf.update(
     task_track_started=True,
     task_time_limit=300,  # 5 min max
     task_soft_time_limit=240,  # 4 min soft limit
+    worker_prefetch_multiplier=1,  # audits are long - do not hoard them
 )
 
-@app.task(bind=True)
-def analyze_audit_async(self, pdf_content, filename):
+
+# === API SIDE: STAGING ===
+
+def stage_audit_file(upload) -> Dict[str, Any]:
     """
-    Async task to analyze PDF audit
+    Store a SpooledUpload where workers can read it and return the task reference
+
+    Files are content-addressed, so resubmitting an audit reuses the staged
+    copy; files older than AUDIT_JOB_RETENTION_HOURS are pruned here.
     """
+    upload.persist(AUDIT_JOB_DIR)
+    _prune_staged_files()
+    return {"sha256": upload.sha256, "filename": upload.filename, "size": upload.size}
+
+
+def staged_audit_path(sha256: str) -> str:
+    return os.path.join(AUDIT_JOB_DIR, f"{sha256}.pdf")
+
+
+def _prune_staged_files():
+    cutoff = time.time() - AUDIT_JOB_RETENTION_HOURS * 3600
+    try:
+        for entry in os.scandir(AUDIT_JOB_DIR):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+    except OSError as e:
+        logger.debug(f"Pruning staged audits failed: {e}")
+
+
+# === WORKER SIDE: WARM STATE ===
+
+_state: Dict[str, Any] = {}
+_state_lock = threading.Lock()
+
+
+def _load_ner_pipeline() -> Optional[Any]:
+    ner_model_path = os.path.join(DATA_PATH, 'fine_tuned_ner_deep')
+    if not os.path.exists(ner_model_path):
+        logger.info("Fine-tuned NER model not found - worker runs without it")
+        return None
     try:
-        # Update progress
-        self.update_state(
-            state='PROCESSING',
-            meta={'progress': 10, 'status': 'Starting analysis...'}
+        from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
+        return pipeline(
+            "token-classification",
+            model=AutoModelForTokenClassification.from_pretrained(ner_model_path),
+            tokenizer=AutoTokenizer.from_pretrained(ner_model_path),
+            aggregation_strategy="simple"
         )
-        
-        # Import here to avoid loading model in main process
-        import pickle
-        import json
-        from sentence_transformers import SentenceTransformer, util
-        
+    except Exception as e:
+        logger.warning(f"Could not load fine-tuned NER: {e}")
+        return None
+
+
+def _load_pricing_analyzer(model) -> Optional[Any]:
+    try:
+        from modules.pricing_integration import PricingAnalyzer
+        return PricingAnalyzer(model, DATA_PATH)
+    except Exception as e:
+        logger.warning(f"Pricing not available in worker: {e}")
+        return None
+
+
+def get_worker_state() -> Dict[str, Any]:
+    """Models and the spec store, loaded once per worker process"""
+    with _state_lock:
+        if not _state:
+            from modules.model_registry import get_embedding_model
+            from modules.spec_store import get_spec_store
+
+            start_time = time.time()
+            model = get_embedding_model(consumer='celery_worker')
+            model.model  # load now, not on the first task
+            spec_store = get_spec_store(DATA_PATH)
+            snapshot = spec_store.snapshot()
+            spec_store.start_watching()
+
+            _state.update(
+                model=model,
+                spec_store=spec_store,
+                ner=_load_ner_pipeline(),
+                pricing_analyzer=_load_pricing_analyzer(model)
+            )
+            logger.info(f"Worker {os.getpid()} ready in {time.time() - start_time:.1f}s "
+                        f"(spec library v{snapshot.version}, {len(snapshot)} chunks)")
+        return _state
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Warm the pipeline in each forked worker before it takes tasks"""
+    try:
+        get_worker_state()
+    except Exception as e:
+        # Tasks retry the load and report the error per job
+        logger.error(f"Worker warm-up failed: {e}")
+
+
+def _summarize(analysis: Dict[str, Any]) -> list:
+    """Per-infraction rows in the shape /job-result expects"""
+    rows = []
+    for result in analysis.get('analysis_results', []):
+        top = result['spec_matches'][0] if result['spec_matches'] else None
+        rows.append({
+            'item': result['infraction_id'],
+            'text': result['infraction_text'],
+            'confidence': top['relevance_score'] if top else 0.0,
+            'repealable': "REPEALABLE" in result['status'],
+            'reason': top['spec_text'] if top else "No matching specifications found",
+            'source': top['source_spec'] if top else "Unknown"
+        })
+    return rows
+
+
+@app.task(bind=True)
+def analyze_audit_async(self, audit_ref, filename=None):
+    """
+    Async task to analyze a staged PDF audit
+
+    Args:
+        audit_ref: {"sha256", "filename", "size"} from stage_audit_file
+        filename: Overrides the filename in audit_ref
+    """
+    filename = filename or (audit_ref.get('filename') if isinstance(audit_ref, dict) else None) or 'audit.pdf'
+    try:
+        if not isinstance(audit_ref, dict) or 'sha256' not in audit_ref:
+            raise ValueError("Tasks take a staged file reference, not PDF content")
+        path = staged_audit_path(audit_ref['sha256'])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Staged audit {audit_ref['sha256'][:16]} not found in {AUDIT_JOB_DIR} "
+                                    f"(the API and worker must share this directory)")
+
+        self.update_state(state='LOADING', meta={'progress': 5, 'status': 'Loading models...'})
+        state = get_worker_state()
+
+        from modules.audit_pipeline import analyze_audit_pdf
+
+        library = state['spec_store'].snapshot()
+        if len(library) == 0:
+            raise ValueError("No spec files in library. Please upload spec files first.")
+
+        def progress(stage, percent, message):
+            self.update_state(state=stage, meta={'progress': percent, 'status': message})
+
         logger.info(f"Processing {filename}")
-        
-        # Simulate processing (replace with actual logic)
-        import time
-        time.sleep(2)
-        
-        # Update progress
-        self.update_state(
-            state='ANALYZING',
-            meta={'progress': 50, 'status': 'Analyzing document...'}
+        analysis = analyze_audit_pdf(
+            path,
+            filename,
+            library,
+            state['model'],
+            pdf_hash=audit_ref['sha256'],
+            pricing_analyzer=state['pricing_analyzer'],
+            progress=progress
         )
-        
-        # Mock result (replace with actual analysis)
-        result = {
+
+        logger.info(f"Completed analysis of {filename}")
+        return {
             'status': 'success',
             'filename': filename,
-            'infractions': [
-                {
-                    'item': 1,
-                    'text': 'Sample infraction',
-                    'confidence': 85.5,
-                    'repealable': True,
-                    'reason': 'Matches spec requirement',
-                    'source': 'spec.pdf'
-                }
-            ]
+            'infractions': _summarize(analysis),
+            'analysis': analysis
         }
-        
-        logger.info(f"Completed analysis of {filename}")
-        return result
-        
+
     except Exception as e:
         logger.error(f"Task failed: {str(e)}")
         return {
             'status': 'failed',
-            'error': str(e),
+            'error': getattr(e, 'detail', None) or str(e),
             'filename': filename
         }
 
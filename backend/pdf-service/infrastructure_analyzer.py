@@ -19,7 +19,7 @@ from pathlib import Path
 # Document processing
 import pdfplumber
 import spacy
-from sentence_transformers import SentenceTransformer
+from modules.model_registry import get_embedding_model
 import faiss
 
 # ML models
@@ -46,7 +46,7 @@ class SpecBookManager:
     def __init__(self, spec_path: str = "pgne_spec_book.pdf"):
         self.spec_path = spec_path
         self.nlp = spacy.load("en_core_web_sm")
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.sentence_model = get_embedding_model(consumer='InfrastructureAnalyzer')
         self.dimension = 384
         self.index = faiss.IndexFlatL2(self.dimension)
         self.rules = []
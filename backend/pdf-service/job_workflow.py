@@ -245,10 +245,12 @@ async def submit_qc_audit(
     job = JOBS_DB[job_id]
     
     # Use existing async analyzer
-    from celery_worker import analyze_audit_async
+    from celery_worker import analyze_audit_async, stage_audit_file
+    from modules.upload_spool import spool_upload
     
-    content = await audit_file.read()
-    task = analyze_audit_async.delay(content, audit_file.filename)
+    with await spool_upload(audit_file) as upload:
+        audit_ref = stage_audit_file(upload)
+    task = analyze_audit_async.delay(audit_ref)
     
     return {
         "job_id": job_id,
@@ -29,17 +29,14 @@ class OptimizedModelLoader:
             gc.collect()
             
             # Import only when needed
-            from sentence_transformers import SentenceTransformer
+            from modules.model_registry import get_embedding_model
             
-            # Use smaller model for lower memory
-            self._model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Shared registry model (already in eval mode)
+            self._model = get_embedding_model(consumer='OptimizedModelLoader')
             
             # Reduce batch size to save memory
             self._model.max_seq_length = 256
             
-            # Set to eval mode (saves memory)
-            self._model.eval()
-            
             logger.info("✅ Sentence transformer loaded (optimized)")
             
         return self._model
@@ -1,48 +1,82 @@
 """
 Middleware for request validation and error handling
+
+Plain ASGI middleware rather than BaseHTTPMiddleware: request and response
+bodies stream straight through (no per-request task and memory stream, no
+buffering of large uploads or streaming responses) and background tasks
+run after the response as usual. Headers are added to the
+http.response.start message on its way out. Errors can only be turned
+into JSON responses while nothing has been sent yet; after that they
+propagate to the server.
+
+    python middleware_bench.py   # latency before/after on a trivial endpoint and a 50 MB upload
 """
 import time
 import uuid
-from typing import Callable
-from fastapi import Request, HTTPException
+from typing import Optional
+from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 from datetime import datetime
 
+from modules.rate_limiter import SlidingWindowRateLimiter, create_rate_limiter
+
 logger = logging.getLogger(__name__)
 
-class ValidationMiddleware(BaseHTTPMiddleware):
+
+def get_correlation_id(scope: Scope) -> str:
+    """Correlation ID ValidationMiddleware stored in request.state"""
+    return scope.get("state", {}).get("correlation_id", "unknown")
+
+
+class ValidationMiddleware:
     """Middleware for request validation and correlation ID generation"""
-    
-    async def dispatch(self, request: Request, call_next: Callable):
-        # Generate correlation ID
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Generate correlation ID (request.state.correlation_id for endpoints)
         correlation_id = str(uuid.uuid4())[:8]
-        request.state.correlation_id = correlation_id
-        
+        scope.setdefault("state", {})["correlation_id"] = correlation_id
+
         # Log request
         start_time = time.time()
-        logger.info(f"[{correlation_id}] {request.method} {request.url.path} from {request.client.host}")
-        
+        client_host = scope["client"][0] if scope.get("client") else "unknown"
+        logger.info(f"[{correlation_id}] {scope['method']} {scope['path']} from {client_host}")
+        response_started = False
+
+        async def send_with_headers(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+
+                # Log response
+                process_time = time.time() - start_time
+                logger.info(f"[{correlation_id}] Response: {message['status']} in {process_time:.2f}s")
+
+                # Add correlation ID to response headers
+                headers = MutableHeaders(scope=message)
+                headers["X-Correlation-ID"] = correlation_id
+                headers["X-Process-Time"] = str(process_time)
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
-            # Log response
-            process_time = time.time() - start_time
-            logger.info(f"[{correlation_id}] Response: {response.status_code} in {process_time:.2f}s")
-            
-            # Add correlation ID to response headers
-            response.headers["X-Correlation-ID"] = correlation_id
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
+            await self.app(scope, receive, send_with_headers)
+
         except Exception as exc:
             process_time = time.time() - start_time
             logger.error(f"[{correlation_id}] Error after {process_time:.2f}s: {str(exc)}")
-            
+            if response_started:
+                raise
+
             # Return structured error response
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "error": "Internal Server Error",
@@ -52,82 +86,44 @@ class ValidationMiddleware(BaseHTTPMiddleware):
                 },
                 headers={"X-Correlation-ID": correlation_id}
             )
+            await response(scope, receive, send)
 
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
+class ErrorHandlingMiddleware:
     """Enhanced error handling with user-friendly messages"""
-    
-    async def dispatch(self, request: Request, call_next: Callable):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        response_started = False
+
+        async def send_tracking_start(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
-            response = await call_next(request)
-            return response
-            
+            await self.app(scope, receive, send_tracking_start)
+
         except HTTPException as exc:
-            # Handle expected HTTP exceptions with better messages
-            correlation_id = getattr(request.state, 'correlation_id', 'unknown')
-            
-            # Custom error messages for common issues
-            error_messages = {
-                400: {
-                    "Spec book not learned": {
-                        "error": "Setup Required",
-                        "message": "Please upload a spec book first before analyzing audits",
-                        "action": "Upload spec book using /upload-spec-book endpoint"
-                    },
-                    "Only PDF files": {
-                        "error": "Invalid File Type",
-                        "message": "Only PDF files are supported",
-                        "action": "Please upload a PDF file"
-                    },
-                    "No text could be extracted": {
-                        "error": "Empty Document",
-                        "message": "The PDF appears to be empty or contains only images",
-                        "action": "Please ensure the PDF contains readable text"
-                    }
-                },
-                413: {
-                    "error": "File Too Large",
-                    "message": "File exceeds maximum size of 1100MB",
-                    "action": "Please reduce file size or split into smaller documents"
-                }
-            }
-            
-            # Find matching error message
-            error_response = {"correlation_id": correlation_id}
-            
-            if exc.status_code in error_messages:
-                if isinstance(error_messages[exc.status_code], dict):
-                    # Check for specific error patterns
-                    for pattern, response_data in error_messages[exc.status_code].items():
-                        if pattern in exc.detail:
-                            error_response.update(response_data)
-                            break
-                    else:
-                        # Default message for status code
-                        error_response["error"] = f"Request Error ({exc.status_code})"
-                        error_response["message"] = exc.detail
-                else:
-                    error_response.update(error_messages[exc.status_code])
-            else:
-                error_response["error"] = f"Request Error ({exc.status_code})"
-                error_response["message"] = exc.detail
-                
-            error_response["timestamp"] = datetime.utcnow().isoformat()
-            
-            logger.warning(f"[{correlation_id}] HTTP {exc.status_code}: {exc.detail}")
-            
-            return JSONResponse(
-                status_code=exc.status_code,
-                content=error_response,
-                headers={"X-Correlation-ID": correlation_id}
-            )
-            
+            if response_started:
+                raise
+            response = self.http_error_response(exc, get_correlation_id(scope))
+            await response(scope, receive, send)
+
         except Exception as exc:
+            if response_started:
+                raise
             # Handle unexpected errors
-            correlation_id = getattr(request.state, 'correlation_id', 'unknown')
+            correlation_id = get_correlation_id(scope)
             logger.error(f"[{correlation_id}] Unexpected error: {str(exc)}", exc_info=True)
-            
-            return JSONResponse(
+
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "error": "Internal Server Error",
@@ -137,64 +133,116 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                 },
                 headers={"X-Correlation-ID": correlation_id}
             )
+            await response(scope, receive, send)
+
+    @staticmethod
+    def http_error_response(exc: HTTPException, correlation_id: str) -> JSONResponse:
+        """Handle expected HTTP exceptions with better messages"""
+        # Custom error messages for common issues
+        error_messages = {
+            400: {
+                "Spec book not learned": {
+                    "error": "Setup Required",
+                    "message": "Please upload a spec book first before analyzing audits",
+                    "action": "Upload spec book using /upload-spec-book endpoint"
+                },
+                "Only PDF files": {
+                    "error": "Invalid File Type",
+                    "message": "Only PDF files are supported",
+                    "action": "Please upload a PDF file"
+                },
+                "No text could be extracted": {
+                    "error": "Empty Document",
+                    "message": "The PDF appears to be empty or contains only images",
+                    "action": "Please ensure the PDF contains readable text"
+                }
+            },
+            413: {
+                "error": "File Too Large",
+                "message": "File exceeds maximum size of 1100MB",
+                "action": "Please reduce file size or split into smaller documents"
+            }
+        }
+
+        # Find matching error message
+        error_response = {"correlation_id": correlation_id}
+
+        if exc.status_code in error_messages:
+            if isinstance(error_messages[exc.status_code], dict):
+                # Check for specific error patterns
+                for pattern, response_data in error_messages[exc.status_code].items():
+                    if pattern in exc.detail:
+                        error_response.update(response_data)
+                        break
+                else:
+                    # Default message for status code
+                    error_response["error"] = f"Request Error ({exc.status_code})"
+                    error_response["message"] = exc.detail
+            else:
+                error_response.update(error_messages[exc.status_code])
+        else:
+            error_response["error"] = f"Request Error ({exc.status_code})"
+            error_response["message"] = exc.detail
+
+        error_response["timestamp"] = datetime.utcnow().isoformat()
+
+        logger.warning(f"[{correlation_id}] HTTP {exc.status_code}: {exc.detail}")
 
+        return JSONResponse(
+            status_code=exc.status_code,
+            content=error_response,
+            headers={"X-Correlation-ID": correlation_id}
+        )
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple rate limiting middleware"""
-    
-    def __init__(self, app, calls: int = 100, period: int = 60):
-        super().__init__(app)
+
+class RateLimitMiddleware:
+    """Sliding-window rate limiting per client IP (see modules.rate_limiter)"""
+
+    def __init__(self, app: ASGIApp, calls: int = 100, period: int = 60, limiter: Optional[SlidingWindowRateLimiter] = None):
+        self.app = app
         self.calls = calls
         self.period = period
-        self.requests = {}  # IP -> list of timestamps
-        
-    async def dispatch(self, request: Request, call_next: Callable):
+        # Fixed memory per IP and an LRU-bounded table; RATE_LIMIT_BACKEND=redis shares it across workers
+        self.limiter = limiter or create_rate_limiter(calls, period)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Skip rate limiting for health checks
-        if request.url.path == "/health":
-            return await call_next(request)
-            
-        client_ip = request.client.host
-        now = time.time()
-        
-        # Clean old requests
-        if client_ip in self.requests:
-            self.requests[client_ip] = [
-                ts for ts in self.requests[client_ip] 
-                if now - ts < self.period
-            ]
-        else:
-            self.requests[client_ip] = []
-            
+        if scope["type"] != "http" or scope["path"] == "/health":
+            return await self.app(scope, receive, send)
+
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        result = await self.limiter.acquire(client_ip)
+        reset = str(int(time.time() + result.reset_after))
+
         # Check rate limit
-        if len(self.requests[client_ip]) >= self.calls:
-            correlation_id = getattr(request.state, 'correlation_id', 'unknown')
+        if not result.allowed:
+            correlation_id = get_correlation_id(scope)
             logger.warning(f"[{correlation_id}] Rate limit exceeded for {client_ip}")
-            
-            return JSONResponse(
+
+            response = JSONResponse(
                 status_code=429,
                 content={
                     "error": "Rate Limit Exceeded",
                     "message": f"Maximum {self.calls} requests per {self.period} seconds",
-                    "retry_after": self.period,
+                    "retry_after": result.retry_after,
                     "timestamp": datetime.utcnow().isoformat()
                 },
                 headers={
                     "X-RateLimit-Limit": str(self.calls),
                     "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(int(now + self.period)),
-                    "Retry-After": str(self.period)
+                    "X-RateLimit-Reset": reset,
+                    "Retry-After": str(result.retry_after)
                 }
             )
-            
-        # Record request
-        self.requests[client_ip].append(now)
-        
+            return await response(scope, receive, send)
+
         # Add rate limit headers
-        response = await call_next(request)
-        remaining = self.calls - len(self.requests[client_ip])
-        
-        response.headers["X-RateLimit-Limit"] = str(self.calls)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(int(now + self.period))
-        
-        return response
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(self.calls)
+                headers["X-RateLimit-Remaining"] = str(result.remaining)
+                headers["X-RateLimit-Reset"] = reset
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Middleware Latency Benchmark
+Serves a small FastAPI app with uvicorn on loopback three times - with no
+middleware, with the previous BaseHTTPMiddleware stack and with the ASGI
+stack in middleware.py - and measures client-side latency for a trivial
+GET and for streaming a 50 MB upload through the same three middlewares
+(validation, error handling, rate limiting) that app_oct2025_enhanced uses.
+
+    python middleware_bench.py [--requests 2000] [--uploads 10] [--upload-mb 50]
+"""
+
+import sys
+import json
+import time
+import uuid
+import socket
+import threading
+import statistics
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware import ErrorHandlingMiddleware, RateLimitMiddleware, ValidationMiddleware
+from modules.rate_limiter import SlidingWindowRateLimiter
+
+# High enough that the benchmark itself is never limited
+BENCH_RATE_LIMIT = 10_000_000
+
+
+# --- the previous BaseHTTPMiddleware stack, condensed to what runs per request ---
+
+class BaseHTTPValidationMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable):
+        correlation_id = str(uuid.uuid4())[:8]
+        request.state.correlation_id = correlation_id
+        start_time = time.time()
+        try:
+            response = await call_next(request)
+            response.headers["X-Correlation-ID"] = correlation_id
+            response.headers["X-Process-Time"] = str(time.time() - start_time)
+            return response
+        except Exception:
+            return JSONResponse(status_code=500, content={"error": "Internal Server Error",
+                                                          "correlation_id": correlation_id})
+
+
+class BaseHTTPErrorHandlingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable):
+        try:
+            return await call_next(request)
+        except HTTPException as exc:
+            return ErrorHandlingMiddleware.http_error_response(
+                exc, getattr(request.state, 'correlation_id', 'unknown'))
+        except Exception:
+            return JSONResponse(status_code=500, content={"error": "Internal Server Error",
+                                                          "timestamp": datetime.utcnow().isoformat()})
+
+
+class BaseHTTPRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, limiter: SlidingWindowRateLimiter):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request: Request, call_next: Callable):
+        result = await self.limiter.acquire(request.client.host)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"error": "Rate Limit Exceeded"})
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(result.limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        response.headers["X-RateLimit-Reset"] = str(int(time.time() + result.reset_after))
+        return response
+
+
+def make_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        return {"size": size}
+
+    limiter = SlidingWindowRateLimiter(calls=BENCH_RATE_LIMIT, period=60)
+    if stack == 'asgi':
+        app.add_middleware(RateLimitMiddleware, calls=BENCH_RATE_LIMIT, period=60, limiter=limiter)
+        app.add_middleware(ErrorHandlingMiddleware)
+        app.add_middleware(ValidationMiddleware)
+    elif stack == 'base_http':
+        app.add_middleware(BaseHTTPRateLimitMiddleware, limiter=limiter)
+        app.add_middleware(BaseHTTPErrorHandlingMiddleware)
+        app.add_middleware(BaseHTTPValidationMiddleware)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3)
+    }
+
+
+def measure(stack: str, requests: int, uploads: int, upload_mb: int) -> Dict[str, Any]:
+    import httpx
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(make_app(stack), host='127.0.0.1', port=port,
+                                           log_level='warning', access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    payload = b'\0' * (upload_mb * 1024 * 1024)
+
+    def chunks():
+        view = memoryview(payload)
+        for offset in range(0, len(view), 1024 * 1024):
+            yield bytes(view[offset:offset + 1024 * 1024])
+
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            for _ in range(50):
+                client.get("/ping")
+            ping_times = []
+            for _ in range(requests):
+                start_time = time.perf_counter()
+                client.get("/ping").raise_for_status()
+                ping_times.append(time.perf_counter() - start_time)
+
+            upload_times = []
+            for _ in range(uploads):
+                start_time = time.perf_counter()
+                response = client.post("/upload", content=chunks())
+                upload_times.append(time.perf_counter() - start_time)
+                assert response.json()["size"] == len(payload)
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    return {
+        "stack": stack,
+        "ping": percentiles(ping_times),
+        f"upload_{upload_mb}mb": percentiles(upload_times)
+    }
+
+
+def bench(requests: int, uploads: int, upload_mb: int) -> List[Dict[str, Any]]:
+    return [measure(stack, requests, uploads, upload_mb) for stack in ('none', 'base_http', 'asgi')]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Latency of the middleware stack, BaseHTTPMiddleware vs ASGI")
+    parser.add_argument('--requests', type=int, default=2000, help="GET /ping requests per stack")
+    parser.add_argument('--uploads', type=int, default=10, help="uploads per stack")
+    parser.add_argument('--upload-mb', type=int, default=50)
+    args = parser.parse_args()
+
+    results = bench(args.requests, args.uploads, args.upload_mb)
+    print(json.dumps(results, indent=2))
+    upload_key = f"upload_{args.upload_mb}mb"
+    for result in results:
+        print(f"{result['stack']:>10}  ping p50 {result['ping']['p50_ms']:>7.3f}ms p95 {result['ping']['p95_ms']:>7.3f}ms  "
+              f"{args.upload_mb}MB upload p50 {result[upload_key]['p50_ms']:>8.1f}ms p95 {result[upload_key]['p95_ms']:>8.1f}ms",
+              flush=True)
+    sys.exit(0)
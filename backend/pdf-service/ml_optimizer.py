@@ -9,7 +9,6 @@ import time
 import psutil
 import logging
 from typing import List, Dict, Any, Optional
-from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 import asyncio
 import numpy as np
@@ -18,9 +17,11 @@ import pickle
 import json
 
 from fastapi import HTTPException
-from sentence_transformers import SentenceTransformer
 import torch
 
+from modules.model_registry import get_embedding_model, model_registry
+from modules.embedding_batcher import get_embedding_batcher
+
 logger = logging.getLogger(__name__)
 
 class MLOptimizer:
@@ -41,7 +42,7 @@ class MLOptimizer:
         # Thread pool for concurrent processing
         self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         
-        # Cache for embeddings (LRU)
+        # Embeddings are cached by the shared registry model (see embedding_cache)
         self.cache_size = cache_size
         
         # Initialize models lazily
@@ -58,9 +59,8 @@ class MLOptimizer:
             "memory_usage_mb": 0
         }
         
-        # Request queue for batching
-        self.request_queue = []
-        self.batch_lock = asyncio.Lock()
+        # Cross-request batching shared with every endpoint
+        self.batcher = get_embedding_batcher()
         
         logger.info(f"ML Optimizer initialized: batch_size={self.batch_size}, workers={self.max_workers}")
     
@@ -68,18 +68,13 @@ class MLOptimizer:
     def embedder(self):
         """Lazy load embedder model"""
         if self._embedder is None:
-            logger.info("Loading sentence transformer...")
-            self._embedder = SentenceTransformer('all-MiniLM-L6-v2')
-            # Set to eval mode and optimize
-            self._embedder.eval()
-            if torch.cuda.is_available():
-                self._embedder = self._embedder.cuda()
+            # Shared registry model (already in eval mode)
+            device = 'cuda' if torch.cuda.is_available() else None
+            self._embedder = get_embedding_model(device=device, consumer='MLOptimizer')
         return self._embedder
     
-    @lru_cache(maxsize=1000)
     def cached_embedding(self, text: str) -> np.ndarray:
-        """Cache embeddings for frequently accessed texts"""
-        self.metrics["cache_hits"] += 1
+        """Embedding of one text, served from the shared embedding cache when seen before"""
         return self.embedder.encode(text)
     
     def batch_encode(self, texts: List[str]) -> np.ndarray:
@@ -97,47 +92,20 @@ class MLOptimizer:
         if memory_usage > 3500:  # 3.5GB threshold
             logger.warning(f"High memory usage: {memory_usage:.0f}MB")
             # Clear caches to free memory
-            self.cached_embedding.cache_clear()
+            cache = self._embedding_cache()
+            if cache is not None:
+                cache.clear_memory()
             torch.cuda.empty_cache() if torch.cuda.is_available() else None
         
         try:
-            # Process in batches
-            all_embeddings = []
-            
-            for i in range(0, len(texts), self.batch_size):
-                batch = texts[i:i + self.batch_size]
-                
-                # Try cache first
-                embeddings = []
-                uncached = []
-                uncached_indices = []
-                
-                for j, text in enumerate(batch):
-                    try:
-                        # Check if in cache
-                        emb = self.cached_embedding.__wrapped__(self, text)
-                        embeddings.append(emb)
-                        self.metrics["cache_hits"] += 1
-                    except:
-                        uncached.append(text)
-                        uncached_indices.append(j)
-                        self.metrics["cache_misses"] += 1
-                
-                # Encode uncached texts
-                if uncached:
-                    new_embeddings = self.embedder.encode(
-                        uncached,
-                        batch_size=min(self.batch_size, len(uncached)),
-                        show_progress_bar=False,
-                        convert_to_numpy=True
-                    )
-                    
-                    # Insert new embeddings at correct positions
-                    for idx, emb in zip(uncached_indices, new_embeddings):
-                        embeddings.insert(idx, emb)
-                
-                all_embeddings.extend(embeddings)
-                self.metrics["batch_count"] += 1
+            # One call: the registry's cache looks up every text and encodes only the misses
+            all_embeddings = self.embedder.encode(
+                texts,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+            self.metrics["batch_count"] += (len(texts) + self.batch_size - 1) // self.batch_size
             
             # Update metrics
             inference_time = time.time() - start_time
@@ -147,7 +115,7 @@ class MLOptimizer:
             
             logger.info(f"Batch encoded {len(texts)} texts in {inference_time:.2f}s")
             
-            return np.array(all_embeddings)
+            return np.asarray(all_embeddings)
             
         except Exception as e:
             logger.error(f"Batch encoding failed: {e}")
@@ -155,43 +123,22 @@ class MLOptimizer:
     
     async def queue_for_batch(self, text: str, timeout: Optional[int] = None) -> np.ndarray:
         """
-        Queue requests for batch processing (async)
+        Embed one text as part of the next cross-request batch (async)
+        
+        Requests from every endpoint are collected for up to
+        EMBEDDING_BATCH_MAX_LATENCY_MS or EMBEDDING_BATCH_MAX_SIZE texts and
+        encoded together on a worker thread.
         """
         
         timeout = timeout or self.timeout
-        
-        async with self.batch_lock:
-            self.request_queue.append(text)
-            
-            # Process batch if full or after timeout
-            if len(self.request_queue) >= self.batch_size:
-                return await self._process_batch()
-        
-        # Wait for batch to fill or timeout
-        await asyncio.sleep(0.1)  # Small delay for batching
-        
-        async with self.batch_lock:
-            if text in self.request_queue:
-                return await self._process_batch()
+        self.metrics["total_requests"] += 1
+        try:
+            return await asyncio.wait_for(self.batcher.encode(text), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Encoding timed out")
     
-    async def _process_batch(self) -> np.ndarray:
-        """Process queued batch"""
-        
-        if not self.request_queue:
-            return np.array([])
-        
-        batch = self.request_queue[:self.batch_size]
-        self.request_queue = self.request_queue[self.batch_size:]
-        
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        embeddings = await loop.run_in_executor(
-            self.executor,
-            self.batch_encode,
-            batch
-        )
-        
-        return embeddings
+    def _embedding_cache(self):
+        return model_registry.cache
     
     def optimize_model_memory(self):
         """
@@ -220,13 +167,15 @@ class MLOptimizer:
     def get_metrics(self) -> Dict[str, Any]:
         """Get performance metrics"""
         
-        cache_hit_rate = (
-            self.metrics["cache_hits"] / 
-            max(self.metrics["cache_hits"] + self.metrics["cache_misses"], 1)
-        ) * 100
+        cache = self._embedding_cache()
+        cache_stats = cache.get_stats() if cache is not None else {}
+        self.metrics["cache_hits"] = cache_stats.get("memory_hits", 0) + cache_stats.get("disk_hits", 0)
+        self.metrics["cache_misses"] = cache_stats.get("misses", 0)
+        cache_hit_rate = cache_stats.get("hit_rate", 0.0) * 100
         
         return {
             **self.metrics,
+            "batcher": self.batcher.get_stats(),
             "cache_hit_rate": f"{cache_hit_rate:.1f}%",
             "cpu_percent": psutil.cpu_percent(interval=1),
             "memory_percent": psutil.virtual_memory().percent,
@@ -12,10 +12,11 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.colors import green, red, black
 from reportlab.lib.units import inch
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import pickle
 import json
 
+from modules.model_registry import get_embedding_model
+from modules.spec_store import get_spec_store
+
 logger = logging.getLogger(__name__)
 
 class AsBuiltFiller:
@@ -26,24 +27,27 @@ class AsBuiltFiller:
     def __init__(self, data_dir: str = "/data"):
         self.data_dir = data_dir
         self.model = None
-        self.spec_embeddings = None
-        self.spec_chunks = None
+        self.spec_store = get_spec_store(data_dir)
         self.load_resources()
     
+    @property
+    def spec_chunks(self):
+        return self.spec_store.chunks
+    
+    @property
+    def spec_embeddings(self):
+        return self.spec_store.matrix
+    
     def load_resources(self):
         """Load model and spec embeddings"""
         try:
             # Load sentence transformer
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.model = get_embedding_model(consumer='AsBuiltFiller')
             
-            # Load spec embeddings from learned spec book
-            embeddings_file = os.path.join(self.data_dir, "spec_embeddings.pkl")
-            if os.path.exists(embeddings_file):
-                with open(embeddings_file, 'rb') as f:
-                    data = pickle.load(f)
-                    self.spec_embeddings = data.get('embeddings')
-                    self.spec_chunks = data.get('chunks', [])
-                    logger.info(f"✅ Loaded {len(self.spec_chunks)} spec chunks")
+            # Learned spec book comes from the shared spec store
+            chunk_count = len(self.spec_store)
+            if chunk_count:
+                logger.info(f"✅ Using {chunk_count} spec chunks")
             else:
                 logger.warning("⚠️ No spec embeddings found - run /upload-specs first!")
         except Exception as e:
@@ -131,7 +135,7 @@ class AsBuiltFiller:
         """
         Check equipment against learned PG&E specs
         """
-        if not self.spec_embeddings or not self.spec_chunks:
+        if len(self.spec_store) == 0:
             return {
                 'checked': False,
                 'message': 'No spec book loaded',
@@ -199,25 +203,22 @@ class AsBuiltFiller:
         """
         Search learned spec book for relevant sections
         """
-        if not self.model or not self.spec_embeddings:
+        if not self.model or len(self.spec_store) == 0:
             return []
         
         try:
             # Encode query
             query_embedding = self.model.encode([query], normalize_embeddings=True)
             
-            # Compute similarities
-            similarities = np.dot(self.spec_embeddings, query_embedding.T).flatten()
-            
-            # Get top matches
-            top_indices = np.argsort(similarities)[-top_k:][::-1]
+            # Top matches against the shared library
+            top_indices, top_scores, snapshot = self.spec_store.search(query_embedding, top_k)
             
             results = []
-            for idx in top_indices:
-                if idx < len(self.spec_chunks):
+            for idx, score in zip(top_indices[0], top_scores[0]):
+                if np.isfinite(score):
                     results.append({
-                        'text': self.spec_chunks[idx],
-                        'score': float(similarities[idx]),
+                        'text': snapshot.chunks[int(idx)],
+                        'score': float(score),
                         'index': int(idx)
                     })
             
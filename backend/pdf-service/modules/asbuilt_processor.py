@@ -13,6 +13,7 @@ from reportlab.lib.colors import red, blue, black
 from reportlab.lib.pagesizes import letter
 from pole_classifier import PoleClassifier
 from document_ordering import DocumentOrderingSystem
+from pdf_extraction import extract_text
 import logging
 
 logger = logging.getLogger(__name__)
@@ -309,11 +310,7 @@ class PGEAsBuiltProcessor:
     def extract_pdf_text(self, pdf_content: bytes) -> str:
         """Extract text from PDF bytes"""
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            return text
+            return extract_text(pdf_content, separator="")
         except Exception as e:
             logger.error(f"Error extracting PDF text: {e}")
             return ""
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Audit Analysis Pipeline
+Extraction -> infraction detection -> spec scoring -> pricing for one QA
+audit PDF. Shared by /analyze-audit and the Celery worker so both produce
+the same result; kept free of FastAPI app state so a worker can import it
+without starting the API.
+"""
+
+import re
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional, Union, Callable
+
+from fastapi import HTTPException
+
+from pdf_extraction import iter_pages
+from pdf_ocr import ocr_pages as ocr_pages_batch
+from modules.spec_index import SpecSnapshot
+from modules.infraction_scoring import score_infractions
+from modules.keyword_matcher import KeywordMatcher, QC_ITEM_INDICATORS, INFRACTION_KEYWORDS, context_blocks
+
+logger = logging.getLogger(__name__)
+
+# progress(state, percent, message) - states match what /job-result reports
+ProgressCallback = Callable[[str, int, str], None]
+
+QC_ITEM_MATCHER = KeywordMatcher(QC_ITEM_INDICATORS)
+INFRACTION_MATCHER = KeywordMatcher(INFRACTION_KEYWORDS)
+
+# Bump whenever a change here alters the result for the same PDF and library
+PIPELINE_VERSION = 3
+MAX_INFRACTIONS = 50
+SCORING_TOP_K = 5  # Increased from 3 to 5 for better coverage
+SCORING_THRESHOLD = 0.4  # Lowered threshold from 0.5 to 0.4
+
+
+def analyzer_config_hash(model, library: Optional[SpecSnapshot] = None) -> str:
+    """
+    Digest of every analyzer setting that changes the result for a given
+    PDF, spec library version and pricing version (result cache key part)
+    """
+    ann = getattr(library, 'ann', None)
+    config = {
+        'pipeline_version': PIPELINE_VERSION,
+        'model': getattr(model, 'model_id', None) or repr(model),
+        'max_infractions': MAX_INFRACTIONS,
+        'top_k': SCORING_TOP_K,
+        'threshold': SCORING_THRESHOLD,
+        'qc_indicators': QC_ITEM_MATCHER.keywords,
+        'keywords': INFRACTION_MATCHER.keywords,
+        'spec_search': f"{ann.backend}:{ann.key}" if ann is not None and ann.enabled else 'exact'
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def clean_audit_garble(text: str) -> str:
+    """Enhanced cleaning for audit text garble"""
+    original_length = len(text)
+    
+    # Fix common OCR issues
+    text = re.sub(r'andentercallsnotlistedatendofeachsection\.\)No', '', text)
+    text = re.sub(r'(\w)\s+(\w)', r'\1\2', text)  # Fix split words
+    text = re.sub(r'\s+', ' ', text)  # Normalize spaces
+    text = re.sub(r'\)\.?No', '', text)  # Remove common audit endings
+    
+    # More aggressive cleaning
+    text = re.sub(r'QCInspectionandentercalls', 'QC Inspection and enter calls', text)
+    text = re.sub(r'notlistedatendofeachsection', 'not listed at end of each section', text)
+    
+    if original_length != len(text):
+        logger.info(f"🧹 Cleaned audit text: reduced from {original_length} to {len(text)} chars")
+    
+    return text.strip()
+
+
+def extract_text_from_pdf(pdf_content: Union[bytes, str], use_ocr: bool = False, pdf_hash: Optional[str] = None) -> str:
+    """Extract text from PDF bytes or a spooled file path with optional OCR support"""
+    try:
+        page_texts = []
+        ocr_pages = 0
+        
+        for page in iter_pages(pdf_content):
+            # Clean the extracted text
+            page_texts.append(clean_audit_garble(page.text))
+        
+        # Use OCR where text extraction is poor - all such pages in one batch
+        if use_ocr:
+            low_text_pages = [i + 1 for i, page_text in enumerate(page_texts) if len(page_text.strip()) < 100]
+            try:
+                # Note: This requires pdf2image which needs poppler
+                ocr_results = ocr_pages_batch(pdf_content, low_text_pages, pdf_hash=pdf_hash)
+            except Exception as e:
+                logger.debug(f"OCR failed: {e}")
+                ocr_results = {}
+            for page_number, ocr_text in ocr_results.items():
+                if len(ocr_text) > len(page_texts[page_number - 1]):
+                    page_texts[page_number - 1] = ocr_text
+                    ocr_pages += 1
+        
+        # Final cleanup
+        text = clean_audit_garble("\n".join(page_texts) + "\n")
+        
+        if ocr_pages > 0:
+            logger.info(f"OCR was used on {ocr_pages} pages")
+        
+        return text
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to extract text: {str(e)}")
+
+
+def analyze_audit_pdf(source: Union[bytes, str],
+                      filename: str,
+                      library: SpecSnapshot,
+                      model,
+                      pdf_hash: Optional[str] = None,
+                      pricing_analyzer=None,
+                      batch_size: int = 32,
+                      progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """
+    Full audit analysis: text extraction (with OCR), infraction detection,
+    spec scoring and pricing. Synchronous and CPU-heavy - /analyze-audit
+    runs it on the CPU executor, the Celery worker runs it in a task.
+
+    Args:
+        source: Audit PDF bytes or file path
+        filename: Audit name for logs and the response
+        library: Spec library snapshot to score against
+        model: Embedding model (registry handle)
+        pdf_hash: sha256 of the PDF, if known (OCR cache key)
+        pricing_analyzer: PricingAnalyzer for repealable items, or None
+        batch_size: Encode batch size for scoring
+        progress: Called as progress(state, percent, message) between stages
+
+    Returns:
+        The /analyze-audit response body
+    """
+    report = progress or (lambda state, percent, message: None)
+
+    # Extract text
+    report('EXTRACTING', 10, 'Extracting text...')
+    logger.info(f"Analyzing audit: {filename}")
+    audit_text = extract_text_from_pdf(source, use_ocr=True, pdf_hash=pdf_hash)
+    
+    # Debug: Log sample of extracted text
+    logger.info(f"📄 Extracted text sample (first 500 chars): {audit_text[:500]}")
+    logger.info(f"📄 Text length: {len(audit_text)} characters")
+    
+    # Extract infractions using multiple detection methods
+    infractions = []
+    
+    # Method 1: Look for structured INFRACTION patterns (e.g., "INFRACTION #1:", "INFRACTION #2:")
+    logger.info("🔍 Method 1: Looking for structured INFRACTION patterns...")
+    infraction_pattern = r'INFRACTION\s*#?\d+[:\.]?\s*(.*?)(?=INFRACTION\s*#?\d+|SUMMARY|$)'
+    matches = re.finditer(infraction_pattern, audit_text, re.IGNORECASE | re.DOTALL)
+    
+    method1_count = 0
+    for match in matches:
+        infraction_text = match.group(0).strip()
+        if len(infraction_text) > 20:  # Filter out very short matches
+            infractions.append(infraction_text)
+            method1_count += 1
+    
+    logger.info(f"✓ Method 1 found {method1_count} structured infractions")
+    
+    # Method 1.5: Look for QC Audit format with "Non-Conforming Items"
+    if not infractions:
+        logger.info("🔍 Method 1.5: Looking for QC Audit non-conforming items pattern...")
+        # Look for "Total Number of Non-Conforming Items X"
+        nc_pattern = r'Total\s+Number\s+of\s+Non[-\s]?Conforming\s+Items\s+(\d+)'
+        nc_match = re.search(nc_pattern, audit_text, re.IGNORECASE)
+        
+        if nc_match:
+            nc_count = int(nc_match.group(1))
+            logger.info(f"✓ Found QC Audit with {nc_count} non-conforming items reported")
+            
+            # Checklist items marked "No" or with issues, with the lines around them
+            blocks, _ = context_blocks(audit_text, QC_ITEM_MATCHER, before=3, after=7, min_length=30)
+            infractions.extend(blocks)
+            
+            logger.info(f"✓ Method 1.5 found {len(infractions)} non-conforming items from checklist")
+    
+    # Method 2: If no structured infractions found, look for keywords
+    if not infractions:
+        logger.info("🔍 Method 2: Looking for keyword-based infractions...")
+        blocks, hit_lines = context_blocks(audit_text, INFRACTION_MATCHER, before=2, after=5)
+        infractions.extend(blocks)
+        
+        logger.info(f"✓ Method 2 found {len(infractions)} keyword-based infractions from {len(hit_lines)} keyword matches")
+        if hit_lines and len(hit_lines) <= 5:
+            lines = audit_text.split('\n')
+            for line_num in hit_lines:
+                line = lines[line_num]
+                logger.info(f"  Line {line_num}: keywords={INFRACTION_MATCHER.keywords_in(line)}, text='{line[:100]}...'")
+    
+    if not infractions:
+        logger.warning(f"❌ No infractions detected in {filename}")
+        logger.warning(f"📄 Check if the PDF contains keywords like: go-back, infraction, violation, deficiency, non-compliant")
+        return {
+            "message": "No infractions found in this audit",
+            "infractions": [],
+            "audit_file": filename,
+            "text_length": len(audit_text),
+            "text_sample": audit_text[:500] + "..." if len(audit_text) > 500 else audit_text,
+            "note": "The analyzer looked for keywords like 'go-back', 'infraction', 'violation', 'deficiency', etc. but found none. Please verify the PDF contains these terms or check the text_sample to see what was extracted."
+        }
+    
+    # Analyze infractions against spec library
+    report('ANALYZING', 50, f'Scoring {min(len(infractions), MAX_INFRACTIONS)} infractions against the spec library...')
+    logger.info(f"Found {len(infractions)} infractions, analyzing against {len(library)} spec chunks")
+    
+    analyze_start = time.time()
+    results = score_infractions(
+        model,
+        infractions[:MAX_INFRACTIONS],
+        library,
+        top_k=SCORING_TOP_K,
+        threshold=SCORING_THRESHOLD,
+        batch_size=batch_size
+    )
+    logger.info(f"⏱️ Batched scoring: {time.time() - analyze_start:.2f}s")
+    
+    logger.info(f"Analysis complete: {len(results)} infractions analyzed")
+    
+    # Enhance with pricing if available
+    report('FINALIZING', 85, 'Pricing and formatting results...')
+    if pricing_analyzer:
+        from modules.pricing_integration import enhance_infraction_with_pricing
+        for result in results:
+            if result['status'] == 'POTENTIALLY REPEALABLE':
+                try:
+                    result = enhance_infraction_with_pricing(result, pricing_analyzer)
+                except Exception as e:
+                    logger.warning(f"Failed to add pricing for infraction {result['infraction_id']}: {e}")
+        logger.info("💰 Pricing enhancement complete")
+    
+    # Transform to frontend-compatible format (for backwards compatibility)
+    infractions_frontend = []
+    for r in results:
+        # Map to old frontend format
+        is_repealable = "REPEALABLE" in r['status']
+        confidence_value = 0.8 if r['confidence'] == "HIGH" else (0.6 if r['confidence'] == "MEDIUM" else 0.4)
+        
+        spec_refs = [m['source_spec'] for m in r['spec_matches'][:3]]
+        reason = r['spec_matches'][0]['spec_text'][:150] + "..." if r['spec_matches'] else "No matching specifications found"
+        
+        infractions_frontend.append({
+            "code": f"Item {r['infraction_id']}",
+            "description": r['infraction_text'][:200] + "..." if len(r['infraction_text']) > 200 else r['infraction_text'],
+            "is_repealable": is_repealable,
+            "confidence": confidence_value,
+            "reason": reason,
+            "spec_references": spec_refs,
+            "match_count": r['match_count'],
+            "status": r['status']
+        })
+    
+    return {
+        "audit_file": filename,
+        "total_spec_files": len(library.metadata.get('files', [])),
+        "total_spec_chunks": len(library),
+        "infractions_found": len(infractions),
+        "infractions_analyzed": len(results),
+        "infractions": infractions_frontend,  # Frontend-compatible format
+        "analysis_results": results,  # Keep new format too
+        "summary": {
+            "potentially_repealable": sum(1 for r in results if "REPEALABLE" in r['status']),
+            "valid": sum(1 for r in results if r['status'] == "VALID"),
+            "high_confidence": sum(1 for r in results if r['confidence'] == "HIGH")
+        }
+    }
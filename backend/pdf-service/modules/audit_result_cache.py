@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Audit Result Cache
+Versioned cache of /analyze-audit responses on top of RedisCacheManager.
+Keys combine the audit PDF's SHA-256 with the spec library version, the
+pricing data version and a hash of the analyzer configuration, so a spec
+upload, a new pricing master or an analyzer change retires old results by
+changing the key - nothing is scanned or deleted. QA re-submitting the
+same audit gets the stored result in milliseconds.
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_TYPE = 'audit_result'
+
+
+def result_key(pdf_sha256: str, spec_version: int, pricing_version: str, config_hash: str) -> str:
+    return f"{pdf_sha256}:spec-v{spec_version}:pricing-{pricing_version}:config-{config_hash}"
+
+
+class AuditResultCache:
+    """/analyze-audit results in Redis (or the manager's in-memory fallback)"""
+
+    def __init__(self, manager, ttl: Optional[int] = None):
+        """
+        Args:
+            manager: RedisCacheManager
+            ttl: Seconds to keep a result; defaults to $AUDIT_RESULT_CACHE_TTL or one day
+        """
+        self.manager = manager
+        self.ttl = ttl or int(os.getenv('AUDIT_RESULT_CACHE_TTL', 86400))
+
+    def get(self, key: str, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cached result for key
+
+        Args:
+            filename: Name of the upload being answered - the key only covers
+                the PDF's content, so the stored result names whichever
+                upload produced it first
+        """
+        result = self.manager.get(key, CACHE_TYPE)
+        if result is not None:
+            logger.info(f"⚡ Audit result cache hit ({key[:16]}...)")
+            if filename is not None and 'audit_file' in result:
+                result = {**result, 'audit_file': filename}
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        self.manager.set(key, result, CACHE_TYPE, ttl=self.ttl)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.manager.get_counters(CACHE_TYPE),
+            "backend": "redis" if self.manager.enabled else "memory",
+            "ttl_seconds": self.ttl
+        }
+
+
+_cache: Optional[AuditResultCache] = None
+_cache_unavailable = False
+_cache_lock = threading.Lock()
+
+
+def get_audit_result_cache() -> Optional[AuditResultCache]:
+    """
+    Process-wide result cache, or None when disabled
+
+    Disabled with AUDIT_RESULT_CACHE_ENABLED=false or when the redis client
+    library is not installed.
+    """
+    global _cache, _cache_unavailable
+    if os.getenv('AUDIT_RESULT_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+    with _cache_lock:
+        if _cache is None and not _cache_unavailable:
+            try:
+                from redis_cache_manager import cache as manager
+            except ImportError as e:
+                logger.warning(f"Audit result cache disabled: {e}")
+                _cache_unavailable = True
+                return None
+            _cache = AuditResultCache(manager)
+        return _cache
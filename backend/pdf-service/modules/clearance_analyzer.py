@@ -13,11 +13,11 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import torch
 from transformers import AutoTokenizer, AutoModelForTokenClassification
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import pickle
 from datetime import datetime
 
+from modules.model_registry import get_embedding_model
+from modules.spec_store import get_spec_store, chunk_source
+
 logger = logging.getLogger(__name__)
 
 class ClearanceAnalyzer:
@@ -48,10 +48,11 @@ class ClearanceAnalyzer:
             self.use_fine_tuned = False
         
         # Load sentence transformer for embeddings
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedder = get_embedding_model(consumer='ClearanceAnalyzer')
         
         # Load spec embeddings
-        self.spec_data = self._load_spec_embeddings()
+        self.spec_store = get_spec_store(spec_embeddings_path)
+        self._load_spec_embeddings()
         
         # Define entity labels
         self.id2label = {
@@ -86,21 +87,19 @@ class ClearanceAnalyzer:
             '60F_no_wind': {'temperature': 60, 'wind': 0, 'standard': 'G.O. 95'}
         }
     
-    def _load_spec_embeddings(self) -> Optional[Dict]:
-        """Load pre-computed spec embeddings"""
-        
-        if not self.spec_embeddings_path.exists():
-            logger.warning(f"Spec embeddings not found at {self.spec_embeddings_path}")
-            return None
+    def _load_spec_embeddings(self) -> int:
+        """Check the shared spec library (updates are picked up automatically)"""
         
         try:
-            with open(self.spec_embeddings_path, 'rb') as f:
-                data = pickle.load(f)
-                logger.info(f"Loaded {len(data.get('chunks', []))} spec chunks")
-                return data
+            chunk_count = len(self.spec_store)
         except Exception as e:
             logger.error(f"Failed to load spec embeddings: {e}")
-            return None
+            return 0
+        if chunk_count == 0:
+            logger.warning(f"Spec library is empty at {self.spec_store.data_path}")
+        else:
+            logger.info(f"Using {chunk_count} spec chunks from the shared spec store")
+        return chunk_count
     
     def extract_clearance_entities(self, text: str) -> List[Dict]:
         """
@@ -251,7 +250,7 @@ class ClearanceAnalyzer:
         enhanced_query = " ".join(query_parts)
         
         # 5. Search spec embeddings
-        if not self.spec_data:
+        if len(self.spec_store) == 0:
             return {
                 "error": "No spec embeddings available",
                 "confidence": 0,
@@ -261,22 +260,17 @@ class ClearanceAnalyzer:
         # Encode query
         query_embedding = self.embedder.encode(enhanced_query)
         
-        # Compute similarities
-        spec_embeddings = np.array(self.spec_data['embeddings'])
-        similarities = np.dot(spec_embeddings, query_embedding) / (
-            np.linalg.norm(spec_embeddings, axis=1) * np.linalg.norm(query_embedding)
-        )
-        
-        # Find top matches
-        top_indices = np.argsort(similarities)[-5:][::-1]
+        # Top matches by cosine similarity against the shared library
+        top_indices, top_scores, snapshot = self.spec_store.search(query_embedding, top_k=5)
         matches = []
         
-        for idx in top_indices:
-            if similarities[idx] >= self.confidence_threshold:
+        for idx, similarity in zip(top_indices[0], top_scores[0]):
+            if similarity >= self.confidence_threshold:
+                chunk = snapshot.chunks[int(idx)]
                 matches.append({
-                    "chunk": self.spec_data['chunks'][idx],
-                    "similarity": float(similarities[idx]),
-                    "source": self.spec_data.get('sources', {}).get(str(idx), 'Unknown')
+                    "chunk": chunk,
+                    "similarity": float(similarity),
+                    "source": chunk_source(chunk)
                 })
         
         # 6. Determine repeal status with clearance logic
@@ -12,10 +12,13 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import torch
 from transformers import AutoTokenizer, AutoModelForTokenClassification
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import pickle
 
+from modules.model_registry import get_embedding_model
+from modules.embedding_batcher import get_embedding_batcher
+from modules.spec_store import get_spec_store, chunk_source
+
 logger = logging.getLogger(__name__)
 
 class ConduitEnhancedAnalyzer:
@@ -46,10 +49,11 @@ class ConduitEnhancedAnalyzer:
             self.use_fine_tuned = False
         
         # Load sentence transformer for embeddings
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedder = get_embedding_model(consumer='ConduitEnhancedAnalyzer')
         
         # Load spec embeddings
-        self.spec_data = self._load_spec_embeddings()
+        self.spec_store = get_spec_store(spec_embeddings_path)
+        self._load_spec_embeddings()
         
         # Define entity labels
         self.id2label = {
@@ -62,21 +66,19 @@ class ConduitEnhancedAnalyzer:
             13: "B-LOCATION", 14: "I-LOCATION"
         }
     
-    def _load_spec_embeddings(self) -> Optional[Dict]:
-        """Load pre-computed spec embeddings"""
-        
-        if not self.spec_embeddings_path.exists():
-            logger.warning(f"Spec embeddings not found at {self.spec_embeddings_path}")
-            return None
+    def _load_spec_embeddings(self) -> int:
+        """Check the shared spec library (updates are picked up automatically)"""
         
         try:
-            with open(self.spec_embeddings_path, 'rb') as f:
-                data = pickle.load(f)
-                logger.info(f"Loaded {len(data.get('chunks', []))} spec chunks")
-                return data
+            chunk_count = len(self.spec_store)
         except Exception as e:
             logger.error(f"Failed to load spec embeddings: {e}")
-            return None
+            return 0
+        if chunk_count == 0:
+            logger.warning(f"Spec library is empty at {self.spec_store.data_path}")
+        else:
+            logger.info(f"Using {chunk_count} spec chunks from the shared spec store")
+        return chunk_count
     
     def extract_entities(self, text: str) -> List[Dict]:
         """
@@ -168,15 +170,12 @@ class ConduitEnhancedAnalyzer:
         
         return entities
     
-    def analyze_conduit_infraction(self, infraction_text: str) -> Dict:
+    def build_query(self, infraction_text: str) -> Dict:
         """
-        Analyze a conduit-related infraction for go-back validity
+        Extract entities and build the spec search query for an infraction
         
-        Args:
-            infraction_text: Description of the infraction
-            
         Returns:
-            Analysis with confidence, spec matches, and repeal recommendation
+            {"text": enhanced query, "entities": extracted entities}
         """
         
         # 1. Extract entities from infraction
@@ -196,10 +195,30 @@ class ConduitEnhancedAnalyzer:
             elif entity["label"] == "EQUIPMENT":
                 query_parts.append(f"{entity['text']} installation")
         
-        enhanced_query = " ".join(query_parts)
+        return {"text": " ".join(query_parts), "entities": entities}
+    
+    def analyze_conduit_infraction(self, infraction_text: str,
+                                   query: Optional[Dict] = None,
+                                   query_embedding: Optional[np.ndarray] = None) -> Dict:
+        """
+        Analyze a conduit-related infraction for go-back validity
+        
+        Args:
+            infraction_text: Description of the infraction
+            query: build_query() result, if already built
+            query_embedding: Embedding of query["text"], if already computed
+                (e.g. by the micro-batcher)
+            
+        Returns:
+            Analysis with confidence, spec matches, and repeal recommendation
+        """
+        
+        if query is None:
+            query = self.build_query(infraction_text)
+        entities = query["entities"]
         
         # 3. Search spec embeddings
-        if not self.spec_data:
+        if len(self.spec_store) == 0:
             return {
                 "error": "No spec embeddings available",
                 "confidence": 0,
@@ -207,24 +226,20 @@ class ConduitEnhancedAnalyzer:
             }
         
         # Encode query
-        query_embedding = self.embedder.encode(enhanced_query)
-        
-        # Compute similarities
-        spec_embeddings = np.array(self.spec_data['embeddings'])
-        similarities = np.dot(spec_embeddings, query_embedding) / (
-            np.linalg.norm(spec_embeddings, axis=1) * np.linalg.norm(query_embedding)
-        )
+        if query_embedding is None:
+            query_embedding = self.embedder.encode(query["text"])
         
-        # Find top matches
-        top_indices = np.argsort(similarities)[-5:][::-1]
+        # Top matches by cosine similarity against the shared library
+        top_indices, top_scores, snapshot = self.spec_store.search(query_embedding, top_k=5)
         matches = []
         
-        for idx in top_indices:
-            if similarities[idx] >= self.confidence_threshold:
+        for idx, similarity in zip(top_indices[0], top_scores[0]):
+            if similarity >= self.confidence_threshold:
+                chunk = snapshot.chunks[int(idx)]
                 matches.append({
-                    "chunk": self.spec_data['chunks'][idx],
-                    "similarity": float(similarities[idx]),
-                    "source": self.spec_data.get('sources', {}).get(str(idx), 'Unknown')
+                    "chunk": chunk,
+                    "similarity": float(similarity),
+                    "source": chunk_source(chunk)
                 })
         
         # 4. Determine repeal status
@@ -325,14 +340,15 @@ class ConduitEnhancedAnalyzer:
         if not self.use_fine_tuned:
             return {"error": "Fine-tuned model not available"}
         
-        if not self.spec_data:
+        spec_chunks = self.spec_store.snapshot().live_chunks()
+        if not spec_chunks:
             return {"error": "No spec data to re-embed"}
         
         logger.info("Re-embedding spec library with fine-tuned model...")
         
         # Extract entities from each chunk
         enhanced_chunks = []
-        for chunk in self.spec_data['chunks']:
+        for chunk in spec_chunks:
             entities = self.extract_entities(chunk)
             
             # Build enhanced version with entity tags
@@ -349,10 +365,10 @@ class ConduitEnhancedAnalyzer:
         enhanced_path = Path("/data/spec_embeddings_conduit_enhanced.pkl")
         with open(enhanced_path, 'wb') as f:
             pickle.dump({
-                'chunks': self.spec_data['chunks'],
+                'chunks': spec_chunks,
                 'embeddings': new_embeddings,
                 'enhanced_chunks': enhanced_chunks,
-                'sources': self.spec_data.get('sources', {}),
+                'sources': {str(i): chunk_source(chunk) for i, chunk in enumerate(spec_chunks)},
                 'metadata': {
                     'enhanced_with': 'conduit_ner',
                     'timestamp': str(Path.ctime(Path.now()))
@@ -377,6 +393,7 @@ def integrate_enhanced_analyzer(app):
     
     router = APIRouter(prefix="/conduit-analysis", tags=["Enhanced Conduit Analysis"])
     analyzer = ConduitEnhancedAnalyzer()
+    batcher = get_embedding_batcher()
     
     class InfractionRequest(BaseModel):
         infraction_text: str
@@ -390,7 +407,10 @@ def integrate_enhanced_analyzer(app):
         Returns repeal recommendation with >90% confidence.
         """
         
-        result = analyzer.analyze_conduit_infraction(request.infraction_text)
+        query = analyzer.build_query(request.infraction_text)
+        # Concurrent analyses share one encode
+        embedding = await batcher.encode(query["text"]) if len(analyzer.spec_store) else None
+        result = analyzer.analyze_conduit_infraction(request.infraction_text, query, embedding)
         
         # Add job identifiers if provided
         if request.pm_number:
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Bounded CPU Executor
+Runs the synchronous heavy lifting of async endpoints (PDF parsing, OCR,
+model.encode, library writes) on a fixed thread pool sized from
+RENDER_CORES, so the event loop keeps answering /health while an audit is
+analyzed. An admission limit bounds how much work can queue up; past it
+requests fail fast with 503 and a Retry-After estimate instead of piling up.
+
+Threads rather than processes: the embedding model is shared in-process,
+torch and tesseract release the GIL, and large PDFs are already split
+across processes by pdf_extraction.
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> int:
+    if os.getenv('RENDER_CORES'):
+        return max(1, int(os.environ['RENDER_CORES']))
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class ExecutorSaturated(HTTPException):
+    """503 with Retry-After - raised instead of queueing past the admission limit"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail="Server is busy with other analyses, please retry shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.retry_after = retry_after
+
+
+def _percentile_ms(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(1000 * ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 1)
+
+
+class CPUExecutor:
+    """
+    Thread pool with an admission queue
+
+    At most workers jobs run at once and at most max_queue more wait; run()
+    raises ExecutorSaturated beyond that.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None, name: str = 'cpu-work'):
+        """
+        Args:
+            workers: Concurrent jobs; defaults to $CPU_EXECUTOR_WORKERS or
+                half of $RENDER_CORES (torch uses the other threads per job)
+            max_queue: Jobs allowed to wait; defaults to $CPU_EXECUTOR_QUEUE or 4 per worker
+        """
+        self.workers = workers or int(os.getenv('CPU_EXECUTOR_WORKERS', 0)) or max(1, available_cores() // 2)
+        self.max_queue = max_queue if max_queue is not None else \
+            int(os.getenv('CPU_EXECUTOR_QUEUE', self.workers * 4))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._wait_times = deque(maxlen=512)
+        self._run_times = deque(maxlen=512)
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        """Admitted jobs that have not started yet"""
+        return self._admitted - self._running
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from recent run times"""
+        with self._lock:
+            recent = list(self._run_times)
+            queued = self._admitted - self._running
+        average = sum(recent) / len(recent) if recent else 5.0
+        return max(1, min(120, math.ceil((queued + 1) * average / self.workers)))
+
+    def _release(self):
+        with self._lock:
+            self._admitted -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the pool and await its result
+
+        Raises:
+            ExecutorSaturated: When workers + max_queue jobs are already admitted
+        """
+        with self._lock:
+            admitted = self._admitted < self.workers + self.max_queue
+            if admitted:
+                self._admitted += 1
+                self.stats["submitted"] += 1
+            else:
+                self.stats["rejected"] += 1
+        if not admitted:
+            retry_after = self.retry_after()
+            logger.warning(f"CPU executor saturated ({self.workers} running, {self.max_queue} queued); "
+                           f"Retry-After {retry_after}s")
+            raise ExecutorSaturated(retry_after)
+
+        submitted_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._wait_times.append(started_at - submitted_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._admitted -= 1
+                    self._run_times.append(time.perf_counter() - started_at)
+
+        future = self._pool.submit(job)
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Client went away: drop the job if it has not started, otherwise it finishes and releases itself
+            if future.cancel():
+                self._release()
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        self.stats["completed"] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = list(self._wait_times)
+            runs = list(self._run_times)
+            running = self._running
+            queued = self._admitted - self._running
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": running,
+            "queue_depth": queued,
+            "wait_ms_p50": _percentile_ms(waits, 50),
+            "wait_ms_p95": _percentile_ms(waits, 95),
+            "wait_ms_max": round(1000 * max(waits), 1) if waits else 0.0,
+            "run_ms_p50": _percentile_ms(runs, 50),
+            "run_ms_p95": _percentile_ms(runs, 95)
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor: Optional[CPUExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_cpu_executor() -> CPUExecutor:
+    """Process-wide executor shared by all endpoints"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CPUExecutor()
+            logger.info(f"CPU executor: {_executor.workers} workers, queue {_executor.max_queue}")
+        return _executor
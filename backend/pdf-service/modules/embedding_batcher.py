@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Embedding Micro-Batcher
+Collects encode requests from every endpoint for up to
+EMBEDDING_BATCH_MAX_LATENCY_MS, or until EMBEDDING_BATCH_MAX_SIZE texts are
+waiting, and runs them as one batched encode on the CPU executor. Thirty
+concurrent go-back analyses then cost one forward pass over thirty rows
+instead of thirty passes over one.
+
+One batch is in flight at a time; requests arriving while it runs form the
+next batch, so batches grow with load and a lone request only pays the
+latency window. Vectors are encoded unnormalized (the form the embedding
+cache stores) and normalized per caller, so requests with different
+options still share a batch.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from modules.cpu_executor import CPUExecutor, _percentile_ms, get_cpu_executor
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets (texts per encode)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class EmbeddingBatcher:
+    """
+    Deadline- and size-bounded request batching in front of model.encode
+
+    encode() may be awaited from any endpoint on the event loop; requests
+    larger than max_batch_size run as a batch of their own.
+    """
+
+    def __init__(self,
+                 model=None,
+                 max_latency_ms: Optional[float] = None,
+                 max_batch_size: Optional[int] = None,
+                 executor: Optional[CPUExecutor] = None,
+                 encode_batch_size: int = 32):
+        """
+        Args:
+            model: Embedding model; defaults to the shared registry model
+            max_latency_ms: Longest a request waits for company; defaults to
+                $EMBEDDING_BATCH_MAX_LATENCY_MS or 5
+            max_batch_size: Texts that flush a batch early; defaults to
+                $EMBEDDING_BATCH_MAX_SIZE or 64
+            executor: Where the encode runs; defaults to the process-wide CPU executor
+            encode_batch_size: batch_size passed through to model.encode
+        """
+        if max_latency_ms is None:
+            max_latency_ms = float(os.getenv('EMBEDDING_BATCH_MAX_LATENCY_MS', 5))
+        self.max_latency = max(0.0, max_latency_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size or int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', 64)))
+        self.encode_batch_size = encode_batch_size
+        self._model = model
+        self._executor = executor
+
+        self._pending: deque = deque()
+        self._pending_texts = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._wait_times = deque(maxlen=512)
+        self._run_times = deque(maxlen=512)
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "failed_batches": 0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            from modules.model_registry import get_embedding_model
+            self._model = get_embedding_model(consumer='EmbeddingBatcher')
+        return self._model
+
+    @property
+    def executor(self) -> CPUExecutor:
+        if self._executor is None:
+            self._executor = get_cpu_executor()
+        return self._executor
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._pending.clear()
+            self._pending_texts = 0
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, sentences, normalize_embeddings: bool = False) -> np.ndarray:
+        """
+        Embed one text (1-D result) or a list of texts (2-D result) as part
+        of the next batch
+
+        Raises whatever the batched encode raised, e.g. ExecutorSaturated (503)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._pending.append(_Request(texts, future, time.perf_counter()))
+        self._pending_texts += len(texts)
+        self.stats["requests"] += 1
+        self._wakeup.set()
+
+        matrix = await future
+        if normalize_embeddings:
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return matrix[0] if single else matrix
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Wait for company until the window closes or the batch is full
+            deadline = loop.time() + self.max_latency
+            while self._pending_texts < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [self._pending.popleft()]
+            size = len(batch[0].texts)
+            while self._pending and size + len(self._pending[0].texts) <= self.max_batch_size:
+                request = self._pending.popleft()
+                batch.append(request)
+                size += len(request.texts)
+            self._pending_texts -= size
+
+            await self._flush(batch, size)
+
+    async def _flush(self, batch: List[_Request], size: int):
+        started_at = time.perf_counter()
+        for request in batch:
+            self._wait_times.append(started_at - request.enqueued_at)
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if size <= bound), len(BATCH_SIZE_BUCKETS))
+        self._histogram[bucket] += 1
+        self.stats["batches"] += 1
+        self.stats["texts"] += size
+
+        texts = [text for request in batch for text in request.texts]
+        try:
+            matrix = await self.executor.run(self._encode, texts)
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finally:
+            self._run_times.append(time.perf_counter() - started_at)
+
+        offset = 0
+        for request in batch:
+            # Callers that went away (cancelled) just drop their rows
+            if not request.future.done():
+                request.future.set_result(matrix[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=min(self.encode_batch_size, len(texts)),
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    async def stop(self):
+        """Cancel the collector; waiting callers get CancelledError"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        while self._pending:
+            self._pending.popleft().future.cancel()
+        self._pending_texts = 0
+        self._worker = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        labels = [str(bound) for bound in BATCH_SIZE_BUCKETS] + ['+Inf']
+        waits = list(self._wait_times)
+        runs = list(self._run_times)
+        return {
+            **self.stats,
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+            "max_batch_size": self.max_batch_size,
+            "queued_texts": self._pending_texts,
+            "avg_batch_size": round(self.stats["texts"] / self.stats["batches"], 2) if self.stats["batches"] else 0.0,
+            "batch_size_histogram": dict(zip(labels, self._histogram)),
+            "wait_ms_p50": _percentile_ms(waits, 50),
+            "wait_ms_p95": _percentile_ms(waits, 95),
+            "run_ms_p50": _percentile_ms(runs, 50),
+            "run_ms_p95": _percentile_ms(runs, 95)
+        }
+
+
+_batcher: Optional[EmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Process-wide batcher around the shared embedding model"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = EmbeddingBatcher()
+            logger.info(f"Embedding batcher: up to {_batcher.max_batch_size} texts "
+                        f"or {_batcher.max_latency * 1000:.0f}ms per batch")
+        return _batcher
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Embedding Cache
+Embeddings keyed by (model id, normalized text hash), shared by spec
+ingestion, re-embedding and audit analysis. A byte-bounded in-memory LRU
+sits in front of a SQLite file on the persistent disk, so a re-uploaded
+spec or repeated infraction boilerplate is only encoded once.
+
+Every SharedModel.encode call (see model_registry) goes through
+cached_encode, so call sites do not change.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# encode() options that change the vector itself - anything else bypasses the cache
+_BYPASS_OPTIONS = {'output_value', 'precision', 'prompt', 'prompt_name', 'device'}
+_SQLITE_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    """Normalization that cannot change the tokenized input: NFC and collapsed whitespace"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def text_key(model_id: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return f"{model_id}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache
+
+    Vectors are stored un-normalized as float32; normalize_embeddings is
+    applied on the way out, so one entry serves both kinds of caller.
+    """
+
+    def __init__(self,
+                 memory_bytes: int = 64 * 1024 * 1024,
+                 disk_path: Optional[str] = None,
+                 disk_max_entries: int = 200_000):
+        """
+        Args:
+            memory_bytes: Upper bound for the in-memory LRU tier
+            disk_path: SQLite file for the persistent tier (None = memory only)
+            disk_max_entries: Oldest rows are pruned past this many
+        """
+        self.memory_bytes = memory_bytes
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+
+        self._memory: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_writes = 0
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "bypassed_calls": 0,
+            "disk_errors": 0
+        }
+
+        if disk_path:
+            try:
+                self._init_disk()
+            except Exception as e:
+                logger.warning(f"Embedding cache disk tier disabled ({disk_path}): {e}")
+                self.disk_path = None
+
+    # === DISK TIER ===
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_disk(self):
+        os.makedirs(os.path.dirname(self.disk_path) or '.', exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            'key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings(created)')
+        conn.commit()
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        if not self.disk_path or not keys:
+            return found
+        try:
+            conn = self._connection()
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[i:i + _SQLITE_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        except sqlite3.Error as e:
+            self.stats["disk_errors"] += 1
+            logger.warning(f"Embedding cache read failed: {e}")
+        return found
+
+    def _disk_put(self, items: Dict[str, np.ndarray]):
+        if not self.disk_path or not items:
+            return
+        try:
+            conn = self._connection()
+            now = time.time()
+            conn.executemany(
+                'INSERT OR IGNORE INTO embeddings (key, vector, created) VALUES (?, ?, ?)',
+                [(key, vector.tobytes(), now) for key, vector in items.items()]
+            )
+            conn.commit()
+            self._disk_writes += len(items)
+            if self._disk_writes >= 1000:
+                self._disk_writes = 0
+                self._prune_disk(conn)
+        except sqlite3.Error as e:
+            self.stats["disk_errors"] += 1
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def _prune_disk(self, conn: sqlite3.Connection):
+        count = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        excess = count - self.disk_max_entries
+        if excess > 0:
+            # Drop a little extra so we do not prune on every write
+            excess += self.disk_max_entries // 10
+            conn.execute(
+                'DELETE FROM embeddings WHERE key IN '
+                '(SELECT key FROM embeddings ORDER BY created LIMIT ?)', (excess,)
+            )
+            conn.commit()
+
+    # === MEMORY TIER ===
+
+    def _memory_put(self, key: str, vector: np.ndarray):
+        if vector.nbytes > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = vector
+            self._memory_used += vector.nbytes
+            while self._memory_used > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= evicted.nbytes
+                self.stats["evictions"] += 1
+
+    # === PUBLIC API ===
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Look keys up in memory, then on disk; disk hits are promoted"""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                else:
+                    missing.append(key)
+        self.stats["memory_hits"] += len(found)
+
+        if missing:
+            from_disk = self._disk_get(missing)
+            for key, vector in from_disk.items():
+                self._memory_put(key, vector)
+            found.update(from_disk)
+            self.stats["disk_hits"] += len(from_disk)
+            self.stats["misses"] += len(missing) - len(from_disk)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        items = {key: np.ascontiguousarray(vector, dtype=np.float32) for key, vector in items.items()}
+        for key, vector in items.items():
+            self._memory_put(key, vector)
+        self._disk_put(items)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "memory_limit_bytes": self.memory_bytes,
+            "disk_path": self.disk_path
+        }
+
+
+def cached_encode(cache: Optional[EmbeddingCache], model, model_id: str, sentences, **kwargs):
+    """
+    SentenceTransformer.encode with the cache in front of it
+
+    Supports the options the pdf-service uses (normalize_embeddings,
+    convert_to_numpy, convert_to_tensor, batch_size, show_progress_bar);
+    anything that changes what encode returns goes straight to the model.
+    """
+    single = isinstance(sentences, str)
+    texts = [sentences] if single else list(sentences) if sentences is not None else []
+    convert_to_tensor = kwargs.get('convert_to_tensor', False)
+    convert_to_numpy = kwargs.get('convert_to_numpy', True)
+
+    if cache is None or not texts or _BYPASS_OPTIONS & kwargs.keys() \
+            or not (convert_to_numpy or convert_to_tensor) \
+            or not all(isinstance(text, str) for text in texts):
+        if cache is not None:
+            cache.stats["bypassed_calls"] += 1
+        return model.encode(sentences, **kwargs)
+
+    normalize = kwargs.pop('normalize_embeddings', False)
+    kwargs.pop('convert_to_tensor', None)
+    kwargs.pop('convert_to_numpy', None)
+
+    keys = [text_key(model_id, text) for text in texts]
+    found = cache.get_many(keys)
+
+    # Encode each missing text once, even if it repeats within the call
+    pending: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in pending:
+            pending[key] = text
+    if pending:
+        encoded = model.encode(list(pending.values()), convert_to_numpy=True,
+                               normalize_embeddings=False, **kwargs)
+        new_items = dict(zip(pending.keys(), np.asarray(encoded, dtype=np.float32)))
+        cache.put_many(new_items)
+        found.update(new_items)
+
+    matrix = np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+    if normalize:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+
+    result = matrix[0] if single else matrix
+    if convert_to_tensor:
+        import torch
+        result = torch.from_numpy(np.array(result)).to(getattr(model, 'device', 'cpu'))
+    return result
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache configured from the environment (None when disabled)"""
+    global _cache
+    if os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+    with _cache_lock:
+        if _cache is None:
+            disk_path = os.getenv('EMBEDDING_CACHE_PATH') or os.path.join(
+                os.getenv('DATA_PATH', '/data'), 'embedding_cache.sqlite3'
+            )
+            _cache = EmbeddingCache(
+                memory_bytes=int(float(os.getenv('EMBEDDING_CACHE_MEMORY_MB', 64)) * 1024 * 1024),
+                disk_path=disk_path if os.getenv('EMBEDDING_CACHE_DISK', 'true').lower() == 'true' else None,
+                disk_max_entries=int(os.getenv('EMBEDDING_CACHE_DISK_MAX_ENTRIES', 200_000))
+            )
+        return _cache
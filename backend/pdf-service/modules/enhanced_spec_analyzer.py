@@ -5,18 +5,20 @@ Integrates with existing app_oct2025_enhanced.py
 """
 
 import os
-import pickle
 import json
 import torch
 import numpy as np
 from typing import List, Dict, Any, Tuple
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
 from transformers import AutoModelForTokenClassification, AutoTokenizer
 import logging
 from datetime import datetime
 import hashlib
 
+from modules.model_registry import get_embedding_model
+from modules.embedding_batcher import get_embedding_batcher
+from modules.spec_store import get_spec_store
+
 logger = logging.getLogger(__name__)
 
 class EnhancedSpecAnalyzer:
@@ -42,7 +44,7 @@ class EnhancedSpecAnalyzer:
         
         # Load embeddings model
         logger.info("Loading sentence transformer...")
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedder = get_embedding_model(consumer='EnhancedSpecAnalyzer')
         
         # Load fine-tuned NER model if available
         self.ner_model = None
@@ -55,9 +57,8 @@ class EnhancedSpecAnalyzer:
         else:
             logger.warning("⚠️ Fine-tuned model not found, using base embeddings only")
         
-        # Load spec embeddings
-        self.spec_chunks = []
-        self.spec_embeddings = None
+        # Shared spec library - one memory-mapped copy for every analyzer
+        self.spec_store = get_spec_store(spec_embeddings_path)
         self.load_spec_embeddings()
         
         # Statistics tracking
@@ -69,29 +70,34 @@ class EnhancedSpecAnalyzer:
             "avg_confidence": 0.0
         }
     
+    @property
+    def spec_chunks(self):
+        return self.spec_store.chunks
+    
+    @property
+    def spec_embeddings(self):
+        return self.spec_store.matrix if len(self.spec_store) else None
+    
     def load_spec_embeddings(self):
-        """Load pre-computed spec embeddings"""
+        """Check the shared spec library (updates are picked up automatically)"""
         
-        if os.path.exists(self.spec_embeddings_path):
-            try:
-                with open(self.spec_embeddings_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.spec_chunks = data.get('chunks', [])
-                    self.spec_embeddings = data.get('embeddings', None)
-                logger.info(f"✅ Loaded {len(self.spec_chunks)} spec chunks")
-            except Exception as e:
-                logger.error(f"Failed to load spec embeddings: {e}")
-                self.spec_chunks = []
-                self.spec_embeddings = None
-        else:
-            logger.warning(f"Spec embeddings not found at {self.spec_embeddings_path}")
+        try:
+            snapshot = self.spec_store.snapshot()
+            if len(snapshot):
+                logger.info(f"✅ Using {len(snapshot)} spec chunks (v{snapshot.version})")
+            else:
+                logger.warning(f"Spec library is empty at {self.spec_store.data_path}")
+        except Exception as e:
+            logger.error(f"Failed to load spec embeddings: {e}")
     
-    def analyze_go_back_infraction(self, infraction_text: str) -> Dict[str, Any]:
+    def analyze_go_back_infraction(self, infraction_text: str, infraction_embedding=None) -> Dict[str, Any]:
         """
         Analyze a go-back infraction for poles/underground equipment
         
         Args:
             infraction_text: Text describing the infraction
+            infraction_embedding: Embedding of infraction_text if already
+                computed (e.g. by the micro-batcher)
             
         Returns:
             Analysis result with confidence, status, and reasoning
@@ -103,7 +109,8 @@ class EnhancedSpecAnalyzer:
         entities = self.extract_entities(infraction_text) if self.ner_model else []
         
         # Generate embedding for infraction
-        infraction_embedding = self.embedder.encode(infraction_text, convert_to_tensor=True)
+        if infraction_embedding is None:
+            infraction_embedding = self.embedder.encode(infraction_text, convert_to_tensor=True)
         
         # Find best matching specs
         matches = self.find_best_spec_matches(infraction_embedding, top_k=5)
@@ -227,21 +234,23 @@ class EnhancedSpecAnalyzer:
     def find_best_spec_matches(self, query_embedding, top_k=5) -> List[Dict]:
         """Find best matching spec chunks"""
         
-        if self.spec_embeddings is None or len(self.spec_chunks) == 0:
+        if len(self.spec_store) == 0:
             return []
         
-        # Calculate cosine similarities
-        similarities = util.cos_sim(query_embedding, self.spec_embeddings)[0]
-        
-        # Get top-k matches
-        top_results = torch.topk(similarities, k=min(top_k, len(self.spec_chunks)))
+        # Cosine top-k against the shared library
+        if isinstance(query_embedding, torch.Tensor):
+            query_embedding = query_embedding.detach().cpu().numpy()
+        indices, scores, snapshot = self.spec_store.search(query_embedding, top_k)
         
         matches = []
-        for score, idx in zip(top_results.values, top_results.indices):
+        for score, idx in zip(scores[0], indices[0]):
+            if not np.isfinite(score):
+                continue
+            chunk = snapshot.chunks[int(idx)]
             matches.append({
-                "text": self.spec_chunks[idx.item()],
-                "score": score.item(),
-                "source": self.extract_source_from_chunk(self.spec_chunks[idx.item()])
+                "text": chunk,
+                "score": float(score),
+                "source": self.extract_source_from_chunk(chunk)
             })
         
         return matches
@@ -372,7 +381,7 @@ class EnhancedSpecAnalyzer:
             **self.stats,
             "confidence_threshold": self.confidence_threshold,
             "model_type": "fine-tuned" if self.ner_model else "base",
-            "spec_chunks_loaded": len(self.spec_chunks),
+            "spec_chunks_loaded": len(self.spec_store),
             "repeal_rate": (
                 self.stats["repealable_count"] / self.stats["total_infractions_analyzed"] * 100
                 if self.stats["total_infractions_analyzed"] > 0 else 0
@@ -387,6 +396,8 @@ def integrate_with_app(app):
     from typing import List
     
     analyzer = EnhancedSpecAnalyzer()
+    # Concurrent analyses share one encode
+    batcher = get_embedding_batcher()
     
     @app.post("/analyze-go-back")
     async def analyze_go_back(
@@ -400,8 +411,11 @@ def integrate_with_app(app):
         """
         try:
             analyzer.confidence_threshold = confidence_threshold
-            result = analyzer.analyze_go_back_infraction(infraction_text)
+            embedding = await batcher.encode(infraction_text)
+            result = analyzer.analyze_go_back_infraction(infraction_text, embedding)
             return result
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Analysis failed: {e}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -411,9 +425,10 @@ def integrate_with_app(app):
         """Analyze multiple go-back infractions"""
         
         results = []
-        for infraction in infractions:
+        embeddings = await batcher.encode(infractions)
+        for infraction, embedding in zip(infractions, embeddings):
             try:
-                result = analyzer.analyze_go_back_infraction(infraction)
+                result = analyzer.analyze_go_back_infraction(infraction, embedding)
                 results.append(result)
             except Exception as e:
                 results.append({
@@ -1,23 +1,21 @@
 #!/usr/bin/env python3
 """
-Enhanced Spec Learning System with FAISS and Optimized Chunking
-Implements all recommendations for production-ready embeddings
+Enhanced Spec Learning System with Optimized Chunking
+Implements all recommendations for production-ready embeddings.
+Chunks are stored in and searched through the shared spec store.
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
 from typing import List, Dict, Any, Optional, Tuple
 import os
-import pickle
-import faiss
+import re
 from pathlib import Path
 import pdfplumber
 import pypdf
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import logging
 import hashlib
 from datetime import datetime
-import re
 import nltk
 from nltk.tokenize import word_tokenize, sent_tokenize
 
@@ -27,11 +25,16 @@ try:
 except LookupError:
     nltk.download('punkt')
 
+from modules.model_registry import get_embedding_model
+from modules.spec_store import get_spec_store
+
 logger = logging.getLogger(__name__)
 
+CHUNK_TAG_PATTERN = re.compile(r'\[Source: ([^\],]+), Page (\d+)\]\s*$')
+
 class EnhancedSpecLearningSystem:
     """
-    Production-ready spec learning with FAISS indexing and optimized chunking
+    Production-ready spec learning with optimized chunking
     Implements all recommendations from the embedding guide
     """
     
@@ -58,7 +61,6 @@ class EnhancedSpecLearningSystem:
             self.data_dir.mkdir(exist_ok=True)
         
         self.embeddings_path = self.data_dir / "spec_embeddings.pkl"
-        self.faiss_index_path = self.data_dir / "spec_index.faiss"
         self.specs_dir = self.data_dir / "specs"
         self.specs_dir.mkdir(exist_ok=True)
         
@@ -69,61 +71,38 @@ class EnhancedSpecLearningSystem:
         
         # Load sentence transformer
         logger.info(f"Loading sentence transformer: {model_name}")
-        self.embedder = SentenceTransformer(model_name)
+        self.embedder = get_embedding_model(model_name, consumer='EnhancedSpecLearningSystem')
         self.embedding_dim = self.embedder.get_sentence_embedding_dimension()
         
-        # Initialize storage
-        self.spec_chunks = []
-        self.spec_embeddings = None
-        self.spec_metadata = []
-        self.faiss_index = None
-        
-        # Load existing data
+        # Shared spec library - the same memory-mapped copy the analyzers read
+        self.spec_store = get_spec_store(str(self.data_dir))
         self.load_existing_embeddings()
     
+    @property
+    def spec_chunks(self):
+        return self.spec_store.chunks
+    
+    @property
+    def spec_embeddings(self):
+        return self.spec_store.matrix if len(self.spec_store) else None
+    
     def load_existing_embeddings(self):
-        """Load existing embeddings and FAISS index"""
-        
-        # Load embeddings
-        if self.embeddings_path.exists():
-            try:
-                with open(self.embeddings_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.spec_chunks = data.get('chunks', [])
-                    self.spec_embeddings = data.get('embeddings', None)
-                    self.spec_metadata = data.get('metadata', [])
-                    # If no metadata, create empty dict for each chunk
-                    if not self.spec_metadata and self.spec_chunks:
-                        self.spec_metadata = [{}] * len(self.spec_chunks)
-                logger.info(f"✅ Loaded {len(self.spec_chunks)} existing spec chunks")
-            except Exception as e:
-                logger.error(f"Failed to load embeddings: {e}")
-        
-        # Load FAISS index
-        if self.faiss_index_path.exists():
-            try:
-                self.faiss_index = faiss.read_index(str(self.faiss_index_path))
-                logger.info(f"✅ Loaded FAISS index with {self.faiss_index.ntotal} vectors")
-            except Exception as e:
-                logger.error(f"Failed to load FAISS index: {e}")
-                self.create_faiss_index()
-        else:
-            self.create_faiss_index()
+        """Check the shared spec library (updates are picked up automatically)"""
+        
+        try:
+            snapshot = self.spec_store.snapshot()
+            logger.info(f"✅ Loaded {len(snapshot)} existing spec chunks (v{snapshot.version})")
+        except Exception as e:
+            logger.error(f"Failed to load embeddings: {e}")
     
-    def create_faiss_index(self):
-        """Create new FAISS index"""
-        
-        # Use IndexFlatIP for cosine similarity (after normalization)
-        self.faiss_index = faiss.IndexFlatIP(self.embedding_dim)
-        
-        # Add existing embeddings if available
-        if self.spec_embeddings is not None and len(self.spec_embeddings) > 0:
-            # Normalize for cosine similarity
-            normalized = self.spec_embeddings / np.linalg.norm(
-                self.spec_embeddings, axis=1, keepdims=True
-            )
-            self.faiss_index.add(normalized)
-            logger.info(f"Created FAISS index with {self.faiss_index.ntotal} vectors")
+    @staticmethod
+    def chunk_metadata(chunk: str) -> Dict[str, Any]:
+        """Source and page of a learned chunk, read from its [Source: ..., Page N] tag"""
+        
+        match = CHUNK_TAG_PATTERN.search(chunk)
+        if not match:
+            return {}
+        return {'source': match.group(1).strip(), 'page': int(match.group(2))}
     
     def extract_text_with_pdfplumber(self, pdf_path: Path) -> Tuple[str, List[Dict]]:
         """
@@ -332,84 +311,54 @@ class EnhancedSpecLearningSystem:
         
         # Step 4: Update storage
         logger.info("💾 Updating storage and index...")
-        self.update_storage(chunks_with_metadata, new_embeddings)
+        file_hash = self.calculate_file_hash(pdf_path)
+        self.update_storage(chunks_with_metadata, new_embeddings, {
+            'filename': pdf_path.name,
+            'file_hash': file_hash,
+            'chunk_count': len(chunks_with_metadata),
+            'file_size': pdf_path.stat().st_size,
+            'upload_time': datetime.now().isoformat()
+        })
         
         # Step 5: Calculate statistics
         processing_time = (datetime.now() - start_time).total_seconds()
-        file_hash = self.calculate_file_hash(pdf_path)
         
         return {
             'success': True,
             'file': pdf_path.name,
             'file_hash': file_hash,
             'chunks_added': len(chunks_with_metadata),
-            'total_chunks': len(self.spec_chunks),
+            'total_chunks': len(self.spec_store),
             'total_pages': len(page_metadata),
             'processing_time': f"{processing_time:.2f} seconds",
             'embedding_dim': self.embedding_dim,
-            'index_size': self.faiss_index.ntotal if self.faiss_index else 0,
+            'index_size': len(self.spec_store),
             'timestamp': datetime.now().isoformat()
         }
     
-    def update_storage(self, new_chunks: List[Dict], new_embeddings: np.ndarray):
-        """Update embeddings storage and FAISS index"""
+    def update_storage(self, new_chunks: List[Dict], new_embeddings: np.ndarray,
+                       file_info: Optional[Dict[str, Any]] = None):
+        """Append the new chunks to the shared spec store as one segment"""
         
-        # Extract text and metadata separately
+        # Source and page travel in the chunk text
         new_texts = [f"{chunk['text']} [Source: {chunk['source']}, Page {chunk['page']}]" 
                     for chunk in new_chunks]
         
-        # Update chunks and metadata
-        self.spec_chunks.extend(new_texts)
-        self.spec_metadata.extend(new_chunks)
-        
-        # Update embeddings
-        if self.spec_embeddings is None:
-            self.spec_embeddings = new_embeddings
-        else:
-            self.spec_embeddings = np.vstack([self.spec_embeddings, new_embeddings])
-        
-        # Update FAISS index
-        if self.faiss_index is None:
-            self.create_faiss_index()
-        else:
-            self.faiss_index.add(new_embeddings)
-        
-        # Save to disk
-        self.save_embeddings()
-        self.save_faiss_index()
-    
-    def save_embeddings(self):
-        """Save embeddings and metadata to pickle file"""
-        
-        data = {
-            'chunks': self.spec_chunks,
-            'embeddings': self.spec_embeddings,
-            'metadata': self.spec_metadata,
-            'model': 'all-MiniLM-L6-v2',
-            'embedding_dim': self.embedding_dim,
-            'chunk_params': {
-                'size': self.chunk_size,
-                'overlap': self.chunk_overlap
-            },
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open(self.embeddings_path, 'wb') as f:
-            pickle.dump(data, f)
-        
-        file_size_mb = self.embeddings_path.stat().st_size / (1024 * 1024)
-        logger.info(f"✅ Saved embeddings to {self.embeddings_path} ({file_size_mb:.2f} MB)")
-    
-    def save_faiss_index(self):
-        """Save FAISS index to disk"""
+        if file_info is None:
+            source = new_chunks[0]['source'] if new_chunks else 'unknown'
+            file_info = {
+                'filename': source,
+                'file_hash': hashlib.md5('\n'.join(new_texts).encode('utf-8')).hexdigest(),
+                'chunk_count': len(new_texts),
+                'upload_time': datetime.now().isoformat()
+            }
         
-        if self.faiss_index is not None:
-            faiss.write_index(self.faiss_index, str(self.faiss_index_path))
-            logger.info(f"✅ Saved FAISS index with {self.faiss_index.ntotal} vectors")
+        snapshot = self.spec_store.append_segment(new_texts, new_embeddings, file_info)
+        logger.info(f"✅ Spec library v{snapshot.version}: {len(snapshot)} chunks")
     
     def search_specs(self, query: str, top_k: int = 5, threshold: float = 0.7) -> List[Dict]:
         """
-        Search specs using FAISS for efficient similarity search
+        Search specs with exact cosine similarity over the shared spec store
         
         Args:
             query: Search query text
@@ -420,7 +369,7 @@ class EnhancedSpecLearningSystem:
             List of matching chunks with scores
         """
         
-        if self.faiss_index is None or self.faiss_index.ntotal == 0:
+        if len(self.spec_store) == 0:
             logger.warning("No embeddings indexed yet")
             return []
         
@@ -431,23 +380,24 @@ class EnhancedSpecLearningSystem:
             normalize_embeddings=True
         ).reshape(1, -1)
         
-        # Search with FAISS
-        scores, indices = self.faiss_index.search(query_embedding, top_k)
+        # Exact cosine search over the shared library
+        indices, scores, snapshot = self.spec_store.search(query_embedding, top_k)
         
         # Filter by threshold and prepare results
         results = []
         for score, idx in zip(scores[0], indices[0]):
             # Convert numpy int64 to Python int
             idx = int(idx)
-            if score >= threshold and idx < len(self.spec_chunks):
-                chunk_metadata = self.spec_metadata[idx] if idx < len(self.spec_metadata) else {}
+            if score >= threshold:
+                chunk = snapshot.chunks[idx]
+                chunk_metadata = self.chunk_metadata(chunk)
                 
                 results.append({
-                    'chunk': self.spec_chunks[idx][:500],  # First 500 chars
+                    'chunk': chunk[:500],  # First 500 chars
                     'similarity': float(score),
                     'confidence_percentage': f"{score * 100:.1f}%",
-                    'source': chunk_metadata.get('source', 'Unknown') if isinstance(chunk_metadata, dict) else 'Unknown',
-                    'page': chunk_metadata.get('page', 0) if isinstance(chunk_metadata, dict) else 0,
+                    'source': chunk_metadata.get('source', 'Unknown'),
+                    'page': chunk_metadata.get('page', 0),
                     'chunk_index': idx
                 })
         
@@ -465,26 +415,24 @@ class EnhancedSpecLearningSystem:
     def get_statistics(self) -> Dict:
         """Get comprehensive statistics about the spec learning system"""
         
+        snapshot = self.spec_store.snapshot()
+        store_stats = self.spec_store.get_stats()
+        
         return {
-            'total_chunks': len(self.spec_chunks),
-            'total_embeddings': len(self.spec_embeddings) if self.spec_embeddings is not None else 0,
+            'total_chunks': len(snapshot),
+            'total_embeddings': len(snapshot),
             'embedding_dimension': self.embedding_dim,
-            'faiss_index_size': self.faiss_index.ntotal if self.faiss_index else 0,
-            'embeddings_file_size_mb': (
-                self.embeddings_path.stat().st_size / (1024 * 1024) 
-                if self.embeddings_path.exists() else 0
-            ),
-            'faiss_index_size_mb': (
-                self.faiss_index_path.stat().st_size / (1024 * 1024)
-                if self.faiss_index_path.exists() else 0
-            ),
-            'unique_sources': len(set(m.get('source', '') for m in self.spec_metadata if isinstance(m, dict))),
+            'dead_chunks': store_stats['dead_chunks'],
+            'spec_store_segments': store_stats['segments'],
+            'embeddings_file_size_mb': store_stats['matrix_bytes'] / (1024 * 1024),
+            'spec_library_version': snapshot.version,
+            'unique_sources': len({f.get('filename') for f in snapshot.metadata.get('files', [])}),
             'chunk_parameters': {
                 'size': self.chunk_size,
                 'overlap': self.chunk_overlap
             },
             'model': 'all-MiniLM-L6-v2',
-            'ready': self.faiss_index is not None and self.faiss_index.ntotal > 0
+            'ready': len(snapshot) > 0
         }
 
 def integrate_enhanced_spec_learning(app):
@@ -503,12 +451,12 @@ def integrate_enhanced_spec_learning(app):
         background_tasks: BackgroundTasks = BackgroundTasks()
     ):
         """
-        Enhanced spec learning with FAISS and optimized chunking
+        Enhanced spec learning with optimized chunking
         
         Features:
         - PDFPlumber for better text extraction
         - Overlapping chunks for context preservation
-        - FAISS indexing for fast similarity search
+        - Shared memory-mapped spec store (no per-module copy)
         - Batch embedding generation
         - Comprehensive metadata tracking
         """
@@ -532,7 +480,7 @@ def integrate_enhanced_spec_learning(app):
                 "chunks_added": result['chunks_added'],
                 "total_chunks": result['total_chunks'],
                 "processing_time": result['processing_time'],
-                "faiss_index_size": result['index_size']
+                "index_size": result['index_size']
             }
         else:
             raise HTTPException(status_code=500, detail=result['message'])
@@ -544,7 +492,7 @@ def integrate_enhanced_spec_learning(app):
         threshold: float = 0.7
     ):
         """
-        Search specs using FAISS-accelerated similarity search
+        Search specs against the shared spec store
         """
         
         results = spec_learner.search_specs(query, top_k, threshold)
@@ -568,7 +516,7 @@ def integrate_enhanced_spec_learning(app):
     
     app.include_router(router)
     logger.info("✅ Enhanced spec learning endpoints added")
-    logger.info("   Features: PDFPlumber extraction, FAISS indexing, overlapping chunks")
+    logger.info("   Features: PDFPlumber extraction, shared spec store, overlapping chunks")
 
 if __name__ == "__main__":
     # Test the enhanced system
@@ -579,7 +527,7 @@ if __name__ == "__main__":
     
     stats = system.get_statistics()
     print(f"Total Chunks: {stats['total_chunks']}")
-    print(f"FAISS Index: {stats['faiss_index_size']} vectors")
+    print(f"Spec Store: {stats['spec_store_segments']} segments, {stats['embeddings_file_size_mb']:.1f} MB")
     print(f"Embedding Dim: {stats['embedding_dimension']}")
     print(f"Ready: {stats['ready']}")
     
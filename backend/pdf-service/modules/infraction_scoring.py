@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Batched Infraction Scoring Engine
+Scores every infraction of an audit against the spec library with one
+encode call, one matrix multiply per library segment and a vectorized top-k
+"""
+
+import re
+import logging
+from typing import List, Dict, Any, Optional, Sequence
+
+from modules.spec_index import unit_normalize, top_k_scores  # noqa: F401 - re-exported
+
+logger = logging.getLogger(__name__)
+
+SOURCE_PATTERN = re.compile(r'\[Source: (.*?)\]')
+SOURCE_TAG_PATTERN = re.compile(r'\[Source:.*?\]\s*')
+
+
+def build_spec_match(chunk: str, score: float, sources: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Format one spec chunk match the way /analyze-audit reports it
+
+    Args:
+        chunk: Spec chunk text with its [Source: ...] tag
+        score: Cosine similarity
+        sources: Live spec files containing the chunk (SpecSnapshot.sources),
+            when near-duplicates of it were collapsed
+    """
+    # Extract source file from chunk
+    source_match = SOURCE_PATTERN.search(chunk)
+    source = source_match.group(1) if source_match else "Unknown"
+    if sources and source not in sources:
+        source = sources[0]  # the tagged file was removed; a duplicate keeps the chunk
+
+    # Clean the chunk text (remove source tag)
+    clean_chunk = SOURCE_TAG_PATTERN.sub('', chunk).strip()
+
+    match = {
+        "source_spec": source,
+        "relevance_score": round(score * 100, 1),
+        "spec_text": clean_chunk[:300] + "..." if len(clean_chunk) > 300 else clean_chunk
+    }
+    also_in = [name for name in sources or [] if name != source]
+    if also_in:
+        match["also_in_specs"] = also_in
+    return match
+
+
+def classify_matches(matches: List[Dict[str, Any]]):
+    """Determine status and confidence based on match quality"""
+    if not matches:
+        return "VALID", "LOW"
+    elif matches[0]['relevance_score'] > 70:
+        return "POTENTIALLY REPEALABLE", "HIGH"
+    elif matches[0]['relevance_score'] > 55:
+        return "POTENTIALLY REPEALABLE", "MEDIUM"
+    return "VALID", "MEDIUM"
+
+
+def score_infractions(model,
+                      infractions: Sequence[str],
+                      library,
+                      top_k: int = 5,
+                      threshold: float = 0.4,
+                      batch_size: int = 32) -> List[Dict[str, Any]]:
+    """
+    Score infractions against the spec library in one batch
+
+    Args:
+        model: Sentence embedding model exposing encode()
+        infractions: Infraction texts to analyze
+        library: SpecSnapshot (anything with search() and chunks)
+        top_k: Matches to keep per infraction
+        threshold: Minimum cosine similarity for a match
+        batch_size: Encoder batch size
+
+    Returns:
+        The analysis_results list returned by /analyze-audit
+    """
+    if not infractions:
+        return []
+
+    # One batched encode for every infraction
+    query_matrix = model.encode(
+        list(infractions),
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    query_matrix = unit_normalize(query_matrix)
+
+    # One GEMM per library segment, merged top-k
+    top_indices, top_scores = library.search(query_matrix, top_k)
+
+    # Only rows that collapsed duplicates were merged onto can have more than one source
+    alias_sources = getattr(library, 'alias_sources', None) or {}
+
+    results = []
+    for i, infraction in enumerate(infractions):
+        matches = [
+            build_spec_match(library.chunks[idx], float(score),
+                             library.sources(int(idx)) if int(idx) in alias_sources else None)
+            for idx, score in zip(top_indices[i], top_scores[i])
+            if score > threshold
+        ]
+        status, confidence = classify_matches(matches)
+
+        results.append({
+            "infraction_id": i + 1,
+            "infraction_text": infraction[:500] + "..." if len(infraction) > 500 else infraction,
+            "spec_matches": matches,
+            "status": status,
+            "confidence": confidence,
+            "match_count": len(matches)
+        })
+
+    return results
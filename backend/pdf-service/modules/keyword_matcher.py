@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Keyword Matcher
+Single-pass keyword search for infraction detection. Every keyword is
+compiled into one trie-shaped regex, so finding the lines that contain any
+of them is one scan of the text however many keywords there are, and the
+context windows around hits are merged as line intervals - an audit with
+thousands of "missing" lines stays linear.
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# Method 1.5: checklist items answered "No" in QC audits
+QC_ITEM_INDICATORS = ('check "no"', 'check no', 'list the items', 'list the issues', 'missing')
+
+# Method 2: free-text infraction keywords
+INFRACTION_KEYWORDS = (
+    "go-back", "go back", "goback",
+    "infraction", "violation", "deficiency",
+    "non-compliant", "non compliant", "noncompliant",
+    "non-conforming", "non conforming", "nonconforming",
+    "correction required", "correction needed",
+    "does not meet", "fails to meet",
+    "not in compliance", "out of compliance",
+    "check no", "check \"no\"", "marked no",
+    "incomplete", "failed", "missing"
+)
+
+# Longest block a run of adjacent hits is merged into before a new block starts
+MAX_BLOCK_LINES = 24
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex source matching any of words, with shared prefixes factored out"""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if '' in node:
+            return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+        return body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """Case-insensitive matcher for a fixed keyword list"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(dict.fromkeys(k.lower() for k in keywords if k))
+        self.pattern = re.compile(_trie_pattern(self.keywords))
+
+    def hit_lines(self, text: str) -> List[int]:
+        """
+        Indices of the lines of text (split on newlines) containing any keyword
+
+        After the first hit on a line the scan resumes at the next line, so
+        the cost is one pass over the text regardless of hits per line.
+        """
+        lowered = text.lower()
+        hits = []
+        position = 0
+        line = 0
+        while True:
+            match = self.pattern.search(lowered, position)
+            if match is None:
+                break
+            line += lowered.count('\n', position, match.start())
+            hits.append(line)
+            line_end = lowered.find('\n', match.end())
+            if line_end < 0:
+                break
+            position = line_end + 1
+            line += 1
+        return hits
+
+    def keywords_in(self, line: str) -> List[str]:
+        """Every keyword occurring in one line (for logging)"""
+        line = line.lower()
+        return [kw for kw in self.keywords if kw in line]
+
+
+def merge_windows(hits: Iterable[int], before: int, after: int, total: int,
+                  max_lines: int = MAX_BLOCK_LINES) -> List[Tuple[int, int]]:
+    """
+    Context windows around hit lines, merged where they overlap
+
+    Args:
+        hits: Hit line indices in ascending order
+        before: Lines of context before each hit
+        after: Lines after each hit (the window is [hit - before, hit + after))
+        total: Number of lines in the text
+        max_lines: A merged window that would grow past this is closed and
+            the next one starts where it ended
+
+    Returns:
+        Disjoint (start, end) line intervals in order
+    """
+    windows: List[Tuple[int, int]] = []
+    current_start = current_end = None
+    for hit in hits:
+        start, end = max(0, hit - before), min(total, hit + after)
+        if current_end is not None and start < current_end:
+            if end - current_start <= max_lines:
+                current_end = max(current_end, end)
+                continue
+            windows.append((current_start, current_end))
+            start = current_end
+            if start >= end:
+                current_start = current_end = None
+                continue
+        elif current_end is not None:
+            windows.append((current_start, current_end))
+        current_start, current_end = start, end
+    if current_end is not None:
+        windows.append((current_start, current_end))
+    return windows
+
+
+def context_blocks(text: str, matcher: KeywordMatcher, before: int, after: int,
+                   min_length: int = 0) -> Tuple[List[str], List[int]]:
+    """
+    Text blocks around every line of text that contains a keyword
+
+    Args:
+        text: Audit text
+        matcher: Keywords to look for
+        before: Context lines before a hit
+        after: Window end relative to a hit (exclusive)
+        min_length: Drop blocks shorter than this after stripping
+
+    Returns:
+        Tuple of (unique blocks in document order, hit line indices)
+    """
+    lines = text.split('\n')
+    hits = matcher.hit_lines(text)
+    blocks = []
+    seen = set()
+    for start, end in merge_windows(hits, before, after, len(lines)):
+        block = '\n'.join(lines[start:end]).strip()
+        if block and len(block) > min_length and block not in seen:
+            seen.add(block)
+            blocks.append(block)
+    return blocks, hits
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Length-Bucketed Encoding
+Spec chunks (~400-1100 chars) and infraction blocks (20-500+ chars) vary a
+lot in token length, and a transformer batch is padded to its longest
+member. The bucketer measures every text in tokens, sorts by length and
+cuts batches by a padded-token budget rather than a fixed count: short
+texts go many to a batch, long ones few, and each batch holds rows of
+nearly the same length. Results are scattered back to input order.
+
+The registry runs every SharedModel.encode() through it, so spec
+ingestion, re-embedding, batched infraction scoring and the micro-batcher
+all get it. Benchmark (real tokens per second, arrival order vs bucketed):
+
+    python -m modules.length_bucketing --texts 2000
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = 8192   # padded tokens per batch - 32 rows of 256
+DEFAULT_MAX_ITEMS = 256
+# A text shorter than this fraction of a batch's longest starts a new batch
+LENGTH_SPREAD = 0.7
+
+
+def token_lengths(model, texts: Sequence[str]) -> np.ndarray:
+    """Tokens per text (special tokens included), capped at the model's max_seq_length"""
+    limit = getattr(model, 'max_seq_length', None)
+    tokenizer = getattr(model, 'tokenizer', None)
+    try:
+        if hasattr(tokenizer, 'encode_batch'):
+            # tokenizers.Tokenizer (onnx backend) pads the batch - count the mask
+            lengths = [sum(encoding.attention_mask) for encoding in tokenizer.encode_batch(list(texts))]
+        elif tokenizer is not None:
+            lengths = [len(ids) for ids in tokenizer(list(texts), add_special_tokens=True,
+                                                     truncation=limit is not None, max_length=limit)['input_ids']]
+        else:
+            lengths = [len(text.split()) + 2 for text in texts]
+    except Exception as e:
+        logger.debug(f"Tokenizer unavailable for length bucketing ({e}), estimating from characters")
+        lengths = [len(text) // 4 + 2 for text in texts]
+    lengths = np.asarray(lengths, dtype=np.int64)
+    return np.minimum(lengths, limit) if limit else lengths
+
+
+def plan_batches(lengths: np.ndarray, max_tokens: int, max_items: int) -> List[np.ndarray]:
+    """
+    Input indices per batch, longest first; each batch fits max_tokens once
+    padded and holds lengths within LENGTH_SPREAD of its longest
+    """
+    order = np.argsort(-lengths, kind='stable')
+    batches = []
+    start = 0
+    while start < len(order):
+        longest = max(1, int(lengths[order[start]]))
+        end = start + max(1, min(max_items, max_tokens // longest))
+        floor = longest * LENGTH_SPREAD
+        stop = start + 1
+        while stop < min(end, len(order)) and lengths[order[stop]] >= floor:
+            stop += 1
+        batches.append(order[start:stop])
+        start = stop
+    return batches
+
+
+def padded_tokens(lengths: np.ndarray, batches: Sequence[np.ndarray]) -> int:
+    """Tokens a model computes for these batches, padding included"""
+    return int(sum(len(batch) * int(lengths[batch].max()) for batch in batches if len(batch)))
+
+
+class LengthBucketer:
+    """Token-budget batching in front of model.encode()"""
+
+    def __init__(self,
+                 enabled: Optional[bool] = None,
+                 max_tokens: Optional[int] = None,
+                 max_items: Optional[int] = None):
+        """
+        Args:
+            enabled: Defaults to $EMBEDDING_BUCKETING_ENABLED (true)
+            max_tokens: Padded tokens per batch; defaults to $EMBEDDING_BUCKET_MAX_TOKENS or 8192
+            max_items: Texts per batch however short; defaults to $EMBEDDING_BUCKET_MAX_ITEMS or 256
+        """
+        if enabled is None:
+            enabled = os.getenv('EMBEDDING_BUCKETING_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.max_tokens = max_tokens or int(os.getenv('EMBEDDING_BUCKET_MAX_TOKENS', DEFAULT_MAX_TOKENS))
+        self.max_items = max_items or int(os.getenv('EMBEDDING_BUCKET_MAX_ITEMS', DEFAULT_MAX_ITEMS))
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "texts": 0, "batches": 0, "tokens": 0, "padded_tokens": 0}
+
+    def encode(self, model, sentences, **kwargs):
+        """
+        model.encode(sentences, **kwargs), one length bucket at a time
+
+        Anything but a list of texts to numpy goes straight to the model.
+        """
+        if not self.enabled or isinstance(sentences, str) or kwargs.get('convert_to_tensor') \
+                or not kwargs.get('convert_to_numpy', True) \
+                or kwargs.get('output_value', 'sentence_embedding') != 'sentence_embedding':
+            return model.encode(sentences, **kwargs)
+        texts = list(sentences)
+        if len(texts) < 2 or not all(isinstance(text, str) for text in texts):
+            return model.encode(sentences, **kwargs)
+
+        lengths = token_lengths(model, texts)
+        batches = plan_batches(lengths, self.max_tokens, self.max_items)
+        kwargs.pop('batch_size', None)
+        kwargs['show_progress_bar'] = False
+
+        result = None
+        for batch in batches:
+            embeddings = np.asarray(model.encode([texts[i] for i in batch], batch_size=len(batch), **kwargs))
+            if result is None:
+                result = np.empty((len(texts),) + embeddings.shape[1:], dtype=embeddings.dtype)
+            result[batch] = embeddings
+
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += len(batches)
+            self.stats["tokens"] += int(lengths.sum())
+            self.stats["padded_tokens"] += padded_tokens(lengths, batches)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "enabled": self.enabled,
+            "max_tokens": self.max_tokens,
+            "max_items": self.max_items,
+            "padding_efficiency": round(stats["tokens"] / stats["padded_tokens"], 4) if stats["padded_tokens"] else 1.0
+        }
+
+
+class BucketedEncoder:
+    """A model whose encode() goes through a LengthBucketer"""
+
+    def __init__(self, model, bucketer: LengthBucketer):
+        self.model = model
+        self.bucketer = bucketer
+
+    def encode(self, sentences, **kwargs):
+        return self.bucketer.encode(self.model, sentences, **kwargs)
+
+
+def benchmark(model, texts: Sequence[str], batch_size: int = 32, max_tokens: int = DEFAULT_MAX_TOKENS,
+              max_items: int = DEFAULT_MAX_ITEMS, repeats: int = 3) -> List[Dict[str, Any]]:
+    """
+    Real (unpadded) tokens per second of three ways to batch the same texts:
+    fixed batches in arrival order, one encode() call (sentence-transformers
+    sorts by character length) and token-budget length buckets
+    """
+    texts = list(texts)
+    lengths = token_lengths(model, texts)
+    tokens = int(lengths.sum())
+    arrival = [np.arange(i, min(i + batch_size, len(texts))) for i in range(0, len(texts), batch_size)]
+    by_chars = np.argsort([-len(text) for text in texts], kind='stable')
+    char_sorted = [by_chars[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    bucketer = LengthBucketer(enabled=True, max_tokens=max_tokens, max_items=max_items)
+
+    modes = {
+        'arrival order': (lambda: [model.encode(texts[i:i + batch_size], batch_size=batch_size, show_progress_bar=False)
+                                   for i in range(0, len(texts), batch_size)], arrival),
+        'single call': (lambda: model.encode(texts, batch_size=batch_size, show_progress_bar=False), char_sorted),
+        'length buckets': (lambda: bucketer.encode(model, texts), plan_batches(lengths, max_tokens, max_items)),
+    }
+    model.encode(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)  # warm-up
+
+    results = []
+    for mode, (run, batches) in modes.items():
+        seconds = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start_time)
+        best = min(seconds)
+        results.append({
+            'mode': mode,
+            'batches': len(batches),
+            'padding_efficiency': round(tokens / padded_tokens(lengths, batches), 3),
+            'seconds': round(best, 3),
+            'tokens_per_second': round(tokens / best, 1)
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from modules.onnx_embedder import sample_corpus
+
+    parser = argparse.ArgumentParser(description="Tokens/sec of arrival-order vs length-bucketed encode batches")
+    parser.add_argument('--model', default=os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'))
+    parser.add_argument('--backend', default=os.getenv('EMBEDDING_BACKEND', 'torch'), choices=['torch', 'onnx'])
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_TOKENS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.backend == 'onnx':
+        from modules.onnx_embedder import OnnxSentenceEncoder
+        encoder = OnnxSentenceEncoder(args.model)
+    else:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(args.model, device='cpu')
+
+    corpus = sample_corpus(args.texts)
+    for result in benchmark(encoder, corpus, batch_size=args.batch_size, max_tokens=args.max_tokens):
+        print(f"{result['mode']:>15}  {result['batches']:>5} batches  padding efficiency "
+              f"{result['padding_efficiency']:.3f}  {result['seconds']:>7.3f}s  "
+              f"{result['tokens_per_second']:>10.1f} tokens/s", flush=True)
@@ -18,11 +18,13 @@ import pandas as pd
 import numpy as np
 from dataclasses import dataclass
 from collections import defaultdict
-import pdfplumber
-from sentence_transformers import SentenceTransformer
 from sklearn.cluster import KMeans
 from geopy.distance import geodesic
 
+from modules.model_registry import get_embedding_model
+from modules.spec_store import get_spec_store
+from pdf_extraction import extract_text
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -76,8 +78,8 @@ class MegaBundleAnalyzer:
         self.bundle_dir.mkdir(exist_ok=True)
         
         # Load embeddings for spec compliance
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        self.spec_embeddings = self._load_spec_embeddings(spec_embeddings_path)
+        self.embedder = get_embedding_model(consumer='MegaBundleAnalyzer')
+        self.spec_store = get_spec_store(spec_embeddings_path)
         
         # Load pricing data
         self.rates = self._load_pricing_data(pricing_data_path)
@@ -126,17 +128,6 @@ class MegaBundleAnalyzer:
             }
         }
     
-    def _load_spec_embeddings(self, path: str) -> Optional[Dict]:
-        """Load spec embeddings for compliance checking"""
-        try:
-            import pickle
-            if Path(path).exists():
-                with open(path, 'rb') as f:
-                    return pickle.load(f)
-        except Exception as e:
-            logger.warning(f"Could not load spec embeddings: {e}")
-        return None
-    
     def _load_pricing_data(self, path: str) -> Dict:
         """Load pricing rates"""
         
@@ -171,58 +162,57 @@ class MegaBundleAnalyzer:
         """
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                # Extract all text
-                text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-                
-                # Extract job tag (07D, KAA, etc.)
-                tag_match = re.search(r'\b(07D|KAA|2AA|TRX|UG1)\b', text)
-                tag = tag_match.group(1) if tag_match else "UNK"
-                
-                # Extract PM number
-                pm_match = re.search(r'PM[- ]?(\d{4,})', text)
-                pm_number = pm_match.group(1) if pm_match else pdf_path.stem
-                
-                # Extract notification number
-                notif_match = re.search(r'N[- ]?(\d{4,})', text)
-                notification_number = notif_match.group(1) if notif_match else ""
-                
-                # Extract coordinates (simplified - look for lat/lon pattern)
-                coord_match = re.search(r'(\d+\.\d+)[,\s]+(-?\d+\.\d+)', text)
-                if coord_match:
-                    lat = float(coord_match.group(1))
-                    lon = float(coord_match.group(2))
-                    coordinates = (lat, lon)
-                else:
-                    # Default to Sacramento area if not found
-                    coordinates = (38.5816 + np.random.uniform(-0.5, 0.5), 
-                                 -121.4944 + np.random.uniform(-0.5, 0.5))
-                
-                # Extract requirements (materials, special equipment)
-                requirements = self._extract_requirements(text)
-                
-                # Get job definition
-                job_def = self.job_definitions.get(tag, self.job_definitions["07D"])
-                
-                # Check compliance against specs
-                compliance_score = self._check_compliance(requirements)
-                
-                return Job(
-                    id=pm_number,
-                    tag=tag,
-                    pm_number=pm_number,
-                    notification_number=notification_number,
-                    coordinates=coordinates,
-                    requirements=requirements,
-                    estimated_hours={
-                        "labor": job_def["labor_hours"],
-                        "equipment": job_def["equipment_hours"]
-                    },
-                    compliance_score=compliance_score,
-                    dependencies=job_def["dependencies"],
-                    priority=job_def["priority"]
-                )
-                
+            # Extract all text (page ranges in parallel for large PDFs)
+            text = extract_text(pdf_path, backend='pdfplumber')
+            
+            # Extract job tag (07D, KAA, etc.)
+            tag_match = re.search(r'\b(07D|KAA|2AA|TRX|UG1)\b', text)
+            tag = tag_match.group(1) if tag_match else "UNK"
+            
+            # Extract PM number
+            pm_match = re.search(r'PM[- ]?(\d{4,})', text)
+            pm_number = pm_match.group(1) if pm_match else pdf_path.stem
+            
+            # Extract notification number
+            notif_match = re.search(r'N[- ]?(\d{4,})', text)
+            notification_number = notif_match.group(1) if notif_match else ""
+            
+            # Extract coordinates (simplified - look for lat/lon pattern)
+            coord_match = re.search(r'(\d+\.\d+)[,\s]+(-?\d+\.\d+)', text)
+            if coord_match:
+                lat = float(coord_match.group(1))
+                lon = float(coord_match.group(2))
+                coordinates = (lat, lon)
+            else:
+                # Default to Sacramento area if not found
+                coordinates = (38.5816 + np.random.uniform(-0.5, 0.5), 
+                             -121.4944 + np.random.uniform(-0.5, 0.5))
+            
+            # Extract requirements (materials, special equipment)
+            requirements = self._extract_requirements(text)
+            
+            # Get job definition
+            job_def = self.job_definitions.get(tag, self.job_definitions["07D"])
+            
+            # Check compliance against specs
+            compliance_score = self._check_compliance(requirements)
+            
+            return Job(
+                id=pm_number,
+                tag=tag,
+                pm_number=pm_number,
+                notification_number=notification_number,
+                coordinates=coordinates,
+                requirements=requirements,
+                estimated_hours={
+                    "labor": job_def["labor_hours"],
+                    "equipment": job_def["equipment_hours"]
+                },
+                compliance_score=compliance_score,
+                dependencies=job_def["dependencies"],
+                priority=job_def["priority"]
+            )
+            
         except Exception as e:
             logger.error(f"Failed to extract job from {pdf_path}: {e}")
             return None
@@ -264,7 +254,12 @@ class MegaBundleAnalyzer:
             Compliance score 0-1 (1 = fully compliant)
         """
         
-        if not self.spec_embeddings:
+        try:
+            has_specs = len(self.spec_store) > 0
+        except Exception as e:
+            logger.warning(f"Could not load spec embeddings: {e}")
+            has_specs = False
+        if not has_specs:
             return 0.85  # Default if no embeddings
         
         # Convert requirements to text for embedding
@@ -275,23 +270,11 @@ class MegaBundleAnalyzer:
         # Generate embedding
         req_embedding = self.embedder.encode(req_text)
         
-        # If we have actual spec embeddings, do similarity search
-        if 'embeddings' in self.spec_embeddings:
-            import torch
-            from sentence_transformers import util as st_util
-            
-            spec_embeddings = self.spec_embeddings['embeddings']
-            if isinstance(spec_embeddings, np.ndarray):
-                spec_embeddings = torch.from_numpy(spec_embeddings)
-            
-            # Calculate similarities
-            similarities = st_util.cos_sim(
-                torch.from_numpy(req_embedding.reshape(1, -1)),
-                spec_embeddings
-            )[0]
-            
+        # Similarity search against the shared spec library
+        _, scores, _ = self.spec_store.search(req_embedding, top_k=1)
+        if scores.size:
             # Use max similarity as compliance score
-            compliance = float(torch.max(similarities))
+            compliance = float(scores[0, 0])
         else:
             # Fallback to reasonable estimate
             compliance = 0.75 + np.random.uniform(0, 0.15)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Embedding Model Registry
+Hands out one shared SentenceTransformer per (model name, device, precision,
+backend) instead of every analyzer loading its own copy of all-MiniLM-L6-v2.
+Models load lazily on first use, exactly once, and every handle counts its
+encode calls so /status can show who is using what. encode() goes through
+the content-addressed embedding cache (see embedding_cache) and encodes
+the misses in token-length buckets (see length_bucketing). The onnx
+backend serves the same encode() through ONNX Runtime (see onnx_embedder).
+"""
+
+import os
+import time
+import inspect
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple
+
+from modules.embedding_cache import EmbeddingCache, cached_encode, get_embedding_cache
+from modules.length_bucketing import BucketedEncoder, LengthBucketer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+SUPPORTED_PRECISIONS = ('float32', 'float16', 'int8')
+SUPPORTED_BACKENDS = ('torch', 'onnx')
+
+ModelKey = Tuple[str, str, str, str]
+
+
+def canonical_model_name(name: str) -> str:
+    """'sentence-transformers/all-MiniLM-L6-v2' and 'all-MiniLM-L6-v2' are the same model"""
+    prefix = 'sentence-transformers/'
+    return name[len(prefix):] if name.startswith(prefix) else name
+
+
+def default_model_name() -> str:
+    return os.getenv('EMBEDDING_MODEL', DEFAULT_MODEL_NAME)
+
+
+def default_device() -> str:
+    return os.getenv('EMBEDDING_DEVICE', 'cpu')
+
+
+def default_precision() -> str:
+    return os.getenv('EMBEDDING_PRECISION', 'float32')
+
+
+def default_backend() -> str:
+    return os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+
+
+@dataclass
+class _Entry:
+    """One loaded (or not yet loaded) model and its usage counters"""
+    key: ModelKey
+    model: Any = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    count_lock: threading.Lock = field(default_factory=threading.Lock)
+    load_seconds: float = 0.0
+    loaded_at: Optional[float] = None
+    handles: Dict[str, int] = field(default_factory=dict)
+    encode_calls: int = 0
+    texts_encoded: int = 0
+
+
+def encode_keywords(model, args: Tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bind positional encode() arguments after sentences (encode(texts, 64)) to
+    their keywords, so such calls take the cached, bucketed path as well
+
+    The parameter order differs between SentenceTransformer versions and the
+    onnx backend, so it is read from the wrapped model's own signature.
+    """
+    parameters = [p for p in inspect.signature(model.encode).parameters.values()
+                  if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)][1:]
+    if len(args) > len(parameters):
+        raise TypeError(f"encode() takes at most {len(parameters) + 1} positional arguments")
+    bound = dict(kwargs)
+    for parameter, value in zip(parameters, args):
+        if parameter.name in bound:
+            raise TypeError(f"encode() got multiple values for argument '{parameter.name}'")
+        bound[parameter.name] = value
+    return bound
+
+
+class SharedModel:
+    """
+    Lazy handle to a registry model
+
+    Behaves like the SentenceTransformer it wraps; the model is loaded the
+    first time an attribute is used, so constructing an analyzer costs
+    nothing until it actually encodes.
+    """
+
+    def __init__(self, registry: 'ModelRegistry', entry: _Entry):
+        self._registry = registry
+        self._entry = entry
+
+    @property
+    def model(self):
+        return self._registry._load(self._entry)
+
+    @property
+    def model_id(self) -> str:
+        """Registry id of the loaded model (name, precision, max_seq_length)"""
+        self.model
+        return self._registry.model_id(self._entry)
+
+    def encode(self, sentences, *args, **kwargs):
+        entry = self._entry
+        with entry.count_lock:
+            entry.encode_calls += 1
+            entry.texts_encoded += 1 if isinstance(sentences, str) else len(sentences)
+        model = self.model
+        if args:
+            kwargs = encode_keywords(model, args, kwargs)
+        encoder = BucketedEncoder(model, self._registry.bucketer)
+        cache = self._registry.cache
+        if cache is None:
+            return encoder.encode(sentences, **kwargs)
+        return cached_encode(cache, encoder, self._registry.model_id(entry), sentences, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def __setattr__(self, name, value):
+        # Settings such as max_seq_length apply to the shared model - every consumer sees them
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.model, name, value)
+
+    def __repr__(self) -> str:
+        name, device, precision, backend = self._entry.key
+        state = 'loaded' if self._entry.model is not None else 'lazy'
+        return f"SharedModel({name}, device={device}, precision={precision}, backend={backend}, {state})"
+
+
+class ModelRegistry:
+    """Process-wide, thread-safe cache of embedding models"""
+
+    def __init__(self, cache: Optional[EmbeddingCache] = None, use_cache: bool = True,
+                 bucketer: Optional[LengthBucketer] = None):
+        """
+        Args:
+            cache: Embedding cache for encode(); defaults to the process-wide one
+            use_cache: False to always call the model directly
+            bucketer: Length bucketing for encode(); defaults to one configured from the environment
+        """
+        self._entries: Dict[ModelKey, _Entry] = {}
+        self._lock = threading.Lock()
+        self._cache = cache
+        self._use_cache = use_cache
+        self.bucketer = bucketer or LengthBucketer()
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        if not self._use_cache:
+            return None
+        if self._cache is None:
+            self._cache = get_embedding_cache()
+        return self._cache
+
+    @staticmethod
+    def model_id(entry: _Entry) -> str:
+        """Cache namespace: anything that changes the vectors for a given text"""
+        name, _, precision, backend = entry.key
+        model_id = f"{name}:{precision}:{getattr(entry.model, 'max_seq_length', '')}"
+        return model_id if backend == 'torch' else f"{model_id}:{backend}"
+
+    def get(self,
+            name: Optional[str] = None,
+            device: Optional[str] = None,
+            precision: Optional[str] = None,
+            consumer: str = 'unknown',
+            backend: Optional[str] = None) -> SharedModel:
+        """
+        Shared handle to a sentence embedding model
+
+        Args:
+            name: Model name (with or without the sentence-transformers/
+                prefix); defaults to $EMBEDDING_MODEL or all-MiniLM-L6-v2
+            device: Torch device; defaults to $EMBEDDING_DEVICE or cpu
+            precision: float32, float16 or int8 (dynamic quantization, CPU);
+                defaults to $EMBEDDING_PRECISION or float32
+            consumer: Who is asking - only used for the usage report
+            backend: torch (SentenceTransformer) or onnx (ONNX Runtime, CPU,
+                float32 or int8); defaults to $EMBEDDING_BACKEND or torch
+
+        Returns:
+            A SharedModel; the same underlying model for the same key
+        """
+        precision = precision or default_precision()
+        if precision not in SUPPORTED_PRECISIONS:
+            raise ValueError(f"Unsupported embedding precision: {precision}")
+        backend = backend or default_backend()
+        if backend not in SUPPORTED_BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+        if backend == 'onnx' and precision == 'float16':
+            raise ValueError("The onnx embedding backend runs float32 or int8 on CPU")
+        key = (canonical_model_name(name or default_model_name()), device or default_device(), precision, backend)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(key=key)
+                self._entries[key] = entry
+            entry.handles[consumer] = entry.handles.get(consumer, 0) + 1
+        return SharedModel(self, entry)
+
+    def _load(self, entry: _Entry):
+        model = entry.model
+        if model is not None:
+            return model
+
+        with entry.lock:
+            if entry.model is None:
+                name, device, precision, backend = entry.key
+                start_time = time.time()
+                logger.info(f"Loading embedding model {name} ({device}, {precision}, {backend})...")
+
+                if backend == 'onnx':
+                    from modules.onnx_embedder import OnnxSentenceEncoder
+                    if device != 'cpu':
+                        logger.warning(f"onnx embedding backend runs on CPU, ignoring device {device}")
+                    model = OnnxSentenceEncoder(name, precision=precision)
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(name, device=device)
+                    model.eval()
+                    if precision == 'float16':
+                        model.half()
+                    elif precision == 'int8':
+                        import torch
+                        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+                entry.load_seconds = round(time.time() - start_time, 3)
+                entry.loaded_at = time.time()
+                entry.model = model
+                logger.info(f"✅ Embedding model {name} loaded in {entry.load_seconds}s "
+                            f"(shared by {', '.join(sorted(entry.handles)) or 'nobody yet'})")
+            return entry.model
+
+    def preload(self, name: Optional[str] = None, device: Optional[str] = None,
+                precision: Optional[str] = None, background: bool = False, backend: Optional[str] = None):
+        """Load a model ahead of the first request, optionally on a daemon thread"""
+        handle = self.get(name, device, precision, consumer='preload', backend=backend)
+        if background:
+            threading.Thread(target=lambda: handle.model, name='model-preload', daemon=True).start()
+        else:
+            handle.model
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "models": [
+                {
+                    "name": entry.key[0],
+                    "device": entry.key[1],
+                    "precision": entry.key[2],
+                    "backend": entry.key[3],
+                    "loaded": entry.model is not None,
+                    "load_seconds": entry.load_seconds,
+                    "consumers": dict(entry.handles),
+                    "encode_calls": entry.encode_calls,
+                    "texts_encoded": entry.texts_encoded
+                }
+                for entry in entries
+            ],
+            "loaded_models": sum(1 for entry in entries if entry.model is not None),
+            "embedding_cache": self.cache.get_stats() if self.cache else None,
+            "length_bucketing": self.bucketer.get_stats()
+        }
+
+
+model_registry = ModelRegistry()
+
+
+def get_embedding_model(name: Optional[str] = None,
+                        device: Optional[str] = None,
+                        precision: Optional[str] = None,
+                        consumer: str = 'unknown',
+                        backend: Optional[str] = None) -> SharedModel:
+    """Shared handle from the process-wide registry (see ModelRegistry.get)"""
+    return model_registry.get(name, device, precision, consumer, backend)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime Embedding Backend
+SentenceTransformer-compatible encode() for all-MiniLM-L6-v2 (and other
+mean- or CLS-pooled sentence-transformers models) served by ONNX Runtime
+instead of PyTorch. The transformer is exported to ONNX once, optionally
+with dynamic int8 weight quantization, and kept on the data disk; after
+that, loading needs only onnxruntime and tokenizers - torch is not used on
+the encode path.
+
+Selected with EMBEDDING_BACKEND=onnx (see model_registry);
+EMBEDDING_PRECISION=int8 picks the quantized graph.
+
+Layout:
+    <ONNX_MODEL_DIR>/<model>/model.onnx         float32 graph
+    <ONNX_MODEL_DIR>/<model>/model.int8.onnx    dynamic int8 weights
+    <ONNX_MODEL_DIR>/<model>/tokenizer.json     fast tokenizer
+    <ONNX_MODEL_DIR>/<model>/export.json        pooling, normalization, max_seq_length
+
+Export ahead of a deploy, or compare against the torch backend:
+    python -m modules.onnx_embedder export --quantize
+    python -m modules.onnx_embedder benchmark --texts 2000
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GRAPH_FILES = {'float32': 'model.onnx', 'int8': 'model.int8.onnx'}
+TOKENIZER_FILE = 'tokenizer.json'
+EXPORT_FILE = 'export.json'
+OPSET_VERSION = 14
+
+_export_lock = threading.Lock()
+
+
+def model_dir(name: str) -> str:
+    root = os.getenv('ONNX_MODEL_DIR') or os.path.join(os.getenv('DATA_PATH', '/data'), 'onnx_models')
+    return os.path.join(root, name.replace('/', '__'))
+
+
+def default_threads() -> int:
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 2)
+    return int(os.getenv('ONNX_NUM_THREADS', 0)) or max(1, int(os.getenv('RENDER_CORES', cores)) // 2)
+
+
+def export_model(name: str, directory: str, quantize: bool = True) -> Dict[str, Any]:
+    """
+    Export a sentence-transformers model to ONNX (needs torch and sentence_transformers)
+
+    Args:
+        name: Model name, e.g. all-MiniLM-L6-v2
+        directory: Where the graph, tokenizer and export.json are written
+        quantize: Also write the dynamic int8 graph
+
+    Returns:
+        The export.json contents
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    start_time = time.time()
+    st_model = SentenceTransformer(name, device='cpu')
+    st_model.eval()
+    transformer = st_model[0]
+    tokenizer = transformer.tokenizer
+    pooling = next((module for module in st_model if type(module).__name__ == 'Pooling'), None)
+
+    sample = tokenizer(["export sample"], return_tensors='pt', padding=True)
+    input_names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in sample]
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    os.makedirs(directory, exist_ok=True)
+    suffix = f".tmp.{os.getpid()}"
+    graph_path = os.path.join(directory, GRAPH_FILES['float32'])
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model).eval(),
+            tuple(sample[n] for n in input_names),
+            graph_path + suffix,
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes={n: {0: 'batch', 1: 'sequence'} for n in input_names + ['token_embeddings']},
+            opset_version=OPSET_VERSION
+        )
+    os.replace(graph_path + suffix, graph_path)
+    tokenizer.backend_tokenizer.save(os.path.join(directory, TOKENIZER_FILE))
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        int8_path = os.path.join(directory, GRAPH_FILES['int8'])
+        quantize_dynamic(graph_path, int8_path + suffix, weight_type=QuantType.QInt8)
+        os.replace(int8_path + suffix, int8_path)
+
+    config = {
+        'model': name,
+        'input_names': input_names,
+        'pooling': 'cls' if pooling is not None and pooling.pooling_mode_cls_token else 'mean',
+        'normalize': any(type(module).__name__ == 'Normalize' for module in st_model),
+        'max_seq_length': int(st_model.max_seq_length),
+        'dimension': int(st_model.get_sentence_embedding_dimension()),
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': int(tokenizer.pad_token_id),
+        'opset': OPSET_VERSION,
+        'torch_version': torch.__version__,
+        'exported': datetime.utcnow().isoformat()
+    }
+    with open(os.path.join(directory, EXPORT_FILE), 'w') as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"📦 Exported {name} to ONNX in {time.time() - start_time:.1f}s ({directory})")
+    return config
+
+
+class OnnxSentenceEncoder:
+    """
+    Drop-in for SentenceTransformer.encode on CPU
+
+    Same batching (texts sorted by length, order restored), pooling and
+    built-in normalization as the sentence-transformers pipeline it was
+    exported from; normalize_embeddings, convert_to_numpy and
+    convert_to_tensor behave as in SentenceTransformer.encode.
+    """
+
+    device = 'cpu'
+
+    def __init__(self, name: str, precision: str = 'float32', directory: Optional[str] = None,
+                 threads: Optional[int] = None):
+        """
+        Args:
+            name: sentence-transformers model name
+            precision: float32 or int8 (dynamically quantized weights)
+            directory: Export directory; defaults to $ONNX_MODEL_DIR/<name>
+            threads: intra-op threads; defaults to $ONNX_NUM_THREADS or half the cores
+        """
+        if precision not in GRAPH_FILES:
+            raise ValueError(f"ONNX backend supports {', '.join(GRAPH_FILES)}, not {precision}")
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.name = name
+        self.precision = precision
+        self.directory = directory or model_dir(name)
+        graph_path = os.path.join(self.directory, GRAPH_FILES[precision])
+        with _export_lock:
+            if not os.path.exists(graph_path) or not os.path.exists(os.path.join(self.directory, EXPORT_FILE)):
+                export_model(name, self.directory, quantize=precision == 'int8')
+
+        with open(os.path.join(self.directory, EXPORT_FILE), 'r') as f:
+            self.config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.directory, TOKENIZER_FILE))
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+        self.max_seq_length = self.config['max_seq_length']
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or default_threads()
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(graph_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    @property
+    def max_seq_length(self) -> int:
+        return self._max_seq_length
+
+    @max_seq_length.setter
+    def max_seq_length(self, value: int):
+        self._max_seq_length = int(value)
+        self.tokenizer.enable_truncation(max_length=self._max_seq_length)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+    def eval(self):
+        return self
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        tokens = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+
+        if self.config['pooling'] == 'cls':
+            pooled = tokens[:, 0]
+        else:
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (tokens * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.config['normalize']:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32, copy=False)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: Optional[bool] = None,
+               convert_to_numpy: bool = True, convert_to_tensor: bool = False,
+               normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Longest first, like SentenceTransformer - batches pad to similar lengths
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[i] for i in rows])
+
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        result = embeddings[0] if single else embeddings
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(result)
+        return result
+
+
+# === PARITY / BENCHMARK ===
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity between two embedding matrices of the same texts"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = np.sum(reference * candidate, axis=1)
+    return {'mean': round(float(cosines.mean()), 6), 'min': round(float(cosines.min()), 6)}
+
+
+def sample_corpus(count: int, seed: int = 0) -> List[str]:
+    """Spec- and audit-like sentences of mixed length"""
+    import random
+
+    rng = random.Random(seed)
+    subjects = ["Crossarm", "Guy anchor", "Primary riser", "Conduit run", "Ground rod", "Service drop",
+                "Transformer pad", "Splice box", "Pole top extension", "Secondary conductor"]
+    findings = ["is missing required hardware", "does not meet GO 95 Rule 37 clearance",
+                "was installed without the specified bonding", "requires a go-back per the QA audit",
+                "meets the minimum depth of 30 inches", "lacks a visible identification tag"]
+    details = ["See Greenbook section 4.2.", "Photo evidence attached.", "Crew to correct within 30 days.",
+               "Reference TD-2051P-01 Rev 3.", "Measured clearance was 18 inches against 24 required.", ""]
+    texts = []
+    for _ in range(count):
+        sentences = [f"{rng.choice(subjects)} {rng.choice(findings)}. {rng.choice(details)}"
+                     for _ in range(rng.choice([1, 1, 2, 4, 8]))]
+        texts.append(' '.join(sentences).strip())
+    return texts
+
+
+def benchmark(name: str, texts: Sequence[str], batch_size: int = 32,
+              precisions: Sequence[str] = ('float32', 'int8')) -> List[Dict[str, Any]]:
+    """
+    Texts/sec of the torch backend and each ONNX precision, and their cosine
+    agreement with torch float32
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(default_threads())
+    reference_model = SentenceTransformer(name, device='cpu')
+
+    def timed(encoder):
+        encoder.encode(list(texts[:batch_size]), batch_size=batch_size)  # warm-up
+        start_time = time.perf_counter()
+        embeddings = encoder.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+        return np.asarray(embeddings, dtype=np.float32), time.perf_counter() - start_time
+
+    reference, seconds = timed(reference_model)
+    results = [{'backend': 'torch', 'precision': 'float32', 'texts_per_second': round(len(texts) / seconds, 1),
+                'cosine_mean': 1.0, 'cosine_min': 1.0}]
+    for precision in precisions:
+        embeddings, seconds = timed(OnnxSentenceEncoder(name, precision=precision))
+        agreement = cosine_agreement(reference, embeddings)
+        results.append({'backend': 'onnx', 'precision': precision,
+                        'texts_per_second': round(len(texts) / seconds, 1),
+                        'cosine_mean': agreement['mean'], 'cosine_min': agreement['min']})
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX or benchmark it against torch")
+    parser.add_argument('command', choices=['export', 'benchmark'])
+    parser.add_argument('--model', default=os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'))
+    parser.add_argument('--directory', help="Export directory (default: $ONNX_MODEL_DIR/<model>)")
+    parser.add_argument('--quantize', action='store_true', help="Also write the int8 graph")
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'export':
+        print(json.dumps(export_model(args.model, args.directory or model_dir(args.model), args.quantize), indent=2))
+    else:
+        for result in benchmark(args.model, sample_corpus(args.texts), batch_size=args.batch_size):
+            print(f"{result['backend']:>6} {result['precision']:>8}  {result['texts_per_second']:>8.1f} texts/s  "
+                  f"cosine vs torch mean {result['cosine_mean']:.5f} min {result['cosine_min']:.5f}", flush=True)
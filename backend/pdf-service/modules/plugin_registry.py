@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Lazy Plugin Registry
+The optional feature routers (analyzers, fine-tuners, training, auth, ...)
+construct SentenceTransformers, NER pipelines or YOLO models when they are
+integrated, and most of them import torch/transformers at module level.
+Integrating all of them at import made cold start take minutes, and every
+worker paid for features it never served.
+
+Each plugin instead declares the routes it serves up front. Nothing is
+imported until the first request for one of those routes (or a background
+warm-up) arrives; the plugin's integrate function then runs once, on a
+worker thread, against a private FastAPI app that the request is handed to.
+Load timings per plugin are reported by GET /plugins.
+
+The main app's OpenAPI schema merges in the operations of every loaded
+plugin. A plugin that has not loaded yet is listed as a tag linking to
+GET /plugins/<name>/openapi.json, which loads it and serves its schema.
+
+    ENABLED_PLUGINS=all|none|name,name,...   which plugins are served
+    PLUGIN_WARMUP=all|name,name,...          loaded in the background at startup
+                                             (before the fork with serve_preload.py)
+"""
+
+import os
+import copy
+import time
+import asyncio
+import logging
+import importlib
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.routing import BaseRoute, Match, NoMatchFound, get_route_path
+
+logger = logging.getLogger(__name__)
+
+
+def _name_list(value: str, default: str) -> Optional[List[str]]:
+    """None for 'all', a list of names otherwise"""
+    value = (value if value is not None else default).strip().lower()
+    if value in ('all', '*'):
+        return None
+    if value in ('', 'none'):
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class Plugin:
+    """One optional feature: where it lives, which routes it serves and its load state"""
+
+    def __init__(self, name: str, module: str, attr: str, routes: Sequence[str],
+                 description: str = '', enabled: bool = True):
+        """
+        Args:
+            name: Short name used by ENABLED_PLUGINS / PLUGIN_WARMUP and /plugins
+            module: Module holding the integrate function (imported on first use)
+            attr: integrate(app) function, or an APIRouter to include
+            routes: Path prefixes served - "/conduit-analysis" covers
+                "/conduit-analysis/..." as well
+            description: Shown in the /plugins report
+        """
+        self.name = name
+        self.module = module
+        self.attr = attr
+        self.routes = tuple(route.rstrip('/') or '/' for route in routes)
+        self.description = description
+        self.enabled = enabled
+        self.app: Optional[FastAPI] = None
+        self.state = 'declared' if enabled else 'disabled'
+        self.error: Optional[str] = None
+        self.trigger: Optional[str] = None
+        self.import_seconds = 0.0
+        self.integrate_seconds = 0.0
+        self.loaded_at: Optional[float] = None
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def serves(self, path: str) -> bool:
+        return any(path == route or path.startswith(route + '/') for route in self.routes)
+
+    def load(self, trigger: str = 'request') -> Optional[FastAPI]:
+        """Import and integrate once; later calls (from any thread) wait for and share the result"""
+        if self.state in ('loaded', 'failed', 'disabled'):
+            return self.app
+        with self._lock:
+            if self.state != 'declared':
+                return self.app
+            self.state = 'loading'
+            self.trigger = trigger
+            logger.info(f"Loading plugin {self.name} ({self.module}) on {trigger}...")
+            try:
+                start_time = time.perf_counter()
+                target = getattr(importlib.import_module(self.module), self.attr)
+                self.import_seconds = round(time.perf_counter() - start_time, 3)
+
+                start_time = time.perf_counter()
+                app = FastAPI(openapi_url=None, docs_url=None, redoc_url=None)
+                if callable(target) and not hasattr(target, 'routes'):
+                    target(app)
+                else:
+                    app.include_router(target)
+                self.integrate_seconds = round(time.perf_counter() - start_time, 3)
+            except Exception as e:
+                self.state = 'failed'
+                self.error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Plugin {self.name} not available: {self.error}")
+                return None
+            self.app = app
+            self.loaded_at = time.time()
+            self.state = 'loaded'
+            logger.info(f"✅ Plugin {self.name} loaded in {self.import_seconds + self.integrate_seconds:.2f}s "
+                        f"(import {self.import_seconds}s, integrate {self.integrate_seconds}s)")
+            return app
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "enabled": self.enabled,
+            "state": self.state,
+            "routes": list(self.routes),
+            "trigger": self.trigger,
+            "import_seconds": self.import_seconds,
+            "integrate_seconds": self.integrate_seconds,
+            "load_seconds": round(self.import_seconds + self.integrate_seconds, 3),
+            "loaded_at": self.loaded_at,
+            "requests": self.requests,
+            "error": self.error
+        }
+
+
+class LazyPluginRoute(BaseRoute):
+    """Matches a plugin's declared routes; loads the plugin and hands the request to it"""
+
+    def __init__(self, plugin: Plugin):
+        self.plugin = plugin
+
+    def matches(self, scope) -> tuple:
+        if scope["type"] == "http" and self.plugin.serves(get_route_path(scope)):
+            return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope, receive, send):
+        plugin = self.plugin
+        plugin.requests += 1
+        app = plugin.app
+        if app is None and plugin.state not in ('disabled', 'failed'):
+            app = await asyncio.to_thread(plugin.load, 'request')
+        if app is None:
+            detail = f"Plugin '{plugin.name}' is disabled" if plugin.state == 'disabled' \
+                else f"Plugin '{plugin.name}' is not available: {plugin.error}"
+            status_code = 404 if plugin.state == 'disabled' else 503
+            await JSONResponse({"detail": detail}, status_code=status_code)(scope, receive, send)
+            return
+        await app(scope, receive, send)
+
+
+class PluginRegistry:
+    """Declared plugins of one FastAPI app"""
+
+    def __init__(self, app: FastAPI, enabled: Optional[str] = None, warmup: Optional[str] = None):
+        """
+        Args:
+            app: The application the plugins' routes are declared on
+            enabled: Allow-list; defaults to $ENABLED_PLUGINS or all
+            warmup: Plugins to load in the background at startup;
+                defaults to $PLUGIN_WARMUP or none
+        """
+        self.app = app
+        self.allowed = _name_list(enabled if enabled is not None else os.getenv('ENABLED_PLUGINS'), 'all')
+        self.warmup_names = _name_list(warmup if warmup is not None else os.getenv('PLUGIN_WARMUP'), 'none')
+        self.plugins: Dict[str, Plugin] = {}
+        self._warmup_task: Optional[asyncio.Task] = None
+
+        # Serve the plugins' routes in the app's own docs
+        self._base_openapi = app.openapi
+        self._openapi_cache = None
+        app.openapi = self.openapi
+        app.add_api_route('/plugins/{name}/openapi.json', self.plugin_openapi, methods=['GET'],
+                          include_in_schema=False)
+
+    def declare(self, name: str, module: str, attr: str, routes: Sequence[str], description: str = '') -> Plugin:
+        """Declare a plugin's routes now; it is imported on first use"""
+        enabled = self.allowed is None or name in self.allowed
+        plugin = Plugin(name, module, attr, routes, description, enabled)
+        self.plugins[name] = plugin
+        self.app.router.routes.append(LazyPluginRoute(plugin))
+        if not enabled:
+            logger.info(f"Plugin {name} disabled by ENABLED_PLUGINS")
+        return plugin
+
+    def is_enabled(self, name: str) -> bool:
+        plugin = self.plugins.get(name)
+        return bool(plugin and plugin.enabled and plugin.state != 'failed')
+
+    def _warmup_plugins(self) -> List[Plugin]:
+        names = list(self.plugins) if self.warmup_names is None else self.warmup_names
+        return [self.plugins[name] for name in names if name in self.plugins and self.plugins[name].enabled]
+
+    def preload(self) -> int:
+        """
+        Load the PLUGIN_WARMUP plugins now, on this thread - for a master
+        process about to fork workers, which then share them copy-on-write
+        """
+        return sum(1 for plugin in self._warmup_plugins() if plugin.load('preload') is not None)
+
+    def start_warmup(self) -> Optional[asyncio.Task]:
+        """Load the PLUGIN_WARMUP plugins one at a time, off the event loop"""
+        plugins = [plugin for plugin in self._warmup_plugins() if plugin.state == 'declared']
+        if not plugins:
+            return None
+
+        async def warm_up():
+            for plugin in plugins:
+                await asyncio.to_thread(plugin.load, 'warmup')
+
+        self._warmup_task = asyncio.get_running_loop().create_task(warm_up())
+        return self._warmup_task
+
+    async def stop_warmup(self):
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+            try:
+                await self._warmup_task
+            except asyncio.CancelledError:
+                pass
+
+    def openapi(self) -> Dict[str, Any]:
+        """The app's OpenAPI schema with the operations of every loaded plugin merged in"""
+        loaded = tuple(name for name, plugin in self.plugins.items() if plugin.state == 'loaded')
+        if self._openapi_cache is not None and self._openapi_cache[0] == loaded:
+            return self._openapi_cache[1]
+
+        schema = copy.deepcopy(self._base_openapi())
+        paths = schema.setdefault('paths', {})
+        tags = []
+        for name, plugin in self.plugins.items():
+            if not plugin.enabled:
+                continue
+            if plugin.state == 'loaded':
+                plugin_schema = plugin.app.openapi()
+                for path, operations in plugin_schema.get('paths', {}).items():
+                    paths.setdefault(path, operations)
+                components = plugin_schema.get('components', {}).get('schemas', {})
+                if components:
+                    merged = schema.setdefault('components', {}).setdefault('schemas', {})
+                    for component, definition in components.items():
+                        merged.setdefault(component, definition)
+                continue
+            state = f"failed to load ({plugin.error})" if plugin.state == 'failed' else "not loaded yet"
+            tags.append({
+                "name": f"plugin: {name}",
+                "description": f"{plugin.description or name} - serves {', '.join(plugin.routes)}; "
+                               f"{state}, its operations appear here once it has loaded",
+                "externalDocs": {"description": "Plugin OpenAPI schema (loads the plugin)",
+                                 "url": f"/plugins/{name}/openapi.json"}
+            })
+        if tags:
+            schema['tags'] = schema.get('tags', []) + tags
+
+        self._openapi_cache = (loaded, schema)
+        return schema
+
+    async def plugin_openapi(self, name: str):
+        """OpenAPI schema of one plugin, loading it first if needed"""
+        plugin = self.plugins.get(name)
+        if plugin is None or not plugin.enabled:
+            return JSONResponse({"detail": f"Plugin '{name}' is not enabled"}, status_code=404)
+        app = plugin.app
+        if app is None and plugin.state != 'failed':
+            app = await asyncio.to_thread(plugin.load, 'docs')
+        if app is None:
+            return JSONResponse({"detail": f"Plugin '{name}' is not available: {plugin.error}"}, status_code=503)
+        return app.openapi()
+
+    def get_stats(self) -> Dict[str, Any]:
+        plugins = [plugin.get_stats() for plugin in self.plugins.values()]
+        return {
+            "allow_list": 'all' if self.allowed is None else self.allowed,
+            "warmup": 'all' if self.warmup_names is None else self.warmup_names,
+            "loaded": sum(1 for plugin in plugins if plugin["state"] == 'loaded'),
+            "total_load_seconds": round(sum(plugin["load_seconds"] for plugin in plugins), 3),
+            "plugins": plugins
+        }
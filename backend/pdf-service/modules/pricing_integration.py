@@ -14,6 +14,7 @@ from sentence_transformers import SentenceTransformer
 import faiss
 import pickle
 import os
+import hashlib
 import logging
 from typing import Dict, List, Optional, Tuple
 import re
@@ -53,6 +54,9 @@ class PricingAnalyzer:
         self.labor_df = None
         self.equip_df = None
         
+        # (mtime, size) of every data file loaded - see get_version()
+        self._sources: Dict[str, Tuple[int, int]] = {}
+        
         self._load_pricing_data()
         self._load_labor_equipment_data()
     
@@ -66,6 +70,7 @@ class PricingAnalyzer:
                 # Load metadata
                 with open(self.pricing_metadata_path, 'rb') as f:
                     self.pricing_metadata = pickle.load(f)
+                self._record_source(self.pricing_metadata_path)
                 
                 logger.info(f"✅ Loaded pricing index: {len(self.pricing_metadata)} entries")
             else:
@@ -84,6 +89,7 @@ class PricingAnalyzer:
             
             if os.path.exists(labor_path):
                 self.labor_df = pd.read_csv(labor_path)
+                self._record_source(labor_path)
                 logger.info(f"✅ Loaded labor rates: {len(self.labor_df)} classifications")
             else:
                 logger.warning("⚠️ Labor rates CSV not found")
@@ -96,6 +102,7 @@ class PricingAnalyzer:
             
             if os.path.exists(equip_path):
                 self.equip_df = pd.read_csv(equip_path)
+                self._record_source(equip_path)
                 logger.info(f"✅ Loaded equipment rates: {len(self.equip_df)} items")
             else:
                 logger.warning("⚠️ Equipment rates CSV not found")
@@ -172,6 +179,7 @@ class PricingAnalyzer:
             
             self.pricing_index = index
             self.pricing_metadata = metadata_list
+            self._record_source(self.pricing_metadata_path)
             
             logger.info(f"✅ Pricing data indexed: {len(metadata_list)} entries")
             
@@ -521,6 +529,20 @@ class PricingAnalyzer:
                 return metadata
         return None
     
+    def _record_source(self, path: str):
+        st = os.stat(path)
+        self._sources[os.path.basename(path)] = (st.st_mtime_ns, st.st_size)
+    
+    def get_version(self) -> str:
+        """
+        Short fingerprint of the pricing data this analyzer has loaded
+        
+        Changes when a pricing master is learned or a rate CSV is replaced
+        and reloaded, so results that include pricing can be cached per version.
+        """
+        payload = repr((sorted(self._sources.items()), len(self.pricing_metadata), self.pricing_threshold))
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+    
     def get_pricing_summary(self) -> Dict:
         """Get summary of loaded pricing data"""
         # Check labor/equipment CSVs
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Sliding-Window Rate Limiter
+Per-client request limits in fixed memory. Each key keeps two counters -
+requests in the current window and in the previous one - and a request is
+allowed while previous * (unelapsed fraction of the window) + current stays
+under the limit. That approximates a true sliding window without storing a
+timestamp per request. The key table is an LRU bounded at max_keys, so
+scanning traffic from many addresses cannot grow it without bound.
+
+With RATE_LIMIT_BACKEND=redis the counters live in Redis and are updated
+by one Lua script per request, so the limit holds across all workers and
+instances; the in-process table takes over while Redis is unreachable.
+
+    RATE_LIMIT_BACKEND=memory|redis
+    RATE_LIMIT_MAX_KEYS=100000
+    RATE_LIMIT_REDIS_URL=(defaults to REDIS_URL)
+
+Benchmark (per-request overhead and memory vs the old timestamp lists):
+
+    python -m modules.rate_limiter --keys 100000 --requests 500000
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_KEYS = 100_000
+# Seconds before a failed Redis backend is tried again
+REDIS_RETRY_SECONDS = 30
+
+# KEYS: current window counter, previous window counter
+# ARGV: limit, weight of the previous window, counter TTL in seconds
+SLIDING_WINDOW_LUA = """
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if previous * tonumber(ARGV[2]) + current >= tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {1, current, previous}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float     # seconds until the current window ends
+    retry_after: int       # seconds until a denied request would be allowed (0 if allowed)
+
+
+def window_result(limit: int, period: float, now: float, current: int, previous: int,
+                  allowed: bool) -> RateLimitResult:
+    """Headers-worth of state for a key after a request was counted (or denied)"""
+    elapsed = now % period
+    weight = (period - elapsed) / period
+    estimate = previous * weight + current
+    retry_after = 0
+    if not allowed:
+        if current >= limit:
+            # Wait for the next window, then for this window's count to decay below the limit
+            wait = period - elapsed + max(0.0, period * (1 - limit / current))
+        else:
+            wait = period - elapsed - period * (limit - current) / previous
+        # Allowed once the estimate drops strictly below the limit, i.e. just after wait
+        retry_after = max(1, math.floor(wait) + 1)
+    return RateLimitResult(allowed, limit, max(0, int(limit - estimate)), period - elapsed, retry_after)
+
+
+class SlidingWindowRateLimiter:
+    """In-process limiter: an LRU table of [window, current, previous] per key"""
+
+    backend = 'memory'
+
+    def __init__(self, calls: int = 100, period: float = 60, max_keys: Optional[int] = None):
+        """
+        Args:
+            calls: Requests allowed per key per period
+            period: Window length in seconds
+            max_keys: Keys tracked at once, least recently seen evicted first;
+                defaults to $RATE_LIMIT_MAX_KEYS or 100000
+        """
+        self.calls = calls
+        self.period = period
+        self.max_keys = max_keys or int(os.getenv('RATE_LIMIT_MAX_KEYS', DEFAULT_MAX_KEYS))
+        self._table: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "limited": 0, "evictions": 0}
+
+    def hit(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        """Count a request for key if it is within the limit"""
+        now = time.time() if now is None else now
+        window = int(now // self.period)
+        with self._lock:
+            entry = self._table.get(key)
+            if entry is None:
+                entry = self._table[key] = [window, 0, 0]
+                if len(self._table) > self.max_keys:
+                    self._table.popitem(last=False)
+                    self.stats["evictions"] += 1
+            else:
+                self._table.move_to_end(key)
+                if entry[0] != window:
+                    # Roll over: the old current window is the previous one only if adjacent
+                    entry[2] = entry[1] if entry[0] == window - 1 else 0
+                    entry[1] = 0
+                    entry[0] = window
+            weight = (self.period - now % self.period) / self.period
+            allowed = entry[2] * weight + entry[1] < self.calls
+            if allowed:
+                entry[1] += 1
+                self.stats["allowed"] += 1
+            else:
+                self.stats["limited"] += 1
+            current, previous = entry[1], entry[2]
+        return window_result(self.calls, self.period, now, current, previous, allowed)
+
+    async def acquire(self, key: str) -> RateLimitResult:
+        return self.hit(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            keys = len(self._table)
+        return {
+            **stats,
+            "backend": self.backend,
+            "limit": self.calls,
+            "period_seconds": self.period,
+            "keys": keys,
+            "max_keys": self.max_keys
+        }
+
+
+class RedisRateLimiter(SlidingWindowRateLimiter):
+    """Counters shared by every worker through Redis; the in-process table is the fallback"""
+
+    backend = 'redis'
+
+    def __init__(self, calls: int = 100, period: float = 60, max_keys: Optional[int] = None,
+                 url: Optional[str] = None, client=None, prefix: str = 'ratelimit'):
+        """
+        Args:
+            url: Defaults to $RATE_LIMIT_REDIS_URL or $REDIS_URL
+            client: A redis.asyncio client to use instead of connecting to url
+            prefix: Key prefix for the window counters
+        """
+        super().__init__(calls, period, max_keys)
+        if client is None:
+            import redis.asyncio as redis_asyncio
+            url = url or os.getenv('RATE_LIMIT_REDIS_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+            client = redis_asyncio.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(SLIDING_WINDOW_LUA)
+        self._failed_at: Optional[float] = None
+        self.stats.update({"redis_errors": 0, "fallbacks": 0})
+
+    async def acquire(self, key: str) -> RateLimitResult:
+        now = time.time()
+        if self._failed_at is not None and now - self._failed_at < REDIS_RETRY_SECONDS:
+            self.stats["fallbacks"] += 1
+            return self.hit(key, now)
+
+        window = int(now // self.period)
+        weight = (self.period - now % self.period) / self.period
+        try:
+            allowed, current, previous = await self._script(
+                keys=[f"{self.prefix}:{key}:{window}", f"{self.prefix}:{key}:{window - 1}"],
+                args=[self.calls, weight, int(math.ceil(self.period * 2))]
+            )
+        except Exception as e:
+            if self._failed_at is None:
+                logger.warning(f"Rate limiter falling back to per-process limits, Redis unavailable: {e}")
+            self._failed_at = now
+            self.stats["redis_errors"] += 1
+            self.stats["fallbacks"] += 1
+            return self.hit(key, now)
+
+        if self._failed_at is not None:
+            logger.info("Rate limiter using Redis again")
+            self._failed_at = None
+        self.stats["allowed" if allowed else "limited"] += 1
+        return window_result(self.calls, self.period, now, int(current), int(previous), bool(allowed))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "redis_available": self._failed_at is None}
+
+
+def create_rate_limiter(calls: int = 100, period: float = 60,
+                        backend: Optional[str] = None) -> SlidingWindowRateLimiter:
+    """Limiter for $RATE_LIMIT_BACKEND (memory unless redis is asked for and importable)"""
+    backend = (backend or os.getenv('RATE_LIMIT_BACKEND', 'memory')).lower()
+    if backend == 'redis':
+        try:
+            return RedisRateLimiter(calls, period)
+        except ImportError as e:
+            logger.warning(f"Redis rate limiting unavailable ({e}), limiting per process")
+    return SlidingWindowRateLimiter(calls, period)
+
+
+# --- benchmark ---
+
+class TimestampListLimiter:
+    """The previous middleware's algorithm, kept for comparison: a list of timestamps per IP"""
+
+    def __init__(self, calls: int, period: float):
+        self.calls = calls
+        self.period = period
+        self.requests = {}
+
+    def hit(self, key: str, now: float) -> bool:
+        if key in self.requests:
+            self.requests[key] = [ts for ts in self.requests[key] if now - ts < self.period]
+        else:
+            self.requests[key] = []
+        if len(self.requests[key]) >= self.calls:
+            return False
+        self.requests[key].append(now)
+        return True
+
+
+def benchmark(keys: int, requests: int, calls: int = 200, period: float = 60) -> Dict[str, Dict[str, float]]:
+    """Per-hit time and table memory for requests spread over keys addresses within one period"""
+    import random
+    import tracemalloc
+
+    addresses = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(keys)]
+    random.seed(0)
+    # A few busy clients plus a scan over many addresses
+    sequence = [addresses[random.randrange(min(keys, 50))] if random.random() < 0.8
+                else addresses[random.randrange(keys)] for _ in range(requests)]
+    start = time.time()
+    times = [start + period * i / requests for i in range(requests)]
+
+    def run(limiter) -> float:
+        start_time = time.perf_counter()
+        for key, now in zip(sequence, times):
+            limiter.hit(key, now)
+        return time.perf_counter() - start_time
+
+    results = {}
+    for name, factory in (('timestamp lists', lambda: TimestampListLimiter(calls, period)),
+                          ('sliding window', lambda: SlidingWindowRateLimiter(calls, period))):
+        seconds = run(factory())
+        # Table size in a second pass - tracemalloc slows the timed one down
+        tracemalloc.start()
+        limiter = factory()
+        run(limiter)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[name] = {
+            "ns_per_request": round(seconds / requests * 1e9, 1),
+            "table_mb": round(memory / 1024 / 1024, 2)
+        }
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-request overhead of the rate limiter")
+    parser.add_argument('--keys', type=int, default=100_000, help="Distinct client addresses")
+    parser.add_argument('--requests', type=int, default=500_000)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    for name, result in benchmark(args.keys, args.requests, args.calls).items():
+        print(f"{name:>16}  {result['ns_per_request']:>9.1f} ns/request  {result['table_mb']:>8.2f} MB", flush=True)
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Approximate Nearest-Neighbour Indexes for the Spec Library
+Optional FAISS indexes over the memory-mapped segments of spec_mmap_store,
+so /analyze-audit stays fast at 500k+ chunks. One index is built per
+immutable segment - ingesting a file or compacting only indexes the new
+segment - and saved next to it. Candidates are always rescored exactly
+against the segment's float vectors, so reported scores are true cosine
+similarities whichever backend produced them.
+
+Backends:
+    flat    exact GEMM per segment (default, no FAISS needed)
+    int8    brute-force scan of int8 scalar-quantized codes (no FAISS needed)
+    hnsw    HNSW graph over 8-bit scalar-quantized vectors
+    ivfpq   inverted lists with product-quantized codes
+
+With int8, hnsw or ivfpq the float matrix is only read for the shortlisted
+rows, so its pages stay out of worker memory; int8 keeps a quarter of the
+float32 bytes resident (memory-mapped, shared by every worker) and ivfpq
+far less.
+
+Layout:
+    spec_store/ann_index.json                          backend + build parameters
+    spec_store/segments/<id>/ann-<backend>-<key>.faiss  one index per segment
+    spec_store/segments/<id>/ann-int8-<key>.npy        int8 codes (+ .scale.npy)
+
+Benchmark (top-5 agreement with float32 exact search, latency, memory):
+    python -m modules.spec_ann --sizes 10000 100000 500000
+"""
+
+import os
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+
+from modules.spec_mmap_store import Segment, segment_dir, store_root
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu is optional - every backend falls back to exact search
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'ann_index.json'
+BACKENDS = ('flat', 'int8', 'hnsw', 'ivfpq')
+FAISS_BACKENDS = ('hnsw', 'ivfpq')
+
+# Build parameters change the index files; search parameters do not
+DEFAULT_BUILD_PARAMS = {
+    'int8': {},
+    'hnsw': {'m': 32, 'ef_construction': 80},
+    'ivfpq': {'nlist': 0, 'pq_m': 48, 'nbits': 8}  # nlist 0: ~4*sqrt(rows) per segment
+}
+# rescore: candidates fetched per requested match, then scored exactly -
+# PQ codes are coarse, so IVF-PQ needs a much deeper candidate list
+DEFAULT_SEARCH_PARAMS = {
+    'int8': {'rescore': 8},
+    'hnsw': {'ef_search': 96, 'rescore': 4},
+    'ivfpq': {'nprobe': 24, 'rescore': 20}
+}
+ENV_PARAMS = {
+    'm': 'SPEC_HNSW_M',
+    'ef_construction': 'SPEC_HNSW_EF_CONSTRUCTION',
+    'ef_search': 'SPEC_HNSW_EF_SEARCH',
+    'nlist': 'SPEC_IVF_NLIST',
+    'nprobe': 'SPEC_IVF_NPROBE',
+    'pq_m': 'SPEC_PQ_M',
+    'nbits': 'SPEC_PQ_NBITS',
+    'rescore': 'SPEC_ANN_RESCORE'
+}
+
+ADD_BATCH_ROWS = 65536
+TRAIN_SAMPLE_ROWS = 100_000
+MISSING_RECHECK_SECONDS = 30  # another worker may build the index meanwhile
+
+
+def params_key(backend: str, build_params: Dict[str, Any]) -> str:
+    """Short digest naming the index files built with these parameters"""
+    payload = json.dumps({'backend': backend, **build_params}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:10]
+
+
+def _largest_divisor(dim: int, limit: int) -> int:
+    for m in range(min(limit, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _float32_rows(matrix: np.ndarray, start: int, end: int) -> np.ndarray:
+    return np.ascontiguousarray(matrix[start:end], dtype=np.float32)
+
+
+def _training_sample(matrix: np.ndarray, rows: int) -> np.ndarray:
+    if len(matrix) <= rows:
+        return _float32_rows(matrix, 0, len(matrix))
+    picks = np.sort(np.random.default_rng(0).choice(len(matrix), rows, replace=False))
+    return np.ascontiguousarray(matrix[picks], dtype=np.float32)
+
+
+def build_faiss_index(matrix: np.ndarray, backend: str, build_params: Dict[str, Any]):
+    """
+    Build a FAISS inner-product index over one segment's rows
+
+    Args:
+        matrix: (n, dim) unit-normalized embeddings (float32 or float16, may be a memmap)
+        backend: 'hnsw' or 'ivfpq'
+        build_params: DEFAULT_BUILD_PARAMS-shaped parameters
+
+    Returns:
+        The trained, populated index; row i of the segment is label i
+    """
+    n, dim = matrix.shape
+    if backend == 'hnsw':
+        index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, int(build_params['m']),
+                                  faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = int(build_params['ef_construction'])
+    elif backend == 'ivfpq':
+        nlist = int(build_params['nlist']) or int(4 * math.sqrt(n))
+        nlist = max(1, min(nlist, n // 39))  # FAISS wants ~39 training points per list
+        pq_m = _largest_divisor(dim, int(build_params['pq_m']))
+        nbits = int(build_params['nbits'])
+        if n < 39 * (1 << nbits):
+            nbits = max(4, int(math.log2(max(16, n // 39))))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, nlist, pq_m, nbits, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"Unknown ANN backend: {backend}")
+
+    index.train(_training_sample(matrix, max(TRAIN_SAMPLE_ROWS, 39 * 256)))
+    for start in range(0, n, ADD_BATCH_ROWS):
+        index.add(_float32_rows(matrix, start, min(n, start + ADD_BATCH_ROWS)))
+    return index
+
+
+class Int8Codes:
+    """
+    Int8 scalar-quantized copy of one segment
+
+    Each dimension is scaled symmetrically by its largest magnitude, so
+    unit-normalized embeddings keep ~7 bits per component. Scores from the
+    codes only rank the shortlist; the caller rescores it exactly. Exposes
+    the slice of the FAISS index interface AnnIndexer uses.
+    """
+
+    BLOCK_ROWS = 8192
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray):
+        self.codes = codes
+        self.scale = scale
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.scale.nbytes)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray) -> 'Int8Codes':
+        n, dim = matrix.shape
+        peak = np.zeros(dim, dtype=np.float32)
+        for start in range(0, n, ADD_BATCH_ROWS):
+            np.maximum(peak, np.abs(_float32_rows(matrix, start, min(n, start + ADD_BATCH_ROWS))).max(axis=0), out=peak)
+        scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+
+        codes = np.empty((n, dim), dtype=np.int8)
+        for start in range(0, n, ADD_BATCH_ROWS):
+            end = min(n, start + ADD_BATCH_ROWS)
+            codes[start:end] = np.clip(np.rint(_float32_rows(matrix, start, end) / scale), -127, 127)
+        return cls(codes, scale)
+
+    @staticmethod
+    def scale_path(path: str) -> str:
+        return path[:-len('.npy')] + '.scale.npy'
+
+    def save(self, path: str):
+        """Write scale then codes, each to a temp file renamed into place - the codes file marks completion"""
+        suffix = f".tmp.{os.getpid()}.{threading.get_ident()}"
+        for target, array in ((self.scale_path(path), self.scale), (path, self.codes)):
+            with open(target + suffix, 'wb') as f:
+                np.save(f, array)
+            os.replace(target + suffix, target)
+
+    @classmethod
+    def load(cls, path: str) -> 'Int8Codes':
+        return cls(np.load(path, mmap_mode='r'), np.load(cls.scale_path(path)))
+
+    def search(self, queries: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k by a blocked scan of the codes
+
+        Returns:
+            Tuple of (approximate scores, row labels), each (n_queries, k)
+        """
+        from modules.spec_index import top_k_scores
+
+        scaled = np.ascontiguousarray(queries * self.scale, dtype=np.float32)
+        block = np.empty((min(self.BLOCK_ROWS, self.ntotal), self.codes.shape[1]), dtype=np.float32)
+        candidate_labels, candidate_scores = [], []
+        for start in range(0, self.ntotal, self.BLOCK_ROWS):
+            end = min(self.ntotal, start + self.BLOCK_ROWS)
+            rows = block[:end - start]
+            np.copyto(rows, self.codes[start:end], casting='unsafe')
+            labels, scores = top_k_scores(scaled @ rows.T, k)
+            candidate_labels.append(labels + start)
+            candidate_scores.append(scores)
+        merged_labels = np.hstack(candidate_labels)
+        order, scores = top_k_scores(np.hstack(candidate_scores), k)
+        return scores, np.take_along_axis(merged_labels, order, axis=1)
+
+
+class AnnIndexer:
+    """
+    Per-segment ANN indexes for one spec library
+
+    Writers call build() for each new segment (SpecIndex does this on
+    ingest and compaction); readers call search(), which uses an index if
+    one is loaded or on disk and otherwise returns None so the caller
+    searches the segment exactly. Indexes are never built on the request
+    path - missing ones are filled in by ensure() from the maintenance loop.
+    """
+
+    def __init__(self, data_path: Optional[str], backend: Optional[str] = None,
+                 build_params: Optional[Dict[str, Any]] = None,
+                 search_params: Optional[Dict[str, Any]] = None,
+                 min_rows: Optional[int] = None):
+        """
+        Args:
+            data_path: Spec data directory, or None to keep indexes in memory only
+            backend: flat, int8, hnsw or ivfpq; defaults to $SPEC_ANN_BACKEND, then the
+                backend recorded in spec_store/ann_index.json, then flat
+            build_params: Overrides for DEFAULT_BUILD_PARAMS[backend]
+            search_params: Overrides for DEFAULT_SEARCH_PARAMS[backend]
+            min_rows: Segments smaller than this are always searched exactly
+        """
+        self.data_path = data_path
+        persisted = self._read_config()
+
+        backend = (backend or os.getenv('SPEC_ANN_BACKEND') or persisted.get('backend') or 'flat').lower()
+        if backend not in BACKENDS:
+            logger.warning(f"Unknown SPEC_ANN_BACKEND '{backend}', using exact search")
+            backend = 'flat'
+        if backend in FAISS_BACKENDS and faiss is None:
+            logger.warning(f"faiss-cpu not installed - spec library '{backend}' index disabled, using exact search")
+            backend = 'flat'
+        self.backend = backend
+
+        inherited = persisted.get('build_params', {}) if persisted.get('backend') == backend else {}
+        self.build_params = self._resolve(DEFAULT_BUILD_PARAMS.get(backend, {}), inherited, build_params)
+        self.search_params = self._resolve(DEFAULT_SEARCH_PARAMS.get(backend, {}), {}, search_params)
+        self.key = params_key(backend, self.build_params)
+        self.min_rows = min_rows if min_rows is not None else int(os.getenv('SPEC_ANN_MIN_ROWS', 20000))
+
+        self._indexes: Dict[str, Any] = {}
+        self._missing: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.stats = {
+            "builds": 0,
+            "build_seconds": 0.0,
+            "loads": 0,
+            "ann_segment_searches": 0,
+            "exact_segment_searches": 0
+        }
+
+        if self.enabled and self.data_path and persisted.get('key') != self.key:
+            self._write_config()
+
+    @staticmethod
+    def _resolve(defaults: Dict[str, Any], inherited: Dict[str, Any], explicit: Optional[Dict[str, Any]]):
+        params = {**defaults, **{k: v for k, v in inherited.items() if k in defaults}}
+        for name in defaults:
+            if os.getenv(ENV_PARAMS[name]):
+                params[name] = int(os.environ[ENV_PARAMS[name]])
+        params.update(explicit or {})
+        return params
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != 'flat'
+
+    # === CONFIG / PATHS ===
+
+    def _config_path(self) -> Optional[str]:
+        return os.path.join(store_root(self.data_path), CONFIG_FILE) if self.data_path else None
+
+    def _read_config(self) -> Dict[str, Any]:
+        path = self._config_path()
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {CONFIG_FILE}: {e}")
+            return {}
+
+    def _write_config(self):
+        from modules.spec_index import _atomic_write
+
+        os.makedirs(store_root(self.data_path), exist_ok=True)
+        config = {
+            'format_version': 1,
+            'backend': self.backend,
+            'build_params': self.build_params,
+            'key': self.key,
+            'faiss_version': getattr(faiss, '__version__', None),
+            'updated': datetime.utcnow().isoformat()
+        }
+        _atomic_write(self._config_path(), json.dumps(config, indent=2).encode('utf-8'))
+
+    def index_path(self, segment: Segment) -> Optional[str]:
+        if not self.data_path or segment.segment_id == 'in-memory':
+            return None
+        directory = os.path.normpath(segment_dir(self.data_path, segment.segment_id))
+        extension = 'npy' if self.backend == 'int8' else 'faiss'
+        return os.path.join(directory, f"ann-{self.backend}-{self.key}.{extension}")
+
+    def wants_index(self, segment: Segment) -> bool:
+        return self.enabled and len(segment) >= max(1, self.min_rows) and segment.matrix.ndim == 2
+
+    # === BUILD ===
+
+    def build(self, segment: Segment, force: bool = False) -> bool:
+        """
+        Build (and save) the index for one segment if it is large enough
+
+        Returns:
+            True if an index was built
+        """
+        if not self.wants_index(segment):
+            return False
+        path = self.index_path(segment)
+        if not force and (segment.segment_id in self._indexes or (path and os.path.exists(path))):
+            return False
+
+        with self._build_lock:
+            start_time = time.time()
+            if self.backend == 'int8':
+                index = Int8Codes.build(segment.matrix)
+                if path:
+                    index.save(path)
+            else:
+                index = build_faiss_index(segment.matrix, self.backend, self.build_params)
+                if path:
+                    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+                    faiss.write_index(index, tmp_path)
+                    os.replace(tmp_path, path)
+            elapsed = time.time() - start_time
+
+        with self._lock:
+            self._indexes[segment.segment_id] = index
+            self._missing.pop(segment.segment_id, None)
+        self.stats["builds"] += 1
+        self.stats["build_seconds"] = round(self.stats["build_seconds"] + elapsed, 3)
+        logger.info(f"🧭 Built {self.backend} index for segment {segment.segment_id} "
+                    f"({len(segment)} rows) in {elapsed:.1f}s")
+        return True
+
+    def ensure(self, segments: Iterable[Segment]) -> int:
+        """Build every missing index (segments ingested before the backend was enabled)"""
+        built = 0
+        for segment in segments:
+            try:
+                built += self.build(segment)
+            except Exception as e:
+                logger.error(f"ANN index build failed for segment {segment.segment_id}: {e}")
+        return built
+
+    def retain(self, segment_ids: Iterable[str]):
+        """Drop loaded indexes of segments no longer in the library"""
+        keep = set(segment_ids)
+        with self._lock:
+            for segment_id in [s for s in self._indexes if s not in keep]:
+                del self._indexes[segment_id]
+            for segment_id in [s for s in self._missing if s not in keep]:
+                del self._missing[segment_id]
+
+    # === SEARCH ===
+
+    def get(self, segment: Segment):
+        """The loaded index for a segment, reading it from disk on first use; None if absent"""
+        if not self.wants_index(segment):
+            return None
+        index = self._indexes.get(segment.segment_id)
+        if index is not None:
+            return index
+        if time.time() - self._missing.get(segment.segment_id, 0.0) < MISSING_RECHECK_SECONDS:
+            return None
+
+        path = self.index_path(segment)
+        with self._lock:
+            index = self._indexes.get(segment.segment_id)
+            if index is None:
+                try:
+                    index = self._read_index(path) if path and os.path.exists(path) else None
+                except (RuntimeError, OSError, ValueError) as e:
+                    logger.warning(f"Unreadable ANN index {path}: {e}")
+                    index = None
+                if index is None:
+                    self._missing[segment.segment_id] = time.time()
+                    return None
+                if index.ntotal != len(segment):
+                    logger.warning(f"ANN index for segment {segment.segment_id} has {index.ntotal} rows, "
+                                   f"segment has {len(segment)} - searching exactly")
+                    self._missing[segment.segment_id] = time.time()
+                    return None
+                self._indexes[segment.segment_id] = index
+                self.stats["loads"] += 1
+        return index
+
+    def _read_index(self, path: str):
+        if self.backend == 'int8':
+            return Int8Codes.load(path)
+        return faiss.read_index(path)
+
+    def _search_parameters(self, k: int):
+        if self.backend == 'int8':
+            return None
+        if self.backend == 'hnsw':
+            return faiss.SearchParametersHNSW(efSearch=max(int(self.search_params['ef_search']), k))
+        return faiss.SearchParametersIVF(nprobe=int(self.search_params['nprobe']))
+
+    def search(self, segment: Segment, queries: np.ndarray, top_k: int,
+               mask: Optional[np.ndarray] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k rows of one segment for each query, or None to search it exactly
+
+        Args:
+            segment: The segment to search
+            queries: (n_queries, dim) row-normalized float32 queries
+            top_k: Matches per query
+            mask: Live-row mask (False rows are tombstoned), or None
+
+        Returns:
+            Tuple of (row indices, exact scores), each (n_queries, <=k), best first;
+            tombstoned rows only ever appear with a -inf score
+        """
+        from modules.spec_index import top_k_scores
+
+        index = self.get(segment) if self.enabled else None
+        if index is None:
+            self.stats["exact_segment_searches"] += 1
+            return None
+
+        live = len(segment) if mask is None else int(mask.sum())
+        rescore = max(1, int(self.search_params['rescore']))
+        fetch = min(len(segment), math.ceil(top_k * rescore * len(segment) / max(1, live)))
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        _, labels = index.search(queries, fetch, params=self._search_parameters(fetch))
+
+        # Exact rescoring from the segment's own vectors
+        valid = labels >= 0
+        rows = np.where(valid, labels, 0)
+        vectors = np.asarray(segment.matrix[rows.ravel()], dtype=np.float32).reshape(rows.shape + (-1,))
+        scores = np.einsum('qkd,qd->qk', vectors, queries)
+        if mask is not None:
+            valid &= mask[rows]
+        scores[~valid] = -np.inf
+
+        order, top_scores = top_k_scores(scores, top_k)
+        self.stats["ann_segment_searches"] += 1
+        return np.take_along_axis(rows, order, axis=1), top_scores
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = len(self._indexes)
+            missing = len(self._missing)
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "build_params": self.build_params,
+            "search_params": self.search_params,
+            "min_rows": self.min_rows,
+            "loaded_indexes": loaded,
+            "segments_without_index": missing
+        }
+
+
+# === BENCHMARK ===
+
+def _clustered_embeddings(rows: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors around a few thousand topics - closer to chunk embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(16, rows // 200), dim)).astype(np.float32)
+    matrix = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, ADD_BATCH_ROWS):
+        end = min(rows, start + ADD_BATCH_ROWS)
+        assign = rng.integers(0, len(centers), end - start)
+        matrix[start:end] = centers[assign] + 0.6 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def _index_bytes(index) -> int:
+    if index is None:
+        return 0
+    if isinstance(index, Int8Codes):
+        return index.nbytes
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _percentile_ms(values, pct: float) -> float:
+    return round(1000 * float(np.percentile(values, pct)), 3)
+
+
+def benchmark(matrix: np.ndarray, backends: Iterable[str], queries: int = 200, top_k: int = 5,
+              build_params: Optional[Dict[str, Dict[str, Any]]] = None,
+              search_params: Optional[Dict[str, Dict[str, Any]]] = None) -> list:
+    """
+    Recall@k against exact search and single-query latency for each backend
+
+    Searches go through SpecSnapshot.search, so rescoring and segment merging
+    are included in the latency. Recall@k is the top-k agreement with the
+    float32 library; scanned_mb is what a search reads besides the
+    shortlisted float rows (the float32 matrix for flat, the codes or index
+    otherwise).
+
+    Returns:
+        One result dict per backend
+    """
+    from modules.spec_index import SpecSnapshot, InMemorySegment
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(matrix), min(queries, len(matrix)), replace=False)
+    probe = np.asarray(matrix[picks], dtype=np.float32) + 0.05 * rng.standard_normal((len(picks), matrix.shape[1]))
+    probe = (probe / np.linalg.norm(probe, axis=1, keepdims=True)).astype(np.float32)
+
+    segment = InMemorySegment([''] * len(matrix), matrix)
+    exact, _ = SpecSnapshot([segment], [], {}, 1).search(probe, top_k)
+
+    results = []
+    for backend in backends:
+        indexer = AnnIndexer(None, backend=backend, min_rows=1,
+                             build_params=(build_params or {}).get(backend),
+                             search_params=(search_params or {}).get(backend))
+        start_time = time.time()
+        indexer.build(segment)
+        build_seconds = time.time() - start_time
+        snapshot = SpecSnapshot([segment], [], {}, 1, ann=indexer)
+
+        snapshot.search(probe[:1], top_k)  # warm-up
+        latencies = []
+        found = []
+        for query in probe:
+            query_start = time.perf_counter()
+            idx, _ = snapshot.search(query.reshape(1, -1), top_k)
+            latencies.append(time.perf_counter() - query_start)
+            found.append(idx[0])
+
+        recall = np.mean([len(set(f.tolist()) & set(e.tolist())) / top_k for f, e in zip(found, exact)])
+        index = indexer._indexes.get(segment.segment_id)
+        results.append({
+            'rows': len(matrix),
+            'backend': indexer.backend,
+            f'recall@{top_k}': round(float(recall), 4),
+            'p50_ms': _percentile_ms(latencies, 50),
+            'p95_ms': _percentile_ms(latencies, 95),
+            'build_seconds': round(build_seconds, 2),
+            'index_mb': round(_index_bytes(index) / 1e6, 1),
+            'scanned_mb': round((_index_bytes(index) if index is not None else matrix.nbytes) / 1e6, 1),
+            'float32_mb': round(len(matrix) * matrix.shape[1] * 4 / 1e6, 1)
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recall and latency of the spec library ANN backends")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--data-path', help="Sample the live library in this directory instead of synthetic data")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    source = None
+    if args.data_path:
+        from modules.spec_store import get_spec_store
+        source = get_spec_store(args.data_path).snapshot().to_library()['embeddings']
+        print(f"Library: {len(source)} live chunks from {args.data_path}")
+
+    rows_out = []
+    for size in args.sizes:
+        if source is not None:
+            matrix = source[:size]
+        else:
+            matrix = _clustered_embeddings(size, args.dim, seed=size)
+        for result in benchmark(matrix, args.backends, queries=args.queries, top_k=args.top_k):
+            rows_out.append(result)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{result['rows']:>9} {result['backend']:>6}  recall@{args.top_k} "
+                      f"{result[f'recall@{args.top_k}']:.3f}  p50 {result['p50_ms']:>8.3f} ms  "
+                      f"p95 {result['p95_ms']:>8.3f} ms  build {result['build_seconds']:>7.2f}s  "
+                      f"index {result['index_mb']:>7.1f} MB  scanned {result['scanned_mb']:>7.1f} MB "
+                      f"of {result['float32_mb']:.1f} MB float32", flush=True)
@@ -7,13 +7,15 @@ Uses industry defaults and spec-driven adjustments for accurate profitability ca
 
 import re
 import json
-import pickle
 import logging
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional, Any
 import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer, util as st_util
+
+from modules.spec_index import unit_normalize
+from modules.model_registry import get_embedding_model
+from modules.spec_store import get_spec_store
 
 logger = logging.getLogger(__name__)
 
@@ -39,10 +41,11 @@ class SpecBasedHourEstimator:
         
         # Load sentence transformer
         logger.info("Loading sentence transformer for hour estimation...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = get_embedding_model(consumer='SpecBasedHourEstimator')
         
-        # Load spec embeddings
-        self.spec_data = self._load_spec_embeddings()
+        # Shared spec library
+        self.spec_store = get_spec_store(embeddings_path)
+        self._load_spec_embeddings()
         
         # Load or create industry defaults
         self.defaults = self._load_industry_defaults()
@@ -92,21 +95,19 @@ class SpecBasedHourEstimator:
             'mechanical': -1.0,  # Faster with machines
         }
     
-    def _load_spec_embeddings(self) -> Optional[Dict]:
-        """Load spec embeddings from pickle file"""
-        
-        if not self.embeddings_path.exists():
-            logger.warning(f"Spec embeddings not found at {self.embeddings_path}")
-            return None
+    def _load_spec_embeddings(self) -> int:
+        """Check the shared spec library (updates are picked up automatically)"""
         
         try:
-            with open(self.embeddings_path, 'rb') as f:
-                data = pickle.load(f)
-                logger.info(f"Loaded {len(data.get('chunks', []))} spec chunks for hour estimation")
-                return data
+            chunk_count = len(self.spec_store)
         except Exception as e:
             logger.error(f"Failed to load spec embeddings: {e}")
-            return None
+            return 0
+        if chunk_count == 0:
+            logger.warning(f"Spec library is empty at {self.spec_store.data_path}")
+        else:
+            logger.info(f"Using {chunk_count} spec chunks for hour estimation")
+        return chunk_count
     
     def _load_industry_defaults(self) -> Dict:
         """
@@ -228,7 +229,7 @@ class SpecBasedHourEstimator:
             base_equipment = 2.0
         
         # If no spec embeddings available, return defaults
-        if not self.spec_data:
+        if len(self.spec_store) == 0:
             return {
                 'labor_hours': base_labor,
                 'equipment_hours': base_equipment,
@@ -341,28 +342,34 @@ class SpecBasedHourEstimator:
             Tuple of (matched_chunks, adjustments)
         """
         
-        if not self.spec_data or 'embeddings' not in self.spec_data:
+        snapshot = self.spec_store.snapshot()
+        if len(snapshot) == 0:
             return [], []
         
         # Encode query
         with torch.no_grad():
-            query_embedding = self.model.encode(query_text, convert_to_tensor=True)
-        
-        # Get spec embeddings
-        spec_embeddings = self.spec_data['embeddings']
-        if isinstance(spec_embeddings, np.ndarray):
-            spec_embeddings = torch.from_numpy(spec_embeddings)
-        
-        # Calculate similarities
-        similarities = st_util.cos_sim(query_embedding, spec_embeddings)[0]
-        
+            query_embedding = self.model.encode(query_text, convert_to_numpy=True)
+        
+        # Cosine similarities per segment of the shared (unit-normalized) library,
+        # so the segments are never concatenated into one matrix
+        query = unit_normalize(query_embedding.reshape(1, -1))[0].astype(np.float32)
+        hits = []
+        for segment, offset, mask in zip(snapshot.segments, snapshot.offsets, snapshot.live_masks):
+            if len(segment) == 0:
+                continue
+            similarities = segment.matrix @ query
+            above = similarities >= threshold
+            if mask is not None:
+                above &= mask
+            hits.extend((offset + int(row), float(similarities[row])) for row in np.flatnonzero(above))
+
         # Find matches above threshold
         matches = []
         adjustments = []
-        
-        for idx, score in enumerate(similarities):
-            if score >= threshold and idx < len(self.spec_data['chunks']):
-                chunk = self.spec_data['chunks'][idx]
+
+        for idx, score in hits:
+            if idx < len(snapshot.chunks):
+                chunk = snapshot.chunks[idx]
                 matches.append({
                     'chunk': chunk,
                     'score': float(score),
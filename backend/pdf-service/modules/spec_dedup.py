@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Chunk Detection for Spec Ingestion
+PG&E spec books repeat the same boilerplate, and revisions of one book are
+usually uploaded side by side, so many chunks differ only in their
+[Source: ...] tag or a handful of words. Every chunk gets a MinHash
+signature over its word shingles; LSH banding finds candidate pairs
+without comparing every pair, and a candidate is a duplicate when its
+estimated Jaccard similarity clears the threshold and it quotes exactly
+the same numbers - a revision that changes a clearance is not a duplicate.
+
+Duplicates are not stored. The library keeps one canonical row and the
+library manifest lists the other files as aliases of it ('<segment>:<row>'
+-> [{file_hash, filename}]), so search returns the row once and reports
+every spec it appears in.
+
+Layout:
+    spec_store/segments/<id>/minhash-<key>.npy   uint32 (n, num_perm + 2) signatures
+"""
+
+import os
+import re
+import zlib
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from modules.spec_mmap_store import Segment, segment_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {
+    'num_perm': 128,     # MinHash permutations
+    'bands': 16,         # LSH bands of num_perm / bands rows each
+    'shingle': 5,        # words per shingle
+    'threshold': 0.9,    # estimated Jaccard similarity for a duplicate
+    'min_tokens': 12     # shorter chunks (headings, table cells) are never collapsed
+}
+ENV_PARAMS = {
+    'num_perm': 'SPEC_DEDUP_NUM_PERM',
+    'bands': 'SPEC_DEDUP_BANDS',
+    'shingle': 'SPEC_DEDUP_SHINGLE',
+    'threshold': 'SPEC_DEDUP_THRESHOLD',
+    'min_tokens': 'SPEC_DEDUP_MIN_TOKENS'
+}
+
+MERSENNE_PRIME = (1 << 31) - 1
+MAX_HASH = np.uint32(0xFFFFFFFF)
+
+TAG_PATTERN = re.compile(r'\[Source:[^\]]*\]')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+
+def alias_key(segment_id: str, row: int) -> str:
+    """Manifest alias entry naming one canonical row"""
+    return f"{segment_id}:{int(row)}"
+
+
+def parse_alias_key(key: str) -> Tuple[str, int]:
+    segment_id, _, row = key.rpartition(':')
+    return segment_id, int(row)
+
+
+def chunk_tokens(chunk: str) -> List[str]:
+    """Lower-cased word tokens of a chunk without its [Source: ...] tag"""
+    return TOKEN_PATTERN.findall(TAG_PATTERN.sub(' ', chunk).lower())
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, plus a digest of the numbers a chunk quotes"""
+
+    def __init__(self, num_perm: int, shingle: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle = shingle
+        # h(x) = (a * x + b) mod p with x < p < 2^31 - products fit in uint64
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, chunk: str) -> np.ndarray:
+        """(num_perm + 2,) uint32: the MinHash values, then a 64-bit digest of the chunk's numbers"""
+        tokens = chunk_tokens(chunk)
+        signature = np.empty(self.num_perm + 2, dtype=np.uint32)
+        if len(tokens) > self.shingle:
+            grams = {' '.join(tokens[i:i + self.shingle]) for i in range(len(tokens) - self.shingle + 1)}
+        else:
+            grams = {' '.join(tokens)} if tokens else set()
+        if grams:
+            hashes = np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.uint64) % MERSENNE_PRIME
+            signature[:self.num_perm] = ((self._a * hashes + self._b) % MERSENNE_PRIME).min(axis=1)
+        else:
+            signature[:self.num_perm] = MAX_HASH
+
+        numbers = sorted(set(NUMBER_PATTERN.findall(' '.join(tokens))))
+        digest = hashlib.blake2b('|'.join(numbers).encode('utf-8'), digest_size=8).digest()
+        signature[self.num_perm:] = np.frombuffer(digest, dtype=np.uint32)
+        return signature
+
+    def signatures(self, chunks: Sequence[str]) -> np.ndarray:
+        result = np.empty((len(chunks), self.num_perm + 2), dtype=np.uint32)
+        for i, chunk in enumerate(chunks):
+            result[i] = self.signature(chunk)
+        return result
+
+
+class SegmentBands:
+    """LSH band hashes of one segment, sorted per band for vectorized bucket lookups"""
+
+    def __init__(self, band_hashes: np.ndarray):
+        self.order = np.argsort(band_hashes, axis=0, kind='stable').T        # (bands, n)
+        self.sorted = np.take_along_axis(band_hashes, self.order.T, axis=0).T  # (bands, n)
+
+    def candidates(self, query_bands: np.ndarray) -> Dict[int, np.ndarray]:
+        """Rows sharing at least one band bucket with each query: {query index: rows}"""
+        found: Dict[int, List[np.ndarray]] = {}
+        for band in range(self.sorted.shape[0]):
+            left = np.searchsorted(self.sorted[band], query_bands[:, band], side='left')
+            right = np.searchsorted(self.sorted[band], query_bands[:, band], side='right')
+            for query in np.flatnonzero(right > left):
+                found.setdefault(int(query), []).append(self.order[band, left[query]:right[query]])
+        return {query: np.unique(np.concatenate(rows)) for query, rows in found.items()}
+
+
+@dataclass
+class DedupPlan:
+    """What to store for one ingested file"""
+    keep: List[int]                                   # rows of the file that are stored
+    signatures: np.ndarray                            # signatures of the kept rows
+    aliases: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # alias key -> {file_hash, filename}
+    duplicates: int = 0                               # rows collapsed onto an existing row
+
+
+class SpecDeduper:
+    """
+    Collapses near-duplicate chunks of newly ingested spec files onto rows
+    already in the library (or earlier in the same upload batch)
+    """
+
+    def __init__(self, data_path: Optional[str], enabled: Optional[bool] = None,
+                 params: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            data_path: Spec data directory; signatures are saved next to its segments
+            enabled: Defaults to $SPEC_DEDUP_ENABLED (true)
+            params: Overrides of DEFAULT_PARAMS (then $SPEC_DEDUP_* env vars)
+        """
+        self.data_path = data_path
+        if enabled is None:
+            enabled = os.getenv('SPEC_DEDUP_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+
+        self.params = dict(DEFAULT_PARAMS)
+        for name, env_var in ENV_PARAMS.items():
+            if os.getenv(env_var):
+                self.params[name] = type(DEFAULT_PARAMS[name])(os.getenv(env_var))
+        self.params.update(params or {})
+        if self.params['num_perm'] % self.params['bands']:
+            raise ValueError("SPEC_DEDUP_NUM_PERM must be a multiple of SPEC_DEDUP_BANDS")
+
+        self.hasher = MinHasher(self.params['num_perm'], self.params['shingle'])
+        self.key = f"{self.params['num_perm']}p-{self.params['shingle']}s"
+        rows = self.params['num_perm'] // self.params['bands']
+        self._band_weights = np.random.default_rng(2).integers(
+            1, np.iinfo(np.int64).max, rows, dtype=np.uint64) | np.uint64(1)
+
+        self._bands: Dict[str, SegmentBands] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "chunks_checked": 0,
+            "duplicates_collapsed": 0,
+            "last_dedup_seconds": 0.0
+        }
+
+    # === SIGNATURES ===
+
+    def _signature_path(self, segment_id: str) -> str:
+        return os.path.join(segment_dir(self.data_path, segment_id), f"minhash-{self.key}.npy")
+
+    def save_signatures(self, segment_id: str, signatures: np.ndarray):
+        """Store a segment's signatures next to it (written to a temp file and renamed)"""
+        path = self._signature_path(segment_id)
+        tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(signatures, dtype=np.uint32))
+        os.replace(tmp_path, path)
+
+    def signatures_for(self, segment: Segment) -> np.ndarray:
+        """Signatures of every row of a segment, computed and saved on first use for older segments"""
+        path = self._signature_path(segment.segment_id)
+        if os.path.exists(path):
+            signatures = np.load(path, mmap_mode='r')
+            if len(signatures) == len(segment):
+                return signatures
+        signatures = self.hasher.signatures(segment.chunks)
+        try:
+            self.save_signatures(segment.segment_id, signatures)
+        except OSError as e:
+            logger.warning(f"Could not save signatures for segment {segment.segment_id}: {e}")
+        return signatures
+
+    def carry_signatures(self, segment_id: str, parts: Sequence[Tuple[Segment, np.ndarray]]):
+        """Save the signatures of a merged segment built from (segment, rows) parts"""
+        pieces = [np.asarray(self.signatures_for(segment)[rows]) for segment, rows in parts if len(rows)]
+        if pieces:
+            self.save_signatures(segment_id, np.vstack(pieces))
+
+    def band_hashes(self, signatures: np.ndarray) -> np.ndarray:
+        """(n, bands) uint64 bucket keys, one per band of MinHash rows"""
+        bands = self.params['bands']
+        rows = self.params['num_perm'] // bands
+        minhash = np.asarray(signatures[:, :bands * rows], dtype=np.uint64).reshape(len(signatures), bands, rows)
+        # Wrapping uint64 arithmetic is the hash
+        return (minhash * self._band_weights).sum(axis=2, dtype=np.uint64)
+
+    def _segment_bands(self, segment: Segment, signatures: np.ndarray) -> SegmentBands:
+        with self._lock:
+            bands = self._bands.get(segment.segment_id)
+        if bands is None:
+            bands = SegmentBands(self.band_hashes(signatures))
+            with self._lock:
+                self._bands[segment.segment_id] = bands
+        return bands
+
+    def retain(self, segment_ids):
+        """Forget the band tables of segments that left the library"""
+        keep = set(segment_ids)
+        with self._lock:
+            for segment_id in [s for s in self._bands if s not in keep]:
+                del self._bands[segment_id]
+
+    # === DEDUPLICATION ===
+
+    def is_duplicate(self, signature: np.ndarray, other: np.ndarray) -> bool:
+        num_perm = self.params['num_perm']
+        if not np.array_equal(signature[num_perm:], other[num_perm:]):
+            return False
+        return float(np.mean(signature[:num_perm] == other[:num_perm])) >= self.params['threshold']
+
+    def collapse(self, items: Sequence[Tuple[str, Sequence[str], Dict[str, Any]]], snapshot=None) -> List[DedupPlan]:
+        """
+        Decide which rows of newly ingested files are stored
+
+        A row is dropped when it duplicates a live row of snapshot, a kept
+        row of an earlier file in items, or an earlier row of its own file.
+        Only the first two become aliases - a file does not alias itself.
+
+        Args:
+            items: (segment_id, chunks, file_info) per file, in ingest order;
+                segment_id is the id the file's segment will be written as
+            snapshot: SpecSnapshot to deduplicate against (None: only within items)
+
+        Returns:
+            One DedupPlan per item
+        """
+        start_time = time.time()
+        min_tokens = self.params['min_tokens']
+
+        library = []
+        if snapshot is not None:
+            for segment, mask in zip(snapshot.segments, snapshot.live_masks):
+                if len(segment) == 0 or segment.segment_id == 'in-memory':
+                    continue
+                signatures = self.signatures_for(segment)
+                library.append((segment.segment_id, signatures, self._segment_bands(segment, signatures), mask))
+
+        batch_buckets: Dict[Tuple[int, int], List[Tuple[int, int, np.ndarray]]] = {}
+        plans = []
+        for item, (segment_id, chunks, file_info) in enumerate(items):
+            file_info = file_info or {}
+            signatures = self.hasher.signatures(chunks)
+            bands = self.band_hashes(signatures)
+            eligible = [len(chunk_tokens(chunk)) >= min_tokens for chunk in chunks]
+
+            # Live library rows first - they already have an embedding everyone searches
+            targets: List[Optional[str]] = [None] * len(chunks)
+            for library_id, library_signatures, library_bands, mask in library:
+                for row, candidates in library_bands.candidates(bands).items():
+                    if targets[row] is not None or not eligible[row]:
+                        continue
+                    if mask is not None:
+                        candidates = candidates[mask[candidates]]
+                    for candidate in candidates:
+                        if self.is_duplicate(signatures[row], library_signatures[candidate]):
+                            targets[row] = alias_key(library_id, candidate)
+                            break
+
+            plan = DedupPlan(keep=[], signatures=signatures)
+            for row in range(len(chunks)):
+                target, own_file = targets[row], False
+                if target is None and eligible[row]:
+                    for band, bucket in enumerate(bands[row]):
+                        for other_item, position, other in batch_buckets.get((band, int(bucket)), ()):
+                            if self.is_duplicate(signatures[row], other):
+                                target = alias_key(items[other_item][0], position)
+                                own_file = other_item == item
+                                break
+                        if target is not None:
+                            break
+
+                if target is None:
+                    position = len(plan.keep)
+                    plan.keep.append(row)
+                    if eligible[row]:
+                        for band, bucket in enumerate(bands[row]):
+                            batch_buckets.setdefault((band, int(bucket)), []).append((item, position, signatures[row]))
+                    continue
+
+                plan.duplicates += 1
+                if not own_file and file_info.get('file_hash'):
+                    plan.aliases[target] = {'file_hash': file_info['file_hash'], 'filename': file_info.get('filename')}
+
+            plan.signatures = signatures[plan.keep]
+            plans.append(plan)
+
+        checked = sum(len(chunks) for _, chunks, _ in items)
+        collapsed = sum(plan.duplicates for plan in plans)
+        self.stats["chunks_checked"] += checked
+        self.stats["duplicates_collapsed"] += collapsed
+        self.stats["last_dedup_seconds"] = round(time.time() - start_time, 3)
+        if collapsed:
+            logger.info(f"🧬 Collapsed {collapsed}/{checked} near-duplicate chunks "
+                        f"({self.stats['last_dedup_seconds']}s)")
+        return plans
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = len(self._bands)
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "params": self.params,
+            "cached_band_tables": cached
+        }
+
+
+def dedup_report(snapshot) -> Dict[str, Any]:
+    """
+    How much near-duplicate collapsing shrank the library
+
+    Args:
+        snapshot: SpecSnapshot
+
+    Returns:
+        Library-wide totals and the files with collapsed chunks
+    """
+    files = snapshot.metadata.get('files', [])
+    ingested = sum(int(f.get('chunk_count') or 0) for f in files)
+    collapsed = sum(int(f.get('duplicate_chunks') or 0) for f in files)
+    row_bytes = 0
+    for segment in snapshot.segments:
+        if segment.matrix.ndim == 2 and segment.matrix.shape[1]:
+            row_bytes = int(segment.matrix.shape[1] * segment.matrix.dtype.itemsize)
+            break
+
+    return {
+        "library_version": snapshot.version,
+        "chunks_ingested": ingested,
+        "chunks_stored": len(snapshot),
+        "duplicates_collapsed": collapsed,
+        "shrink_percent": round(100 * collapsed / ingested, 1) if ingested else 0.0,
+        "embedding_bytes_saved": collapsed * row_bytes,
+        "shared_chunks": len(snapshot.alias_sources),
+        "alias_references": sum(len(sources) for sources in snapshot.alias_sources.values()),
+        "files": sorted(
+            ({
+                "filename": f.get('filename'),
+                "file_hash": f.get('file_hash'),
+                "chunk_count": f.get('chunk_count'),
+                "duplicate_chunks": int(f.get('duplicate_chunks') or 0)
+            } for f in files if f.get('duplicate_chunks')),
+            key=lambda f: -f['duplicate_chunks']
+        )
+    }
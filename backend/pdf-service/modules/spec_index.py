@@ -0,0 +1,914 @@
+#!/usr/bin/env python3
+"""
+Resident Spec Index
+Keeps the spec library in process memory and reloads it only when the
+on-disk library version changes
+"""
+
+import os
+import copy
+import json
+import time
+import pickle
+import bisect
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence, Iterator, Tuple
+
+import numpy as np
+
+from modules.spec_mmap_store import (
+    Segment,
+    write_segment,
+    write_library_manifest,
+    read_library_manifest,
+    open_library,
+    segment_dir,
+    store_root,
+    prune_store,
+    open_segment,
+    new_segment_id,
+    migrate_pickle_library
+)
+from modules.spec_ann import AnnIndexer
+from modules.spec_dedup import SpecDeduper, alias_key, parse_alias_key
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines - in-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_FILENAME = 'spec_library.version'
+
+
+def _empty_metadata() -> Dict[str, Any]:
+    return {
+        'files': [],
+        'total_chunks': 0,
+        'last_updated': None
+    }
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write bytes to a temp file next to path and rename it into place"""
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def as_embedding_matrix(embeddings: Any, dim: Optional[int] = None) -> np.ndarray:
+    """Convert list-of-lists / tensor / ndarray embeddings to a contiguous float32 matrix"""
+    if embeddings is None or (hasattr(embeddings, '__len__') and len(embeddings) == 0):
+        return np.zeros((0, dim or 0), dtype=np.float32)
+    if hasattr(embeddings, 'detach'):
+        embeddings = embeddings.detach().cpu().numpy()
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix
+
+
+def unit_normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    Return a row-normalized float32 matrix
+
+    Spec embeddings are normally stored normalized already, in which case
+    the input array is returned as-is without a copy.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.size == 0:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1)
+    if np.all(np.abs(norms - 1.0) < 1e-3):
+        return matrix
+    norms[norms == 0] = 1.0
+    return matrix / norms[:, None]
+
+
+def top_k_scores(scores: np.ndarray, top_k: int):
+    """
+    Top-k per row using argpartition instead of a full sort
+
+    Args:
+        scores: (n_queries, n_specs) similarity matrix
+        top_k: Number of matches to keep per query
+
+    Returns:
+        Tuple of (indices, scores), each (n_queries, k), best match first
+    """
+    k = min(top_k, scores.shape[1])
+    if k == 0:
+        empty = np.zeros((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    if k < scores.shape[1]:
+        candidate_idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidate_idx = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidate_idx, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidate_idx, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def tombstone_key(segment_id: str, file_hash: str) -> str:
+    """Manifest tombstone entry for one file's rows in one segment"""
+    return f"{segment_id}:{file_hash}"
+
+
+class ChainedChunks(Sequence[str]):
+    """Chunk texts of several segments addressed by one global index"""
+
+    def __init__(self, segments: List[Segment], offsets: List[int]):
+        self._segments = segments
+        self._offsets = offsets
+        self._total = offsets[-1] + len(segments[-1]) if segments else 0
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += self._total
+        if not 0 <= index < self._total:
+            raise IndexError("chunk index out of range")
+        position = bisect.bisect_right(self._offsets, index) - 1
+        return self._segments[position].chunks[index - self._offsets[position]]
+
+    def __iter__(self) -> Iterator[str]:
+        for segment in self._segments:
+            yield from segment.chunks
+
+
+class SpecSnapshot:
+    """
+    Immutable view of one version of the spec library
+
+    Readers hold on to a snapshot for the duration of a request, so a
+    concurrent publish never changes the data underneath them. The library
+    is a list of segments; tombstoned files stay on disk until compaction
+    but are masked out of every search. A row that other files' collapsed
+    near-duplicates alias (see spec_dedup) stays live while any of them
+    does. Segments with an ANN index (see spec_ann) are searched through
+    it, the rest exactly.
+    """
+
+    def __init__(self, segments: List[Segment], tombstones: Sequence[str], metadata: Dict[str, Any], version: int,
+                 ann: Optional[AnnIndexer] = None, aliases: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.segments = segments
+        self.tombstones = frozenset(tombstones)
+        self.metadata = metadata
+        self.version = version
+        self.ann = ann
+        self.aliases = aliases or {}
+
+        aliased_rows: Dict[str, List[int]] = {}
+        for key in self.aliases:
+            segment_id, row = parse_alias_key(key)
+            aliased_rows.setdefault(segment_id, []).append(row)
+
+        self.offsets: List[int] = []
+        self.live_masks: List[Optional[np.ndarray]] = []
+        # Global row -> filenames of the collapsed duplicates it stands for
+        self.alias_sources: Dict[int, List[str]] = {}
+        position = 0
+        live = 0
+        for segment in segments:
+            self.offsets.append(position)
+            mask = None
+            dead_ranges = [f for f in segment.files
+                           if tombstone_key(segment.segment_id, f.get('file_hash')) in self.tombstones]
+            if dead_ranges:
+                mask = np.ones(len(segment), dtype=bool)
+                for file_range in dead_ranges:
+                    mask[file_range['start']:file_range['end']] = False
+            for row in aliased_rows.get(segment.segment_id, ()):
+                if row < len(segment):
+                    if mask is not None:
+                        mask[row] = True
+                    self.alias_sources[position + row] = [
+                        a.get('filename') for a in self.aliases[alias_key(segment.segment_id, row)]]
+            self.live_masks.append(mask)
+            position += len(segment)
+            live += len(segment) if mask is None else int(mask.sum())
+
+        self.chunks = ChainedChunks(segments, self.offsets)
+        self.live_count = live
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    @property
+    def dead_count(self) -> int:
+        return len(self.chunks) - self.live_count
+
+    @property
+    def dim(self) -> int:
+        for segment in self.segments:
+            if segment.matrix.ndim == 2 and segment.matrix.shape[1]:
+                return int(segment.matrix.shape[1])
+        return 0
+
+    def sources(self, index: int) -> List[str]:
+        """
+        Live spec files containing chunk index
+
+        The file the row was ingested from (unless it was removed) followed
+        by the files whose near-duplicate chunk was collapsed onto it. Empty
+        for rows without file ranges (legacy libraries).
+        """
+        position = bisect.bisect_right(self.offsets, index) - 1
+        segment = self.segments[position]
+        row = index - self.offsets[position]
+        names = [f.get('filename') for f in segment.files
+                 if f['start'] <= row < f['end']
+                 and tombstone_key(segment.segment_id, f.get('file_hash')) not in self.tombstones]
+        return names + [name for name in self.alias_sources.get(index, []) if name not in names]
+
+    def search(self, queries: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cosine search over every live segment
+
+        Each segment is scored and reduced to its own top-k, then the
+        per-segment candidates are merged - segments are never
+        concatenated. Segments with an ANN index return exactly rescored
+        candidates from it; the others are scored with one GEMM.
+
+        Args:
+            queries: (n_queries, dim) row-normalized query embeddings
+            top_k: Matches to return per query
+
+        Returns:
+            Tuple of (indices, scores), each (n_queries, <=k), indices into
+            self.chunks. Tombstoned rows can only appear with a -inf score.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        candidate_idx = []
+        candidate_scores = []
+        for segment, offset, mask in zip(self.segments, self.offsets, self.live_masks):
+            if len(segment) == 0 or (mask is not None and not mask.any()):
+                continue
+            found = self.ann.search(segment, queries, top_k, mask) if self.ann is not None else None
+            if found is not None:
+                idx, segment_scores = found
+            else:
+                scores = queries @ segment.matrix.T
+                if mask is not None:
+                    scores[:, ~mask] = -np.inf
+                idx, segment_scores = top_k_scores(scores, top_k)
+            candidate_idx.append(idx + offset)
+            candidate_scores.append(segment_scores)
+
+        if not candidate_idx:
+            empty = np.zeros((queries.shape[0], 0))
+            return empty.astype(np.int64), empty
+
+        merged_idx = np.hstack(candidate_idx)
+        merged_scores = np.hstack(candidate_scores)
+        order, scores = top_k_scores(merged_scores, top_k)
+        return np.take_along_axis(merged_idx, order, axis=1), scores
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        One (n, dim) float32 matrix aligned with self.chunks
+
+        Built on first use for consumers that still need a single array;
+        tombstoned rows are zeroed. A single float32 segment without
+        tombstones is returned as its memory map, without a copy. Search
+        does not use this.
+        """
+        if self._matrix is None and len(self.segments) == 1 and self.live_masks[0] is None \
+                and self.segments[0].matrix.dtype == np.float32:
+            self._matrix = self.segments[0].matrix
+        if self._matrix is None:
+            parts = []
+            for segment, mask in zip(self.segments, self.live_masks):
+                if len(segment) == 0:
+                    continue
+                part = np.array(segment.matrix, dtype=np.float32)
+                if mask is not None:
+                    part[~mask] = 0.0
+                parts.append(part)
+            matrix = np.vstack(parts) if parts else np.zeros((0, self.dim), dtype=np.float32)
+            matrix.setflags(write=False)
+            self._matrix = matrix
+        return self._matrix
+
+    def iter_live(self) -> Iterator[Tuple[Segment, np.ndarray]]:
+        """Yield (segment, live row indices) for every segment"""
+        for segment, mask in zip(self.segments, self.live_masks):
+            rows = np.arange(len(segment)) if mask is None else np.flatnonzero(mask)
+            yield segment, rows
+
+    def live_chunks(self) -> List[str]:
+        """Texts of every live row, in order"""
+        chunks: List[str] = []
+        for segment, rows in self.iter_live():
+            chunks.extend(segment.chunks[int(i)] for i in rows)
+        return chunks
+
+    def to_library(self) -> Dict[str, Any]:
+        """Return a mutable library dict of live rows (the shape load_spec_library has always returned)"""
+        parts = [np.asarray(segment.matrix[rows], dtype=np.float32)
+                 for segment, rows in self.iter_live() if len(rows)]
+        return {
+            'chunks': self.live_chunks(),
+            'embeddings': np.vstack(parts) if parts else np.zeros((0, self.dim), dtype=np.float32),
+            'metadata': copy.deepcopy(self.metadata)
+        }
+
+
+class InMemorySegment(Segment):
+    """Segment held in process memory (legacy pickle fallback)"""
+
+    def __init__(self, chunks: List[str], matrix: np.ndarray):
+        super().__init__('in-memory', chunks, matrix, {'files': []})
+
+
+class SpecIndex:
+    """
+    Process-resident, append-only spec library with a monotonically
+    increasing version
+
+    The library is only reopened when the version file on disk changes.
+    Every ingested spec file is written as a new immutable memory-mapped
+    segment (see spec_mmap_store); a per-version manifest lists the live
+    segments and the tombstoned files. Writers write the new segment,
+    manifest and metadata first and the version file last, so readers never
+    see a half-written library and never wait on a writer. A background
+    compactor merges small segments and drops tombstoned rows.
+    """
+
+    def __init__(self, data_path: str, embeddings_path: str, metadata_path: str,
+                 dtype: Optional[str] = None, write_legacy_pickle: Optional[bool] = None):
+        """
+        Args:
+            data_path: Directory holding the spec library
+            embeddings_path: Path to the legacy chunks/embeddings pickle
+            metadata_path: Path to the spec metadata JSON
+            dtype: Embedding storage dtype (float32 or float16)
+            write_legacy_pickle: Also export spec_embeddings.pkl (in the
+                background) for modules that still read it directly
+        """
+        self.data_path = data_path
+        self.embeddings_path = embeddings_path
+        self.metadata_path = metadata_path
+        self.version_path = os.path.join(data_path, VERSION_FILENAME)
+        self.dtype = dtype or os.getenv('SPEC_EMBEDDING_DTYPE', 'float32')
+        if write_legacy_pickle is None:
+            write_legacy_pickle = os.getenv('SPEC_WRITE_LEGACY_PICKLE', 'false').lower() == 'true'
+        self.write_legacy_pickle = write_legacy_pickle
+
+        self.small_segment_rows = int(os.getenv('SPEC_SMALL_SEGMENT_ROWS', 5000))
+        self.compaction_min_segments = int(os.getenv('SPEC_COMPACTION_MIN_SEGMENTS', 4))
+        self.ann = AnnIndexer(data_path)
+        self.dedup = SpecDeduper(data_path)
+
+        self._snapshot: Optional[SpecSnapshot] = None
+        self._version_stat = None
+        self._reload_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._maintenance_thread: Optional[threading.Thread] = None
+        self._maintenance_stop = threading.Event()
+        self._exported_version = None
+
+        self.stats = {
+            "reloads": 0,
+            "publishes": 0,
+            "compactions": 0,
+            "last_reload_seconds": 0.0,
+            "last_compaction_seconds": 0.0
+        }
+
+    # === READ PATH ===
+
+    def snapshot(self) -> SpecSnapshot:
+        """Return the current library snapshot, reloading only if the on-disk version changed"""
+        current = self._snapshot
+        if current is not None and self._version_stat == self._stat_version_file():
+            return current
+
+        # Only one thread reloads; everyone else keeps serving the old snapshot
+        if current is not None and not self._reload_lock.acquire(blocking=False):
+            return current
+        if current is None:
+            self._reload_lock.acquire()
+        try:
+            version_stat = self._stat_version_file()
+            if self._snapshot is None or self._version_stat != version_stat:
+                self._snapshot = self._load_from_disk()
+                self._version_stat = version_stat
+            return self._snapshot
+        finally:
+            self._reload_lock.release()
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
+
+    def _stat_version_file(self):
+        try:
+            st = os.stat(self.version_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _read_disk_version(self) -> int:
+        try:
+            with open(self.version_path, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _open_version(self, version: int, metadata: Optional[Dict[str, Any]] = None) -> Optional[SpecSnapshot]:
+        opened = open_library(self.data_path, version) if version > 0 else None
+        if opened is None:
+            return None
+        segments, manifest = opened
+        if metadata is None:
+            metadata = read_metadata_file(self.metadata_path)
+        snapshot = SpecSnapshot(segments, manifest.get('tombstones', []), metadata, version, ann=self.ann,
+                                aliases=manifest.get('aliases'))
+        metadata['total_chunks'] = len(snapshot)
+        self.ann.retain(segment.segment_id for segment in segments)
+        self.dedup.retain(segment.segment_id for segment in segments)
+        return snapshot
+
+    def _load_from_disk(self) -> SpecSnapshot:
+        start_time = time.time()
+        snapshot = None
+        for _ in range(3):
+            try:
+                snapshot = self._open_version(self._read_disk_version())
+                break
+            except FileNotFoundError:
+                # Pruned by a concurrent writer between reading the version and opening it
+                continue
+
+        # One-shot migration of a library that only exists as a pickle
+        if snapshot is None and os.path.exists(self.embeddings_path):
+            try:
+                with self._locked():
+                    # Another worker may have migrated or published while we waited for the lock
+                    snapshot = self._open_version(self._read_disk_version())
+                    if snapshot is None:
+                        migrated = migrate_pickle_library(self.data_path, self.embeddings_path,
+                                                          self.metadata_path, dtype=self.dtype)
+                        if migrated:
+                            snapshot = self._open_version(migrated)
+            except Exception as e:
+                logger.warning(f"Spec store migration failed, reading pickle directly: {e}")
+
+        if snapshot is None:
+            chunks, embeddings, metadata = read_library_files(self.embeddings_path, self.metadata_path)
+            matrix = unit_normalize(as_embedding_matrix(embeddings))
+            if len(chunks) != matrix.shape[0]:
+                logger.warning(f"Spec library mismatch: {len(chunks)} chunks vs {matrix.shape[0]} embeddings")
+            segments = [InMemorySegment(chunks, matrix)] if chunks else []
+            snapshot = SpecSnapshot(segments, [], metadata, self._read_disk_version())
+
+        self.stats["reloads"] += 1
+        self.stats["last_reload_seconds"] = round(time.time() - start_time, 3)
+        logger.info(f"📚 Spec index v{snapshot.version} loaded: {len(snapshot)} chunks in "
+                    f"{len(snapshot.segments)} segments ({self.stats['last_reload_seconds']}s)")
+        return snapshot
+
+    # === WRITE PATH ===
+
+    @contextmanager
+    def _locked(self):
+        """Serialize writers within the process and, where supported, across workers"""
+        with self._write_lock:
+            os.makedirs(store_root(self.data_path), exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(store_root(self.data_path), '.write.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _disk_state(self):
+        """Current (version, segment ids, tombstones, aliases, metadata) - call with the write lock held"""
+        version = self._read_disk_version()
+        manifest = read_library_manifest(self.data_path, version) if version > 0 else None
+        if manifest is None and os.path.exists(self.embeddings_path):
+            migrated = migrate_pickle_library(self.data_path, self.embeddings_path,
+                                              self.metadata_path, dtype=self.dtype)
+            if migrated:
+                version = migrated
+                manifest = read_library_manifest(self.data_path, version)
+        segment_ids = list(manifest['segments']) if manifest else []
+        tombstones = list(manifest.get('tombstones', [])) if manifest else []
+        aliases = copy.deepcopy(manifest.get('aliases', {})) if manifest else {}
+        return version, segment_ids, tombstones, aliases, read_metadata_file(self.metadata_path)
+
+    def _commit(self, previous_version: int, segment_ids: List[str], tombstones: List[str],
+                aliases: Dict[str, List[Dict[str, Any]]], metadata: Dict[str, Any]) -> SpecSnapshot:
+        """Publish a new library version - call with the write lock held"""
+        version = max(previous_version, self._snapshot.version if self._snapshot else 0) + 1
+
+        # Manifest and metadata first, version file last - a reader that sees
+        # the new version is guaranteed to find the matching data on disk
+        write_library_manifest(self.data_path, version, segment_ids, tombstones, aliases)
+        snapshot = self._open_version(version, metadata)
+        metadata['last_updated'] = datetime.utcnow().isoformat()
+        metadata['library_version'] = version
+        _atomic_write(self.metadata_path, json.dumps(metadata, indent=2).encode('utf-8'))
+        _atomic_write(self.version_path, str(version).encode('utf-8'))
+
+        snapshot.metadata = copy.deepcopy(metadata)
+        self._snapshot = snapshot
+        self._version_stat = self._stat_version_file()
+        prune_store(self.data_path, keep_versions=(version, previous_version))
+        self.stats["publishes"] += 1
+        logger.info(f"💾 Spec index v{version} published: {len(snapshot)} chunks in {len(segment_ids)} segments")
+        return snapshot
+
+    def _write_file_segment(self, chunks: Sequence[str], embeddings: Any, file_info: Optional[Dict[str, Any]],
+                            segment_id: Optional[str] = None, keep: Optional[List[int]] = None,
+                            signatures: Optional[np.ndarray] = None) -> str:
+        """Write one file's rows (only the rows in keep, if given) as a new segment"""
+        matrix = unit_normalize(as_embedding_matrix(embeddings))
+        if len(chunks) != matrix.shape[0]:
+            raise ValueError(f"{len(chunks)} chunks vs {matrix.shape[0]} embeddings")
+        if keep is not None:
+            chunks = [chunks[i] for i in keep]
+            matrix = matrix[keep]
+        files = []
+        if file_info and file_info.get('file_hash'):
+            files.append({
+                'file_hash': file_info['file_hash'],
+                'filename': file_info.get('filename'),
+                'start': 0,
+                'end': len(chunks)
+            })
+        segment_id = write_segment(self.data_path, list(chunks), matrix, files=files, dtype=self.dtype,
+                                   segment_id=segment_id)
+        if signatures is not None:
+            self.dedup.save_signatures(segment_id, signatures)
+        self._build_ann_index(segment_id)
+        return segment_id
+
+    def _build_ann_index(self, segment_id: str):
+        """Index a new segment before it is published (no-op for flat search or small segments)"""
+        if not self.ann.enabled:
+            return
+        try:
+            self.ann.build(open_segment(self.data_path, segment_id))
+        except Exception as e:
+            # The segment is still searched exactly; maintenance retries the build
+            logger.error(f"ANN index build failed for segment {segment_id}: {e}")
+
+    def append_segments(self, items: List[Tuple[Sequence[str], Any, Dict[str, Any]]],
+                        replace: bool = False) -> SpecSnapshot:
+        """
+        Add one immutable segment per ingested file
+
+        Cost is proportional to the new files only - existing segments are
+        never rewritten. With deduplication on, chunks that near-duplicate a
+        live row (or an earlier chunk of the batch) are not stored; the file
+        is recorded as an alias of that row instead.
+
+        Args:
+            items: (chunks, embeddings, file_info) per file; file_info is the
+                spec_metadata.json 'files' entry for that file
+            replace: Drop every existing segment (the upload 'replace' mode)
+
+        Returns:
+            The newly published snapshot
+        """
+        for attempt in range(3):
+            # A last attempt only deduplicates within the batch, so it cannot conflict
+            against_library = not replace and attempt < 2
+            ids = [new_segment_id() for _ in items]
+            plans = None
+            if self.dedup.enabled:
+                plans = self.dedup.collapse([(segment_id, chunks, info) for segment_id, (chunks, _, info)
+                                             in zip(ids, items)], self.snapshot() if against_library else None)
+
+            # Segments are written outside the lock - only the manifest swap is serialized.
+            # Other writers' prune_store leaves unlisted segments alone for a grace period.
+            new_ids, new_aliases, new_files = [], {}, []
+            for segment_id, (chunks, embeddings, info), plan in zip(ids, items, plans or [None] * len(items)):
+                info = copy.deepcopy(info) if info else None
+                if plan is None:
+                    new_ids.append(self._write_file_segment(chunks, embeddings, info, segment_id))
+                else:
+                    if plan.keep:
+                        new_ids.append(self._write_file_segment(chunks, embeddings, info, segment_id,
+                                                                keep=plan.keep, signatures=plan.signatures))
+                    for key, alias in plan.aliases.items():
+                        new_aliases.setdefault(key, []).append(alias)
+                    if info is not None:
+                        info['duplicate_chunks'] = plan.duplicates
+                if info:
+                    new_files.append(info)
+
+            with self._locked():
+                version, segment_ids, tombstones, aliases, metadata = self._disk_state()
+                if replace:
+                    segment_ids, tombstones, aliases, metadata['files'] = [], [], {}, []
+                live = set(segment_ids) | set(new_ids)
+                if all(parse_alias_key(key)[0] in live for key in new_aliases):
+                    segment_ids.extend(new_ids)
+                    for key, entries in new_aliases.items():
+                        aliases.setdefault(key, []).extend(entries)
+                    metadata['files'].extend(new_files)
+                    return self._commit(version, segment_ids, tombstones, aliases, metadata)
+
+            # A compaction moved rows these duplicates point at - deduplicate again
+            logger.info("Spec library compacted during ingest, re-checking duplicates")
+            for segment_id in new_ids:
+                shutil.rmtree(segment_dir(self.data_path, segment_id), ignore_errors=True)
+
+    def append_segment(self, chunks: Sequence[str], embeddings: Any, file_info: Dict[str, Any]) -> SpecSnapshot:
+        """Add one spec file as a new segment"""
+        return self.append_segments([(chunks, embeddings, file_info)])
+
+    def tombstone(self, file_hash: str) -> SpecSnapshot:
+        """
+        Remove a spec file from the library
+
+        Its rows are masked out of search immediately and physically
+        dropped by the next compaction. Tombstones name the segments that
+        held the file, so uploading it again later is not masked.
+        """
+        with self._locked():
+            version, segment_ids, tombstones, aliases, metadata = self._disk_state()
+            # Not self.snapshot(): a first load may be waiting on this lock to migrate a pickle
+            current = self._snapshot
+            if current is None or current.version != version:
+                current = self._open_version(version, metadata) or current
+            for segment in (current.segments if current is not None else []):
+                if segment.segment_id in segment_ids and any(f.get('file_hash') == file_hash for f in segment.files):
+                    tombstones.append(tombstone_key(segment.segment_id, file_hash))
+            # Rows the file only shared as a collapsed duplicate stop counting it
+            for key in list(aliases):
+                aliases[key] = [a for a in aliases[key] if a.get('file_hash') != file_hash]
+                if not aliases[key]:
+                    del aliases[key]
+            metadata['files'] = [f for f in metadata.get('files', []) if f.get('file_hash') != file_hash]
+            return self._commit(version, segment_ids, tombstones, aliases, metadata)
+
+    def publish(self, library: Dict[str, Any]) -> SpecSnapshot:
+        """
+        Replace the whole library with a library dict
+
+        Args:
+            library: Dict with 'chunks', 'embeddings' and 'metadata'
+
+        Returns:
+            The newly published snapshot
+        """
+        chunks = list(library['chunks'])
+        new_ids = [self._write_file_segment(chunks, library['embeddings'], None)] if chunks else []
+
+        with self._locked():
+            version, _, _, _, _ = self._disk_state()
+            metadata = copy.deepcopy(library['metadata'])
+            metadata.setdefault('files', [])
+            return self._commit(version, new_ids, [], {}, metadata)
+
+    # === COMPACTION ===
+
+    def compact(self, force: bool = False) -> bool:
+        """
+        Merge small segments and drop tombstoned rows
+
+        Args:
+            force: Merge every segment regardless of size thresholds
+
+        Returns:
+            True if a new library version was published
+        """
+        snapshot = self.snapshot()
+        if any(isinstance(segment, InMemorySegment) for segment in snapshot.segments):
+            return False
+
+        # With an ANN backend, segments too small to get an index are merged until they are big enough
+        small_rows = max(self.small_segment_rows, self.ann.min_rows) if self.ann.enabled else self.small_segment_rows
+        plan = []
+        has_dead = False
+        for segment, mask in zip(snapshot.segments, snapshot.live_masks):
+            live = len(segment) if mask is None else int(mask.sum())
+            # Rows of removed files that collapsed duplicates still alias are not dead
+            dead = live < len(segment)
+            has_dead = has_dead or dead
+            if force or dead or live < small_rows:
+                plan.append((segment, mask))
+
+        min_segments = 2 if force else max(2, self.compaction_min_segments)
+        if not has_dead and len(plan) < min_segments:
+            return False
+
+        # Build the merged segment outside the lock; writers keep appending meanwhile
+        start_time = time.time()
+        chunks: List[str] = []
+        parts = []
+        files = []
+        copied = []
+        # Removed files whose aliased rows are carried over stay tombstoned in the merged segment
+        carried_tombstones = set()
+        live_hashes = {f.get('file_hash') for segment, _ in plan for f in segment.files
+                       if tombstone_key(segment.segment_id, f.get('file_hash')) not in snapshot.tombstones}
+        for segment, mask in plan:
+            live_rows = np.ones(len(segment), dtype=bool) if mask is None else mask
+            live_before = np.concatenate([[0], np.cumsum(live_rows)])
+            base = len(chunks)
+            for file_range in segment.files:
+                start = base + int(live_before[file_range['start']])
+                end = base + int(live_before[file_range['end']])
+                if tombstone_key(segment.segment_id, file_range.get('file_hash')) in snapshot.tombstones:
+                    if start == end or file_range.get('file_hash') in live_hashes:
+                        continue
+                    carried_tombstones.add(file_range.get('file_hash'))
+                files.append({**file_range, 'start': start, 'end': end})
+            rows = np.flatnonzero(live_rows)
+            chunks.extend(segment.chunks[int(i)] for i in rows)
+            if len(rows):
+                parts.append(np.asarray(segment.matrix[rows], dtype=np.float32))
+            copied.append((segment, rows, live_rows, base + live_before[:-1]))
+
+        merged_id = None
+        if chunks:
+            merged_id = write_segment(self.data_path, chunks, np.vstack(parts), files=files, dtype=self.dtype)
+            if self.dedup.enabled:
+                self.dedup.carry_signatures(merged_id, [(segment, rows) for segment, rows, _, _ in copied])
+            self._build_ann_index(merged_id)
+
+        planned_ids = [segment.segment_id for segment, _ in plan]
+        with self._locked():
+            version, segment_ids, tombstones, aliases, metadata = self._disk_state()
+            if not all(segment_id in segment_ids for segment_id in planned_ids):
+                # Someone else compacted or replaced the library meanwhile
+                if merged_id:
+                    shutil.rmtree(segment_dir(self.data_path, merged_id), ignore_errors=True)
+                return False
+
+            first = segment_ids.index(planned_ids[0])
+            remaining = [s for s in segment_ids if s not in set(planned_ids)]
+            if merged_id:
+                remaining.insert(min(first, len(remaining)), merged_id)
+
+            # Tombstones applied by this compaction go; ones added while we
+            # were merging move over to the merged segment
+            kept = []
+            for key in tombstones:
+                segment_id, _, file_hash = key.partition(':')
+                if segment_id not in planned_ids:
+                    kept.append(key)
+                elif merged_id and (key not in snapshot.tombstones or file_hash in carried_tombstones):
+                    kept.append(tombstone_key(merged_id, file_hash))
+            tombstones = sorted(set(kept))
+
+            # Aliases follow their rows into the merged segment
+            positions = {segment.segment_id: (live_rows, merged_rows)
+                         for segment, _, live_rows, merged_rows in copied}
+            remapped = {}
+            for key, entries in aliases.items():
+                segment_id, row = parse_alias_key(key)
+                if segment_id not in positions:
+                    remapped.setdefault(key, []).extend(entries)
+                    continue
+                live_rows, merged_rows = positions[segment_id]
+                if merged_id and row < len(live_rows) and live_rows[row]:
+                    remapped.setdefault(alias_key(merged_id, merged_rows[row]), []).extend(entries)
+                else:
+                    logger.warning(f"Dropping aliases of compacted-away row {key}: "
+                                   f"{[a.get('filename') for a in entries]}")
+
+            self._commit(version, remaining, tombstones, remapped, metadata)
+
+        self.stats["compactions"] += 1
+        self.stats["last_compaction_seconds"] = round(time.time() - start_time, 3)
+        logger.info(f"🗜️ Compacted {len(plan)} segments into {1 if merged_id else 0} "
+                    f"({len(chunks)} rows) in {self.stats['last_compaction_seconds']}s")
+        return True
+
+    def export_legacy_pickle(self) -> bool:
+        """Write spec_embeddings.pkl for modules that still unpickle it directly"""
+        snapshot = self.snapshot()
+        if self._exported_version == snapshot.version:
+            return False
+        library = snapshot.to_library()
+        _atomic_write(self.embeddings_path, pickle.dumps((library['chunks'], library['embeddings'].tolist())))
+        self._exported_version = snapshot.version
+        return True
+
+    def start_background_maintenance(self, interval: Optional[float] = None):
+        """Run compaction, missing ANN index builds and the optional legacy pickle export on a daemon thread"""
+        if self._maintenance_thread and self._maintenance_thread.is_alive():
+            return
+        interval = interval or float(os.getenv('SPEC_COMPACTION_INTERVAL', 60))
+        self._maintenance_stop.clear()
+
+        def run():
+            while not self._maintenance_stop.wait(interval):
+                try:
+                    self.compact()
+                    if self.ann.enabled:
+                        self.ann.ensure(self.snapshot().segments)
+                    if self.write_legacy_pickle:
+                        self.export_legacy_pickle()
+                except Exception as e:
+                    logger.error(f"Spec library maintenance failed: {e}")
+
+        self._maintenance_thread = threading.Thread(target=run, name='spec-compactor', daemon=True)
+        self._maintenance_thread.start()
+        logger.info(f"🗜️ Spec library compactor running every {interval:.0f}s")
+
+    def stop_background_maintenance(self):
+        self._maintenance_stop.set()
+        if self._maintenance_thread:
+            self._maintenance_thread.join(timeout=5)
+            self._maintenance_thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            **self.stats,
+            "version": snapshot.version if snapshot else None,
+            "total_chunks": len(snapshot) if snapshot else 0,
+            "dead_chunks": snapshot.dead_count if snapshot else 0,
+            "segments": len(snapshot.segments) if snapshot else 0,
+            "tombstones": len(snapshot.tombstones) if snapshot else 0,
+            "matrix_bytes": int(sum(s.matrix.nbytes for s in snapshot.segments)) if snapshot else 0,
+            "ann": self.ann.get_stats(),
+            "dedup": self.dedup.get_stats()
+        }
+
+
+def read_metadata_file(metadata_path: str) -> Dict[str, Any]:
+    """Parse spec_metadata.json, normalizing legacy float timestamps"""
+    metadata = _empty_metadata()
+    if os.path.exists(metadata_path):
+        try:
+            with open(metadata_path, 'r') as f:
+                disk_metadata = json.load(f)
+            if isinstance(disk_metadata, dict):
+                # Convert float timestamps to ISO strings for backward compatibility
+                for file_info in disk_metadata.get('files', []):
+                    if isinstance(file_info.get('upload_time'), (int, float)):
+                        file_info['upload_time'] = datetime.fromtimestamp(file_info['upload_time']).isoformat()
+                if isinstance(disk_metadata.get('last_updated'), (int, float)):
+                    disk_metadata['last_updated'] = datetime.fromtimestamp(disk_metadata['last_updated']).isoformat()
+                metadata.update(disk_metadata)
+        except Exception as e:
+            logger.warning(f"Could not load metadata: {e}")
+
+    if 'files' not in metadata or metadata['files'] is None:
+        metadata['files'] = []
+    return metadata
+
+
+def read_library_files(embeddings_path: str, metadata_path: str):
+    """
+    Parse the legacy spec library files
+
+    Accepts both the (chunks, embeddings) tuple pickle and the dict pickle
+    written by older services.
+
+    Returns:
+        Tuple of (chunks, embeddings, metadata)
+    """
+    chunks: List[str] = []
+    embeddings: Any = []
+    metadata = _empty_metadata()
+
+    if os.path.exists(embeddings_path):
+        try:
+            with open(embeddings_path, 'rb') as f:
+                data = pickle.load(f)
+            # Handle different formats
+            if isinstance(data, tuple) and len(data) == 2:
+                chunks, embeddings = data
+                chunks = chunks if isinstance(chunks, list) else []
+                embeddings = embeddings if hasattr(embeddings, '__len__') else []
+            elif isinstance(data, dict):
+                chunks = data.get('chunks', [])
+                embeddings = data.get('embeddings', [])
+                if isinstance(data.get('metadata'), dict):
+                    metadata.update(data['metadata'])
+            else:
+                logger.warning(f"Unknown embeddings format: {type(data)}")
+        except Exception as e:
+            logger.warning(f"Could not load embeddings: {e}")
+
+    metadata.update(read_metadata_file(metadata_path))
+    metadata['total_chunks'] = len(chunks)
+
+    return list(chunks), embeddings, metadata
@@ -10,7 +10,7 @@ import os
 import pickle
 from pathlib import Path
 import pypdf
-from sentence_transformers import SentenceTransformer
+from modules.model_registry import get_embedding_model
 import numpy as np
 import logging
 import hashlib
@@ -35,7 +35,7 @@ class SpecLearningSystem:
         
         # Load sentence transformer
         logger.info("Loading sentence transformer for spec learning...")
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedder = get_embedding_model(consumer='SpecLearner')
         
         # Load existing embeddings if available
         self.spec_chunks = []
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Spec Library Store
+Binary, append-only on-disk format for the spec library. Every ingested
+spec file becomes an immutable segment: a raw .npy embedding matrix opened
+with np.memmap, a chunk text blob with an offsets index and a small JSON
+manifest. A versioned library manifest lists the live segments and the
+tombstoned files. Loading is zero-copy and the pages are shared through the
+OS page cache by every worker on the machine.
+
+Layout:
+    spec_store/segments/<id>/embeddings.npy   float32 or float16 (n, dim)
+    spec_store/segments/<id>/chunks.bin       UTF-8 chunk texts, concatenated
+    spec_store/segments/<id>/chunks.idx.npy   uint64 offsets (n + 1)
+    spec_store/segments/<id>/manifest.json    dtype, dim, count, file row ranges
+    spec_store/manifest-v00000012.json        live segments, tombstones + aliases
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence, Iterator
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_DIRNAME = 'spec_store'
+SEGMENTS_DIRNAME = 'segments'
+FORMAT_VERSION = 2
+EMBEDDINGS_FILE = 'embeddings.npy'
+CHUNKS_FILE = 'chunks.bin'
+OFFSETS_FILE = 'chunks.idx.npy'
+MANIFEST_FILE = 'manifest.json'
+
+SUPPORTED_DTYPES = ('float32', 'float16')
+# Unlisted segments younger than this may still be committed by another writer
+DEFAULT_PENDING_GRACE_SECONDS = 3600
+
+
+class MmapChunks(Sequence[str]):
+    """
+    Read-only sequence of chunk texts backed by a memory-mapped blob
+
+    Chunks are decoded on access, so holding the library costs no Python
+    string objects until a chunk is actually reported.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return max(0, len(self._offsets) - 1)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class Segment:
+    """One immutable, memory-mapped slice of the spec library"""
+
+    __slots__ = ('segment_id', 'chunks', 'matrix', 'files', 'manifest')
+
+    def __init__(self, segment_id: str, chunks: MmapChunks, matrix: np.ndarray, manifest: Dict[str, Any]):
+        self.segment_id = segment_id
+        self.chunks = chunks
+        self.matrix = matrix
+        self.manifest = manifest
+        # [{'file_hash', 'filename', 'start', 'end'}] - row ranges per source file
+        self.files = manifest.get('files', [])
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+
+# === PATHS ===
+
+def store_root(data_path: str) -> str:
+    return os.path.join(data_path, STORE_DIRNAME)
+
+
+def segment_dir(data_path: str, segment_id: str) -> str:
+    return os.path.join(store_root(data_path), SEGMENTS_DIRNAME, segment_id)
+
+
+def library_manifest_path(data_path: str, version: int) -> str:
+    return os.path.join(store_root(data_path), f"manifest-v{version:08d}.json")
+
+
+def legacy_version_dir(data_path: str, version: int) -> str:
+    """Single-directory layout written before segments existed"""
+    return os.path.join(store_root(data_path), f"v{version:08d}")
+
+
+def new_segment_id() -> str:
+    """Segment ids sort by creation time"""
+    return f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+
+
+# === SEGMENTS ===
+
+def _fsync_dir_files(directory: str):
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), 'rb') as f:
+            os.fsync(f.fileno())
+
+
+def write_segment(data_path: str,
+                  chunks: Sequence[str],
+                  matrix: np.ndarray,
+                  files: Optional[List[Dict[str, Any]]] = None,
+                  dtype: str = 'float32',
+                  segment_id: Optional[str] = None) -> str:
+    """
+    Write one immutable segment
+
+    The files are written into a temporary directory that is renamed into
+    place, so a segment directory is either complete or absent.
+
+    Args:
+        data_path: Spec data directory (usually /data)
+        chunks: Chunk texts aligned with matrix rows
+        matrix: (n, dim) embedding matrix
+        files: Row ranges per source file ({'file_hash', 'filename', 'start', 'end'})
+        dtype: Storage dtype, float32 or float16
+        segment_id: Explicit id (generated when omitted)
+
+    Returns:
+        The segment id
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    segment_id = segment_id or new_segment_id()
+    target = segment_dir(data_path, segment_id)
+    tmp_dir = f"{target}.tmp.{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    matrix = np.ascontiguousarray(matrix, dtype=np.dtype(dtype))
+    np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), matrix)
+
+    offsets = np.zeros(len(chunks) + 1, dtype=np.uint64)
+    with open(os.path.join(tmp_dir, CHUNKS_FILE), 'wb') as f:
+        position = 0
+        for i, chunk in enumerate(chunks):
+            encoded = chunk.encode('utf-8')
+            f.write(encoded)
+            position += len(encoded)
+            offsets[i + 1] = position
+    np.save(os.path.join(tmp_dir, OFFSETS_FILE), offsets)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'segment_id': segment_id,
+        'dtype': dtype,
+        'count': int(matrix.shape[0]),
+        'dim': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        'files': files or [],
+        'created': datetime.utcnow().isoformat()
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    _fsync_dir_files(tmp_dir)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp_dir, target)
+    return segment_id
+
+
+def _open_segment_dir(directory: str, segment_id: str) -> Optional[Segment]:
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') not in (1, FORMAT_VERSION):
+        raise ValueError(f"Unsupported spec store format: {manifest.get('format_version')}")
+
+    if manifest['count'] == 0:
+        matrix = np.zeros((0, manifest.get('dim', 0)), dtype=np.float32)
+        chunks = MmapChunks(np.zeros(0, dtype=np.uint8), np.zeros(1, dtype=np.uint64))
+        return Segment(segment_id, chunks, matrix, manifest)
+
+    matrix = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode='r')
+    offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode='r')
+    blob_path = os.path.join(directory, CHUNKS_FILE)
+    if os.path.getsize(blob_path) > 0:
+        blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+    else:
+        blob = np.zeros(0, dtype=np.uint8)
+
+    return Segment(segment_id, MmapChunks(blob, offsets), matrix, manifest)
+
+
+def open_segment(data_path: str, segment_id: str) -> Optional[Segment]:
+    """Open one segment without copying it into process memory"""
+    return _open_segment_dir(segment_dir(data_path, segment_id), segment_id)
+
+
+# === LIBRARY MANIFEST ===
+
+def write_library_manifest(data_path: str, version: int, segment_ids: List[str], tombstones: List[str],
+                           aliases: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+    """
+    Atomically write the manifest for one library version
+
+    aliases maps '<segment>:<row>' to the other spec files whose
+    near-duplicate chunk was collapsed onto that row (see spec_dedup).
+    """
+    from modules.spec_index import _atomic_write
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'segments': list(segment_ids),
+        'tombstones': sorted(set(tombstones)),
+        'aliases': aliases or {},
+        'created': datetime.utcnow().isoformat()
+    }
+    _atomic_write(library_manifest_path(data_path, version), json.dumps(manifest, indent=2).encode('utf-8'))
+
+
+def read_library_manifest(data_path: str, version: int) -> Optional[Dict[str, Any]]:
+    """
+    Read the manifest of one library version
+
+    A version written in the older single-directory layout is presented as
+    a library with one segment.
+    """
+    path = library_manifest_path(data_path, version)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    if os.path.exists(os.path.join(legacy_version_dir(data_path, version), MANIFEST_FILE)):
+        return {
+            'format_version': 1,
+            'version': version,
+            'segments': [f"../v{version:08d}"],
+            'tombstones': []
+        }
+    return None
+
+
+def open_library(data_path: str, version: int):
+    """
+    Open every live segment of one library version
+
+    Returns:
+        Tuple of (segments, manifest) or None if the version is absent
+    """
+    manifest = read_library_manifest(data_path, version)
+    if manifest is None:
+        return None
+
+    segments = []
+    for segment_id in manifest['segments']:
+        segment = _open_segment_dir(os.path.normpath(segment_dir(data_path, segment_id)), segment_id)
+        if segment is None:
+            raise FileNotFoundError(f"Spec store segment missing: {segment_id}")
+        segments.append(segment)
+    return segments, manifest
+
+
+def prune_store(data_path: str, keep_versions: Sequence[int], pending_grace: Optional[float] = None):
+    """
+    Remove manifests that are no longer current and segments none of them reference
+
+    Workers that still have an old segment mapped keep reading it safely -
+    unlinked files stay valid until the last mapping is closed.
+
+    Writers build segments before they take the write lock, so a segment no
+    manifest has listed yet may belong to an upload or compaction still in
+    flight in another worker. Such segments are only removed once nothing
+    has been written to them for pending_grace seconds (default
+    $SPEC_PENDING_SEGMENT_SECONDS or 3600); segments of the manifests being
+    removed here go right away.
+    """
+    root = store_root(data_path)
+    if not os.path.isdir(root):
+        return
+    if pending_grace is None:
+        pending_grace = float(os.getenv('SPEC_PENDING_SEGMENT_SECONDS', DEFAULT_PENDING_GRACE_SECONDS))
+
+    referenced = set()
+    keep_manifests = set()
+    for version in keep_versions:
+        if version <= 0:
+            continue
+        manifest = read_library_manifest(data_path, version)
+        if manifest:
+            keep_manifests.add(os.path.basename(library_manifest_path(data_path, version)))
+            referenced.update(os.path.normpath(segment_dir(data_path, s)) for s in manifest['segments'])
+
+    # Segments of the versions being dropped were committed, so they are not pending
+    retired = set()
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith('manifest-v') and name not in keep_manifests and '.tmp.' not in name:
+            try:
+                with open(path, 'r') as f:
+                    retired.update(os.path.normpath(segment_dir(data_path, s)) for s in json.load(f)['segments'])
+            except (OSError, ValueError, KeyError):
+                pass
+            os.remove(path)
+        elif name.startswith('v') and os.path.isdir(path) and os.path.normpath(path) not in referenced:
+            shutil.rmtree(path, ignore_errors=True)
+
+    segments_root = os.path.join(root, SEGMENTS_DIRNAME)
+    if os.path.isdir(segments_root):
+        now = time.time()
+        for name in os.listdir(segments_root):
+            path = os.path.normpath(os.path.join(segments_root, name))
+            if '.tmp.' in name or path in referenced:
+                continue
+            if path not in retired:
+                try:
+                    # Index and signature files land in the directory after it is renamed into place
+                    if now - os.stat(path).st_mtime < pending_grace:
+                        continue
+                except FileNotFoundError:
+                    continue
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# === MIGRATION ===
+
+def migrate_pickle_library(data_path: str,
+                           embeddings_path: str,
+                           metadata_path: str,
+                           dtype: str = 'float32') -> Optional[int]:
+    """
+    One-shot migration of the legacy pickle library to the binary format
+
+    Accepts both the (chunks, embeddings) tuple pickle and the dict pickle
+    that load_spec_library has always read. The whole pickle becomes one
+    segment; per-file row ranges are unknown for legacy data.
+
+    Returns:
+        The library version written, or None if there was nothing to migrate
+    """
+    from modules.spec_index import read_library_files, as_embedding_matrix, unit_normalize, VERSION_FILENAME, _atomic_write
+
+    if not os.path.exists(embeddings_path):
+        return None
+
+    chunks, embeddings, metadata = read_library_files(embeddings_path, metadata_path)
+    matrix = unit_normalize(as_embedding_matrix(embeddings))
+    if len(chunks) != matrix.shape[0]:
+        raise ValueError(f"Cannot migrate: {len(chunks)} chunks vs {matrix.shape[0]} embeddings")
+
+    version_path = os.path.join(data_path, VERSION_FILENAME)
+    try:
+        with open(version_path, 'r') as f:
+            version = int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        version = 0
+    version = max(version, 1)
+
+    segment_ids = []
+    if chunks:
+        segment_ids.append(write_segment(data_path, chunks, matrix, dtype=dtype))
+    write_library_manifest(data_path, version, segment_ids, [])
+    metadata['library_version'] = version
+    metadata['total_chunks'] = len(chunks)
+    _atomic_write(metadata_path, json.dumps(metadata, indent=2).encode('utf-8'))
+    _atomic_write(version_path, str(version).encode('utf-8'))
+
+    logger.info(f"📦 Migrated {len(chunks)} chunks from {embeddings_path} to spec store v{version}")
+    return version
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate spec_embeddings.pkl to the memory-mapped spec store")
+    parser.add_argument('--data-path', default='/data')
+    parser.add_argument('--dtype', default='float32', choices=SUPPORTED_DTYPES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    migrated = migrate_pickle_library(
+        args.data_path,
+        os.path.join(args.data_path, 'spec_embeddings.pkl'),
+        os.path.join(args.data_path, 'spec_metadata.json'),
+        dtype=args.dtype
+    )
+    print(f"Migrated to version {migrated}" if migrated else "Nothing to migrate")
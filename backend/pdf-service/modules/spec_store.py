@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Shared Spec Library Store
+One process-wide service every analyzer reads the spec library through.
+The library is held once (memory-mapped, see spec_index) instead of one
+unpickled copy per module, and a publish by any module or worker becomes
+visible everywhere without a restart.
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Sequence, Callable, Tuple
+
+import numpy as np
+
+from modules.spec_index import SpecIndex, SpecSnapshot, unit_normalize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_PATH = '/data'
+EMBEDDINGS_FILENAME = 'spec_embeddings.pkl'
+METADATA_FILENAME = 'spec_metadata.json'
+
+SOURCE_PATTERN = re.compile(r'\[Source: ([^\],]+)')
+
+SpecListener = Callable[[SpecSnapshot], None]
+
+
+def chunk_source(chunk: str) -> str:
+    """Spec file a chunk came from, read from its [Source: ...] tag"""
+    match = SOURCE_PATTERN.search(chunk)
+    return match.group(1).strip() if match else "Unknown"
+
+
+class SpecStore:
+    """
+    Typed, read-mostly facade over the spec library
+
+    Readers get the current matrix, chunks, metadata and version (or pin a
+    whole SpecSnapshot for a multi-step request). Modules that derive state
+    from the library subscribe() and are called once per new version,
+    whether the change was published in this process or by another worker.
+    """
+
+    def __init__(self, index: SpecIndex):
+        self.index = index
+        self._listeners: List[SpecListener] = []
+        self._listeners_lock = threading.Lock()
+        self._notified_version: Optional[int] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+        self.stats = {"notifications": 0, "listener_errors": 0}
+
+    @property
+    def data_path(self) -> str:
+        return self.index.data_path
+
+    # === READ API ===
+
+    def snapshot(self) -> SpecSnapshot:
+        """Current library version; hold on to it for consistent multi-step reads"""
+        snapshot = self.index.snapshot()
+        if snapshot.version != self._notified_version:
+            self._notify(snapshot)
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """(n, dim) unit-normalized float32 embeddings aligned with chunks (read-only)"""
+        return self.snapshot().matrix
+
+    @property
+    def chunks(self) -> Sequence[str]:
+        return self.snapshot().chunks
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.snapshot().metadata
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
+
+    def search(self, queries: Any, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray, SpecSnapshot]:
+        """
+        Cosine search of query embeddings against the live library
+
+        Args:
+            queries: One embedding (dim,) or a batch (n, dim); normalized here
+            top_k: Matches per query
+
+        Returns:
+            Tuple of (indices, scores, snapshot); indices are into snapshot.chunks
+        """
+        snapshot = self.snapshot()
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        indices, scores = snapshot.search(unit_normalize(queries), top_k)
+        return indices, scores, snapshot
+
+    # === WRITE API ===
+
+    def publish(self, library: Dict[str, Any]) -> SpecSnapshot:
+        self.index.publish(library)
+        return self.snapshot()
+
+    def append_segments(self, items, replace: bool = False) -> SpecSnapshot:
+        self.index.append_segments(items, replace=replace)
+        return self.snapshot()
+
+    def append_segment(self, chunks: Sequence[str], embeddings: Any, file_info: Dict[str, Any]) -> SpecSnapshot:
+        self.index.append_segment(chunks, embeddings, file_info)
+        return self.snapshot()
+
+    def tombstone(self, file_hash: str) -> SpecSnapshot:
+        self.index.tombstone(file_hash)
+        return self.snapshot()
+
+    # === CHANGE NOTIFICATIONS ===
+
+    def subscribe(self, listener: SpecListener) -> Callable[[], None]:
+        """
+        Call listener(snapshot) whenever a new library version is seen
+
+        Returns:
+            A function that removes the listener
+        """
+        with self._listeners_lock:
+            self._listeners.append(listener)
+        return lambda: self.unsubscribe(listener)
+
+    def unsubscribe(self, listener: SpecListener):
+        with self._listeners_lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self, snapshot: SpecSnapshot):
+        with self._listeners_lock:
+            if snapshot.version == self._notified_version:
+                return
+            first_load = self._notified_version is None
+            self._notified_version = snapshot.version
+            listeners = list(self._listeners)
+
+        if first_load:
+            return
+        logger.info(f"📚 Spec library changed: v{snapshot.version} ({len(snapshot)} chunks)")
+        self.stats["notifications"] += 1
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                self.stats["listener_errors"] += 1
+                logger.error(f"Spec library listener failed: {e}")
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Poll the version file so publishes by other workers notify listeners promptly"""
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+        interval = interval or float(os.getenv('SPEC_STORE_POLL_INTERVAL', 5))
+        self._watch_stop.clear()
+
+        def run():
+            while not self._watch_stop.wait(interval):
+                try:
+                    self.snapshot()
+                except Exception as e:
+                    logger.error(f"Spec library watch failed: {e}")
+
+        self._watch_thread = threading.Thread(target=run, name='spec-store-watch', daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        self._watch_stop.set()
+        if self._watch_thread:
+            self._watch_thread.join(timeout=5)
+            self._watch_thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.index.get_stats(),
+            **self.stats,
+            "listeners": len(self._listeners),
+            "watching": bool(self._watch_thread and self._watch_thread.is_alive())
+        }
+
+
+_stores: Dict[str, SpecStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_spec_store(path: Optional[str] = None) -> SpecStore:
+    """
+    Process-wide SpecStore for a data directory
+
+    Args:
+        path: The data directory, or the spec_embeddings.pkl path modules
+            used to be configured with. Defaults to $DATA_PATH or /data.
+    """
+    path = str(path or os.getenv('DATA_PATH', DEFAULT_DATA_PATH))
+    data_path = os.path.dirname(path) if path.endswith('.pkl') else path
+    key = os.path.realpath(data_path)
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            try:
+                os.makedirs(data_path, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Spec data directory {data_path} unavailable: {e}")
+            index = SpecIndex(
+                data_path,
+                os.path.join(data_path, EMBEDDINGS_FILENAME),
+                os.path.join(data_path, METADATA_FILENAME)
+            )
+            store = SpecStore(index)
+            _stores[key] = store
+        return store
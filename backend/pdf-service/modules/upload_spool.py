@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Spooled Uploads
+Streams an UploadFile to a temp file in fixed-size chunks while hashing it,
+so spec books and audits are never held in memory whole. Small uploads
+stay in memory; anything over UPLOAD_SPOOL_MEMORY_MB goes to disk and is
+handed to the PDF extractors by path (opened as a file handle, not read).
+"""
+
+import io
+import os
+import hashlib
+import logging
+import shutil
+import tempfile
+import threading
+from typing import Optional, Union, BinaryIO
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """The upload exceeded the endpoint's size limit (detected while streaming)"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """
+    An uploaded file, spooled and hashed
+
+    Attributes:
+        filename: Client filename
+        size: Bytes received
+        sha256: Full hex digest of the content
+    """
+
+    def __init__(self, filename: str, memory_limit: Optional[int] = None, spool_dir: Optional[str] = None):
+        self.filename = filename
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self.path: Optional[str] = None
+        self._memory_limit = memory_limit if memory_limit is not None else \
+            int(float(os.getenv('UPLOAD_SPOOL_MEMORY_MB', 8)) * 1024 * 1024)
+        self._spool_dir = spool_dir or os.getenv('UPLOAD_SPOOL_DIR') or None
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file: Optional[BinaryIO] = None
+        self._digest = hashlib.sha256()
+
+    @property
+    def file_hash(self) -> str:
+        """Short hash used for spec library deduplication (matches get_file_hash)"""
+        return self.sha256[:16]
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """What to pass to pdf_extraction / pdf_ocr: the bytes if small, else the path"""
+        return self._buffer.getvalue() if self.in_memory else self.path
+
+    def write(self, data: bytes):
+        self._digest.update(data)
+        self.size += len(data)
+        if self._file is None and self.size > self._memory_limit:
+            self._rollover()
+        (self._file or self._buffer).write(data)
+
+    def _rollover(self):
+        handle, self.path = tempfile.mkstemp(suffix='.pdf', prefix='upload_', dir=self._spool_dir)
+        self._file = os.fdopen(handle, 'wb')
+        self._file.write(self._buffer.getbuffer())
+        self._buffer = None
+
+    def finish(self) -> 'SpooledUpload':
+        self.sha256 = self._digest.hexdigest()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return self
+
+    def open(self) -> BinaryIO:
+        """A fresh binary handle positioned at the start of the content"""
+        if self.in_memory:
+            return io.BytesIO(self._buffer.getbuffer())
+        return open(self.path, 'rb')
+
+    def read_bytes(self) -> bytes:
+        """The whole content - only for callers that have no streaming path"""
+        with self.open() as f:
+            return f.read()
+
+    def persist(self, directory: str) -> str:
+        """
+        Content-addressed copy at <directory>/<sha256>.pdf that outlives this upload
+
+        An identical file already there is reused (its mtime refreshed).
+        """
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, f"{self.sha256}.pdf")
+        if os.path.exists(target):
+            os.utime(target)
+            return target
+        temp_target = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if self.in_memory:
+            with open(temp_target, 'wb') as f:
+                f.write(self._buffer.getbuffer())
+        else:
+            try:
+                os.link(self.path, temp_target)
+            except OSError:
+                shutil.copyfile(self.path, temp_target)
+        os.replace(temp_target, target)
+        return target
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self._buffer = io.BytesIO()
+
+    def __enter__(self) -> 'SpooledUpload':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def spool_upload(upload, max_bytes: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> SpooledUpload:
+    """
+    Stream an UploadFile into a SpooledUpload
+
+    Args:
+        upload: FastAPI UploadFile (anything with async read(n) and filename)
+        max_bytes: Stop reading and raise UploadTooLarge past this size
+        chunk_size: Bytes per read
+
+    Returns:
+        The finished SpooledUpload; close it (or use it as a context manager)
+    """
+    spooled = SpooledUpload(getattr(upload, 'filename', None) or 'upload.pdf')
+    try:
+        while True:
+            data = await upload.read(chunk_size)
+            if not data:
+                break
+            spooled.write(data)
+            if max_bytes is not None and spooled.size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled.finish()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Parallel PDF Text Extraction
+Shared page-level extraction engine for the spec, audit, as-built and
+mega-bundle pipelines. Page ranges of large documents are extracted on a
+reusable process pool and streamed back in page order; small documents
+(or PDF_EXTRACT_WORKERS=1) are extracted serially in-process.
+
+Kept at the top level rather than in modules/ so pool workers only import
+this file and the PDF library - not torch via modules/__init__.
+"""
+
+import os
+import time
+import logging
+import tempfile
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[bytes, str, os.PathLike]
+BACKENDS = ('pypdf', 'pdfplumber')
+
+
+@dataclass
+class PageText:
+    """Text of one page (page_number is 1-based) and how long it took"""
+    page_number: int
+    text: str
+    seconds: float
+    error: Optional[str] = None
+
+
+def default_workers() -> int:
+    return max(1, int(os.getenv('PDF_EXTRACT_WORKERS', min(4, os.cpu_count() or 1))))
+
+
+def parallel_min_pages() -> int:
+    return int(os.getenv('PDF_PARALLEL_MIN_PAGES', 24))
+
+
+# === BACKENDS (run in pool workers) ===
+
+@contextmanager
+def _open_reader(path: str, backend: str):
+    if backend == 'pdfplumber':
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            yield pdf
+        return
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+    # Given a path pypdf reads the whole file into memory; a handle is read lazily
+    with open(path, 'rb') as f:
+        yield PdfReader(f)
+
+
+def count_pages(path: str, backend: str = 'pypdf') -> int:
+    with _open_reader(path, backend) as reader:
+        return len(reader.pages)
+
+
+def _iter_range(path: str, backend: str, start: int, stop: int) -> Iterator[Tuple[int, str, float, Optional[str]]]:
+    with _open_reader(path, backend) as reader:
+        for index in range(start, stop):
+            page_start = time.perf_counter()
+            try:
+                text = reader.pages[index].extract_text() or ""
+                error = None
+            except Exception as e:
+                text, error = "", str(e)
+            yield index + 1, text, time.perf_counter() - page_start, error
+
+
+def _extract_range(path: str, backend: str, start: int, stop: int) -> List[Tuple[int, str, float, Optional[str]]]:
+    """Extract pages [start, stop) - the unit of work sent to a pool worker"""
+    return list(_iter_range(path, backend, start, stop))
+
+
+# === POOL ===
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _start_method() -> str:
+    method = os.getenv('PDF_EXTRACT_START_METHOD')
+    if method:
+        return method
+    # forkserver avoids forking the threaded server process and, with this
+    # module as the only preload, keeps the app's models out of the workers
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            context = multiprocessing.get_context(_start_method())
+            if context.get_start_method() == 'forkserver':
+                context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the extraction workers (application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# === STATS ===
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "documents": 0,
+    "parallel_documents": 0,
+    "serial_fallbacks": 0,
+    "pages": 0,
+    "page_errors": 0,
+    "page_seconds": 0.0,
+    "wall_seconds": 0.0,
+    "slowest_page": None,
+    "last_document": None
+}
+
+
+def _record(pages: List[PageText], wall_seconds: float, mode: str, workers: int):
+    with _stats_lock:
+        _stats["documents"] += 1
+        _stats["parallel_documents"] += mode == 'parallel'
+        _stats["pages"] += len(pages)
+        _stats["page_errors"] += sum(1 for page in pages if page.error)
+        _stats["page_seconds"] += sum(page.seconds for page in pages)
+        _stats["wall_seconds"] += wall_seconds
+        slowest = max(pages, key=lambda page: page.seconds, default=None)
+        if slowest and (_stats["slowest_page"] is None or slowest.seconds > _stats["slowest_page"]["seconds"]):
+            _stats["slowest_page"] = {"page": slowest.page_number, "seconds": round(slowest.seconds, 4)}
+        _stats["last_document"] = {
+            "pages": len(pages),
+            "mode": mode,
+            "workers": workers,
+            "wall_seconds": round(wall_seconds, 3),
+            "page_seconds": round(sum(page.seconds for page in pages), 3),
+            "page_p95_seconds": round(_percentile([page.seconds for page in pages], 95), 4)
+        }
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def get_extraction_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_page_ms"] = round(1000 * stats["page_seconds"] / stats["pages"], 2) if stats["pages"] else 0.0
+    stats["page_seconds"] = round(stats["page_seconds"], 3)
+    stats["wall_seconds"] = round(stats["wall_seconds"], 3)
+    stats["workers"] = default_workers()
+    stats["pool_running"] = _pool is not None
+    return stats
+
+
+# === PUBLIC API ===
+
+def _page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    # A few ranges per worker keeps the pool busy when some pages are slow
+    size = max(4, -(-page_count // (workers * 4)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def iter_pages(source: PdfSource,
+               backend: str = 'pypdf',
+               workers: Optional[int] = None,
+               min_parallel_pages: Optional[int] = None) -> Iterator[PageText]:
+    """
+    Extract a PDF page by page, in page order
+
+    Args:
+        source: PDF bytes or a file path
+        backend: 'pypdf' (PyPDF2 if pypdf is missing) or 'pdfplumber'
+        workers: Pool size; defaults to $PDF_EXTRACT_WORKERS
+        min_parallel_pages: Documents shorter than this are extracted
+            serially; defaults to $PDF_PARALLEL_MIN_PAGES
+
+    Yields:
+        PageText for every page; a page that fails has empty text and error set
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {backend}")
+    workers = workers or default_workers()
+    if multiprocessing.current_process().daemon:
+        # Daemonic processes (Celery prefork children) may not start a pool
+        workers = 1
+    min_parallel_pages = parallel_min_pages() if min_parallel_pages is None else min_parallel_pages
+
+    temp_path = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # Workers open the document by path so the bytes are not pickled per range
+        handle, temp_path = tempfile.mkstemp(suffix='.pdf', prefix='extract_')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(source)
+        path = temp_path
+    else:
+        path = os.fspath(source)
+
+    start_time = time.perf_counter()
+    pages: List[PageText] = []
+    futures = []
+    mode = 'serial'
+    try:
+        page_count = count_pages(path, backend)
+        ranges = _page_ranges(page_count, workers)
+        done = 0
+
+        if workers > 1 and page_count >= min_parallel_pages and len(ranges) > 1:
+            mode = 'parallel'
+            try:
+                pool = _get_pool(workers)
+                futures = [pool.submit(_extract_range, path, backend, start, stop) for start, stop in ranges]
+                for future in futures:
+                    for page in future.result():
+                        pages.append(PageText(*page))
+                        yield pages[-1]
+                    done += 1
+            except (BrokenProcessPool, OSError, RuntimeError, AssertionError) as e:
+                logger.warning(f"Parallel PDF extraction failed ({e}); continuing serially")
+                with _stats_lock:
+                    _stats["serial_fallbacks"] += 1
+                shutdown_pool()
+                mode = 'serial'
+
+        # Serially, one reader does the rest of the document
+        if done < len(ranges):
+            for page in _iter_range(path, backend, ranges[done][0], page_count):
+                pages.append(PageText(*page))
+                yield pages[-1]
+
+        _record(pages, time.perf_counter() - start_time, mode, workers if mode == 'parallel' else 1)
+    finally:
+        # A caller that stops reading early should not leave the pool busy
+        for future in futures:
+            future.cancel()
+        if temp_path:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+def extract_pages(source: PdfSource, **kwargs) -> List[PageText]:
+    """All pages of a PDF (see iter_pages)"""
+    return list(iter_pages(source, **kwargs))
+
+
+def extract_text(source: PdfSource, separator: str = "\n", **kwargs) -> str:
+    """Whole-document text, pages joined with separator (see iter_pages)"""
+    return separator.join(page.text for page in iter_pages(source, **kwargs))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Batched PDF OCR
+OCR stage for scanned pages. The low-text pages of a document are
+rasterized together (one pdftoppm call per run of nearby pages, written
+to a temp dir instead of re-parsing the PDF for every page), tesseract
+runs on a bounded thread pool, and the text is cached per (pdf sha256,
+page) so re-analyzing the same audit never OCRs a page twice.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[bytes, str, os.PathLike]
+
+
+def default_workers() -> int:
+    return max(1, int(os.getenv('OCR_WORKERS', 2)))
+
+
+def page_runs(pages: Iterable[int], max_gap: int = 2) -> List[Tuple[int, int]]:
+    """
+    Group 1-based page numbers into (first, last) runs to rasterize together
+
+    Pages up to max_gap apart share a run; rasterizing a couple of unneeded
+    pages is cheaper than another pass over the document.
+    """
+    runs: List[List[int]] = []
+    for page in sorted(set(pages)):
+        if runs and page - runs[-1][1] <= max_gap + 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return [(first, last) for first, last in runs]
+
+
+# === OCR CACHE ===
+
+class OCRCache:
+    """SQLite cache of OCR text keyed by (pdf sha256, page number)"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._local = threading.local()
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                conn = self._connection()
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS ocr_pages ('
+                    'pdf_hash TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL, '
+                    'created REAL NOT NULL, PRIMARY KEY (pdf_hash, page))'
+                )
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"OCR cache disabled ({path}): {e}")
+                self.path = None
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, pdf_hash: str, pages: List[int]) -> Dict[int, str]:
+        if not self.path or not pages:
+            return {}
+        try:
+            placeholders = ','.join('?' * len(pages))
+            rows = self._connection().execute(
+                f'SELECT page, text FROM ocr_pages WHERE pdf_hash = ? AND page IN ({placeholders})',
+                [pdf_hash, *pages]
+            )
+            return {page: text for page, text in rows}
+        except sqlite3.Error as e:
+            logger.warning(f"OCR cache read failed: {e}")
+            return {}
+
+    def put(self, pdf_hash: str, page: int, text: str):
+        if not self.path:
+            return
+        try:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO ocr_pages VALUES (?, ?, ?, ?)', (pdf_hash, page, text, time.time()))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"OCR cache write failed: {e}")
+
+
+_cache: Optional[OCRCache] = None
+_pool: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "documents": 0,
+    "pages_requested": 0,
+    "cache_hits": 0,
+    "pages_ocrd": 0,
+    "raster_calls": 0,
+    "raster_seconds": 0.0,
+    "ocr_seconds": 0.0,
+    "failures": 0
+}
+
+
+def get_ocr_cache() -> OCRCache:
+    global _cache
+    with _lock:
+        if _cache is None:
+            path = os.getenv('OCR_CACHE_PATH') or os.path.join(os.getenv('DATA_PATH', '/data'), 'ocr_cache.sqlite3')
+            _cache = OCRCache(path if os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true' else None)
+        return _cache
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    # tesseract runs as a subprocess, so threads are enough; the pool size bounds concurrency
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=default_workers(), thread_name_prefix='ocr')
+        return _pool
+
+
+def _add_stats(**values):
+    with _stats_lock:
+        for key, value in values.items():
+            _stats[key] += value
+
+
+def get_ocr_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["raster_seconds"] = round(stats["raster_seconds"], 3)
+    stats["ocr_seconds"] = round(stats["ocr_seconds"], 3)
+    stats["workers"] = default_workers()
+    stats["cache_path"] = get_ocr_cache().path
+    return stats
+
+
+# === RASTERIZE + OCR ===
+
+def _rasterize(path: str, first: int, last: int, dpi: int, output_folder: str) -> List[str]:
+    """Image files for pages first..last, in page order"""
+    from pdf2image import convert_from_path
+    return convert_from_path(path, dpi=dpi, first_page=first, last_page=last,
+                             output_folder=output_folder, paths_only=True, fmt='png')
+
+
+def _tesseract(image_path: str) -> str:
+    import pytesseract
+    from PIL import Image
+    with Image.open(image_path) as image:
+        return pytesseract.image_to_string(image)
+
+
+def _ocr_page(image_path: str) -> Tuple[str, float]:
+    start = time.perf_counter()
+    return _tesseract(image_path), time.perf_counter() - start
+
+
+def ocr_pages(source: PdfSource,
+              pages: Iterable[int],
+              pdf_hash: Optional[str] = None,
+              dpi: int = 200) -> Dict[int, str]:
+    """
+    OCR text for the given 1-based pages of a PDF
+
+    Args:
+        source: PDF bytes or a file path
+        pages: Page numbers to OCR (typically the ones with too little text)
+        pdf_hash: sha256 of the PDF if the caller already has it
+        dpi: Rasterization resolution
+
+    Returns:
+        {page_number: text}; pages that fail to OCR are left out
+    """
+    pages = sorted(set(pages))
+    if not pages:
+        return {}
+
+    if pdf_hash is None:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            pdf_hash = hashlib.sha256(source).hexdigest()
+        else:
+            digest = hashlib.sha256()
+            with open(source, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            pdf_hash = digest.hexdigest()
+
+    cache = get_ocr_cache()
+    results = cache.get(pdf_hash, pages)
+    missing = [page for page in pages if page not in results]
+    _add_stats(documents=1, pages_requested=len(pages), cache_hits=len(pages) - len(missing))
+    if not missing:
+        return results
+
+    with tempfile.TemporaryDirectory(prefix='ocr_') as work_dir:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            path = os.path.join(work_dir, 'source.pdf')
+            with open(path, 'wb') as f:
+                f.write(source)
+        else:
+            path = os.fspath(source)
+
+        wanted = set(missing)
+        futures = {}
+        pool = _get_pool()
+        for first, last in page_runs(missing):
+            raster_start = time.perf_counter()
+            try:
+                images = _rasterize(path, first, last, dpi, work_dir)
+            except Exception as e:
+                logger.warning(f"Rasterizing pages {first}-{last} failed: {e}")
+                _add_stats(failures=last - first + 1)
+                continue
+            _add_stats(raster_calls=1, raster_seconds=time.perf_counter() - raster_start)
+            # OCR of this run overlaps with rasterizing the next one
+            for page, image_path in zip(range(first, last + 1), images):
+                if page in wanted:
+                    futures[page] = pool.submit(_ocr_page, image_path)
+
+        for page, future in futures.items():
+            try:
+                text, seconds = future.result()
+            except Exception as e:
+                logger.debug(f"OCR failed for page {page}: {e}")
+                _add_stats(failures=1)
+                continue
+            results[page] = text
+            cache.put(pdf_hash, page, text)
+            _add_stats(pages_ocrd=1, ocr_seconds=seconds)
+
+    return results
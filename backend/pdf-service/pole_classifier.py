@@ -9,7 +9,8 @@ from typing import Dict, List, Tuple, Optional
 from PIL import Image
 import pytesseract
 import numpy as np
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
+from modules.model_registry import get_embedding_model
 from pole_vision_detector import PoleVisionDetector
 import logging
 
@@ -19,7 +20,7 @@ class PoleClassifier:
     """Classify poles according to PG&E types 1-5"""
     
     def __init__(self, model_name='all-MiniLM-L6-v2', use_vision=True):
-        self.model = SentenceTransformer(model_name)
+        self.model = get_embedding_model(model_name, consumer='PoleClassifier')
         self.pole_types = self.load_pole_types()
         self.examples = self.load_examples()
         self.pricing_multipliers = self.load_pricing_multipliers()
@@ -7,18 +7,59 @@ import os
 import json
 import hashlib
 import pickle
+import time
+import threading
+from collections import OrderedDict, defaultdict
 from typing import Any, Optional, Dict
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+class MemoryCache:
+    """Bounded LRU with per-entry TTL - the fallback when Redis is unavailable"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def __setitem__(self, key: str, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class RedisCacheManager:
     """Manages Redis caching for spec lookups and audit analysis"""
     
     def __init__(self):
         # Get Redis URL from Render environment
         self.redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        # Hits/misses per cache type, counted by this process
+        self.counters = defaultdict(lambda: {"hits": 0, "misses": 0, "sets": 0, "errors": 0})
         
         try:
             self.client = redis.from_url(
@@ -36,7 +77,7 @@ class RedisCacheManager:
         except Exception as e:
             logger.warning(f"⚠️ Redis not available: {e}. Using memory cache only.")
             self.enabled = False
-            self.memory_cache = {}  # Fallback
+            self.memory_cache = MemoryCache(int(os.getenv('MEMORY_CACHE_MAX_ENTRIES', 256)))  # Fallback
     
     def get_cache_key(self, query: str, cache_type: str = "spec_lookup") -> str:
         """Generate cache key from query"""
@@ -45,10 +86,13 @@ class RedisCacheManager:
     
     def get(self, query: str, cache_type: str = "spec_lookup") -> Optional[Any]:
         """Get cached result for query"""
+        counters = self.counters[cache_type]
         if not self.enabled:
             # Fallback to memory cache
             key = self.get_cache_key(query, cache_type)
-            return self.memory_cache.get(key)
+            value = self.memory_cache.get(key)
+            counters["hits" if value is not None else "misses"] += 1
+            return value
         
         try:
             key = self.get_cache_key(query, cache_type)
@@ -56,6 +100,7 @@ class RedisCacheManager:
             
             if cached:
                 logger.debug(f"Cache hit: {key}")
+                counters["hits"] += 1
                 # Try to deserialize
                 try:
                     return json.loads(cached)
@@ -63,18 +108,22 @@ class RedisCacheManager:
                     return pickle.loads(cached)
             
             logger.debug(f"Cache miss: {key}")
+            counters["misses"] += 1
             return None
             
         except Exception as e:
             logger.error(f"Redis get error: {e}")
+            counters["errors"] += 1
+            counters["misses"] += 1
             return None
     
     def set(self, query: str, value: Any, cache_type: str = "spec_lookup", ttl: int = 3600):
         """Cache result with TTL (default 1 hour)"""
+        self.counters[cache_type]["sets"] += 1
         if not self.enabled:
             # Fallback to memory cache
             key = self.get_cache_key(query, cache_type)
-            self.memory_cache[key] = value
+            self.memory_cache[key] = (time.time() + ttl, value)
             return
         
         try:
@@ -91,12 +140,13 @@ class RedisCacheManager:
             
         except Exception as e:
             logger.error(f"Redis set error: {e}")
+            self.counters[cache_type]["errors"] += 1
     
     def delete_pattern(self, pattern: str):
         """Delete all keys matching pattern (e.g., 'spec_lookup:*')"""
         if not self.enabled:
             # Clear memory cache
-            self.memory_cache = {k: v for k, v in self.memory_cache.items() if not k.startswith(pattern.replace('*', ''))}
+            self.memory_cache.delete_prefix(pattern.replace('*', ''))
             return
         
         try:
@@ -115,13 +165,22 @@ class RedisCacheManager:
         except Exception as e:
             logger.error(f"Redis delete pattern error: {e}")
     
+    def get_counters(self, cache_type: str) -> Dict:
+        """Hits, misses and hit rate of one cache type in this process"""
+        counters = dict(self.counters[cache_type])
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return counters
+    
     def get_stats(self) -> Dict:
         """Get cache statistics"""
+        counters = {cache_type: self.get_counters(cache_type) for cache_type in list(self.counters)}
         if not self.enabled:
             return {
                 "enabled": False,
                 "type": "memory",
-                "keys": len(self.memory_cache)
+                "keys": len(self.memory_cache),
+                "counters": counters
             }
         
         try:
@@ -135,7 +194,8 @@ class RedisCacheManager:
                 "commands_processed": info.get("total_commands_processed", 0),
                 "hit_rate": info.get("keyspace_hits", 0) / max(1, info.get("keyspace_hits", 0) + info.get("keyspace_misses", 0)),
                 "memory_used_mb": memory.get("used_memory", 0) / 1024 / 1024,
-                "keys": self.client.dbsize()
+                "keys": self.client.dbsize(),
+                "counters": counters
             }
             
         except Exception as e:
@@ -143,7 +203,13 @@ class RedisCacheManager:
             return {"enabled": False, "error": str(e)}
     
     def invalidate_spec_cache(self):
-        """Clear all spec-related cache when specs are updated"""
+        """
+        Clear the unversioned spec-related caches when specs are updated
+        
+        /analyze-audit results (cache type audit_result) are keyed by the
+        spec library version, so a spec upload retires them by bumping the
+        version - nothing is scanned or deleted for them.
+        """
         self.delete_pattern("spec_lookup:*")
         self.delete_pattern("audit_analysis:*")
         logger.info("Spec cache invalidated")
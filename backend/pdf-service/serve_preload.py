@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Preload-and-Fork Server
+`uvicorn --workers N` starts N interpreters that each import the app and
+load their own embedding model, spec library arrays, ANN indexes and
+warmed-up plugins. This launcher imports the app and runs its
+preload_for_fork() once in the master, freezes the GC and only then forks
+the workers, which share all of that memory copy-on-write. Without
+gc.freeze() every collection in a worker would write to the headers of the
+inherited objects and slowly un-share their pages.
+
+The workers accept on one listening socket bound by the master, run the
+app's lifespan as usual and are restarted if they die. SIGTERM/SIGINT stop
+them gracefully (SIGKILL after --graceful-timeout).
+
+    python serve_preload.py [--app app_oct2025_enhanced:app] [--workers 4] [--port 8000]
+
+Memory benchmark - RSS/PSS/USS per worker with per-worker loading, preload
+without gc.freeze and preload with gc.freeze, after --requests requests:
+
+    python serve_preload.py bench --workers 4 [--requests 500] [--path /status]
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import importlib
+import statistics
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('serve_preload')
+
+PRELOAD_HOOK = 'preload_for_fork'
+# Workers that die sooner than this after starting count as crash-looping
+CRASH_WINDOW_SECONDS = 10
+MAX_QUICK_CRASHES = 5
+
+
+def import_app(app_path: str):
+    """(module, app) for 'module:attr'"""
+    module_name, _, attr = app_path.partition(':')
+    module = importlib.import_module(module_name)
+    return module, getattr(module, attr or 'app')
+
+
+def run_preload_hook(module) -> float:
+    hook = getattr(module, PRELOAD_HOOK, None)
+    start_time = time.perf_counter()
+    if hook is not None:
+        hook()
+    return time.perf_counter() - start_time
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Master process: preloads the app, forks and supervises uvicorn workers"""
+
+    def __init__(self,
+                 app_path: str,
+                 host: Optional[str] = None,
+                 port: Optional[int] = None,
+                 workers: Optional[int] = None,
+                 preload: bool = True,
+                 gc_freeze: bool = True,
+                 graceful_timeout: int = 30):
+        """
+        Args:
+            app_path: 'module:attr' of the ASGI app; the module's
+                preload_for_fork(), if any, runs before the fork
+            host: Defaults to $API_HOST or 0.0.0.0
+            port: Defaults to $PORT or 8000
+            workers: Defaults to $API_WORKERS or 2
+            preload: False imports and preloads in every worker instead
+                (what uvicorn --workers does) - for comparison
+            gc_freeze: Move everything loaded before the fork to the
+                permanent GC generation
+            graceful_timeout: Seconds workers get to finish on shutdown
+        """
+        self.app_path = app_path
+        self.host = host or os.getenv('API_HOST', '0.0.0.0')
+        self.port = port if port is not None else int(os.getenv('PORT', 8000))
+        self.worker_count = workers or int(os.getenv('API_WORKERS', 2))
+        self.preload = preload
+        self.gc_freeze = gc_freeze
+        self.graceful_timeout = graceful_timeout
+        self.app = None
+        self.socket: Optional[socket.socket] = None
+        self.workers: Dict[int, float] = {}
+        self.stopping = False
+        self.quick_crashes = 0
+
+    def run(self) -> int:
+        self.socket = bind_socket(self.host, self.port)
+        logger.info(f"Listening on {self.host}:{self.port} (master pid {os.getpid()})")
+
+        if self.preload:
+            # No collections while loading: they would only age objects we freeze anyway
+            gc.disable()
+            module, self.app = import_app(self.app_path)
+            seconds = run_preload_hook(module)
+            gc.collect()
+            if self.gc_freeze:
+                gc.freeze()
+            logger.info(f"Preloaded {self.app_path} in the master ({seconds:.1f}s preload_for_fork, "
+                        f"{gc.get_freeze_count()} objects frozen) - forking {self.worker_count} workers")
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGALRM, self._kill)
+        for _ in range(self.worker_count):
+            self._spawn()
+        return self._supervise()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = time.monotonic()
+        logger.info(f"Worker {pid} started")
+
+    def _run_worker(self):
+        """Child process; never returns"""
+        code = 0
+        try:
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+                signal.signal(signum, signal.SIG_DFL)
+            gc.enable()
+            app = self.app
+            if app is None:
+                module, app = import_app(self.app_path)
+                run_preload_hook(module)
+
+            import uvicorn
+            server = uvicorn.Server(uvicorn.Config(app, lifespan='on', log_config=None,
+                                                   timeout_graceful_shutdown=self.graceful_timeout))
+            server.run(sockets=[self.socket])
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} failed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _supervise(self) -> int:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if time.monotonic() - started < CRASH_WINDOW_SECONDS:
+                self.quick_crashes += 1
+                if self.quick_crashes >= MAX_QUICK_CRASHES:
+                    logger.error(f"Workers keep exiting at startup (last: {code}) - shutting down")
+                    self._stop()
+                    continue
+            else:
+                self.quick_crashes = 0
+            logger.warning(f"Worker {pid} exited with {code} - restarting")
+            self._spawn()
+        signal.alarm(0)
+        if self.socket is not None:
+            self.socket.close()
+        return 1 if self.quick_crashes >= MAX_QUICK_CRASHES else 0
+
+    def _stop(self, *args):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Stopping {len(self.workers)} workers...")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        signal.alarm(self.graceful_timeout + 5)
+
+    def _kill(self, *args):
+        for pid in list(self.workers):
+            logger.warning(f"Worker {pid} did not stop in time - killing")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+# --- memory benchmark ---
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _memory_mb(process) -> Dict[str, float]:
+    info = process.memory_full_info()
+    return {key: round(getattr(info, key) / 1024 / 1024, 1) for key in ('rss', 'pss', 'uss')}
+
+
+def _get(url: str, timeout: float = 30) -> int:
+    import urllib.request
+    import urllib.error
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def measure(app_path: str, workers: int, preload: bool, gc_freeze: bool, requests: int, path: str,
+            timeout: float = 600) -> Dict[str, Any]:
+    """Start a server in the given mode, load it with requests and read every process's memory"""
+    import psutil
+    import subprocess
+
+    port = _free_port()
+    command = [sys.executable, os.path.abspath(__file__), '--app', app_path, '--host', '127.0.0.1',
+               '--port', str(port), '--workers', str(workers)]
+    command += [] if preload else ['--no-preload']
+    command += [] if gc_freeze else ['--no-gc-freeze']
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        master = psutil.Process(server.pid)
+        deadline = time.monotonic() + timeout
+        # Every worker up and its memory settled (lifespan and background loads finished)
+        previous, stable = None, 0
+        while stable < 4:
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError(f"Server ({'preload' if preload else 'per-worker'}) did not settle")
+            time.sleep(0.5)
+            children = master.children()
+            if len(children) < workers:
+                continue
+            try:
+                total = sum(child.memory_info().rss for child in children)
+                _get(f"http://127.0.0.1:{port}/health", timeout=5)
+            except (OSError, psutil.Error):
+                continue
+            stable = stable + 1 if previous and abs(total - previous) < 2 * 1024 * 1024 else 0
+            previous = total
+
+        url = f"http://127.0.0.1:{port}{path}"
+        errors = sum(1 for _ in range(requests) if _get(url) >= 500)
+        time.sleep(1)
+
+        per_worker = [_memory_mb(child) for child in master.children()]
+        master_memory = _memory_mb(master)
+        return {
+            "mode": 'per-worker loading' if not preload else f"preload{'' if gc_freeze else ' (no gc.freeze)'}",
+            "workers": len(per_worker),
+            "requests": requests,
+            "errors": errors,
+            "master": master_memory,
+            **{f"worker_{key}_mb": round(statistics.median(m[key] for m in per_worker), 1)
+               for key in ('rss', 'pss', 'uss')},
+            "total_pss_mb": round(master_memory["pss"] + sum(m["pss"] for m in per_worker), 1)
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def bench(app_path: str, workers: int, requests: int, path: str) -> List[Dict[str, Any]]:
+    return [measure(app_path, workers, preload, gc_freeze, requests, path)
+            for preload, gc_freeze in ((False, False), (True, False), (True, True))]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Preload the app in a master process and fork uvicorn workers")
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'bench'])
+    parser.add_argument('--app', default='app_oct2025_enhanced:app')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--no-preload', action='store_true', help="Import and preload in every worker instead")
+    parser.add_argument('--no-gc-freeze', action='store_true')
+    parser.add_argument('--graceful-timeout', type=int, default=30)
+    parser.add_argument('--requests', type=int, default=500, help="bench: requests sent before measuring")
+    parser.add_argument('--path', default='/status', help="bench: endpoint the requests go to")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+
+    if args.command == 'bench':
+        results = bench(args.app, args.workers or 4, args.requests, args.path)
+        print(json.dumps(results, indent=2))
+        for result in results:
+            print(f"{result['mode']:>26}  worker RSS {result['worker_rss_mb']:>7.1f}MB  PSS {result['worker_pss_mb']:>7.1f}MB  "
+                  f"USS {result['worker_uss_mb']:>7.1f}MB  total PSS {result['total_pss_mb']:>8.1f}MB", flush=True)
+        sys.exit(0)
+
+    sys.exit(PreforkServer(args.app, args.host, args.port, args.workers, preload=not args.no_preload,
+                           gc_freeze=not args.no_gc_freeze, graceful_timeout=args.graceful_timeout).run())
@@ -0,0 +1,19 @@
+#!/bin/bash
+# Production startup for the NEXA AI Document Analyzer with several workers
+# Models, spec library and PLUGIN_WARMUP plugins are loaded once in a master
+# process and shared copy-on-write by the forked workers (see serve_preload.py)
+
+echo "🚀 Starting NEXA AI Document Analyzer (preload + fork)"
+echo "=================================================="
+
+export PYTHONUNBUFFERED=1
+# Tokenizer thread pools do not survive a fork
+export TOKENIZERS_PARALLELISM=${TOKENIZERS_PARALLELISM:-false}
+
+echo "🔧 Configuration:"
+echo "  - Port: ${PORT:-8000}"
+echo "  - Workers: ${API_WORKERS:-2}"
+echo "  - Preloaded plugins: ${PLUGIN_WARMUP:-none}"
+echo ""
+
+exec python serve_preload.py --app app_oct2025_enhanced:app --port ${PORT:-8000} --workers ${API_WORKERS:-2}
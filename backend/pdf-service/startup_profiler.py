@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Startup Profiler for the pdf-service
+Shows where boot time goes: every module imported for the first time
+(cumulative and self seconds, through an import hook installed before the
+app's own imports), explicit spans around the module-level initializers
+and the lifespan steps, and process RSS after each span. The app serves
+the report as GET /debug/startup.
+
+The cold-start benchmark boots the app in a fresh interpreter per run
+(interpreter start, imports and lifespan startup, no port bind) and reports p50/p95, failing
+when a budget is exceeded so regressions are caught before deploy:
+
+    python startup_profiler.py bench --runs 5 [--app app_oct2025_enhanced:app] [--max-p95 60]
+"""
+
+import time
+
+_IMPORTED_AT = time.perf_counter()
+
+import os
+import sys
+import json
+import builtins
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+_PROCESS = psutil.Process()
+
+
+def rss_mb() -> float:
+    return round(_PROCESS.memory_info().rss / 1024 / 1024, 1)
+
+
+class StartupProfiler:
+    """Import timings, named spans and RSS checkpoints for one process's boot"""
+
+    def __init__(self):
+        self.origin = _IMPORTED_AT
+        self.spans: List[Dict[str, Any]] = []
+        self.imports: Dict[str, Dict[str, Any]] = {}
+        self.ready_seconds: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.ready_rss_mb: Optional[float] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._original_import = None
+
+    def _offset(self) -> float:
+        return round(time.perf_counter() - self.origin, 3)
+
+    # --- import hook ---
+
+    def install_import_hook(self):
+        """Time every first import from here on (until mark_ready)"""
+        if self._original_import is not None:
+            return
+        original = self._original_import = builtins.__import__
+        profiler = self
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            stack = getattr(profiler._local, 'stack', None)
+            if stack is None:
+                stack = profiler._local.stack = []
+            stack.append(0.0)
+            start_time = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with profiler._lock:
+                    profiler.imports.setdefault(name, {
+                        "module": name,
+                        "seconds": round(elapsed, 4),
+                        "self_seconds": round(elapsed - children, 4),
+                        "depth": len(stack),
+                        "at": round(start_time - profiler.origin, 3)
+                    })
+
+        builtins.__import__ = timed_import
+
+    def uninstall_import_hook(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    # --- spans ---
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a block of startup work and record RSS after it"""
+        start = self._offset()
+        start_time = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            with self._lock:
+                self.spans.append({
+                    "name": name,
+                    "start": start,
+                    "seconds": round(time.perf_counter() - start_time, 3),
+                    "rss_mb": rss_mb(),
+                    **({"error": error} if error else {})
+                })
+
+    def mark_ready(self):
+        """End of startup (lifespan about to yield); stops timing imports"""
+        if self.ready_seconds is None:
+            self.ready_seconds = self._offset()
+            self.ready_at = time.time()
+            self.ready_rss_mb = rss_mb()
+        self.uninstall_import_hook()
+
+    def report(self, top: int = 25) -> Dict[str, Any]:
+        with self._lock:
+            imports = list(self.imports.values())
+            spans = list(self.spans)
+        return {
+            "ready_seconds": self.ready_seconds,
+            "ready_at": self.ready_at,
+            "ready_rss_mb": self.ready_rss_mb,
+            "rss_mb": rss_mb(),
+            "spans": spans,
+            "imports_total": len(imports),
+            "top_level_imports": sorted((i for i in imports if i["depth"] == 0),
+                                        key=lambda i: -i["seconds"])[:top],
+            "slowest_imports_self": sorted(imports, key=lambda i: -i["self_seconds"])[:top]
+        }
+
+
+startup_profiler = StartupProfiler()
+
+
+# --- cold-start benchmark ---
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 3)
+
+
+def boot(app_path: str) -> Dict[str, Any]:
+    """Import the app and run its lifespan startup in this process (a fresh interpreter)"""
+    import asyncio
+    import importlib
+
+    startup_profiler.install_import_hook()
+    module_name, _, attr = app_path.partition(':')
+    start_time = time.perf_counter()
+    with startup_profiler.span('bench.import_app'):
+        app = getattr(importlib.import_module(module_name), attr or 'app')
+    import_seconds = time.perf_counter() - start_time
+
+    async def run_lifespan():
+        async with app.router.lifespan_context(app):
+            startup_profiler.mark_ready()
+
+    start_time = time.perf_counter()
+    asyncio.run(run_lifespan())
+    report = startup_profiler.report(top=10)
+    report.update({
+        "import_seconds": round(import_seconds, 3),
+        "lifespan_seconds": round(time.perf_counter() - start_time, 3)
+    })
+    return report
+
+
+def bench(app_path: str, runs: int) -> Dict[str, Any]:
+    """Boot the app runs times, each in a fresh interpreter"""
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    reports = []
+    for run in range(runs):
+        spawned_at = time.time()
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'boot', '--app', app_path],
+            cwd=here, capture_output=True, text=True
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith('{')]
+        if completed.returncode != 0 or not lines:
+            raise RuntimeError(f"Boot {run + 1} failed (exit {completed.returncode}):\n{completed.stderr[-2000:]}")
+        report = json.loads(lines[-1])
+        # Process spawn (interpreter startup included) to the end of lifespan startup
+        report["cold_start_seconds"] = round(report["ready_at"] - spawned_at, 3)
+        reports.append(report)
+        print(f"boot {run + 1}/{runs}: {reports[-1]['cold_start_seconds']:.2f}s, "
+              f"{reports[-1]['ready_rss_mb']:.0f}MB", file=sys.stderr, flush=True)
+
+    summary = {"app": app_path, "runs": runs}
+    for key in ('cold_start_seconds', 'import_seconds', 'lifespan_seconds', 'ready_rss_mb'):
+        values = [report[key] for report in reports]
+        summary[key] = {"p50": _percentile(values, 50), "p95": _percentile(values, 95), "max": max(values)}
+
+    # Median of each span and top-level import across runs
+    for section, field in (('spans', 'name'), ('top_level_imports', 'module')):
+        timings: Dict[str, List[float]] = {}
+        for report in reports:
+            for item in report[section]:
+                timings.setdefault(item[field], []).append(item['seconds'])
+        summary[section] = sorted(({field: name, "p50_seconds": _percentile(values, 50)}
+                                   for name, values in timings.items()), key=lambda item: -item["p50_seconds"])
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cold-start profile of the pdf-service")
+    parser.add_argument('command', choices=['bench', 'boot'])
+    parser.add_argument('--app', default='app_oct2025_enhanced:app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-p95', type=float, help="Exit 1 if cold-start p95 exceeds this many seconds")
+    args = parser.parse_args()
+
+    # The app's "from startup_profiler import ..." must get this module, not a second copy
+    sys.modules.setdefault('startup_profiler', sys.modules['__main__'])
+
+    if args.command == 'boot':
+        print(json.dumps(boot(args.app)), flush=True)
+        sys.exit(0)
+
+    summary = bench(args.app, args.runs)
+    print(json.dumps(summary, indent=2))
+    if args.max_p95 is not None and summary['cold_start_seconds']['p95'] > args.max_p95:
+        print(f"Cold-start p95 {summary['cold_start_seconds']['p95']}s exceeds budget {args.max_p95}s", file=sys.stderr)
+        sys.exit(1)
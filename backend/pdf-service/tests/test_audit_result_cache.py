@@ -0,0 +1,77 @@
+"""
+Tests for the versioned /analyze-audit result cache
+"""
+import time
+
+import pytest
+
+pytest.importorskip("redis")
+
+from redis_cache_manager import RedisCacheManager, MemoryCache
+from modules.audit_result_cache import AuditResultCache, result_key
+from modules import audit_pipeline
+
+
+@pytest.fixture
+def result_cache(monkeypatch):
+    # Nothing listens here, so the manager runs on its in-memory fallback
+    monkeypatch.setenv('REDIS_URL', 'redis://127.0.0.1:1/0')
+    manager = RedisCacheManager()
+    assert not manager.enabled
+    return AuditResultCache(manager, ttl=60)
+
+
+def test_identical_resubmission_hits(result_cache):
+    key = result_key("a" * 64, 7, "p1", "c1")
+    assert result_cache.get(key) is None
+    result_cache.set(key, {"audit_file": "qa.pdf", "infractions_found": 2})
+
+    assert result_cache.get(key) == {"audit_file": "qa.pdf", "infractions_found": 2}
+    stats = result_cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["sets"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["backend"] == "memory"
+
+
+def test_resubmission_under_another_name_reports_that_name(result_cache):
+    key = result_key("a" * 64, 7, "p1", "c1")
+    result_cache.set(key, {"audit_file": "qa.pdf", "infractions_found": 2})
+
+    renamed = result_cache.get(key, "qa_resubmitted.pdf")
+    assert renamed == {"audit_file": "qa_resubmitted.pdf", "infractions_found": 2}
+    # The stored result is not rewritten
+    assert result_cache.get(key, "qa.pdf")["audit_file"] == "qa.pdf"
+
+
+def test_version_bumps_miss_without_deleting_anything(result_cache):
+    result_cache.set(result_key("a" * 64, 7, "p1", "c1"), {"ok": True})
+
+    assert result_cache.get(result_key("a" * 64, 8, "p1", "c1")) is None  # spec upload
+    assert result_cache.get(result_key("a" * 64, 7, "p2", "c1")) is None  # new pricing master
+    assert result_cache.get(result_key("a" * 64, 7, "p1", "c2")) is None  # analyzer change
+    assert result_cache.get(result_key("b" * 64, 7, "p1", "c1")) is None  # different audit
+    assert result_cache.get(result_key("a" * 64, 7, "p1", "c1")) == {"ok": True}
+
+
+def test_config_hash_tracks_analyzer_settings(monkeypatch):
+    class Model:
+        model_id = "all-MiniLM-L6-v2:fp32:256"
+
+    first = audit_pipeline.analyzer_config_hash(Model())
+    assert audit_pipeline.analyzer_config_hash(Model()) == first
+
+    monkeypatch.setattr(audit_pipeline, 'SCORING_THRESHOLD', 0.5)
+    assert audit_pipeline.analyzer_config_hash(Model()) != first
+
+
+def test_memory_fallback_is_bounded_and_expires():
+    cache = MemoryCache(max_entries=2)
+    cache['a'] = (time.time() + 60, 1)
+    cache['b'] = (time.time() + 60, 2)
+    assert cache.get('a') == 1
+    cache['c'] = (time.time() + 60, 3)  # evicts b, the least recently used
+    assert cache.get('b') is None and cache.get('a') == 1
+
+    cache['d'] = (time.time() - 1, 4)
+    assert cache.get('d') is None
+    assert len(cache) == 1  # the expired entry is dropped on read
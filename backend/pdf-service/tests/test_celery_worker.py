@@ -0,0 +1,65 @@
+"""
+Tests for the Celery audit worker (file references, progress states)
+"""
+import os
+
+import pytest
+
+pytest.importorskip("celery")
+
+import celery_worker
+from modules.upload_spool import SpooledUpload
+
+
+@pytest.fixture
+def staged(monkeypatch, temp_data_dir):
+    monkeypatch.setattr(celery_worker, 'AUDIT_JOB_DIR', os.path.join(temp_data_dir, 'audit_jobs'))
+    upload = SpooledUpload('audit.pdf')
+    upload.write(b"%PDF-1.4 audit")
+    with upload.finish():
+        return celery_worker.stage_audit_file(upload)
+
+
+class FakeStore:
+    def snapshot(self):
+        return ['chunk']
+
+
+def test_task_runs_pipeline_on_staged_file(monkeypatch, staged):
+    states = []
+    calls = {}
+
+    def fake_pipeline(path, filename, library, model, pdf_hash=None, pricing_analyzer=None, progress=None):
+        calls.update(path=path, pdf_hash=pdf_hash)
+        for state in ('EXTRACTING', 'ANALYZING', 'FINALIZING'):
+            progress(state, 0, state.lower())
+        return {"analysis_results": [{
+            "infraction_id": 1,
+            "infraction_text": "Pole depth short",
+            "status": "POTENTIALLY REPEALABLE",
+            "spec_matches": [{"source_spec": "greenbook.pdf", "relevance_score": 91.0, "spec_text": "6 ft"}]
+        }]}
+
+    import modules.audit_pipeline
+    monkeypatch.setattr(modules.audit_pipeline, 'analyze_audit_pdf', fake_pipeline)
+    monkeypatch.setattr(celery_worker, 'get_worker_state',
+                        lambda: {'model': object(), 'spec_store': FakeStore(), 'pricing_analyzer': None})
+    monkeypatch.setattr(celery_worker.analyze_audit_async, 'update_state',
+                        lambda state=None, meta=None: states.append(state))
+
+    result = celery_worker.analyze_audit_async.run(staged)
+
+    assert 'pdf_content' not in staged and set(staged) == {'sha256', 'filename', 'size'}
+    assert calls['path'] == celery_worker.staged_audit_path(staged['sha256'])
+    assert calls['pdf_hash'] == staged['sha256']
+    assert states == ['LOADING', 'EXTRACTING', 'ANALYZING', 'FINALIZING']
+    assert result['status'] == 'success'
+    assert result['infractions'][0]['confidence'] == 91.0
+    assert result['infractions'][0]['source'] == 'greenbook.pdf'
+
+
+def test_missing_staged_file_fails_cleanly(monkeypatch, staged):
+    os.remove(celery_worker.staged_audit_path(staged['sha256']))
+    result = celery_worker.analyze_audit_async.run(staged)
+    assert result['status'] == 'failed'
+    assert 'not found' in result['error']
@@ -0,0 +1,76 @@
+"""
+Tests for the bounded CPU executor
+"""
+import asyncio
+import threading
+
+import pytest
+
+from modules.cpu_executor import CPUExecutor, ExecutorSaturated
+
+
+def test_runs_work_off_the_event_loop():
+    executor = CPUExecutor(workers=2, max_queue=2)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        worker_thread = await executor.run(threading.get_ident)
+        return loop_thread, worker_thread, await executor.run(sum, [1, 2, 3])
+
+    loop_thread, worker_thread, total = asyncio.run(main())
+    assert loop_thread != worker_thread
+    assert total == 6
+    assert executor.get_stats()["completed"] == 2
+    executor.shutdown()
+
+
+def test_saturation_returns_503_with_retry_after():
+    executor = CPUExecutor(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        queued = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+
+        stats = executor.get_stats()
+        assert stats["running"] == 1
+        assert stats["queue_depth"] == 1
+
+        with pytest.raises(ExecutorSaturated) as excinfo:
+            await executor.run(sum, [1])
+        release.set()
+        await asyncio.gather(running, queued)
+        return excinfo.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 503
+    assert int(error.headers["Retry-After"]) >= 1
+
+    stats = executor.get_stats()
+    assert stats["rejected"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["wait_ms_max"] > 0
+    executor.shutdown()
+
+
+def test_failures_and_cancelled_jobs_free_their_slots():
+    executor = CPUExecutor(workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(lambda: 1 / 0)
+
+        blocker = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        blocker.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await blocker
+        await asyncio.sleep(0.05)
+        return await executor.run(sum, [2, 2])
+
+    assert asyncio.run(main()) == 4
+    assert executor.get_stats()["failed"] == 1
+    executor.shutdown()
@@ -0,0 +1,104 @@
+"""
+Tests for cross-request micro-batching of embedding requests
+"""
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from modules.cpu_executor import CPUExecutor
+from modules.embedding_batcher import EmbeddingBatcher
+
+
+class FakeModel:
+    """Embeds a text as [len(text), 1, 0, 0] and records every batch it sees"""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def encode(self, texts, **kwargs):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append(list(texts))
+        if any(text == "boom" for text in texts):
+            raise RuntimeError("encode failed")
+        return np.array([[len(text), 1.0, 0.0, 0.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def executor():
+    executor = CPUExecutor(workers=1, max_queue=4)
+    yield executor
+    executor.shutdown()
+
+
+def test_concurrent_requests_share_one_encode(executor):
+    model = FakeModel()
+    batcher = EmbeddingBatcher(model, max_latency_ms=50, max_batch_size=64, executor=executor)
+    texts = [f"infraction {'x' * i}" for i in range(30)]
+
+    async def main():
+        single, normalized, *rest = await asyncio.gather(
+            batcher.encode(texts[0]),
+            batcher.encode(texts[1:3], normalize_embeddings=True),
+            *(batcher.encode(text) for text in texts[3:])
+        )
+        await batcher.stop()
+        return single, normalized, rest
+
+    single, normalized, rest = asyncio.run(main())
+
+    assert model.batches == [texts]
+    # Every caller gets its own rows back, in its own shape and form
+    assert single.shape == (4,) and single[0] == len(texts[0])
+    assert normalized.shape == (2, 4)
+    np.testing.assert_allclose(np.linalg.norm(normalized, axis=1), 1.0, rtol=1e-6)
+    assert [row[0] for row in rest] == [len(text) for text in texts[3:]]
+
+    stats = batcher.get_stats()
+    assert (stats["requests"], stats["texts"], stats["batches"]) == (29, 30, 1)
+    assert stats["batch_size_histogram"]["32"] == 1
+
+
+def test_batches_are_bounded_by_size_and_fill_while_busy(executor):
+    gate = threading.Event()
+    model = FakeModel(gate)
+    batcher = EmbeddingBatcher(model, max_latency_ms=1000, max_batch_size=4, executor=executor)
+
+    async def main():
+        first = asyncio.ensure_future(batcher.encode(["a", "b", "c", "d"]))
+        await asyncio.sleep(0.05)
+        # Queued behind the running batch: 3 + 2 texts do not fit in one batch of 4
+        later = [asyncio.ensure_future(batcher.encode(text)) for text in ("ee", "fff", "gggg")]
+        large = asyncio.ensure_future(batcher.encode(["h", "i"]))
+        await asyncio.sleep(0.05)
+        gate.set()
+        results = await asyncio.gather(first, *later, large)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(main())
+
+    # A full batch does not wait out the latency window
+    assert model.batches == [["a", "b", "c", "d"], ["ee", "fff", "gggg"], ["h", "i"]]
+    assert [float(r[0]) for r in results[1:4]] == [2.0, 3.0, 4.0]
+    assert batcher.get_stats()["batch_size_histogram"] == \
+        {"1": 0, "2": 1, "4": 2, "8": 0, "16": 0, "32": 0, "64": 0, "128": 0, "+Inf": 0}
+
+
+def test_a_failed_batch_fails_only_its_callers(executor):
+    model = FakeModel()
+    batcher = EmbeddingBatcher(model, max_latency_ms=20, max_batch_size=8, executor=executor)
+
+    async def main():
+        failed = await asyncio.gather(batcher.encode("boom"), batcher.encode("fine"), return_exceptions=True)
+        recovered = await batcher.encode("fine")
+        await batcher.stop()
+        return failed, recovered
+
+    failed, recovered = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in failed)
+    assert recovered[0] == 4
+    assert batcher.get_stats()["failed_batches"] == 1
@@ -0,0 +1,103 @@
+"""
+Tests for the content-addressed embedding cache
+"""
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from modules.embedding_cache import EmbeddingCache, cached_encode, text_key
+from modules.model_registry import ModelRegistry
+
+
+class CountingModel:
+    """Deterministic fake encoder that records every text it embeds"""
+
+    def __init__(self, name='fake', device=None):
+        self.device = device
+        self.max_seq_length = 256
+        self.encoded = []
+
+    def eval(self):
+        return self
+
+    def encode(self, sentences, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        self.encoded.extend(texts)
+        matrix = np.array([[len(t), t.count('a'), 1.0, 2.0] for t in texts], dtype=np.float32)
+        if normalize_embeddings:
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix[0] if isinstance(sentences, str) else matrix
+
+
+def test_memory_hits_and_in_call_duplicates():
+    cache = EmbeddingCache()
+    model = CountingModel()
+
+    first = cached_encode(cache, model, 'm', ["alpha", "beta", "alpha"])
+    second = cached_encode(cache, model, 'm', ["beta", "gamma"])
+
+    assert model.encoded == ["alpha", "beta", "gamma"]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(first[1], second[0])
+    stats = cache.get_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 4
+
+
+def test_keys_are_normalized_and_scoped_by_model():
+    assert text_key('m', "Conduit  depth\n 24in ") == text_key('m', "Conduit depth 24in")
+    assert text_key('m', "x") != text_key('other', "x")
+
+
+def test_disk_tier_survives_a_new_process(temp_data_dir):
+    path = os.path.join(temp_data_dir, 'embedding_cache.sqlite3')
+    model = CountingModel()
+    expected = cached_encode(EmbeddingCache(disk_path=path), model, 'm', ["alpha", "beta"])
+
+    restarted = EmbeddingCache(disk_path=path)
+    again = cached_encode(restarted, model, 'm', ["alpha", "beta"])
+
+    assert model.encoded == ["alpha", "beta"]
+    np.testing.assert_array_equal(expected, again)
+    assert restarted.get_stats()["disk_hits"] == 2
+
+
+def test_memory_tier_is_bounded_by_bytes():
+    cache = EmbeddingCache(memory_bytes=3 * 16)
+    cached_encode(cache, CountingModel(), 'm', ["a", "b", "c", "d"])
+    stats = cache.get_stats()
+    assert stats["memory_entries"] == 3
+    assert stats["memory_bytes"] <= 48
+    assert stats["evictions"] == 1
+
+
+def test_output_options_match_the_model():
+    cache = EmbeddingCache()
+    model = CountingModel()
+    raw = model.encode(["banana"])
+    cached_encode(cache, model, 'm', ["banana"])
+
+    single = cached_encode(cache, model, 'm', "banana", normalize_embeddings=True)
+    assert single.shape == (4,)
+    np.testing.assert_allclose(single, raw[0] / np.linalg.norm(raw[0]), rtol=1e-6)
+
+    # Options the cache cannot serve go straight to the model
+    cached_encode(cache, model, 'm', ["banana"], output_value='token_embeddings')
+    assert cache.get_stats()["bypassed_calls"] == 1
+
+
+def test_registry_routes_encode_through_the_cache(monkeypatch):
+    fake = types.ModuleType('sentence_transformers')
+    fake.SentenceTransformer = CountingModel
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', fake)
+
+    cache = EmbeddingCache()
+    registry = ModelRegistry(cache=cache)
+    registry.get(consumer='a').encode(["alpha", "beta"], convert_to_numpy=True)
+    registry.get(consumer='b').encode("alpha", convert_to_numpy=True)
+
+    assert registry.get().model.encoded == ["alpha", "beta"]
+    assert registry.get_stats()["embedding_cache"]["hit_rate"] == pytest.approx(1 / 3, abs=1e-3)
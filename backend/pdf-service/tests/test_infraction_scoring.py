@@ -0,0 +1,70 @@
+"""
+Tests for the batched infraction scoring engine
+"""
+import numpy as np
+
+from modules.infraction_scoring import score_infractions, top_k_scores
+from modules.spec_index import InMemorySegment, SpecSnapshot, unit_normalize
+
+
+def _snapshot(chunks, matrix):
+    return SpecSnapshot([InMemorySegment(list(chunks), matrix)], [], {'files': []}, 1)
+
+
+class FakeEncoder:
+    """Deterministic stand-in for SentenceTransformer.encode"""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.calls = 0
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        self.calls += 1
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % (2 ** 32)).standard_normal(self.dim)
+            for text in texts
+        ]).astype(np.float32)
+        return unit_normalize(vectors) if normalize_embeddings else vectors
+
+
+def test_top_k_matches_full_sort():
+    scores = np.random.default_rng(0).standard_normal((7, 300)).astype(np.float32)
+    indices, values = top_k_scores(scores, 5)
+
+    expected = np.argsort(-scores, axis=1)[:, :5]
+    assert np.array_equal(indices, expected)
+    assert np.allclose(values, np.take_along_axis(scores, expected, axis=1))
+
+
+def test_top_k_with_fewer_specs_than_k():
+    scores = np.array([[0.1, 0.9, 0.5]], dtype=np.float32)
+    indices, values = top_k_scores(scores, 5)
+    assert indices.tolist() == [[1, 2, 0]]
+
+
+def test_score_infractions_single_encode_call_and_shape():
+    encoder = FakeEncoder()
+    chunks = [f"[Source: spec_{i % 3}.pdf] requirement {i}" for i in range(40)]
+    matrix = encoder.encode(chunks, normalize_embeddings=True)
+    # Make one spec chunk identical to the first infraction
+    infractions = [chunks[7], "Go-back: crossarm missing", "Violation of GO 95"]
+    encoder.calls = 0
+
+    results = score_infractions(encoder, infractions, _snapshot(chunks, matrix), top_k=5, threshold=0.4)
+
+    assert encoder.calls == 1
+    assert [r['infraction_id'] for r in results] == [1, 2, 3]
+    first = results[0]
+    assert first['spec_matches'][0]['source_spec'] == 'spec_1.pdf'
+    assert first['spec_matches'][0]['relevance_score'] == 100.0
+    assert first['spec_matches'][0]['spec_text'] == 'requirement 7'
+    assert first['status'] == 'POTENTIALLY REPEALABLE'
+    assert first['confidence'] == 'HIGH'
+    assert first['match_count'] == len(first['spec_matches'])
+    for result in results:
+        scores = [m['relevance_score'] for m in result['spec_matches']]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_score_infractions_empty():
+    assert score_infractions(FakeEncoder(), [], _snapshot([], np.zeros((0, 16)))) == []
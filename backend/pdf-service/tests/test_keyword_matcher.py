@@ -0,0 +1,74 @@
+"""
+Tests for single-pass keyword matching and context window merging
+"""
+import time
+import random
+
+from modules.keyword_matcher import (
+    KeywordMatcher,
+    INFRACTION_KEYWORDS,
+    QC_ITEM_INDICATORS,
+    merge_windows,
+    context_blocks
+)
+
+
+def _audit_lines(n, seed=0):
+    rng = random.Random(seed)
+    filler = ["Pole 12 set per spec", "Crossarm OK", "Photos attached", "Ground rod driven",
+              "Check NO for item 4", "Conduit depth Missing", "NON-COMPLIANT guy wire",
+              "Go Back required at splice", "Marked no on checklist", "Work incomplete"]
+    return [rng.choice(filler) + f" #{i}" for i in range(n)]
+
+
+def test_hit_lines_match_the_per_line_substring_scan():
+    lines = _audit_lines(500)
+    text = '\n'.join(lines)
+    for keywords in (INFRACTION_KEYWORDS, QC_ITEM_INDICATORS):
+        expected = [i for i, line in enumerate(lines) if any(kw in line.lower() for kw in keywords)]
+        assert KeywordMatcher(keywords).hit_lines(text) == expected
+
+
+def test_prefix_keywords_and_case():
+    matcher = KeywordMatcher(["check no", 'check "no"', "non-compliant", "non compliant"])
+    assert matcher.hit_lines('CHECK "No"\nfine\nNon Compliant\nnon-') == [0, 2]
+    assert matcher.keywords_in('Check "no" and check no') == ["check no", 'check "no"']
+
+
+def test_overlapping_windows_merge_into_line_intervals():
+    assert merge_windows([5, 6, 7], before=2, after=5, total=100) == [(3, 12)]
+    assert merge_windows([5, 40], before=2, after=5, total=100) == [(3, 10), (38, 45)]
+    assert merge_windows([0, 98], before=2, after=5, total=100) == [(0, 5), (96, 100)]
+
+    # A long run of hits is cut into disjoint blocks of bounded size
+    windows = merge_windows(range(100), before=2, after=5, total=100, max_lines=20)
+    assert windows[0] == (0, 20)
+    assert all(end - start <= 20 for start, end in windows)
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    assert windows[-1][1] == 100
+
+
+def test_context_blocks_deduplicate_and_filter():
+    text = "intro\nitem missing\nend\n\n" * 2 + "x\nshort\n"
+    blocks, hits = context_blocks(text, KeywordMatcher(["missing"]), before=1, after=2)
+    assert hits == [1, 5]
+    assert blocks == ["intro\nitem missing\nend"]
+
+    blocks, _ = context_blocks(text, KeywordMatcher(["missing"]), before=1, after=2, min_length=30)
+    assert blocks == []
+
+
+def test_thousands_of_hits_stay_linear():
+    def detect(n):
+        text = '\n'.join(f"Item {i}: conduit cap missing" for i in range(n))
+        start = time.perf_counter()
+        blocks, hits = context_blocks(text, KeywordMatcher(INFRACTION_KEYWORDS), before=2, after=5)
+        return time.perf_counter() - start, blocks, hits
+
+    detect(1000)
+    small, _, _ = detect(5000)
+    large, blocks, hits = detect(50000)
+    assert len(hits) == 50000
+    assert sum(block.count('\n') + 1 for block in blocks) == 50000
+    # 10x the hits in well under the 100x a quadratic dedup would take
+    assert large < max(small, 0.01) * 30
@@ -0,0 +1,108 @@
+"""
+Tests for token-length bucketed encode batching
+"""
+import numpy as np
+import pytest
+
+from modules.embedding_cache import EmbeddingCache
+from modules.length_bucketing import LengthBucketer, plan_batches, token_lengths
+from modules.model_registry import ModelRegistry
+
+
+class WordTokenizer:
+    """HF-style tokenizer: one token per word plus [CLS] and [SEP]"""
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, max_length=None):
+        ids = [[0] * (len(text.split()) + 2) for text in texts]
+        if truncation:
+            ids = [row[:max_length] for row in ids]
+        return {'input_ids': ids}
+
+
+class FakeModel:
+    """Embeds a text as [words, 1]; records each batch's texts"""
+
+    def __init__(self):
+        self.tokenizer = WordTokenizer()
+        self.max_seq_length = 64
+        self.batches = []
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        self.batches.append(list(sentences))
+        return np.array([[len(text.split()), 1.0] for text in sentences], dtype=np.float32)
+
+
+def _texts():
+    # Infraction one-liners mixed with long spec chunks, in arrival order
+    return [' '.join(['word'] * n) for n in (3, 60, 5, 58, 4, 100, 6, 2)]
+
+
+def test_batches_hold_similar_lengths_within_the_token_budget():
+    model = FakeModel()
+    lengths = token_lengths(model, _texts())
+    # Capped at max_seq_length
+    assert list(lengths) == [5, 62, 7, 60, 6, 64, 8, 4]
+
+    batches = plan_batches(lengths, max_tokens=128, max_items=3)
+    assert [list(lengths[batch]) for batch in batches] == [[64, 62], [60], [8, 7, 6], [5, 4]]
+    assert all(len(batch) * lengths[batch].max() <= 128 for batch in batches)
+    # Nothing under LENGTH_SPREAD of the longest joins a batch, even with room left
+    assert all(lengths[batch].min() >= 0.7 * lengths[batch].max() for batch in batches)
+
+
+def test_results_come_back_in_input_order():
+    model = FakeModel()
+    bucketer = LengthBucketer(enabled=True, max_tokens=128, max_items=3)
+    texts = _texts()
+
+    embeddings = bucketer.encode(model, texts, batch_size=32, normalize_embeddings=False)
+    assert embeddings[:, 0].tolist() == [len(text.split()) for text in texts]
+    assert len(model.batches) == 4
+
+    stats = bucketer.get_stats()
+    assert stats["texts"] == 8 and stats["batches"] == 4
+    assert stats["padding_efficiency"] > 0.95
+
+    # Single texts and tensor output go straight to the model
+    bucketer.encode(model, "one text")
+    bucketer.encode(model, texts, convert_to_tensor=True)
+    assert model.batches[-1] == texts
+    assert bucketer.get_stats()["calls"] == 1
+
+
+def test_registry_encodes_cache_misses_in_buckets():
+    model = FakeModel()
+    cache = EmbeddingCache(disk_path=None)
+    registry = ModelRegistry(cache=cache, bucketer=LengthBucketer(enabled=True, max_tokens=128, max_items=3))
+    entry = registry.get(consumer='test')._entry
+    entry.model = model
+    handle = registry.get(consumer='test')
+
+    texts = _texts()
+    first = handle.encode(texts[:4])
+    assert len(model.batches) == 2
+    # Hits come from the cache; only the new texts are bucketed and encoded
+    both = handle.encode(texts)
+    assert sorted(map(len, model.batches[2:])) == [1, 1, 2]
+    np.testing.assert_array_equal(both[:4], first)
+    assert both[:, 0].tolist() == [len(text.split()) for text in texts]
+    assert registry.get_stats()["length_bucketing"]["texts"] == 8
+
+
+def test_positional_encode_arguments_take_the_same_path():
+    model = FakeModel()
+    cache = EmbeddingCache(disk_path=None)
+    registry = ModelRegistry(cache=cache, bucketer=LengthBucketer(enabled=True, max_tokens=128, max_items=3))
+    registry.get(consumer='test')._entry.model = model
+    handle = registry.get(consumer='test')
+
+    texts = _texts()
+    first = handle.encode(texts, 64)
+    batches = len(model.batches)
+    assert batches > 1
+    # batch_size passed positionally still hits the cache on the second call
+    np.testing.assert_array_equal(handle.encode(texts, 64, False), first)
+    assert len(model.batches) == batches
+
+    with pytest.raises(TypeError):
+        handle.encode(texts, 64, batch_size=16)
@@ -0,0 +1,123 @@
+"""
+Tests for the ASGI validation, error handling and rate limit middleware
+"""
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from middleware import ErrorHandlingMiddleware, RateLimitMiddleware, ValidationMiddleware
+from modules.rate_limiter import SlidingWindowRateLimiter
+
+
+def make_app(calls=100):
+    app = FastAPI()
+    app.state.background_ran = []
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return {"correlation_id": request.state.correlation_id}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        return {"size": size}
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse((f"line {i}\n" for i in range(3)), media_type="text/plain")
+
+    @app.get("/background")
+    async def background(tasks: BackgroundTasks):
+        tasks.add_task(app.state.background_ran.append, True)
+        return {"queued": True}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/missing-spec")
+    async def missing_spec():
+        raise HTTPException(status_code=400, detail="Spec book not learned")
+
+    # Same order as app_oct2025_enhanced: Validation runs first, RateLimit last
+    limiter = SlidingWindowRateLimiter(calls=calls, period=60, max_keys=100)
+    app.add_middleware(RateLimitMiddleware, calls=calls, period=60, limiter=limiter)
+    app.add_middleware(ErrorHandlingMiddleware)
+    app.add_middleware(ValidationMiddleware)
+    return app
+
+
+def test_correlation_id_reaches_the_endpoint_and_the_response():
+    client = TestClient(make_app())
+    response = client.get("/ping")
+
+    assert response.status_code == 200
+    assert response.json()["correlation_id"] == response.headers["X-Correlation-ID"]
+    assert float(response.headers["X-Process-Time"]) >= 0
+    assert response.headers["X-RateLimit-Limit"] == "100"
+    assert response.headers["X-RateLimit-Remaining"] == "99"
+    assert int(response.headers["X-RateLimit-Reset"]) > 0
+
+
+def test_unexpected_errors_are_shaped_with_the_correlation_id():
+    client = TestClient(make_app(), raise_server_exceptions=False)
+    response = client.get("/boom")
+
+    assert response.status_code == 500
+    body = response.json()
+    assert body["error"] == "Internal Server Error"
+    assert body["correlation_id"] == response.headers["X-Correlation-ID"]
+    assert "timestamp" in body
+
+
+def test_http_exceptions_keep_the_endpoint_handler():
+    client = TestClient(make_app())
+    response = client.get("/missing-spec")
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Spec book not learned"}
+    assert "X-Correlation-ID" in response.headers
+
+
+def test_http_error_response_maps_known_messages():
+    response = ErrorHandlingMiddleware.http_error_response(
+        HTTPException(status_code=400, detail="Only PDF files are accepted"), "abc123")
+    assert response.status_code == 400
+    assert response.headers["X-Correlation-ID"] == "abc123"
+    assert b'"Invalid File Type"' in response.body
+
+
+def test_rate_limit_returns_429_and_skips_health():
+    client = TestClient(make_app(calls=2))
+    assert [client.get("/ping").status_code for _ in range(3)] == [200, 200, 429]
+
+    limited = client.get("/ping")
+    assert limited.json()["error"] == "Rate Limit Exceeded"
+    assert limited.headers["X-RateLimit-Remaining"] == "0"
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert "X-Correlation-ID" in limited.headers
+
+    health = client.get("/health")
+    assert health.status_code == 200
+    assert "X-RateLimit-Limit" not in health.headers
+
+
+def test_bodies_stream_through_and_background_tasks_run():
+    app = make_app()
+    client = TestClient(app)
+
+    payload = b"x" * (3 * 1024 * 1024 + 17)
+    assert client.post("/upload", content=payload).json() == {"size": len(payload)}
+
+    streamed = client.get("/stream")
+    assert streamed.text == "line 0\nline 1\nline 2\n"
+    assert "X-Correlation-ID" in streamed.headers
+
+    assert client.get("/background").json() == {"queued": True}
+    assert app.state.background_ran == [True]
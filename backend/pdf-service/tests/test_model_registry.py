@@ -0,0 +1,102 @@
+"""
+Tests for the shared embedding model registry
+"""
+import sys
+import types
+import threading
+
+import pytest
+
+from modules.length_bucketing import LengthBucketer
+from modules.model_registry import ModelRegistry
+
+
+class FakeSentenceTransformer:
+    """Counts constructions instead of downloading weights"""
+    instances = 0
+
+    def __init__(self, name, device=None):
+        FakeSentenceTransformer.instances += 1
+        self.name = name
+        self.device = device
+        self.max_seq_length = 512
+
+    def eval(self):
+        return self
+
+    def encode(self, sentences, **kwargs):
+        return [len(s) for s in ([sentences] if isinstance(sentences, str) else sentences)]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    fake = types.ModuleType('sentence_transformers')
+    fake.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', fake)
+    FakeSentenceTransformer.instances = 0
+    return ModelRegistry(use_cache=False, bucketer=LengthBucketer(enabled=False))
+
+
+def test_handles_share_one_lazily_loaded_model(registry):
+    first = registry.get(consumer='ConduitEnhancedAnalyzer')
+    second = registry.get('sentence-transformers/all-MiniLM-L6-v2', consumer='AsBuiltFiller')
+    assert FakeSentenceTransformer.instances == 0
+
+    assert first.encode(["ab", "abc"]) == [2, 3]
+    assert second.encode("abcd") == [4]
+    assert first.model is second.model
+    assert FakeSentenceTransformer.instances == 1
+
+    stats = registry.get_stats()['models'][0]
+    assert stats['consumers'] == {'ConduitEnhancedAnalyzer': 1, 'AsBuiltFiller': 1}
+    assert stats['encode_calls'] == 2
+    assert stats['texts_encoded'] == 3
+
+
+def test_device_and_precision_are_part_of_the_key(registry):
+    cpu = registry.get(device='cpu', precision='float32')
+    other = registry.get(device='cuda:1', precision='float32')
+    cpu.model, other.model
+    assert FakeSentenceTransformer.instances == 2
+    assert other.device == 'cuda:1'
+
+    with pytest.raises(ValueError):
+        registry.get(precision='int4')
+
+
+def test_concurrent_first_use_loads_once(registry):
+    handles = [registry.get(consumer=f"worker-{i}") for i in range(8)]
+    threads = [threading.Thread(target=lambda h=h: h.encode("x")) for h in handles]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert FakeSentenceTransformer.instances == 1
+
+
+def test_settings_apply_to_the_shared_model(registry):
+    handle = registry.get()
+    handle.max_seq_length = 256
+    assert registry.get().max_seq_length == 256
+
+
+def test_onnx_backend_is_a_separate_model_and_cache_namespace(registry, monkeypatch):
+    from modules import onnx_embedder
+
+    class FakeOnnxEncoder(FakeSentenceTransformer):
+        def __init__(self, name, precision='float32'):
+            super().__init__(name)
+            self.precision = precision
+
+    monkeypatch.setattr(onnx_embedder, 'OnnxSentenceEncoder', FakeOnnxEncoder)
+    monkeypatch.setenv('EMBEDDING_BACKEND', 'onnx')
+
+    onnx = registry.get()
+    torch_model = registry.get(backend='torch')
+    assert isinstance(onnx.model, FakeOnnxEncoder) and onnx.model is not torch_model.model
+    assert onnx.model_id == "all-MiniLM-L6-v2:float32:512:onnx"
+    assert torch_model.model_id == "all-MiniLM-L6-v2:float32:512"
+    assert registry.get(precision='int8').model.precision == 'int8'
+
+    with pytest.raises(ValueError):
+        registry.get(precision='float16')
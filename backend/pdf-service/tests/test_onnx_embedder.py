@@ -0,0 +1,52 @@
+"""
+Parity of the ONNX Runtime embedding backend with SentenceTransformer
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("sentence_transformers")
+
+from sentence_transformers import SentenceTransformer
+
+from modules.onnx_embedder import OnnxSentenceEncoder, cosine_agreement, sample_corpus
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+@pytest.fixture(scope='module')
+def export_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('onnx_models'))
+
+
+@pytest.fixture(scope='module')
+def reference():
+    texts = sample_corpus(200)
+    model = SentenceTransformer(MODEL_NAME, device='cpu')
+    return texts, model.encode(texts, batch_size=16, convert_to_numpy=True)
+
+
+@pytest.mark.parametrize("precision, min_cosine", [("float32", 0.9999), ("int8", 0.97)])
+def test_cosine_agreement_with_torch(export_dir, reference, precision, min_cosine):
+    texts, expected = reference
+    encoder = OnnxSentenceEncoder(MODEL_NAME, precision=precision, directory=export_dir)
+
+    embeddings = encoder.encode(texts, batch_size=16)
+    assert embeddings.shape == expected.shape and embeddings.dtype == np.float32
+    agreement = cosine_agreement(expected, embeddings)
+    assert agreement['min'] >= min_cosine
+    assert agreement['mean'] >= (min_cosine + 1) / 2
+
+
+def test_encode_semantics_match_sentence_transformers(export_dir, reference):
+    texts, expected = reference
+    encoder = OnnxSentenceEncoder(MODEL_NAME, directory=export_dir)
+
+    single = encoder.encode(texts[3])
+    assert single.shape == (encoder.get_sentence_embedding_dimension(),)
+    np.testing.assert_allclose(single, expected[3], atol=1e-4)
+
+    # Batch size and order do not change the vectors
+    shuffled = encoder.encode(texts[::-1], batch_size=7, normalize_embeddings=True)
+    np.testing.assert_allclose(shuffled[::-1], expected / np.linalg.norm(expected, axis=1, keepdims=True), atol=1e-4)
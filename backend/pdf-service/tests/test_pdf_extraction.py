@@ -0,0 +1,72 @@
+"""
+Tests for the shared page-level PDF extraction engine
+"""
+import os
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("reportlab")
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+import pdf_extraction
+from pdf_extraction import iter_pages, extract_pages, extract_text, get_extraction_stats
+
+
+def _spec_book(pages: int) -> bytes:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    for number in range(1, pages + 1):
+        c.drawString(50, 700, f"Greenbook section {number} conduit depth 24 inches")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def test_serial_extraction_for_small_documents():
+    pages = extract_pages(_spec_book(3), workers=4)
+    assert [page.page_number for page in pages] == [1, 2, 3]
+    assert "Greenbook section 2" in pages[1].text
+    assert all(page.seconds >= 0 for page in pages)
+    assert get_extraction_stats()["last_document"]["mode"] == "serial"
+
+
+def test_parallel_extraction_streams_pages_in_order(temp_data_dir):
+    path = os.path.join(temp_data_dir, 'book.pdf')
+    with open(path, 'wb') as f:
+        f.write(_spec_book(30))
+
+    serial = extract_text(path, workers=1)
+    pages = list(iter_pages(path, workers=2, min_parallel_pages=10))
+
+    assert [page.page_number for page in pages] == list(range(1, 31))
+    assert "\n".join(page.text for page in pages) == serial
+    last = get_extraction_stats()["last_document"]
+    assert last["mode"] == "parallel"
+    assert last["pages"] == 30
+
+
+def test_broken_pool_falls_back_to_serial(monkeypatch):
+    def broken_pool(workers):
+        raise OSError("no processes available")
+
+    monkeypatch.setattr(pdf_extraction, '_get_pool', broken_pool)
+    text = extract_text(_spec_book(12), workers=2, min_parallel_pages=1)
+    assert text.count("Greenbook section") == 12
+    assert get_extraction_stats()["serial_fallbacks"] >= 1
+
+
+def test_daemonic_process_extracts_serially(monkeypatch):
+    import multiprocessing
+
+    # Celery prefork children are daemonic and may not start a process pool
+    monkeypatch.setattr(multiprocessing.current_process(), 'daemon', True)
+    text = extract_text(_spec_book(12), workers=4, min_parallel_pages=1)
+    assert text.count("Greenbook section") == 12
+    assert get_extraction_stats()["last_document"]["mode"] == "serial"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        extract_text(b"%PDF-1.4", backend='ocr')
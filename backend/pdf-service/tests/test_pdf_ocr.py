@@ -0,0 +1,71 @@
+"""
+Tests for the batched OCR stage
+"""
+import os
+
+import pytest
+
+import pdf_ocr
+from pdf_ocr import OCRCache, ocr_pages, page_runs
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch, temp_data_dir):
+    """Records rasterize/tesseract calls instead of shelling out to poppler and tesseract"""
+    calls = {"raster": [], "ocr": []}
+
+    def rasterize(path, first, last, dpi, output_folder):
+        calls["raster"].append((first, last))
+        images = []
+        for page in range(first, last + 1):
+            image_path = os.path.join(output_folder, f"page-{page}.png")
+            with open(image_path, 'w') as f:
+                f.write(f"scanned text of page {page}")
+            images.append(image_path)
+        return images
+
+    def tesseract(image_path):
+        calls["ocr"].append(os.path.basename(image_path))
+        with open(image_path) as f:
+            return f.read()
+
+    monkeypatch.setattr(pdf_ocr, '_rasterize', rasterize)
+    monkeypatch.setattr(pdf_ocr, '_tesseract', tesseract)
+    monkeypatch.setattr(pdf_ocr, '_cache', OCRCache(os.path.join(temp_data_dir, 'ocr.sqlite3')))
+    return calls
+
+
+def test_page_runs_merge_nearby_pages():
+    assert page_runs([4, 2, 3, 10, 12, 40]) == [(2, 4), (10, 12), (40, 40)]
+    assert page_runs([]) == []
+
+
+def test_pages_are_rasterized_in_runs_and_only_wanted_pages_ocrd(fake_ocr):
+    results = ocr_pages(b"%PDF-1.4 scanned audit", [2, 3, 4, 10, 12, 40])
+
+    assert fake_ocr["raster"] == [(2, 4), (10, 12), (40, 40)]
+    assert sorted(fake_ocr["ocr"]) == sorted(f"page-{p}.png" for p in [2, 3, 4, 10, 12, 40])
+    assert results[10] == "scanned text of page 10"
+    assert 11 not in results
+
+
+def test_reanalysis_never_ocrs_twice(fake_ocr):
+    first = ocr_pages(b"%PDF-1.4 scanned audit", [1, 2])
+    fake_ocr["raster"].clear()
+    fake_ocr["ocr"].clear()
+
+    again = ocr_pages(b"%PDF-1.4 scanned audit", [1, 2])
+    assert again == first
+    assert fake_ocr["raster"] == [] and fake_ocr["ocr"] == []
+
+    # A different document is OCR'd even with the same page numbers
+    ocr_pages(b"%PDF-1.4 another audit", [1])
+    assert fake_ocr["raster"] == [(1, 1)]
+
+
+def test_failed_run_is_skipped(fake_ocr, monkeypatch):
+    def broken(path, first, last, dpi, output_folder):
+        raise RuntimeError("poppler not installed")
+
+    monkeypatch.setattr(pdf_ocr, '_rasterize', broken)
+    assert ocr_pages(b"%PDF-1.4 scanned audit", [5]) == {}
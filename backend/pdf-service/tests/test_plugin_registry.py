@@ -0,0 +1,146 @@
+"""
+Tests for lazily loaded optional feature plugins
+"""
+import sys
+import textwrap
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from modules.plugin_registry import PluginRegistry
+
+PLUGIN_SOURCE = '''
+from fastapi import APIRouter
+
+LOADS = []
+
+
+def integrate_widgets(app):
+    LOADS.append(app)
+    router = APIRouter(prefix="/widgets")
+
+    @router.get("/count")
+    async def count():
+        return {"loads": len(LOADS)}
+
+    app.include_router(router)
+
+
+def integrate_root(app):
+    @app.post("/analyze-widget")
+    async def analyze(text: str):
+        return {"text": text}
+'''
+
+
+@pytest.fixture
+def plugin_module(tmp_path, monkeypatch):
+    (tmp_path / "fake_widget_plugin.py").write_text(textwrap.dedent(PLUGIN_SOURCE))
+    (tmp_path / "broken_plugin.py").write_text("import does_not_exist_anywhere\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    sys.modules.pop("fake_widget_plugin", None)
+    sys.modules.pop("broken_plugin", None)
+
+
+def _app(**kwargs):
+    @asynccontextmanager
+    async def lifespan(app):
+        warmup = registry.start_warmup()
+        if warmup is not None:
+            await warmup
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    registry = PluginRegistry(app, **kwargs)
+    registry.declare('widgets', 'fake_widget_plugin', 'integrate_widgets', ['/widgets'])
+    registry.declare('root', 'fake_widget_plugin', 'integrate_root', ['/analyze-widget'])
+    registry.declare('broken', 'broken_plugin', 'integrate', ['/broken'])
+    return app, registry
+
+
+def test_plugins_load_on_first_request_only(plugin_module):
+    app, registry = _app(enabled='all', warmup='none')
+    client = TestClient(app)
+
+    assert client.get("/health").status_code == 200
+    assert "fake_widget_plugin" not in sys.modules
+    assert registry.get_stats()["loaded"] == 0
+
+    assert client.get("/widgets/count").json() == {"loads": 1}
+    assert client.get("/widgets/count").json() == {"loads": 1}
+    assert client.post("/analyze-widget", params={"text": "crossarm"}).json() == {"text": "crossarm"}
+    # The plugin's own routing still applies
+    assert client.get("/widgets/missing").status_code == 404
+    assert client.get("/analyze-widget").status_code == 405
+
+    stats = {plugin["name"]: plugin for plugin in registry.get_stats()["plugins"]}
+    assert stats["widgets"]["state"] == "loaded"
+    assert stats["widgets"]["trigger"] == "request"
+    assert stats["widgets"]["requests"] == 3
+    assert stats["widgets"]["load_seconds"] >= 0
+
+    response = client.get("/broken/anything")
+    assert response.status_code == 503
+    assert "ModuleNotFoundError" in response.json()["detail"]
+    assert not registry.is_enabled('broken')
+
+
+def test_allow_list_and_warmup(plugin_module):
+    app, registry = _app(enabled='root,broken', warmup='all')
+    with TestClient(app) as client:
+        # Disabled plugins are not served and never imported
+        assert client.get("/widgets/count").status_code == 404
+        assert not registry.is_enabled('widgets')
+
+        assert registry.plugins['root'].state == 'loaded'
+        assert registry.plugins['root'].trigger == 'warmup'
+        assert registry.plugins['broken'].state == 'failed'
+        assert client.post("/analyze-widget", params={"text": "pole"}).status_code == 200
+
+    assert registry.plugins['widgets'].state == 'disabled'
+    assert registry.get_stats()["allow_list"] == ['root', 'broken']
+
+
+def test_preload_loads_warmup_plugins_before_startup(plugin_module):
+    app, registry = _app(enabled='all', warmup='widgets,root')
+    # What serve_preload.py does in the master before forking workers
+    assert registry.preload() == 2
+    assert registry.plugins['widgets'].trigger == 'preload'
+    assert registry.plugins['broken'].state == 'declared'
+
+    with TestClient(app) as client:
+        assert registry.start_warmup() is None
+        assert client.get("/widgets/count").json() == {"loads": 1}
+
+
+def test_plugin_routes_are_in_the_app_docs(plugin_module):
+    app, registry = _app(enabled='all', warmup='none')
+    client = TestClient(app)
+
+    schema = client.get("/openapi.json").json()
+    assert "/health" in schema["paths"]
+    assert "/widgets/count" not in schema["paths"]
+    tags = {tag["name"]: tag for tag in schema["tags"]}
+    assert tags["plugin: widgets"]["externalDocs"]["url"] == "/plugins/widgets/openapi.json"
+    assert "fake_widget_plugin" not in sys.modules
+
+    # The linked schema loads the plugin; the app's docs then list its operations
+    assert "/widgets/count" in client.get("/plugins/widgets/openapi.json").json()["paths"]
+    assert registry.plugins['widgets'].trigger == 'docs'
+    client.post("/analyze-widget", params={"text": "pole"})
+
+    schema = client.get("/openapi.json").json()
+    assert "/widgets/count" in schema["paths"]
+    assert "post" in schema["paths"]["/analyze-widget"]
+    assert [tag["name"] for tag in schema["tags"]] == ["plugin: broken"]
+
+    assert client.get("/plugins/broken/openapi.json").status_code == 503
+    assert client.get("/plugins/unknown/openapi.json").status_code == 404
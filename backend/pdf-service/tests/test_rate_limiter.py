@@ -0,0 +1,112 @@
+"""
+Tests for the sliding-window rate limiter
+"""
+import asyncio
+
+import pytest
+
+from modules.rate_limiter import (
+    RedisRateLimiter, SlidingWindowRateLimiter, TimestampListLimiter, create_rate_limiter
+)
+
+
+def test_limits_within_a_window_and_reports_remaining():
+    limiter = SlidingWindowRateLimiter(calls=3, period=60, max_keys=10)
+    results = [limiter.hit("10.0.0.1", now=600.0) for _ in range(4)]
+
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    assert results[3].retry_after >= 1
+    assert results[0].reset_after == pytest.approx(60)
+    # Other clients have their own budget
+    assert limiter.hit("10.0.0.2", now=600.0).allowed
+
+
+def test_previous_window_decays_across_the_boundary():
+    limiter = SlidingWindowRateLimiter(calls=4, period=60, max_keys=10)
+    for _ in range(4):
+        assert limiter.hit("ip", now=0.0).allowed
+
+    # At the boundary the previous window still weighs fully
+    assert not limiter.hit("ip", now=60.0).allowed
+    # Halfway through it only counts for half of its 4 requests
+    assert limiter.hit("ip", now=90.0).allowed
+    assert limiter.hit("ip", now=90.0).allowed
+    assert not limiter.hit("ip", now=90.0).allowed
+    # A window with no traffic in between resets completely
+    assert all(limiter.hit("ip", now=300.0).allowed for _ in range(4))
+
+
+def test_retry_after_points_at_the_first_allowed_second():
+    limiter = SlidingWindowRateLimiter(calls=4, period=60, max_keys=10)
+    for _ in range(4):
+        limiter.hit("ip", now=0.0)
+    denied = limiter.hit("ip", now=30.0)
+
+    assert not denied.allowed
+    assert not limiter.hit("ip", now=30.0 + denied.retry_after - 1).allowed
+    assert limiter.hit("ip", now=30.0 + denied.retry_after).allowed
+
+
+def test_key_table_is_lru_bounded():
+    limiter = SlidingWindowRateLimiter(calls=1, period=60, max_keys=3)
+    for i in range(3):
+        limiter.hit(f"ip{i}", now=0.0)
+    # Touch ip0 so ip1 is the least recently seen
+    limiter.hit("ip0", now=0.0)
+    limiter.hit("scanner", now=0.0)
+
+    stats = limiter.get_stats()
+    assert stats["keys"] == 3
+    assert stats["evictions"] == 1
+    # ip1 was forgotten and gets a fresh budget; ip0 is still limited
+    assert limiter.hit("ip1", now=1.0).allowed
+    assert not limiter.hit("ip0", now=1.0).allowed
+
+
+def test_matches_timestamp_lists_for_a_steady_client():
+    limiter = SlidingWindowRateLimiter(calls=10, period=60, max_keys=10)
+    reference = TimestampListLimiter(calls=10, period=60)
+    allowed = [limiter.hit("ip", now=float(t)).allowed for t in range(30)]
+    expected = [reference.hit("ip", float(t)) for t in range(30)]
+    assert allowed == expected
+
+
+def test_create_rate_limiter_defaults_to_memory(monkeypatch):
+    monkeypatch.delenv('RATE_LIMIT_BACKEND', raising=False)
+    limiter = create_rate_limiter(5, 60)
+    assert limiter.backend == 'memory'
+    assert asyncio.run(limiter.acquire("ip")).allowed
+
+
+def test_redis_backend_shares_limits_between_limiters():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    workers = [RedisRateLimiter(calls=3, period=60, client=fakeredis.FakeAsyncRedis(server=server))
+               for _ in range(2)]
+
+    async def main():
+        return [(await workers[i % 2].acquire("ip")).allowed for i in range(5)]
+
+    assert asyncio.run(main()) == [True, True, True, False, False]
+    assert workers[0].get_stats()["redis_available"]
+
+
+def test_redis_errors_fall_back_to_the_local_table():
+    class BrokenRedis:
+        def register_script(self, script):
+            async def run(keys, args):
+                raise ConnectionError("connection refused")
+            return run
+
+    limiter = RedisRateLimiter(calls=2, period=60, client=BrokenRedis())
+
+    async def main():
+        return [(await limiter.acquire("ip")).allowed for _ in range(3)]
+
+    assert asyncio.run(main()) == [True, True, False]
+    stats = limiter.get_stats()
+    assert stats["redis_errors"] == 1
+    assert stats["fallbacks"] == 3
+    assert not stats["redis_available"]
@@ -0,0 +1,107 @@
+"""
+Tests for the spec library ANN index layer
+"""
+import os
+import json
+
+import numpy as np
+import pytest
+
+from modules.spec_ann import AnnIndexer, Int8Codes, CONFIG_FILE, _clustered_embeddings
+from modules.spec_index import SpecIndex, SpecSnapshot, InMemorySegment
+from modules.spec_mmap_store import store_root
+
+faiss = pytest.importorskip("faiss")
+
+
+def _spec_index(data_path, **ann_kwargs):
+    index = SpecIndex(
+        data_path,
+        os.path.join(data_path, 'spec_embeddings.pkl'),
+        os.path.join(data_path, 'spec_metadata.json')
+    )
+    index.ann = AnnIndexer(data_path, **ann_kwargs)
+    return index
+
+
+def _queries(matrix, n=40):
+    rng = np.random.default_rng(7)
+    queries = matrix[rng.choice(len(matrix), n, replace=False)] + 0.05 * rng.standard_normal((n, matrix.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.mark.parametrize("backend", ["int8", "hnsw", "ivfpq"])
+def test_ann_matches_exact_search_with_exact_scores(backend):
+    matrix = _clustered_embeddings(12000, 64)
+    segment = InMemorySegment([''] * len(matrix), matrix)
+    queries = _queries(matrix)
+
+    exact_idx, exact_scores = SpecSnapshot([segment], [], {}, 1).search(queries, 5)
+    indexer = AnnIndexer(None, backend=backend, min_rows=1)
+    assert indexer.build(segment)
+    ann_idx, ann_scores = SpecSnapshot([segment], [], {}, 1, ann=indexer).search(queries, 5)
+
+    recall = np.mean([len(set(a) & set(e)) / 5 for a, e in zip(ann_idx.tolist(), exact_idx.tolist())])
+    assert recall >= 0.9
+    # Candidates are rescored against the float vectors, not the quantized codes
+    np.testing.assert_allclose(ann_scores, np.einsum('qkd,qd->qk', matrix[ann_idx], queries), rtol=1e-5)
+    assert indexer.stats["ann_segment_searches"] == 1
+
+
+def test_indexes_are_built_on_ingest_and_reused_by_other_workers(temp_data_dir):
+    matrix = _clustered_embeddings(3000, 32)
+    writer = _spec_index(temp_data_dir, backend='hnsw', min_rows=1000)
+    snapshot = writer.append_segment([f"chunk {i}" for i in range(len(matrix))], matrix,
+                                     {'file_hash': 'big', 'filename': 'big.pdf'})
+    writer.append_segment(["tiny chunk"], matrix[:1], {'file_hash': 'tiny', 'filename': 'tiny.pdf'})
+    assert writer.ann.stats["builds"] == 1  # the one-row segment stays exact
+
+    with open(os.path.join(store_root(temp_data_dir), CONFIG_FILE)) as f:
+        config = json.load(f)
+    assert config['backend'] == 'hnsw' and config['key'] == writer.ann.key
+    assert os.path.exists(writer.ann.index_path(snapshot.segments[0]))
+
+    # A second process inherits the persisted backend and loads instead of building
+    reader = _spec_index(temp_data_dir, min_rows=1000)
+    assert reader.ann.backend == 'hnsw' and reader.ann.key == writer.ann.key
+    idx, _ = reader.snapshot().search(_queries(matrix, 5), 5)
+    assert reader.ann.stats["builds"] == 0 and reader.ann.stats["loads"] == 1
+    assert idx.shape == (5, 5)
+
+    # Changing a build parameter names new files; maintenance rebuilds them
+    rebuilt = _spec_index(temp_data_dir, min_rows=1000, build_params={'m': 8})
+    assert rebuilt.ann.key != writer.ann.key
+    assert rebuilt.ann.ensure(rebuilt.snapshot().segments) == 1
+
+
+def test_tombstoned_rows_never_match(temp_data_dir):
+    matrix = _clustered_embeddings(4000, 32)
+    index = _spec_index(temp_data_dir, backend='ivfpq', min_rows=1000)
+    index.append_segments([
+        ([f"a {i}" for i in range(2000)], matrix[:2000], {'file_hash': 'a', 'filename': 'a.pdf'}),
+        ([f"b {i}" for i in range(2000)], matrix[2000:], {'file_hash': 'b', 'filename': 'b.pdf'})
+    ])
+    snapshot = index.tombstone('a')
+
+    idx, scores = snapshot.search(_queries(matrix[:2000], 10), 5)
+    assert np.all(idx[np.isfinite(scores)] >= 2000)
+    assert index.get_stats()["ann"]["ann_segment_searches"] > 0
+
+
+def test_int8_codes_are_memory_mapped_and_a_quarter_of_float32(temp_data_dir):
+    matrix = _clustered_embeddings(3000, 64)
+    writer = _spec_index(temp_data_dir, backend='int8', min_rows=1000)
+    writer.append_segment([f"chunk {i}" for i in range(len(matrix))], matrix,
+                          {'file_hash': 'big', 'filename': 'big.pdf'})
+
+    reader = _spec_index(temp_data_dir, min_rows=1000)
+    assert reader.ann.backend == 'int8'
+    queries = _queries(matrix, 10)
+    idx, scores = reader.snapshot().search(queries, 5)
+    codes = reader.ann._indexes[reader.snapshot().segments[0].segment_id]
+    assert isinstance(codes, Int8Codes) and isinstance(codes.codes, np.memmap)
+    assert codes.codes.nbytes * 4 == matrix.nbytes
+
+    exact_idx, exact_scores = SpecSnapshot([InMemorySegment([''] * len(matrix), matrix)], [], {}, 1).search(queries, 5)
+    assert np.array_equal(idx, exact_idx)
+    np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
@@ -0,0 +1,113 @@
+"""
+Tests for near-duplicate chunk collapsing during spec ingestion
+"""
+import os
+import random
+
+import numpy as np
+import pytest
+
+from modules.spec_dedup import SpecDeduper, dedup_report
+from modules.spec_index import SpecIndex
+from modules.infraction_scoring import build_spec_match
+
+WORDS = ("conductor crossarm insulator clearance guy anchor pole riser conduit trench splice vault "
+         "transformer bonding ground meter service drop span sag tension hardware bracket").split()
+
+
+def _paragraph(seed, words=180):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(words)) + f" per section {seed}"
+
+
+def _book(name, seeds, edits=()):
+    chunks = []
+    for seed in seeds:
+        text = _paragraph(seed)
+        if seed in edits:
+            text = text.replace(WORDS[0], "reconductor", 1)
+        chunks.append(f"[Source: {name}] {text}")
+    return chunks
+
+
+def _embed(chunks):
+    rng = np.random.default_rng(len(chunks))
+    return rng.standard_normal((len(chunks), 16)).astype(np.float32)
+
+
+@pytest.fixture
+def spec_index(temp_data_dir):
+    index = SpecIndex(
+        temp_data_dir,
+        os.path.join(temp_data_dir, 'spec_embeddings.pkl'),
+        os.path.join(temp_data_dir, 'spec_metadata.json')
+    )
+    index.dedup = SpecDeduper(temp_data_dir, enabled=True)
+    return index
+
+
+def _item(name, chunks):
+    return chunks, _embed(chunks), {'filename': name, 'file_hash': f"hash-{name}", 'chunk_count': len(chunks)}
+
+
+def test_near_duplicates_but_not_changed_numbers():
+    deduper = SpecDeduper(None, enabled=True)
+    base = _paragraph(1)
+    reworded = base.replace("per section", "as per section")
+    renumbered = base.replace("section 1", "section 2")
+
+    sig = deduper.hasher.signature(f"[Source: a.pdf] {base}")
+    assert deduper.is_duplicate(sig, deduper.hasher.signature(f"[Source: b.pdf] {base}"))
+    assert deduper.is_duplicate(sig, deduper.hasher.signature(reworded))
+    # A revision that changes a number is not the same requirement
+    assert not deduper.is_duplicate(sig, deduper.hasher.signature(renumbered))
+    assert not deduper.is_duplicate(sig, deduper.hasher.signature(_paragraph(2)))
+
+
+def test_revisions_uploaded_side_by_side_collapse(spec_index):
+    rev_a = _book("rev3.pdf", range(40))
+    rev_b = _book("rev4.pdf", range(40), edits={5}) + _book("rev4.pdf", [100, 101])
+    snapshot = spec_index.append_segments([_item("rev3.pdf", rev_a), _item("rev4.pdf", rev_b)])
+
+    # rev4 only adds its two new sections; its edited section is a near-duplicate too
+    assert len(snapshot) == 42
+    assert len(snapshot.aliases) == 40
+    files = {f['filename']: f for f in snapshot.metadata['files']}
+    assert files['rev4.pdf']['duplicate_chunks'] == 40
+    assert files['rev4.pdf']['chunk_count'] == 42
+
+    assert snapshot.sources(0) == ["rev3.pdf", "rev4.pdf"]
+    match = build_spec_match(snapshot.chunks[0], 0.8, snapshot.sources(0))
+    assert (match["source_spec"], match["also_in_specs"]) == ("rev3.pdf", ["rev4.pdf"])
+
+    report = dedup_report(snapshot)
+    assert (report["chunks_ingested"], report["chunks_stored"], report["duplicates_collapsed"]) == (82, 42, 40)
+    assert report["embedding_bytes_saved"] == 40 * 16 * 4
+    assert report["files"][0]["filename"] == "rev4.pdf"
+
+    # A later upload is checked against the library, not just its own batch
+    again = spec_index.append_segment(*_item("copy.pdf", _book("copy.pdf", range(10))))
+    assert len(again) == 42
+    assert again.sources(0) == ["rev3.pdf", "rev4.pdf", "copy.pdf"]
+
+
+def test_removing_the_canonical_file_keeps_shared_rows(spec_index):
+    spec_index.append_segments([_item("a.pdf", _book("a.pdf", range(10))),
+                                _item("b.pdf", _book("b.pdf", range(5)))])
+
+    snapshot = spec_index.tombstone("hash-a.pdf")
+    assert len(snapshot) == 5
+    live = [i for i in range(len(snapshot.chunks)) if snapshot.sources(i)]
+    assert [snapshot.sources(i) for i in live] == [["b.pdf"]] * 5
+    match = build_spec_match(snapshot.chunks[live[0]], 0.8, snapshot.sources(live[0]))
+    assert match["source_spec"] == "b.pdf" and "also_in_specs" not in match
+
+    # Compaction drops a.pdf's own rows and carries the shared ones over
+    assert spec_index.compact(force=True)
+    compacted = spec_index.snapshot()
+    assert len(compacted) == len(compacted.chunks) == 5
+    assert all(compacted.sources(i) == ["b.pdf"] for i in range(5))
+    assert not spec_index.compact()  # carried rows are not dead
+
+    # Once no file holds them any more they are gone
+    assert len(spec_index.tombstone("hash-b.pdf")) == 0
@@ -0,0 +1,237 @@
+"""
+Tests for the resident, versioned spec index
+"""
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from modules.spec_index import SpecIndex, VERSION_FILENAME
+from modules.spec_mmap_store import SEGMENTS_DIRNAME, store_root
+
+
+@pytest.fixture
+def spec_index(temp_data_dir):
+    return SpecIndex(
+        temp_data_dir,
+        os.path.join(temp_data_dir, 'spec_embeddings.pkl'),
+        os.path.join(temp_data_dir, 'spec_metadata.json')
+    )
+
+
+def _library(n, dim=8):
+    rng = np.random.default_rng(n)
+    return {
+        'chunks': [f"chunk {i}" for i in range(n)],
+        'embeddings': rng.standard_normal((n, dim)).tolist(),
+        'metadata': {'files': [{'filename': 'a.pdf', 'file_hash': 'abc'}]}
+    }
+
+
+class TestSpecIndex:
+    """Resident index behaviour"""
+
+    def test_empty_library(self, spec_index):
+        snapshot = spec_index.snapshot()
+        assert len(snapshot) == 0
+        assert snapshot.version == 0
+        assert snapshot.metadata['files'] == []
+
+    def test_publish_bumps_version_and_stores_float32(self, spec_index):
+        first = spec_index.publish(_library(3))
+        second = spec_index.publish(_library(5))
+
+        assert second.version == first.version + 1
+        snapshot = spec_index.snapshot()
+        assert snapshot is second
+        assert snapshot.matrix.dtype == np.float32
+        assert snapshot.matrix.flags['C_CONTIGUOUS']
+        assert not snapshot.segments[0].matrix.flags['WRITEABLE']
+        assert snapshot.metadata['total_chunks'] == 5
+
+    def test_snapshot_is_cached_until_version_changes(self, spec_index):
+        spec_index.publish(_library(3))
+        reloads = spec_index.stats['reloads']
+
+        for _ in range(10):
+            spec_index.snapshot()
+        assert spec_index.stats['reloads'] == reloads
+
+    def test_reloads_when_another_process_publishes(self, spec_index, temp_data_dir):
+        spec_index.publish(_library(3))
+
+        # A second index on the same directory stands in for another worker
+        other = SpecIndex(temp_data_dir, spec_index.embeddings_path, spec_index.metadata_path)
+        other.publish(_library(7))
+
+        snapshot = spec_index.snapshot()
+        assert len(snapshot) == 7
+        assert snapshot.version == 2
+
+    def test_migrates_legacy_dict_pickle(self, spec_index, temp_data_dir):
+        with open(spec_index.embeddings_path, 'wb') as f:
+            pickle.dump({'chunks': ['a', 'b'], 'embeddings': [[1.0, 0.0], [0.0, 1.0]]}, f)
+
+        snapshot = spec_index.snapshot()
+        assert list(snapshot.chunks) == ['a', 'b']
+        assert snapshot.matrix.shape == (2, 2)
+        assert snapshot.version == 1
+        assert isinstance(snapshot.segments[0].matrix, np.memmap)
+        assert os.path.exists(os.path.join(temp_data_dir, VERSION_FILENAME))
+
+    def test_migrates_legacy_tuple_pickle(self, spec_index):
+        with open(spec_index.embeddings_path, 'wb') as f:
+            pickle.dump((['x', 'y', 'z'], np.eye(3).tolist()), f)
+
+        snapshot = spec_index.snapshot()
+        assert snapshot.chunks[2] == 'z'
+        assert np.allclose(snapshot.matrix, np.eye(3))
+
+    def test_pickle_is_migrated_once_by_concurrent_readers(self, spec_index, temp_data_dir):
+        with open(spec_index.embeddings_path, 'wb') as f:
+            pickle.dump((['x', 'y'], np.eye(2).tolist()), f)
+        other = SpecIndex(temp_data_dir, spec_index.embeddings_path, spec_index.metadata_path)
+
+        # Worker B migrates after worker A found no library version but before A migrates
+        read_version = spec_index._read_disk_version
+
+        def other_migrates_after_first_read():
+            spec_index._read_disk_version = read_version
+            version = read_version()
+            other.snapshot()
+            return version
+
+        spec_index._read_disk_version = other_migrates_after_first_read
+        snapshot = spec_index.snapshot()
+
+        assert snapshot.version == 1
+        assert [s.segment_id for s in snapshot.segments] == [s.segment_id for s in other.snapshot().segments]
+        assert len(os.listdir(os.path.join(store_root(temp_data_dir), SEGMENTS_DIRNAME))) == 1
+
+    def test_published_library_is_memory_mapped(self, spec_index):
+        spec_index.publish(_library(4))
+        snapshot = spec_index.snapshot()
+        assert isinstance(snapshot.segments[0].matrix, np.memmap)
+        assert snapshot.chunks[3] == 'chunk 3'
+        assert np.allclose(np.linalg.norm(snapshot.matrix, axis=1), 1.0, atol=1e-5)
+
+    def test_to_library_is_a_copy(self, spec_index):
+        spec_index.publish(_library(2))
+        library = spec_index.snapshot().to_library()
+        library['chunks'].append('extra')
+        library['metadata']['files'].clear()
+
+        snapshot = spec_index.snapshot()
+        assert len(snapshot) == 2
+        assert snapshot.metadata['files']
+
+
+class TestSegments:
+    """Append-only segments, tombstones and compaction"""
+
+    @staticmethod
+    def _file(name, n, dim=8):
+        rng = np.random.default_rng(abs(hash(name)) % (2 ** 32))
+        chunks = [f"[Source: {name}] row {i}" for i in range(n)]
+        info = {'filename': name, 'file_hash': f"hash-{name}", 'chunk_count': n}
+        return chunks, rng.standard_normal((n, dim)).astype(np.float32), info
+
+    def test_append_adds_a_segment_without_rewriting(self, spec_index):
+        first = spec_index.append_segment(*self._file('a.pdf', 4))
+        second = spec_index.append_segment(*self._file('b.pdf', 3))
+
+        assert second.version == first.version + 1
+        assert len(second.segments) == 2
+        assert second.segments[0].segment_id == first.segments[0].segment_id
+        assert isinstance(second.segments[0].matrix, np.memmap)
+        assert len(second) == 7
+        assert second.chunks[5] == "[Source: b.pdf] row 1"
+        assert [f['filename'] for f in second.metadata['files']] == ['a.pdf', 'b.pdf']
+
+    def test_search_matches_brute_force_over_live_rows(self, spec_index):
+        for name, n in (('a.pdf', 20), ('b.pdf', 3), ('c.pdf', 15)):
+            spec_index.append_segment(*self._file(name, n))
+        snapshot = spec_index.tombstone('hash-b.pdf')
+
+        queries = np.random.default_rng(9).standard_normal((4, 8)).astype(np.float32)
+        indices, scores = snapshot.search(queries, 5)
+
+        live = [i for i in range(38) if not 20 <= i < 23]
+        full = np.vstack([np.asarray(s.matrix) for s in snapshot.segments])[live]
+        expected = np.argsort(-(queries @ full.T), axis=1)[:, :5]
+        assert np.array_equal(indices, np.asarray(live)[expected])
+        assert np.isfinite(scores).all()
+
+    def test_tombstone_masks_rows_until_compaction(self, spec_index):
+        spec_index.append_segment(*self._file('a.pdf', 5))
+        spec_index.append_segment(*self._file('b.pdf', 5))
+        snapshot = spec_index.tombstone('hash-a.pdf')
+
+        assert len(snapshot) == 5
+        assert snapshot.dead_count == 5
+        assert [f['filename'] for f in snapshot.metadata['files']] == ['b.pdf']
+        assert all('b.pdf' in chunk for chunk in snapshot.to_library()['chunks'])
+
+        assert spec_index.compact(force=True)
+        compacted = spec_index.snapshot()
+        assert len(compacted.segments) == 1
+        assert compacted.dead_count == 0
+        assert not compacted.tombstones
+        assert list(compacted.chunks) == [f"[Source: b.pdf] row {i}" for i in range(5)]
+
+    def test_reupload_after_remove_is_not_masked(self, spec_index):
+        spec_index.append_segment(*self._file('a.pdf', 4))
+        spec_index.tombstone('hash-a.pdf')
+        snapshot = spec_index.append_segment(*self._file('a.pdf', 4))
+
+        assert len(snapshot) == 4
+        assert snapshot.dead_count == 4
+
+    def test_compaction_merges_small_segments(self, spec_index):
+        for name in ('a.pdf', 'b.pdf', 'c.pdf', 'd.pdf'):
+            spec_index.append_segment(*self._file(name, 2))
+        before = spec_index.snapshot()
+
+        assert spec_index.compact()
+        after = spec_index.snapshot()
+        assert len(after.segments) == 1
+        assert list(after.chunks) == list(before.chunks)
+        assert np.allclose(after.segments[0].matrix, before.matrix)
+        assert [f['start'] for f in after.segments[0].files] == [0, 2, 4, 6]
+
+    def test_segment_written_before_another_writer_commits_survives(self, spec_index, temp_data_dir):
+        other = SpecIndex(temp_data_dir, spec_index.embeddings_path, spec_index.metadata_path)
+        spec_index.append_segment(*self._file('a.pdf', 2))
+
+        # Worker B publishes (and prunes) after worker A wrote its segment but before A takes the lock
+        locked = spec_index._locked
+
+        def other_commits_first():
+            other.append_segment(*self._file('b.pdf', 2))
+            return locked()
+
+        spec_index._locked = other_commits_first
+        snapshot = spec_index.append_segment(*self._file('c.pdf', 3))
+
+        assert snapshot.version == 3
+        assert [f['filename'] for f in snapshot.metadata['files']] == ['a.pdf', 'b.pdf', 'c.pdf']
+        assert len(snapshot) == 7
+
+    def test_compaction_survives_a_concurrent_publish(self, spec_index, temp_data_dir):
+        other = SpecIndex(temp_data_dir, spec_index.embeddings_path, spec_index.metadata_path)
+        for name in ('a.pdf', 'b.pdf', 'c.pdf', 'd.pdf'):
+            spec_index.append_segment(*self._file(name, 2))
+
+        locked = spec_index._locked
+
+        def other_commits_first():
+            other.append_segment(*self._file('e.pdf', 2))
+            return locked()
+
+        spec_index._locked = other_commits_first
+        assert spec_index.compact()
+
+        snapshot = spec_index.snapshot()
+        assert len(snapshot.segments) == 2
+        assert len(snapshot) == 10
@@ -0,0 +1,79 @@
+"""
+Tests for the memory-mapped spec library store
+"""
+import os
+
+import numpy as np
+import pytest
+
+from modules.spec_mmap_store import (
+    write_segment, open_segment, segment_dir, write_library_manifest,
+    open_library, prune_store
+)
+
+
+def test_round_trip_with_unicode_chunks(temp_data_dir):
+    chunks = ["GO-95 Rule 35 clearance", "Conduit ≥ 4\" primary", ""]
+    matrix = np.random.default_rng(1).standard_normal((3, 8)).astype(np.float32)
+    files = [{'file_hash': 'abc', 'filename': 'a.pdf', 'start': 0, 'end': 3}]
+
+    segment_id = write_segment(temp_data_dir, chunks, matrix, files=files)
+    segment = open_segment(temp_data_dir, segment_id)
+
+    assert list(segment.chunks) == chunks
+    assert segment.chunks[-1] == ""
+    assert segment.chunks[0:2] == chunks[0:2]
+    assert np.array_equal(segment.matrix, matrix)
+    assert segment.files == files
+    assert len(segment) == 3
+
+
+def test_float16_storage_halves_size(temp_data_dir):
+    matrix = np.random.default_rng(2).standard_normal((100, 384)).astype(np.float32)
+    chunks = [f"c{i}" for i in range(100)]
+
+    id32 = write_segment(temp_data_dir, chunks, matrix, dtype='float32')
+    id16 = write_segment(temp_data_dir, chunks, matrix, dtype='float16')
+
+    size32 = os.path.getsize(os.path.join(segment_dir(temp_data_dir, id32), 'embeddings.npy'))
+    size16 = os.path.getsize(os.path.join(segment_dir(temp_data_dir, id16), 'embeddings.npy'))
+    assert size16 < size32 * 0.55
+    assert np.allclose(open_segment(temp_data_dir, id16).matrix, matrix, atol=1e-2)
+
+
+def test_empty_segment_and_missing_version(temp_data_dir):
+    assert open_library(temp_data_dir, 5) is None
+
+    segment_id = write_segment(temp_data_dir, [], np.zeros((0, 384), dtype=np.float32))
+    segment = open_segment(temp_data_dir, segment_id)
+    assert len(segment.chunks) == 0
+    assert segment.matrix.shape == (0, 384)
+
+
+def test_library_manifest_lists_segments_and_tombstones(temp_data_dir):
+    first = write_segment(temp_data_dir, ["a"], np.ones((1, 2), dtype=np.float32))
+    second = write_segment(temp_data_dir, ["b", "c"], np.ones((2, 2), dtype=np.float32))
+    write_library_manifest(temp_data_dir, 1, [first, second], [f"{first}:abc"])
+
+    segments, manifest = open_library(temp_data_dir, 1)
+    assert [s.segment_id for s in segments] == [first, second]
+    assert manifest['tombstones'] == [f"{first}:abc"]
+
+
+def test_prune_keeps_referenced_segments(temp_data_dir):
+    old = write_segment(temp_data_dir, ["a"], np.ones((1, 2), dtype=np.float32))
+    kept = write_segment(temp_data_dir, ["b"], np.ones((1, 2), dtype=np.float32))
+    write_library_manifest(temp_data_dir, 1, [old, kept], [])
+    write_library_manifest(temp_data_dir, 2, [kept], [])
+
+    prune_store(temp_data_dir, keep_versions=(2,))
+
+    assert open_library(temp_data_dir, 1) is None
+    assert open_library(temp_data_dir, 2) is not None
+    assert open_segment(temp_data_dir, old) is None
+    assert open_segment(temp_data_dir, kept) is not None
+
+
+def test_rejects_unknown_dtype(temp_data_dir):
+    with pytest.raises(ValueError):
+        write_segment(temp_data_dir, ["a"], np.ones((1, 2)), dtype='int4')
@@ -0,0 +1,82 @@
+"""
+Tests for the shared spec library store
+"""
+import os
+
+import numpy as np
+
+from modules.spec_index import SpecIndex
+from modules.spec_store import get_spec_store, chunk_source
+
+
+def _file(name, n, dim=8):
+    rng = np.random.default_rng(n)
+    chunks = [f"[Source: {name}] row {i}" for i in range(n)]
+    return chunks, rng.standard_normal((n, dim)).astype(np.float32), {'filename': name, 'file_hash': name}
+
+
+def test_one_store_per_data_directory(temp_data_dir):
+    by_dir = get_spec_store(temp_data_dir)
+    by_pickle_path = get_spec_store(os.path.join(temp_data_dir, 'spec_embeddings.pkl'))
+    assert by_dir is by_pickle_path
+
+
+def test_typed_read_api(temp_data_dir):
+    store = get_spec_store(temp_data_dir)
+    assert len(store) == 0
+
+    store.append_segment(*_file('a.pdf', 3))
+
+    assert store.version == 1
+    assert store.matrix.shape == (3, 8)
+    assert store.matrix.dtype == np.float32
+    assert store.chunks[1] == "[Source: a.pdf] row 1"
+    assert store.metadata['files'][0]['filename'] == 'a.pdf'
+
+
+def test_search_returns_pinned_snapshot(temp_data_dir):
+    store = get_spec_store(temp_data_dir)
+    chunks, matrix, info = _file('a.pdf', 6)
+    store.append_segment(chunks, matrix, info)
+
+    indices, scores, snapshot = store.search(matrix[4] * 3.0, top_k=2)
+    assert indices[0, 0] == 4
+    assert np.isclose(scores[0, 0], 1.0, atol=1e-5)
+    assert snapshot.chunks[int(indices[0, 0])] == chunks[4]
+
+
+def test_listeners_notified_for_local_and_remote_publishes(temp_data_dir):
+    store = get_spec_store(temp_data_dir)
+    store.snapshot()
+    seen = []
+    unsubscribe = store.subscribe(lambda snapshot: seen.append(snapshot.version))
+
+    store.append_segment(*_file('a.pdf', 2))
+
+    # Another worker publishing through its own index on the same directory
+    other = SpecIndex(temp_data_dir, store.index.embeddings_path, store.index.metadata_path)
+    other.append_segment(*_file('b.pdf', 2))
+    assert len(store) == 4
+
+    unsubscribe()
+    store.tombstone('a.pdf')
+    assert seen == [1, 2]
+
+
+def test_failing_listener_does_not_break_readers(temp_data_dir):
+    store = get_spec_store(temp_data_dir)
+    store.snapshot()
+
+    def broken(snapshot):
+        raise RuntimeError("boom")
+
+    store.subscribe(broken)
+    snapshot = store.append_segment(*_file('a.pdf', 2))
+    assert len(snapshot) == 2
+    assert store.get_stats()['listener_errors'] == 1
+
+
+def test_chunk_source():
+    assert chunk_source("text [Source: TD-051122.pdf, Page 4]") == 'TD-051122.pdf'
+    assert chunk_source("[Source: greenbook.pdf] Conduit depth") == 'greenbook.pdf'
+    assert chunk_source("no tag") == 'Unknown'
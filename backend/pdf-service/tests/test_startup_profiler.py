@@ -0,0 +1,72 @@
+"""
+Tests for the startup profiler (import hook, spans, report)
+"""
+import sys
+import time
+
+import pytest
+
+from startup_profiler import StartupProfiler, _percentile
+
+SLOW_MODULE = '''
+import time
+import slow_leaf_module
+time.sleep(0.05)
+'''
+
+
+@pytest.fixture
+def slow_modules(tmp_path, monkeypatch):
+    (tmp_path / "slow_root_module.py").write_text(SLOW_MODULE)
+    (tmp_path / "slow_leaf_module.py").write_text("import time\ntime.sleep(0.1)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    sys.modules.pop("slow_root_module", None)
+    sys.modules.pop("slow_leaf_module", None)
+
+
+def test_first_imports_are_timed_until_ready(slow_modules):
+    profiler = StartupProfiler()
+    profiler.install_import_hook()
+    try:
+        import slow_root_module  # noqa: F401
+        import slow_root_module  # noqa: F401,F811 - cached, not re-recorded
+    finally:
+        profiler.mark_ready()
+
+    root = profiler.imports["slow_root_module"]
+    leaf = profiler.imports["slow_leaf_module"]
+    assert root["depth"] == 0 and leaf["depth"] == 1
+    assert root["seconds"] >= 0.15
+    # Self time excludes the nested import
+    assert 0.05 <= root["self_seconds"] < 0.1
+    assert leaf["self_seconds"] >= 0.1
+
+    report = profiler.report(top=5)
+    assert report["top_level_imports"][0]["module"] == "slow_root_module"
+    assert report["slowest_imports_self"][0]["module"] == "slow_leaf_module"
+    assert report["ready_seconds"] >= 0.15 and report["ready_rss_mb"] > 0
+
+    # The hook is gone after mark_ready
+    sys.modules.pop("slow_leaf_module")
+    profiler.imports.clear()
+    import slow_leaf_module  # noqa: F401
+    assert profiler.imports == {}
+
+
+def test_spans_record_duration_rss_and_errors():
+    profiler = StartupProfiler()
+    with profiler.span('load_index'):
+        time.sleep(0.02)
+    with pytest.raises(ValueError):
+        with profiler.span('load_ner'):
+            raise ValueError("no model")
+
+    spans = {span["name"]: span for span in profiler.report()["spans"]}
+    assert spans['load_index']["seconds"] >= 0.02
+    assert spans['load_index']["rss_mb"] > 0
+    assert "error" not in spans['load_index']
+    assert spans['load_ner']["error"] == "ValueError: no model"
+
+    assert _percentile([3.0, 1.0, 2.0, 10.0], 50) == 3.0
+    assert _percentile([3.0, 1.0, 2.0, 10.0], 95) == 10.0
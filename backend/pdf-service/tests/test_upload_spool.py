@@ -0,0 +1,136 @@
+"""
+Tests for spooled, incrementally hashed uploads
+"""
+import os
+import asyncio
+import hashlib
+import tracemalloc
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from modules.upload_spool import SpooledUpload, UploadTooLarge, spool_upload
+from pdf_extraction import extract_text
+
+
+def _write_synthetic_pdf(path: str, pages: int, padding_bytes: int):
+    """
+    Text pages interleaved with large unreferenced binary streams,
+    written incrementally so building the fixture stays cheap in memory
+    """
+    offsets = {}
+    padding_per_page = padding_bytes // pages
+    block = bytes(range(256)) * 4096  # 1 MB
+
+    with open(path, 'wb') as f:
+        def obj(number: int, body: bytes):
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        kids = b" ".join(b"%d 0 R" % (4 + 3 * i) for i in range(pages))
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages)
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for i in range(pages):
+            page, content, padding = 4 + 3 * i, 5 + 3 * i, 6 + 3 * i
+            text = b"BT /F1 12 Tf 50 700 Td (Spec page %d conduit depth) Tj ET" % (i + 1)
+            obj(page, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                      b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content)
+            obj(content, b"<< /Length %d >>\nstream\n" % len(text) + text + b"\nendstream")
+
+            # Stand-in for scanned imagery: bulk bytes the text extractor never touches
+            offsets[padding] = f.tell()
+            f.write(b"%d 0 obj\n<< /Length %d >>\nstream\n" % (padding, padding_per_page))
+            remaining = padding_per_page
+            while remaining:
+                f.write(block[:min(remaining, len(block))])
+                remaining -= min(remaining, len(block))
+            f.write(b"\nendstream\nendobj\n")
+
+        count = 4 + 3 * pages
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for number in range(1, count):
+            f.write(b"%010d 00000 n \n" % offsets[number])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+
+
+async def _spool(path: str, **kwargs) -> SpooledUpload:
+    with open(path, 'rb') as f:
+        return await spool_upload(UploadFile(file=f, filename=os.path.basename(path)), **kwargs)
+
+
+def test_hash_is_computed_while_streaming(temp_data_dir):
+    path = os.path.join(temp_data_dir, 'small.pdf')
+    _write_synthetic_pdf(path, pages=3, padding_bytes=3 * 1024)
+    with open(path, 'rb') as f:
+        expected = hashlib.sha256(f.read()).hexdigest()
+
+    with asyncio.run(_spool(path, chunk_size=4096)) as upload:
+        assert upload.sha256 == expected
+        assert upload.file_hash == expected[:16]
+        assert upload.size == os.path.getsize(path)
+        assert upload.in_memory
+        assert "Spec page 2" in extract_text(upload.source)
+
+
+def test_large_uploads_roll_over_to_disk(temp_data_dir):
+    upload = SpooledUpload('big.pdf', memory_limit=1024, spool_dir=temp_data_dir)
+    upload.write(b"x" * 1000)
+    assert upload.in_memory
+    upload.write(b"y" * 1000)
+    upload.finish()
+
+    path = upload.path
+    assert os.path.getsize(path) == 2000
+    assert upload.read_bytes() == b"x" * 1000 + b"y" * 1000
+    upload.close()
+    assert not os.path.exists(path)
+
+
+def test_size_limit_is_enforced_while_streaming(temp_data_dir):
+    path = os.path.join(temp_data_dir, 'too_big.pdf')
+    _write_synthetic_pdf(path, pages=2, padding_bytes=64 * 1024)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(_spool(path, max_bytes=16 * 1024, chunk_size=4096))
+
+
+@pytest.mark.slow
+@pytest.mark.memory_intensive
+@pytest.mark.regression
+def test_multi_hundred_mb_upload_uses_bounded_memory(temp_data_dir):
+    size_mb = int(os.getenv('UPLOAD_MEMORY_TEST_MB', 300))
+    path = os.path.join(temp_data_dir, 'spec_book.pdf')
+    _write_synthetic_pdf(path, pages=200, padding_bytes=size_mb * 1024 * 1024)
+    assert os.path.getsize(path) > size_mb * 1024 * 1024
+
+    tracemalloc.start()
+    try:
+        upload = asyncio.run(_spool(path))
+        with upload:
+            assert not upload.in_memory
+            text = extract_text(upload.source, workers=1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert text.count("conduit depth") == 200
+    # The old path held the whole upload (twice, with BytesIO); now it is a few chunks
+    assert peak < 64 * 1024 * 1024, f"peak Python allocations {peak / 1e6:.1f} MB for a {size_mb} MB upload"
+
+
+def test_persist_is_content_addressed(temp_data_dir):
+    staged_dir = os.path.join(temp_data_dir, 'audit_jobs')
+    for memory_limit in (1 << 20, 16):
+        upload = SpooledUpload('audit.pdf', memory_limit=memory_limit, spool_dir=temp_data_dir)
+        upload.write(b"%PDF-1.4 audit body")
+        upload.finish()
+        with upload:
+            path = upload.persist(staged_dir)
+        assert path == os.path.join(staged_dir, f"{upload.sha256}.pdf")
+
+    # Both spools staged the same file, and it outlives the uploads
+    assert os.listdir(staged_dir) == [os.path.basename(path)]
+    with open(path, 'rb') as f:
+        assert f.read() == b"%PDF-1.4 audit body"
@@ -8,11 +8,12 @@ import os
 import json
 import logging
 from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
 import PyPDF2
 import pickle
 from datetime import datetime
 
+from modules.model_registry import get_embedding_model
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,7 @@ class JobPackageTrainer:
     
     def __init__(self, data_dir: str = "/data"):
         self.data_dir = data_dir
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = get_embedding_model(consumer='JobPackageTrainer')
         self.job_package_patterns = {}
         self.field_mappings = {}
         self.as_built_templates = {}
@@ -11,7 +11,7 @@ from datetime import datetime
 from uuid import UUID, uuid4
 import asyncpg
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from modules.model_registry import get_embedding_model
 import PyPDF2
 import re
 from pydantic import BaseModel
@@ -36,7 +36,7 @@ class UniversalEngine:
     
     def __init__(self):
         self.db_pool = None
-        self.embedder = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.embedder = get_embedding_model('sentence-transformers/all-MiniLM-L6-v2', consumer='UniversalEngine')
         self.utility_cache = {}
         logger.info("Universal Standards Engine initialized")
     
@@ -53,10 +53,10 @@ def compare_systems():
     
     print(f"\nEnhanced System:")
     print(f"  • Chunks: {enhanced_stats['total_chunks']}")
-    print(f"  • FAISS Index: {enhanced_stats['faiss_index_size']} vectors")
+    print(f"  • Spec store: {enhanced_stats['spec_store_segments']} segments")
     print(f"  • Ready: {enhanced_stats['ready']}")
-    print(f"  • Storage: Pickle + FAISS index")
-    print(f"  • Search: FAISS (fast, scalable)")
+    print(f"  • Storage: Memory-mapped spec store")
+    print(f"  • Search: Per-segment (ANN index where built)")
     print(f"  • Chunk overlap: {enhanced_stats['chunk_parameters']['overlap']} words")
     
     # Test search performance